@@ -15,6 +15,65 @@ class EmbedModelProvider:
         override this to apply the query prompt."""
         return self.embed(inputs, dimensions=dimensions)
 
+def truncate_to_tokens(encoder, inputs, max_tokens):
+    """Tokenize each input once and cut it to `max_tokens` from the cached ids.
+
+    Works with tiktoken encoders (encode returns a list of ids) and HF
+    `tokenizers.Tokenizer` (encode returns an Encoding with `.ids`). Returns
+    the (possibly truncated) texts and their token counts after truncation.
+    """
+    texts = []
+    counts = []
+    for text in inputs:
+        enc = encoder.encode(text)
+        ids = getattr(enc, "ids", enc)
+        if max_tokens is not None and len(ids) > max_tokens:
+            ids = ids[:max_tokens]
+            text = encoder.decode(ids)
+        texts.append(text)
+        counts.append(len(ids))
+    return texts, counts
+
+
+class APIEmbedProvider(EmbedModelProvider):
+    """Base for hosted embedding APIs.
+
+    Splits embed() into prepare_inputs() (normalize + truncate, tokenizing
+    each text once) and embed_prepared() (the request itself), so ls-embed can
+    prepare rows ahead of time, pack them into requests by token budget and
+    reuse the token counts for the embedding's token_stats.
+
+    `max_batch_tokens` / `max_batch_items` are the provider's per-request
+    ceilings (None when the API doesn't publish one or there is no local
+    tokenizer to count with).
+    """
+
+    max_batch_tokens = None
+    max_batch_items = None
+    encoder = None
+
+    def max_input_tokens(self):
+        """Per-input truncation length, or None to leave inputs whole."""
+        return (self.params or {}).get("max_tokens")
+
+    def normalize_input(self, text):
+        return text
+
+    def prepare_inputs(self, inputs):
+        """Return (texts ready to send, token counts or None)."""
+        texts = [self.normalize_input(t) for t in inputs]
+        if self.encoder is None:
+            return texts, None
+        return truncate_to_tokens(self.encoder, texts, self.max_input_tokens())
+
+    def embed_prepared(self, inputs, dimensions=None):
+        raise NotImplementedError("This method should be implemented by subclasses.")
+
+    def embed(self, inputs, dimensions=None):
+        inputs, _ = self.prepare_inputs(inputs)
+        return self.embed_prepared(inputs, dimensions=dimensions)
+
+
 class ChatModelProvider:
     def __init__(self, name, params, base_url=None):
         self.name = name
@@ -1,13 +1,17 @@
 import os
-import time
 
 from latentscope.util import get_key
 from latentscope.util.retry import retry_transient
 
-from .base import EmbedModelProvider
+from .base import APIEmbedProvider
 
 
-class CohereAIEmbedProvider(EmbedModelProvider):
+class CohereAIEmbedProvider(APIEmbedProvider):
+    # Default quota for ls-embed --concurrency (trial keys are lower)
+    rate_limits = {"requests_per_minute": 2000, "tokens_per_minute": None}
+    # Texts per embed call
+    max_batch_items = 96
+
     def load_model(self):
         import cohere
 
@@ -17,8 +21,7 @@ class CohereAIEmbedProvider(EmbedModelProvider):
             print("Missing 'COHERE_API_KEY' variable in:", f"{os.getcwd()}/.env")
         self.client = cohere.Client(api_key)
 
-    def embed(self, inputs, dimensions=None):
-        time.sleep(0.01)  # TODO proper rate limiting
+    def embed_prepared(self, inputs, dimensions=None):
         response = retry_transient()(
             lambda: self.client.embed(
                 texts=inputs, model=self.name, input_type=self.params["input_type"]
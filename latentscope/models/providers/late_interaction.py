@@ -30,6 +30,10 @@ class ColBERTEmbedProvider(EmbedModelProvider):
     # jina-colbert-v2 (8192 tokens).
     ENCODE_BATCH_SIZE = 8
 
+    # Sub-batches are padded to their longest document (see
+    # ls-embed --sort-by-length).
+    pads_batches = True
+
     def __init__(self, name, params):
         super().__init__(name, params)
         self.late_interaction = True
@@ -53,6 +57,7 @@ class ColBERTEmbedProvider(EmbedModelProvider):
             device=self.device,
             trust_remote_code=True,
         )
+        self.tokenizer = self.model.tokenizer
 
     def embed(self, inputs, dimensions=None):
         """Return mean embeddings as a list of lists (standard interface).
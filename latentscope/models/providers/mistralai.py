@@ -3,7 +3,7 @@ import os
 from latentscope.util import get_key
 from latentscope.util.retry import retry_transient
 
-from .base import ChatModelProvider, EmbedModelProvider
+from .base import APIEmbedProvider, ChatModelProvider
 
 # TODO verify these tokenizers somehow
 # derived from:
@@ -16,7 +16,10 @@ encoders = {
 }
 
 
-class MistralAIEmbedProvider(EmbedModelProvider):
+class MistralAIEmbedProvider(APIEmbedProvider):
+    # Default quota for ls-embed --concurrency
+    rate_limits = {"requests_per_minute": 300, "tokens_per_minute": None}
+
     def load_model(self):
         from mistralai.client import MistralClient
 
@@ -26,7 +29,7 @@ class MistralAIEmbedProvider(EmbedModelProvider):
             print("Missing 'MISTRAL_API_KEY' variable in:", f"{os.getcwd()}/.env")
         self.client = MistralClient(api_key=api_key)
 
-    def embed(self, inputs, dimensions=None):
+    def embed_prepared(self, inputs, dimensions=None):
         response = retry_transient()(
             lambda: self.client.embeddings(input=inputs, model=self.name)
         )()
@@ -3,10 +3,17 @@ import os
 from latentscope.util import get_key
 from latentscope.util.retry import retry_transient
 
-from .base import ChatModelProvider, EmbedModelProvider
+from .base import APIEmbedProvider, ChatModelProvider
 
 
-class OpenAIEmbedProvider(EmbedModelProvider):
+class OpenAIEmbedProvider(APIEmbedProvider):
+    # Default quota for ls-embed --concurrency (usage tier 1); raise with
+    # --requests_per_minute / --tokens_per_minute to match the account.
+    rate_limits = {"requests_per_minute": 3000, "tokens_per_minute": 1_000_000}
+    # Per-request ceilings of the embeddings endpoint
+    max_batch_tokens = 300_000
+    max_batch_items = 2048
+
     def __init__(self, name, params, base_url=None):
         super().__init__(name, params)
         self.base_url = base_url
@@ -37,17 +44,15 @@ class OpenAIEmbedProvider(EmbedModelProvider):
         else:
             self.encoder = None
 
-    def embed(self, inputs, dimensions=None):
-        inputs = [b.replace("\n", " ") for b in inputs]
-        # Only truncate via tiktoken for native OpenAI models
-        if self.encoder is not None:
-            enc = self.encoder
-            max_tokens = self.params.get("max_tokens", 8191)
-            inputs = [
-                enc.decode(enc.encode(b)[:max_tokens]) if len(enc.encode(b)) > max_tokens else b
-                for b in inputs
-            ]
+    def max_input_tokens(self):
+        return self.params.get("max_tokens", 8191)
+
+    def normalize_input(self, text):
+        return text.replace("\n", " ")
 
+    def embed_prepared(self, inputs, dimensions=None):
+        # Inputs are truncated by prepare_inputs, via tiktoken for native
+        # OpenAI models only (self.encoder is None for custom endpoints).
         @retry_transient()
         def _create():
             if dimensions is not None and dimensions > 0:
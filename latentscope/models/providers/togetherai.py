@@ -1,12 +1,14 @@
 import os
-import time
 
 from latentscope.util.retry import retry_transient
 
-from .base import EmbedModelProvider
+from .base import APIEmbedProvider
 
 
-class TogetherAIEmbedProvider(EmbedModelProvider):
+class TogetherAIEmbedProvider(APIEmbedProvider):
+    # Default quota for ls-embed --concurrency
+    rate_limits = {"requests_per_minute": 600, "tokens_per_minute": None}
+
     def load_model(self):
         import tiktoken
         import together
@@ -21,15 +23,10 @@ class TogetherAIEmbedProvider(EmbedModelProvider):
         self.client = together.Together()
         self.encoder = tiktoken.encoding_for_model("text-embedding-ada-002")
 
-    def embed(self, inputs, dimensions=None):
-        time.sleep(0.2)  # TODO proper rate limiting
-        enc = self.encoder
-        max_tokens = self.params["max_tokens"]
-        inputs = [b.replace("\n", " ") for b in inputs]
-        inputs = [
-            enc.decode(enc.encode(b)[:max_tokens]) if len(enc.encode(b)) > max_tokens else b
-            for b in inputs
-        ]
+    def normalize_input(self, text):
+        return text.replace("\n", " ")
+
+    def embed_prepared(self, inputs, dimensions=None):
         response = retry_transient()(
             lambda: self.client.embeddings.create(input=inputs, model=self.name)
         )()
@@ -1,17 +1,74 @@
+import json
+import os
+
 from .base import ChatModelProvider, EmbedModelProvider
 
+# Inference backends for sentence-transformers models (ls-embed --backend, or
+# "backend" in the model params). The ONNX backends run on CPU through ONNX
+# Runtime; onnx-int8 additionally applies dynamic int8 quantization.
+BACKENDS = ("torch", "onnx", "onnx-int8")
+# An export is only cached if its embeddings of PROBE_SENTENCES stay this close
+# (min cosine) to the torch model's; int8 trades a little precision for speed.
+BACKEND_MIN_COSINE = {"onnx": 0.999, "onnx-int8": 0.95}
+PROBE_SENTENCES = [
+    "The quick brown fox jumps over the lazy dog.",
+    "Latent Scope maps a dataset's embeddings to an interactive 2D view.",
+    "Quarterly revenue grew 12% on strong cloud demand, beating estimates.",
+    "Add the flour gradually and knead until the dough is smooth and elastic.",
+    "def embed(inputs, dimensions=None): return model.encode(inputs)",
+    "Le chat dort sur le canapé pendant que la pluie tombe dehors.",
+    " ",
+    "Photosynthesis converts light energy into chemical energy stored in glucose, "
+    "releasing oxygen as a by-product; it takes place in the chloroplasts of plant "
+    "cells and depends on chlorophyll absorbing mostly blue and red light.",
+]
+
+
+def onnx_export_dir(data_dir, model_name, backend):
+    """Directory in the data dir where the `backend` export of `model_name` is cached."""
+    return os.path.join(data_dir, "models", "onnx", model_name.replace("/", "___"), backend)
+
+
+def min_cosine(reference, candidate):
+    """Lowest row-wise cosine similarity between two embedding matrices."""
+    import numpy as np
+
+    a = np.asarray(reference, dtype=np.float64)
+    b = np.asarray(candidate, dtype=np.float64)
+    a = a / np.maximum(np.linalg.norm(a, axis=1, keepdims=True), 1e-12)
+    b = b / np.maximum(np.linalg.norm(b, axis=1, keepdims=True), 1e-12)
+    return float(np.min(np.sum(a * b, axis=1)))
+
+
+def _quantization_config():
+    """sentence-transformers dynamic quantization preset for this CPU."""
+    import platform
+
+    return "arm64" if platform.machine().lower() in ("arm64", "aarch64") else "avx2"
+
 
 class TransformersEmbedProvider(EmbedModelProvider):
+    # Every sequence in a forward pass is padded to the longest one, so
+    # ls-embed --sort-by-length can group similar-length rows per batch.
+    pads_batches = True
+
     def __init__(self, name, params):
         super().__init__(name, params)
         import torch
         self.torch = torch
         self.device = torch.device("cuda" if torch.cuda.is_available() else "mps" if torch.backends.mps.is_available() else "cpu")
+        self.backend = (params or {}).get("backend", "torch")
 
     def load_model(self):
         # from transformers import AutoTokenizer, AutoModel
         from sentence_transformers import SentenceTransformer
-        self.model = SentenceTransformer(self.name, trust_remote_code=True, device=self.device)#, backend="onnx")
+        if self.backend not in BACKENDS:
+            raise ValueError(f"Unknown backend '{self.backend}' (expected one of "
+                             f"{', '.join(BACKENDS)})")
+        if self.backend == "torch":
+            self.model = SentenceTransformer(self.name, trust_remote_code=True, device=self.device)
+        else:
+            self.model = self._load_onnx_model()
         self.tokenizer = self.model.tokenizer
         # Task-conditioned models (e.g. jina-v3/v5) advertise `config.task_names`
         # and refuse to encode until a task is selected (they swap a LoRA adapter
@@ -56,6 +113,69 @@ class TransformersEmbedProvider(EmbedModelProvider):
         except Exception as e:
             print(f"transformers: prompt auto-detect skipped ({e})")
 
+    def _load_onnx_model(self):
+        """Load the cached ONNX export for this model and backend, exporting it
+        into the data dir on first use. Every run and the search server load
+        the same files, so the export and validation happen once per model."""
+        from sentence_transformers import SentenceTransformer
+
+        from latentscope.util import get_data_dir
+
+        export_dir = onnx_export_dir(get_data_dir(), self.name, self.backend)
+        info_path = os.path.join(export_dir, "latentscope_export.json")
+        if not os.path.exists(info_path):
+            self._export_onnx(export_dir)
+        with open(info_path) as f:
+            info = json.load(f)
+        print(f"transformers: {self.backend} backend from {export_dir} "
+              f"(min cosine vs torch {info['min_cosine']:.4f})")
+        return SentenceTransformer(export_dir, backend="onnx", device="cpu",
+                                   trust_remote_code=True,
+                                   model_kwargs={"file_name": info["file_name"]})
+
+    def _export_onnx(self, export_dir):
+        """Export (and for onnx-int8, quantize) the model, then check it
+        against the torch model on PROBE_SENTENCES before caching it."""
+        import shutil
+
+        from sentence_transformers import SentenceTransformer
+
+        print(f"transformers: exporting {self.name} for the {self.backend} backend")
+        reference = SentenceTransformer(self.name, trust_remote_code=True, device="cpu")
+        expected = reference.encode(PROBE_SENTENCES)
+        del reference
+
+        staging_dir = export_dir + ".partial"
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        exported = SentenceTransformer(self.name, backend="onnx", trust_remote_code=True,
+                                       device="cpu")
+        exported.save_pretrained(staging_dir)
+        file_name = "onnx/model.onnx"
+        if self.backend == "onnx-int8":
+            from sentence_transformers import export_dynamic_quantized_onnx_model
+            config = _quantization_config()
+            export_dynamic_quantized_onnx_model(exported, config, staging_dir)
+            file_name = f"onnx/model_qint8_{config}.onnx"
+            exported = SentenceTransformer(staging_dir, backend="onnx", device="cpu",
+                                           trust_remote_code=True,
+                                           model_kwargs={"file_name": file_name})
+
+        score = min_cosine(expected, exported.encode(PROBE_SENTENCES))
+        threshold = BACKEND_MIN_COSINE[self.backend]
+        if score < threshold:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            raise ValueError(f"{self.backend} export of {self.name} does not match the torch "
+                             f"model (min cosine {score:.4f} < {threshold}); use the torch "
+                             "backend for this model")
+        with open(os.path.join(staging_dir, "latentscope_export.json"), "w") as f:
+            json.dump({"model": self.name, "backend": self.backend, "file_name": file_name,
+                       "min_cosine": round(score, 6)}, f, indent=2)
+        shutil.rmtree(export_dir, ignore_errors=True)
+        os.makedirs(os.path.dirname(export_dir), exist_ok=True)
+        os.replace(staging_dir, export_dir)
+        print(f"transformers: cached {self.backend} export in {export_dir} "
+              f"(min cosine vs torch {score:.4f})")
+
     def _finalize(self, embeddings, dimensions):
         # Support Matroyshka embeddings
         if dimensions is not None and dimensions > 0:
@@ -1,12 +1,17 @@
 import os
-import time
 
 from latentscope.util.retry import retry_transient
 
-from .base import EmbedModelProvider
+from .base import APIEmbedProvider
 
 
-class VoyageAIEmbedProvider(EmbedModelProvider):
+class VoyageAIEmbedProvider(APIEmbedProvider):
+    # Default quota for ls-embed --concurrency (basic tier)
+    rate_limits = {"requests_per_minute": 300, "tokens_per_minute": 1_000_000}
+    # Per-request ceilings (the token limit is the lowest across models)
+    max_batch_tokens = 120_000
+    max_batch_items = 1000
+
     def load_model(self):
         import voyageai
         from tokenizers import Tokenizer
@@ -22,15 +27,9 @@ class VoyageAIEmbedProvider(EmbedModelProvider):
         # It also says that it uses the same tokenizer as Llama 2
         self.encoder = Tokenizer.from_pretrained("TheBloke/Llama-2-70B-fp16")
 
-    def embed(self, inputs, dimensions=None):
-        time.sleep(0.1)  # TODO proper rate limiting
-        # We truncate the input ourselves, even though the API supports truncation its still possible to send too big a batch
-        enc = self.encoder
-        max_tokens = self.params["max_tokens"]
-        inputs = [
-            enc.decode(enc.encode(b).ids[:max_tokens]) if len(enc.encode(b)) > max_tokens else b
-            for b in inputs
-        ]
+    # We truncate the input ourselves (prepare_inputs), even though the API
+    # supports truncation its still possible to send too big a batch
+    def embed_prepared(self, inputs, dimensions=None):
         response = retry_transient()(
             lambda: self.client.embed(
                 texts=inputs, model=self.name, truncation=self.params["truncation"]
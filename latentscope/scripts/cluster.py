@@ -1,6 +1,7 @@
 # Usage: python cluster.py <dataset_id> <umap_id> <samples> <min_samples>
 # Example: python cluster.py dadabase-curated umap-001 50 5
 import argparse
+import contextlib
 import json
 import os
 import re
@@ -20,19 +21,6 @@ from latentscope.util import get_data_dir
 from latentscope.util.device import resolve_device
 
 
-# TODO move this into shared space
-def calculate_point_size(num_points, min_size=10, max_size=30, base_num_points=100):
-    import numpy as np
-    """
-    Calculate the size of points for a scatter plot based on the number of points.
-    """
-    # TODO fix this to actually calculate a log scale between min and max size
-    if num_points <= base_num_points:
-        return max_size
-    else:
-        return min(min_size + min_size * np.log(num_points / base_num_points), max_size)
-
-
 def main():
     parser = argparse.ArgumentParser(description='Cluster UMAP embeddings')
     parser.add_argument('dataset_id', type=str, help='ID of the dataset')
@@ -68,6 +56,9 @@ def main():
                              'nearest cluster centroid (pre-1.0 behavior). By '
                              'default noise points are kept as a separate '
                              '"Unclustered" cluster.')
+    parser.add_argument('--no_knn_cache', action='store_true',
+                        help="EVoC on embeddings: compute the kNN graph for this run instead "
+                             "of reusing the embedding's stored one")
     parser.add_argument('--name', type=str, default=None,
                         help='Human-friendly title for this cluster run')
     parser.add_argument('--description', type=str, default=None,
@@ -81,7 +72,8 @@ def main():
               approx_n_clusters=args.approx_n_clusters,
               base_n_clusters=args.base_n_clusters, seed=args.seed,
               assign_noise=args.assign_noise,
-              name=args.name, description=args.description)
+              name=args.name, description=args.description,
+              knn_cache=not args.no_knn_cache)
 
 
 def _load_embeddings(dataset_id, embedding_id):
@@ -117,9 +109,48 @@ def _evoc_node_embedding_dim(n_features, n_neighbors):
     return None
 
 
+@contextlib.contextmanager
+def _evoc_precomputed_knn(knn):
+    """Make EVoC use a precomputed cosine kNN graph (indices, distances) with
+    n_neighbors columns, e.g. the embedding's stored graph (see
+    latentscope.util.knn_graph).
+
+    evoc has no parameter for this: evoc_clusters calls its module-level
+    knn_graph, so that is swapped for the duration. EVoC measures float
+    vectors by -log2(cosine similarity), converted from cosine distance
+    here. An evoc without that function just builds its own graph.
+    """
+    import numpy as np
+
+    try:
+        import evoc.clustering as evoc_clustering
+    except ImportError:
+        evoc_clustering = None
+    if knn is None or not hasattr(evoc_clustering, "knn_graph"):
+        yield
+        return
+    indices, distances = knn
+    similarity = np.maximum(1.0 - np.asarray(distances, dtype=np.float32), 1e-10)
+    evoc_distances = np.maximum(-np.log2(similarity), 0.0)
+    original = evoc_clustering.knn_graph
+
+    def knn_graph(data, n_neighbors=30, **kwargs):
+        if len(data) != len(indices) or n_neighbors > indices.shape[1]:
+            return original(data, n_neighbors=n_neighbors, **kwargs)
+        return (np.ascontiguousarray(indices[:, :n_neighbors]),
+                np.ascontiguousarray(evoc_distances[:, :n_neighbors]))
+
+    evoc_clustering.knn_graph = knn_graph
+    try:
+        yield
+    finally:
+        evoc_clustering.knn_graph = original
+
+
 def _run_evoc(embeddings, samples, min_samples=5, n_neighbors=15, noise_level=0.5,
-              approx_n_clusters=None, base_n_clusters=None, seed=None):
-    """Run EVoC clustering on the input vectors (always CPU — no cuML equivalent)."""
+              approx_n_clusters=None, base_n_clusters=None, seed=None, knn=None):
+    """Run EVoC clustering on the input vectors (always CPU — no cuML equivalent).
+    `knn` is an optional precomputed cosine kNN graph of `embeddings`."""
     import evoc
     kwargs = {}
     node_dim = _evoc_node_embedding_dim(embeddings.shape[1], n_neighbors)
@@ -142,7 +173,8 @@ def _run_evoc(embeddings, samples, min_samples=5, n_neighbors=15, noise_level=0.
         noise_level=noise_level,
         **kwargs,
     )
-    labels = clusterer.fit_predict(embeddings)
+    with _evoc_precomputed_knn(knn):
+        labels = clusterer.fit_predict(embeddings)
     return labels
 
 
@@ -218,7 +250,7 @@ def _run_gmm(embeddings, n_clusters, seed=None):
 def clusterer(dataset_id, umap_id, samples, min_samples, cluster_selection_epsilon, column,
               method='evoc', cluster_on=None, n_neighbors=15, noise_level=0.5,
               approx_n_clusters=None, base_n_clusters=None, seed=None,
-              assign_noise=False, name=None, description=None):
+              assign_noise=False, name=None, description=None, knn_cache=True):
     DATA_DIR = get_data_dir()
     cluster_dir = os.path.join(DATA_DIR, dataset_id, "clusters")
     # Check if clusters directory exists, if not, create it
@@ -251,12 +283,13 @@ def clusterer(dataset_id, umap_id, samples, min_samples, cluster_selection_epsil
         effective_cluster_on = cluster_on
     print(f"cluster_on: {effective_cluster_on} (method={method})")
 
-    import matplotlib.pyplot as plt
     import numpy as np
     import pandas as pd
     from scipy.spatial import ConvexHull
     from scipy.spatial.distance import cdist
 
+    from latentscope.util.preview import calculate_point_size, label_colors, render_points
+
     umap_embeddings_df = pd.read_parquet(os.path.join(DATA_DIR, dataset_id, "umaps", f"{umap_id}.parquet"))
     # Extract x,y columns into numpy array with shape (n,2). This 2D projection
     # is always used for plotting, hulls and noise reassignment regardless of
@@ -309,10 +342,16 @@ def clusterer(dataset_id, umap_id, samples, min_samples, cluster_selection_epsil
                 cluster_input = umap_embeddings
 
         if method == 'evoc':
+            knn = None
+            if knn_cache and effective_cluster_on == 'embedding':
+                # the embedding's stored graph, shared with its umap runs
+                from latentscope.util.knn_graph import get_knn_graph
+                knn = get_knn_graph(DATA_DIR, dataset_id, embedding_id, cluster_input,
+                                    n_neighbors, seed=seed)
             cluster_labels = _run_evoc(cluster_input, samples, min_samples=min_samples,
                                        n_neighbors=n_neighbors, noise_level=noise_level,
                                        approx_n_clusters=approx_n_clusters,
-                                       base_n_clusters=base_n_clusters, seed=seed)
+                                       base_n_clusters=base_n_clusters, seed=seed, knn=knn)
         elif method == 'kmeans':
             cluster_labels = _run_kmeans(cluster_input, samples, use_cuml=res.use_cuml,
                                          seed=seed)
@@ -385,17 +424,13 @@ def clusterer(dataset_id, umap_id, samples, min_samples, cluster_selection_epsil
     print(df.head())
     print("wrote", output_file)
 
-    # generate a scatterplot of the umap embeddings and save it to a file
-    fig, ax = plt.subplots(figsize=(14.22, 14.22))  # 1024px by 1024px at 72 dpi
-    point_size = calculate_point_size(umap_embeddings.shape[0])
-    print("POINT SIZE", point_size, "for", umap_embeddings.shape[0], "points")
-    plt.scatter(umap_embeddings[:, 0], umap_embeddings[:, 1], s=point_size, alpha=0.5, c=cluster_labels, cmap='Spectral')
     # Compute convex hulls around each cluster on the UMAP 2D coordinates.
     # Hulls are only spatially meaningful when we clustered on the 2D umap
     # projection (hdbscan/kmeans/gmm default). When clustering on high-dim
     # embeddings (evoc default) the clusters may be scattered across the 2D
     # projection, so convex hulls are not meaningful — skip them.
     hulls_by_label = {}
+    hull_outlines = []
     # Hulls require spatially compact clusters in umap space. Density methods
     # clustering directly on the 2D coords satisfy that; EVoC does not even
     # with umap input — it re-embeds a kNN graph internally, so its clusters
@@ -416,14 +451,17 @@ def clusterer(dataset_id, umap_id, samples, min_samples, cluster_selection_epsil
             hull = ConvexHull(points)
             hull_list = [indices[s] for s in hull.vertices.tolist()]
             hulls_by_label[label] = hull_list
-            for simplex in hull.simplices:
-                plt.plot(points[simplex, 0], points[simplex, 1], 'k-')
+            hull_outlines.append(points[hull.vertices, :2])
         except Exception:
             hulls_by_label[label] = []
 
-    plt.axis('off')  # remove axis
-    plt.gca().set_position([0, 0, 1, 1])  # remove margins
-    plt.savefig(os.path.join(cluster_dir, f"{cluster_id}.png"))
+    # generate a scatterplot of the umap embeddings, with the hulls, and save
+    # it to a file
+    point_size = calculate_point_size(umap_embeddings.shape[0])
+    print("POINT SIZE", point_size, "for", umap_embeddings.shape[0], "points")
+    render_points(umap_embeddings, os.path.join(cluster_dir, f"{cluster_id}.png"),
+                  colors=label_colors(cluster_labels), point_size=point_size,
+                  hulls=hull_outlines)
 
     # Build metadata - include method-specific params
     meta = {
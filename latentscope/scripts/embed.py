@@ -18,7 +18,9 @@ except ImportError:
     from tqdm import tqdm
 
 from latentscope.models import TransformersEmbedProvider, get_embedding_model
+from latentscope.models.providers.transformers import BACKENDS
 from latentscope.util import get_data_dir
+from latentscope.util.embedding_store import PRECISIONS
 
 
 def chunked_iterable(iterable, size):
@@ -44,23 +46,503 @@ def decode_image_value(value):
         return None
 
 
-def decode_image_batch(values, start_index=0):
+def decode_image_batch(values, start_index=0, indices=None):
     """Decode a batch of stored image values to PIL images.
 
     Null or undecodable rows get a 1x1 black placeholder (mirrors the
     "[space]" substitution for empty text) so row alignment is preserved.
+    `indices` (row numbers of a non-contiguous batch) are only used in log
+    messages.
     """
     from PIL import Image
     images = []
     for offset, value in enumerate(values):
         img = decode_image_value(value)
         if img is None:
-            print(start_index + offset,
+            print(indices[offset] if indices is not None else start_index + offset,
                   "image is missing or undecodable, substituting a 1x1 black image")
             img = Image.new("RGB", (1, 1), (0, 0, 0))
         images.append(img)
     return images
 
+def prepare_text_batch(values, prefix="", start_index=0, indices=None):
+    """Prefix a batch of raw text column values for embedding.
+
+    Null / empty cells become a single space (so row alignment is preserved)
+    and non-string cells are coerced with str(). `indices` (row numbers of a
+    non-contiguous batch) are only used in log messages.
+    """
+    import pandas as pd
+    texts = []
+    for offset, s in enumerate(values):
+        # pd.isna catches None, NaN and pd.NA (a plain `s is None` check
+        # misses the float NaN / pd.NA that pandas produces from null
+        # parquet/CSV cells, which would crash on `prefix + s` below).
+        if pd.isna(s) or s == "":
+            print(indices[offset] if indices is not None else start_index + offset,
+                  s, "text is empty, adding a [space]")
+            s = " "
+        elif not isinstance(s, str):
+            # Non-string cells (e.g. a numeric column) would also break
+            # concatenation; coerce so row alignment is preserved.
+            s = str(s)
+        texts.append(prefix + s)
+    return texts
+
+
+def length_sorted_order(values, prefix, token_counter, chunk_size=10000):
+    """Return row positions ordered by tokenized length (stable, so rows of
+    equal length keep file order).
+
+    Used by --sort-by-length: consecutive slices of this order form batches
+    of similar-length rows, so the model pads each batch to a length close
+    to every row's own instead of to the longest row in a file-order batch.
+    """
+    import numpy as np
+    import pandas as pd
+    lengths = np.empty(len(values), dtype=np.int64)
+    for start in range(0, len(values), chunk_size):
+        chunk = values[start:start + chunk_size]
+        texts = [prefix + (" " if pd.isna(s) or s == "" else str(s)) for s in chunk]
+        lengths[start:start + len(texts)] = token_counter(texts)
+    return np.argsort(lengths, kind="stable")
+
+
+# Rows tokenized at a time while packing API requests by token budget.
+PACK_WINDOW = 2000
+
+# Batches prepared / encoded ahead of the slowest stage in --pipeline mode.
+PIPELINE_DEPTH = 2
+
+# Sentinel closing a pipeline queue.
+_DONE = object()
+
+
+class _BatchFailure(Exception):
+    """The encode or write stage failed on one batch. Carries the batch so the
+    caller can dump it for ls-embed-debug."""
+
+    def __init__(self, batch, error):
+        super().__init__(str(error))
+        self.batch = batch
+        self.error = error
+
+
+def _timed(timings, stage, fn, batch):
+    start = time.perf_counter()
+    fn(batch)
+    timings[stage] += time.perf_counter() - start
+
+
+def _run_serial(batches, prepare, encode, write, timings, progress=None):
+    """Run prepare -> encode -> write for one batch at a time."""
+    for batch in batches:
+        _timed(timings, "prepare", prepare, batch)
+        try:
+            _timed(timings, "encode", encode, batch)
+            _timed(timings, "write", write, batch)
+        except Exception as e:
+            raise _BatchFailure(batch, e) from e
+        if progress is not None:
+            progress.update(1)
+
+
+def _run_pipelined(batches, prepare, encode, write, timings, progress=None,
+                   depth=PIPELINE_DEPTH):
+    """Overlap the three stages: a producer thread prepares upcoming batches,
+    the calling thread encodes (models stay on the thread that loaded them),
+    and a writer thread drains encoded batches to the store.
+
+    Both queues are bounded by `depth`, so at most a few batches are in
+    memory at once. The single writer appends in batch order, so the stored
+    rows are always a prefix of the batch order and --rerun resumes exactly
+    as in the serial path. The first failing batch (write failures win over a later
+    encode failure) is raised as _BatchFailure once every earlier batch has
+    been written.
+    """
+    import queue
+    import threading
+
+    prepared = queue.Queue(maxsize=depth)
+    encoded = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    write_failures = []
+
+    def put(q, item):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def producer():
+        try:
+            for batch in batches:
+                _timed(timings, "prepare", prepare, batch)
+                if not put(prepared, batch):
+                    return
+        except BaseException as e:
+            put(prepared, e)
+            return
+        put(prepared, _DONE)
+
+    def writer():
+        while True:
+            batch = encoded.get()
+            if batch is _DONE:
+                return
+            if write_failures:
+                # keep draining so the encode loop never blocks, but write
+                # nothing past the first failure
+                continue
+            try:
+                _timed(timings, "write", write, batch)
+            except Exception as e:
+                write_failures.append(_BatchFailure(batch, e))
+                continue
+            if progress is not None:
+                progress.update(1)
+
+    producer_thread = threading.Thread(target=producer, daemon=True)
+    writer_thread = threading.Thread(target=writer, daemon=True)
+    producer_thread.start()
+    writer_thread.start()
+
+    encode_failure = None
+    try:
+        while not write_failures:
+            batch = prepared.get()
+            if batch is _DONE:
+                break
+            if isinstance(batch, BaseException):
+                raise batch
+            try:
+                _timed(timings, "encode", encode, batch)
+            except Exception as e:
+                encode_failure = _BatchFailure(batch, e)
+                break
+            encoded.put(batch)
+    finally:
+        stop.set()
+        encoded.put(_DONE)
+        writer_thread.join()
+
+    if write_failures:
+        raise write_failures[0]
+    if encode_failure is not None:
+        raise encode_failure
+
+
+def _run_concurrent(batches, prepare, encode, write, timings, progress=None,
+                    concurrency=4):
+    """Keep up to `concurrency` batches encoding at once in worker threads
+    (API providers: the time goes to network round trips, not compute) and
+    write them back in batch order.
+
+    Batches finish out of order; completed ones wait in submission order, so
+    the stored rows stay a prefix of the batch order and --rerun resumes as in
+    the serial path. On the first failing batch nothing more is submitted,
+    batches in flight are drained, every earlier batch is written, and the
+    failure is raised as _BatchFailure. Encode time is the wall time during
+    which at least one batch was encoding.
+    """
+    import threading
+    from collections import deque
+    from concurrent.futures import ThreadPoolExecutor
+
+    lock = threading.Lock()
+    active = {"count": 0, "since": 0.0}
+
+    def run_encode(batch):
+        with lock:
+            if active["count"] == 0:
+                active["since"] = time.perf_counter()
+            active["count"] += 1
+        try:
+            encode(batch)
+        finally:
+            with lock:
+                active["count"] -= 1
+                if active["count"] == 0:
+                    timings["encode"] += time.perf_counter() - active["since"]
+
+    window = deque()
+    failure = None
+
+    def drain_head():
+        nonlocal failure
+        batch, future = window.popleft()
+        if failure is not None:
+            future.exception()  # wait for it, discard the result
+            return
+        error = future.exception()
+        if error is None:
+            try:
+                _timed(timings, "write", write, batch)
+            except Exception as e:
+                error = e
+            else:
+                if progress is not None:
+                    progress.update(1)
+                return
+        failure = _BatchFailure(batch, error)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for batch in batches:
+            _timed(timings, "prepare", prepare, batch)
+            window.append((batch, pool.submit(run_encode, batch)))
+            while len(window) >= concurrency or (window and window[0][1].done()):
+                drain_head()
+                if failure is not None:
+                    break
+            if failure is not None:
+                break
+        while window:
+            drain_head()
+
+    if failure is not None:
+        raise failure
+
+
+def _report_throughput(timings, rows, wall):
+    """Print rows/sec per pipeline stage (each stage's own busy time)."""
+    if rows == 0:
+        return
+    parts = []
+    for stage in ("prepare", "encode", "write"):
+        seconds = timings[stage]
+        rate = rows / seconds if seconds > 0 else float("inf")
+        parts.append(f"{stage} {rate:.1f} rows/s ({seconds:.1f}s)")
+    overall = rows / wall if wall > 0 else float("inf")
+    print(f"throughput: {', '.join(parts)}; overall {overall:.1f} rows/s "
+          f"for {rows} rows in {wall:.1f}s")
+
+
+# Start method for ls-embed --workers processes: each worker gets a fresh
+# interpreter (forking a parent that holds torch/OpenMP or LanceDB runtime
+# threads can deadlock the child).
+WORKER_START_METHOD = "spawn"
+
+
+def shard_ranges(start, end, workers, batch_size):
+    """Split rows [start, end) into at most `workers` contiguous ranges whose
+    sizes are multiples of batch_size (except the last)."""
+    n = end - start
+    if n <= 0:
+        return []
+    per_shard = -(-n // workers)
+    per_shard = -(-per_shard // batch_size) * batch_size
+    return [(lo, min(end, lo + per_shard)) for lo in range(start, end, per_shard)]
+
+
+def merge_token_stats(parts):
+    """Combine per-shard token stats; None if any shard has none."""
+    if not parts or any(p is None for p in parts):
+        return None
+    total = sum(p["total"] for p in parts)
+    count = sum(p["count"] for p in parts)
+    return {
+        "total": total,
+        "mean": round(total / count, 2) if count else 0.0,
+        "min": min(p["min"] for p in parts),
+        "max": max(p["max"] for p in parts),
+        "count": count,
+    }
+
+
+def _embed_shard(params, provider_factory=None):
+    """Worker process body for ls-embed --workers: embed rows [start, end)
+    into the shard's staging table, resuming after the rows it already holds.
+    Progress lines go to stdout, which the job log captures."""
+    threads = params["threads"]
+    # Pin intra-op threads before torch spins up its pools, so N workers
+    # share the cores instead of each grabbing all of them.
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(1)
+    except (ImportError, RuntimeError):
+        pass
+
+    import numpy as np
+
+    from latentscope.util.embedding_store import append_embeddings, get_embedding_count
+    from latentscope.util.parquet_stream import iter_column_chunks, read_rows
+
+    DATA_DIR = get_data_dir()
+    dataset_id = params["dataset_id"]
+    embedding_id = params["embedding_id"]
+    shard, start, end = params["shard"], params["start"], params["end"]
+    batch_size = params["batch_size"]
+    prefix = params["prefix"]
+    input_type = params["input_type"]
+    tag = f"shard {shard}"
+
+    done = get_embedding_count(DATA_DIR, dataset_id, embedding_id, shard=shard)
+    fresh = done == 0
+    if not fresh:
+        print(f"{tag}: resuming after {done} rows", flush=True)
+
+    model = _load_embedding_model(params["model_id"], params["task"], params["max_seq_length"],
+                                  prefix, batch_size, backend=params["backend"],
+                                  provider_factory=provider_factory)
+    is_late_interaction = getattr(model, "late_interaction", False)
+    token_counter = None if input_type == "image" else _make_token_counter(model)
+    token_counts = []
+
+    input_path = os.path.join(DATA_DIR, dataset_id, "input.parquet")
+    for start_index, values in iter_column_chunks(input_path, params["text_column"], batch_size,
+                                                  start=start + done):
+        if start_index >= end:
+            break
+        values = values[:end - start_index]
+        if input_type == "image":
+            inputs = decode_image_batch(values, start_index=start_index)
+        else:
+            inputs = prepare_text_batch(values, prefix, start_index=start_index)
+        try:
+            if is_late_interaction:
+                vectors, token_vectors = model.embed_multi(inputs, dimensions=params["dimensions"])
+                counts = [len(tv) for tv in token_vectors]
+            else:
+                vectors = np.array(model.embed(inputs, dimensions=params["dimensions"]))
+                token_vectors = None
+                counts = token_counter(inputs) if token_counter is not None else None
+            append_embeddings(DATA_DIR, dataset_id, embedding_id, vectors,
+                              start_index=start_index, token_vectors_list=token_vectors,
+                              shard=shard)
+        except Exception as e:
+            batch_path = os.path.join(DATA_DIR, dataset_id, "embeddings",
+                                      f"{embedding_id}-batch-{start_index // batch_size}.parquet")
+            df_batch = read_rows(input_path, range(start_index, start_index + len(values)))
+            df_batch["_ls_text_"] = values if input_type == "image" else inputs
+            df_batch.to_parquet(batch_path)
+            print(f"{tag}: error embedding rows {start_index}-{start_index + len(values)}: {e}",
+                  flush=True)
+            print(f"{tag}: wrote the failing batch to {batch_path}", flush=True)
+            raise
+        if counts is not None:
+            token_counts.extend(counts)
+        done += len(values)
+        print(f"{tag}: {done}/{end - start} rows", flush=True)
+
+    counted = is_late_interaction or token_counter is not None
+    return {
+        "shard": shard,
+        "rows": done,
+        "token_stats": summarize_token_counts(token_counts) if fresh and counted else None,
+        "task": getattr(model, "task", None),
+        "late_interaction": is_late_interaction,
+        "backend": getattr(model, "backend", None),
+    }
+
+
+def _embed_sharded(DATA_DIR, dataset_id, embedding_id, existing_count, n_rows, text_column,
+                   input_type, model_id, prefix, dimensions, batch_size, max_seq_length, task,
+                   workers, threads_per_worker=None, backend=None, precision="float32",
+                   token_index=False, tune_index=False):
+    """ls-embed --workers: embed contiguous row shards in parallel worker
+    processes, each into its own staging table, then merge them into the
+    embedding table and finish (optimize + index + meta) once.
+
+    The shard plan is saved next to the embedding meta so that --rerun
+    resumes only the shards that didn't finish, from where each stopped.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    from latentscope.util.embedding_store import merge_embedding_shards
+
+    embedding_dir = os.path.join(DATA_DIR, dataset_id, "embeddings")
+    plan_path = os.path.join(embedding_dir, f"{embedding_id}-shards.json")
+    if os.path.exists(plan_path):
+        with open(plan_path) as f:
+            plan = json.load(f)
+        print(f"resuming the {len(plan['shards'])}-shard plan in {plan_path}")
+    else:
+        plan = {
+            "fresh": existing_count == 0,
+            "shards": [
+                {"shard": k, "start": lo, "end": hi, "complete": False, "token_stats": None}
+                for k, (lo, hi) in enumerate(shard_ranges(existing_count, n_rows, workers,
+                                                          batch_size))
+            ],
+        }
+
+    def save_plan():
+        with open(plan_path, "w") as f:
+            json.dump(plan, f, indent=2)
+
+    save_plan()
+    pending = [s for s in plan["shards"] if not s["complete"]]
+    threads = threads_per_worker or max(1, (os.cpu_count() or 1) // max(1, min(workers, len(pending))))
+    failures = []
+    if pending:
+        print(f"embedding {len(pending)} shard(s) with {min(workers, len(pending))} worker "
+              f"processes, {threads} threads each")
+        context = multiprocessing.get_context(WORKER_START_METHOD)
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending)),
+                                 mp_context=context) as pool:
+            futures = {}
+            for s in pending:
+                params = {
+                    "dataset_id": dataset_id, "embedding_id": embedding_id,
+                    "shard": s["shard"], "start": s["start"], "end": s["end"],
+                    "text_column": text_column, "input_type": input_type,
+                    "model_id": model_id, "prefix": prefix, "dimensions": dimensions,
+                    "batch_size": batch_size, "max_seq_length": max_seq_length,
+                    "task": task, "backend": backend, "threads": threads,
+                }
+                futures[pool.submit(_embed_shard, params, get_embedding_model)] = s
+            for future in as_completed(futures):
+                s = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    failures.append(s)
+                    print(f"shard {s['shard']} (rows {s['start']}-{s['end']}) failed: {e}")
+                    continue
+                s["complete"] = True
+                s["token_stats"] = result["token_stats"]
+                plan["task"] = result["task"]
+                plan["late_interaction"] = result["late_interaction"]
+                plan["backend"] = result["backend"]
+                save_plan()
+                print(f"shard {s['shard']} done ({result['rows']} rows)")
+
+    if failures:
+        print("exiting prematurely", embedding_id)
+        print("completed shards are kept; resume the failed shard(s) with:")
+        print(f"ls-embed {dataset_id} {text_column} {model_id} --rerun {embedding_id} "
+              f"--workers {workers}")
+        sys.exit(1)
+
+    print("merging shards into", embedding_id)
+    merge_embedding_shards(
+        DATA_DIR, dataset_id, embedding_id,
+        [(s["shard"], s["start"], s["end"]) for s in plan["shards"]],
+        on_progress=lambda shard, rows: print(f"merged shard {shard} ({rows} rows)"),
+    )
+    token_stats = None
+    if plan["fresh"]:
+        token_stats = merge_token_stats([s["token_stats"] for s in plan["shards"]])
+    extra_meta = {"workers": workers}
+    if plan.get("backend"):
+        extra_meta["backend"] = plan["backend"]
+    _finish_embedding(
+        DATA_DIR, dataset_id, embedding_id, model_id=model_id, text_column=text_column,
+        input_type=input_type, max_seq_length=max_seq_length, prefix=prefix,
+        task=plan.get("task"), late_interaction=plan.get("late_interaction", False),
+        token_stats=token_stats, extra_meta=extra_meta, precision=precision,
+        token_index=token_index, tune_index=tune_index,
+    )
+    os.remove(plan_path)
+
+
 # Legacy HDF5 functions kept for backward compatibility
 def append_to_hdf5(file_path, new_data):
     import h5py
@@ -97,10 +579,60 @@ def main():
     parser.add_argument('--task', type=str, default=None,
                         help='Task for task-conditioned models (e.g. jina-v3/v5): '
                              'retrieval, clustering, classification, text-matching')
+    parser.add_argument('--pipeline', action='store_true',
+                        help='Overlap input preparation, encoding and LanceDB writes '
+                             'in background threads')
+    parser.add_argument('--cache', action='store_true',
+                        help='Reuse vectors from the shared embedding cache in the data '
+                             'directory and only send uncached rows to the model')
+    parser.add_argument('--cache_max_gb', type=float, default=4.0,
+                        help='Size bound of the embedding cache; least recently used '
+                             'vectors are evicted beyond it')
+    parser.add_argument('--concurrency', type=int, default=1,
+                        help='Batches in flight at once for API embedding providers '
+                             '(OpenAI, Voyage, Cohere, Together, Mistral)')
+    parser.add_argument('--requests_per_minute', type=float, default=None,
+                        help="Override the API provider's requests/min quota")
+    parser.add_argument('--tokens_per_minute', type=float, default=None,
+                        help="Override the API provider's tokens/min quota")
+    parser.add_argument('--max_batch_tokens', type=int, default=None,
+                        help="Token budget per API request (defaults to the provider's "
+                             "limit); rows are packed up to it instead of --batch_size")
+    parser.add_argument('--max_batch_items', type=int, default=None,
+                        help="Inputs per API request (defaults to the provider's limit)")
+    parser.add_argument('--backend', choices=BACKENDS, default=None,
+                        help='Inference backend for local sentence-transformers models; '
+                             'onnx/onnx-int8 export the model once into the data dir '
+                             '(default: torch, or the model params)')
+    parser.add_argument('--precision', choices=PRECISIONS, default="float32",
+                        help='Storage precision of the dense vectors: float16 halves the '
+                             'table, int8 quarters it, binary keeps 1 sign bit per dimension')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Embed row shards in this many worker processes (local '
+                             'models on many-core CPUs); shards merge into one table')
+    parser.add_argument('--threads_per_worker', type=int, default=None,
+                        help='Intra-op threads per --workers process (default: cores / workers)')
+    parser.add_argument('--sort_by_length', '--sort-by-length', action='store_true',
+                        help='Batch rows of similar token length together (local '
+                             'transformers and ColBERT models) to cut padding; the '
+                             'table is rewritten in row order once embedding finishes')
+    parser.add_argument('--token_index', action='store_true',
+                        help='Late interaction models: also build the token-level '
+                             'index searched by MaxSim queries (see ls-token-index)')
+    parser.add_argument('--tune_index', action='store_true',
+                        help='Choose the vector index parameters by measured recall on '
+                             'held-out rows (see ls-tune-index)')
 
     # Parse arguments
     args = parser.parse_args()
-    embed(args.dataset_id, args.text_column, args.model_id, args.prefix, args.rerun, args.dimensions, args.batch_size, args.max_seq_length, task=args.task)
+    embed(args.dataset_id, args.text_column, args.model_id, args.prefix, args.rerun, args.dimensions, args.batch_size, args.max_seq_length, task=args.task, pipeline=args.pipeline,
+          cache=args.cache, cache_max_bytes=int(args.cache_max_gb * 1024 ** 3),
+          sort_by_length=args.sort_by_length, concurrency=args.concurrency,
+          requests_per_minute=args.requests_per_minute, tokens_per_minute=args.tokens_per_minute,
+          max_batch_tokens=args.max_batch_tokens, max_batch_items=args.max_batch_items,
+          workers=args.workers, threads_per_worker=args.threads_per_worker,
+          backend=args.backend, precision=args.precision, token_index=args.token_index,
+          tune_index=args.tune_index)
 
 def _make_token_counter(model):
     """Best-effort per-text token counter using a tokenizer the embedding
@@ -124,19 +656,94 @@ def _make_token_counter(model):
     return count
 
 
-def embed(dataset_id, text_column, model_id, prefix, rerun, dimensions, batch_size=100, max_seq_length=None, task=None):
+def _load_embedding_model(model_id, task, max_seq_length, prefix, batch_size, backend=None,
+                          provider_factory=None):
+    """Instantiate and load the embedding provider for `model_id` with the
+    run's task, backend, sequence cap and prompt settings applied."""
+    model = (provider_factory or get_embedding_model)(model_id)
+    # Requested task for task-conditioned models (jina-v3/v5); the provider reads
+    # this in load_model and falls back to a sensible default when unset.
+    if task:
+        model.task = task
+    if backend:
+        if hasattr(model, "backend"):
+            model.backend = backend
+        else:
+            print(f"--backend ignored: {model_id} has no backend selector")
+    print("MODEL", model)
+    print("loading", model.name)
+    model.load_model()
+
+    # Check if this is a late interaction model
+    is_late_interaction = getattr(model, 'late_interaction', False)
+    if is_late_interaction:
+        print("Late interaction model detected - will store per-token vectors")
+
+    if max_seq_length is not None and isinstance(model, TransformersEmbedProvider):
+        # Check if max_seq_length is a setter property
+        try:
+            model.model.max_seq_length = max_seq_length
+        except AttributeError:
+            print("Warning: This model does not support setting max_seq_length. Continuing with default length.")
+
+    # OOM preflight (#143): report the effective sequence cap and warn when the
+    # model is effectively uncapped and the user didn't cap it themselves.
+    # Never silently cap — that would change the embedding results.
+    effective_max_seq_length = getattr(getattr(model, "model", None),
+                                       "max_seq_length", None)
+    if isinstance(effective_max_seq_length, int):
+        print(f"effective max_seq_length: {effective_max_seq_length}")
+        if max_seq_length is None and effective_max_seq_length > 2048:
+            print("WARNING: this model accepts sequences up to "
+                  f"{effective_max_seq_length} tokens. Long documents times "
+                  f"batch_size={batch_size} can exhaust MPS/CUDA memory. If you "
+                  "hit an out-of-memory error, re-run with something like "
+                  "--max_seq_length 512 --batch_size 32 (note: capping the "
+                  "sequence length changes the resulting embeddings).")
+
+    # Prompt precedence: an explicit --prefix (user intent) wins over a model's
+    # auto-applied prompt. Some sentence-transformers models set a default prompt
+    # (default_prompt_name) so a corpus is embedded with the model's own document
+    # prompt when the user gives no prefix. If the user DID specify a prefix,
+    # honor it and disable the auto prompt so the two don't stack. This is
+    # model-agnostic — it keys off whether the model advertises a default prompt.
+    if isinstance(model, TransformersEmbedProvider):
+        st = getattr(model, "model", None)
+        auto_prompt = getattr(st, "default_prompt_name", None)
+        if auto_prompt and prefix:
+            print(f"Using the specified prefix {prefix!r}; disabling the model's "
+                  f"auto-applied '{auto_prompt}' prompt so they don't stack.")
+            st.default_prompt_name = None
+    return model
+
+
+def embed(dataset_id, text_column, model_id, prefix, rerun, dimensions, batch_size=100, max_seq_length=None, task=None,
+          pipeline=False, cache=False, cache_max_bytes=None, sort_by_length=False,
+          concurrency=1, requests_per_minute=None, tokens_per_minute=None,
+          max_batch_tokens=None, max_batch_items=None, workers=1, threads_per_worker=None,
+          backend=None, precision="float32", token_index=False, tune_index=False):
     import numpy as np
     import pandas as pd
 
     from latentscope.util.embedding_store import (
         append_embeddings,
+        get_embedded_indices,
         get_embedding_count,
         get_storage_format,
         list_embedding_ids,
         migrate_hdf5_to_lancedb,
     )
+    from latentscope.util.parquet_stream import (
+        count_rows,
+        iter_column_chunks,
+        read_column,
+        read_rows,
+    )
     DATA_DIR = get_data_dir()
-    df = pd.read_parquet(os.path.join(DATA_DIR, dataset_id, "input.parquet"))
+    # input.parquet is streamed one batch of the target column at a time (see
+    # pending_batches) so memory is bounded by the batch, not the dataset.
+    input_path = os.path.join(DATA_DIR, dataset_id, "input.parquet")
+    n_rows = count_rows(input_path)
 
     # Determine whether the selected column holds binary images (flagged by
     # ingest in the dataset meta). Image columns are embedded as PIL images
@@ -191,57 +798,28 @@ def embed(dataset_id, text_column, model_id, prefix, rerun, dimensions, batch_si
 
     print("RUNNING:", embedding_id)
     print("MODEL ID", model_id)
-    model = get_embedding_model(model_id)
-    # Requested task for task-conditioned models (jina-v3/v5); the provider reads
-    # this in load_model and falls back to a sensible default when unset.
-    if task:
-        model.task = task
-    print("MODEL", model)
-    print("loading", model.name)
-    model.load_model()
-
-    # Check if this is a late interaction model
-    is_late_interaction = getattr(model, 'late_interaction', False)
-    if is_late_interaction:
-        print("Late interaction model detected - will store per-token vectors")
-
-    if max_seq_length is not None and isinstance(model, TransformersEmbedProvider):
-        # Check if max_seq_length is a setter property
-        try:
-            model.model.max_seq_length = max_seq_length
-        except AttributeError:
-            print("Warning: This model does not support setting max_seq_length. Continuing with default length.")
-
-    # OOM preflight (#143): report the effective sequence cap and warn when the
-    # model is effectively uncapped and the user didn't cap it themselves.
-    # Never silently cap — that would change the embedding results.
-    effective_max_seq_length = getattr(getattr(model, "model", None),
-                                       "max_seq_length", None)
-    if isinstance(effective_max_seq_length, int):
-        print(f"effective max_seq_length: {effective_max_seq_length}")
-        if max_seq_length is None and effective_max_seq_length > 2048:
-            print("WARNING: this model accepts sequences up to "
-                  f"{effective_max_seq_length} tokens. Long documents times "
-                  f"batch_size={batch_size} can exhaust MPS/CUDA memory. If you "
-                  "hit an out-of-memory error, re-run with something like "
-                  "--max_seq_length 512 --batch_size 32 (note: capping the "
-                  "sequence length changes the resulting embeddings).")
-
     if prefix is None:
         prefix = ""
-    # Prompt precedence: an explicit --prefix (user intent) wins over a model's
-    # auto-applied prompt. Some sentence-transformers models set a default prompt
-    # (default_prompt_name) so a corpus is embedded with the model's own document
-    # prompt when the user gives no prefix. If the user DID specify a prefix,
-    # honor it and disable the auto prompt so the two don't stack. This is
-    # model-agnostic — it keys off whether the model advertises a default prompt.
-    if isinstance(model, TransformersEmbedProvider):
-        st = getattr(model, "model", None)
-        auto_prompt = getattr(st, "default_prompt_name", None)
-        if auto_prompt and prefix:
-            print(f"Using the specified prefix {prefix!r}; disabling the model's "
-                  f"auto-applied '{auto_prompt}' prompt so they don't stack.")
-            st.default_prompt_name = None
+    if workers and workers > 1:
+        probe = get_embedding_model(model_id)
+        if getattr(probe, "rate_limits", None) is not None:
+            print("--workers ignored: API providers are network-bound, use --concurrency")
+        elif input_type == "image" and not getattr(probe, "supports_images", False):
+            print(f"Error: column '{text_column}' is an image column but model "
+                  f"'{model_id}' does not support image inputs.")
+            sys.exit(1)
+        else:
+            if pipeline or cache or sort_by_length or (concurrency and concurrency > 1):
+                print("--pipeline/--cache/--sort-by-length/--concurrency are ignored with --workers")
+            _embed_sharded(DATA_DIR, dataset_id, embedding_id, existing_count, n_rows,
+                           text_column, input_type, model_id, prefix, dimensions, batch_size,
+                           max_seq_length, task, workers, threads_per_worker,
+                           backend=backend, precision=precision, token_index=token_index,
+                           tune_index=tune_index)
+            return
+    model = _load_embedding_model(model_id, task, max_seq_length, prefix, batch_size,
+                                  backend=backend)
+    is_late_interaction = getattr(model, 'late_interaction', False)
     if input_type == "image":
         if not getattr(model, "supports_images", False):
             print(f"Error: column '{text_column}' is an image column but model "
@@ -251,31 +829,62 @@ def embed(dataset_id, text_column, model_id, prefix, rerun, dimensions, batch_si
         # Keep the raw stored values; decode to PIL per batch (not all
         # upfront) so memory stays bounded.
         print("embedding image column", text_column)
-        sentences = df[text_column].tolist()
-    else:
-        print("Checking for empty inputs")
-        # Build the prefixed list directly from the column in a single pass so
-        # only one full copy of the text exists (the column itself stays in df).
-        sentences = []
-        for i, s in enumerate(df[text_column]):
-            # pd.isna catches None, NaN and pd.NA (a plain `s is None` check
-            # misses the float NaN / pd.NA that pandas produces from null
-            # parquet/CSV cells, which would crash on `prefix + s` below).
-            if pd.isna(s) or s == "":
-                print(i, s, "text is empty, adding a [space]")
-                s = " "
-            elif not isinstance(s, str):
-                # Non-string cells (e.g. a numeric column) would also break
-                # concatenation; coerce so row alignment is preserved.
-                s = str(s)
-            sentences.append(prefix + s)
-
-    total_batches = (len(sentences) + batch_size - 1) // batch_size
-
-    print("embedding", len(sentences), input_type, "inputs", "in", total_batches, "batches")
+    # Raw column values are read per batch; prefixing / null-filling (text)
+    # and decoding (images) happen per batch in the prepare stage. Only modes
+    # that visit rows out of file order hold the whole column (`sentences`).
+    sentences = None
+
+    # API providers prepare (normalize + truncate) text themselves, tokenizing
+    # each row once; the counts size requests and feed token_stats. With a
+    # local tokenizer, rows are packed into requests up to the provider's
+    # token budget and item limit instead of by --batch_size.
+    prepare_inputs = getattr(model, "prepare_inputs", None) if input_type == "text" else None
+    request_tokens = max_batch_tokens or getattr(model, "max_batch_tokens", None)
+    request_items = max_batch_items or getattr(model, "max_batch_items", None)
+    pack_by_tokens = (prepare_inputs is not None and request_tokens is not None
+                      and getattr(model, "encoder", None) is not None)
+    if pack_by_tokens:
+        print(f"packing API requests up to {request_tokens} tokens"
+              + (f" / {request_items} inputs" if request_items else "")
+              + " (--batch_size ignored)")
+    elif prepare_inputs is not None and request_items and batch_size > request_items:
+        print(f"batch_size {batch_size} exceeds the provider's limit of "
+              f"{request_items} inputs per request; using {request_items}")
+        batch_size = request_items
+
+    total_batches = (n_rows + batch_size - 1) // batch_size
+
+    print("embedding", n_rows, input_type, "inputs", "in", total_batches, "batches")
     if existing_count > 0:
         print(f"Resuming: {existing_count} rows already embedded")
 
+    # Length-bucketed batching: embed rows in order of token length and write
+    # each vector at its original ls_index.
+    order = None
+    if sort_by_length:
+        length_counter = None if input_type == "image" else _make_token_counter(model)
+        if not getattr(model, "pads_batches", False) or length_counter is None:
+            print("--sort-by-length ignored: only local transformers and ColBERT "
+                  "text models batch by token length")
+        else:
+            print("sorting rows by token length")
+            sentences = read_column(input_path, text_column)
+            order = length_sorted_order(sentences, prefix, length_counter)
+
+    # Rows stored so far. A file-order run always stores a contiguous prefix,
+    # but a length-sorted run stores an arbitrary subset, so resume by which
+    # ls_index values are covered whenever the stored rows aren't a prefix.
+    covered = None
+    if existing_count > 0:
+        stored = get_embedded_indices(DATA_DIR, dataset_id, embedding_id)
+        if order is not None or len(stored) == 0 or stored[-1] != existing_count - 1:
+            covered = np.zeros(n_rows, dtype=bool)
+            covered[stored[stored < n_rows]] = True
+            if order is None:
+                order = np.arange(n_rows)
+            if sentences is None:
+                sentences = read_column(input_path, text_column)
+
     # Token accounting (#77): count tokens per row as we go. Late-interaction
     # models give exact counts from their per-token vectors; for dense models we
     # use a local tokenizer when the provider exposes one. Only collected on a
@@ -284,62 +893,303 @@ def embed(dataset_id, text_column, model_id, prefix, rerun, dimensions, batch_si
     collect_tokens = existing_count == 0
     token_counts = []
 
-    for i, batch in enumerate(tqdm(chunked_iterable(sentences, batch_size), total=total_batches)):
-        start_index = i * batch_size
-        end_index = start_index + len(batch)
-        if end_index <= existing_count:
-            # fully covered by a previous run — re-embedding would append
-            # duplicate ls_index rows
-            continue
-        if start_index < existing_count:
-            # partial overlap (final partial batch of a completed run, or a
-            # changed batch_size): embed only the rows not yet stored
-            batch = batch[existing_count - start_index:]
-            start_index = existing_count
+    # Content-addressed vector cache shared across runs and datasets. Dense
+    # models only: late-interaction rows also carry per-token vectors.
+    embedding_cache = None
+    if cache and is_late_interaction:
+        print("embedding cache skipped: late interaction models store per-token vectors")
+    elif cache:
+        from latentscope.util.embedding_cache import (
+            DEFAULT_MAX_BYTES,
+            EmbeddingCache,
+            cache_namespace,
+            cache_path,
+        )
+        embedding_cache = EmbeddingCache(
+            cache_path(DATA_DIR),
+            max_bytes=cache_max_bytes if cache_max_bytes is not None else DEFAULT_MAX_BYTES,
+        )
+        cache_ns = cache_namespace(model_id, getattr(model, "task", None), prefix,
+                                   dimensions, max_seq_length,
+                                   backend=getattr(model, "backend", None))
+        print("using embedding cache", embedding_cache.path)
+
+    # Concurrent API embedding: several batches in flight, paced by the
+    # provider's request/token quotas and backed off on 429s.
+    rate_limiter = None
+    rate_limits = getattr(model, "rate_limits", None)
+    if concurrency and concurrency > 1:
+        if rate_limits is None or is_late_interaction:
+            print("--concurrency ignored: only API embedding providers run batches concurrently")
+        else:
+            from latentscope.util.rate_limit import RateLimiter
+            rate_limiter = RateLimiter(
+                concurrency,
+                requests_per_minute=requests_per_minute or rate_limits.get("requests_per_minute"),
+                tokens_per_minute=tokens_per_minute or rate_limits.get("tokens_per_minute"),
+            )
+            print(f"concurrent embedding: up to {concurrency} batches in flight")
+
+    # inputs were already prepared by the provider in the prepare stage
+    embed_fn = model.embed_prepared if prepare_inputs is not None else model.embed
+
+    def call_model(inputs, token_counts=None):
+        if rate_limiter is None:
+            return embed_fn(inputs, dimensions=dimensions)
+        if token_counts is not None:
+            cost = sum(token_counts)
+        else:
+            # ~4 characters per token is close enough for pacing
+            cost = sum(len(t) for t in inputs) // 4 + len(inputs)
+        return rate_limiter.call(lambda: embed_fn(inputs, dimensions=dimensions),
+                                 tokens=cost)
+
+    def packed_batches():
+        """Prepare rows PACK_WINDOW at a time and pack consecutive rows into
+        batches of at most request_tokens tokens / request_items inputs."""
+        if order is not None:
+            positions = order if covered is None else order[~covered[order]]
+            windows = ((window, [sentences[j] for j in window])
+                       for window in chunked_iterable(positions, PACK_WINDOW))
+        else:
+            windows = ((np.arange(start, start + len(values)), values)
+                       for start, values in iter_column_chunks(
+                           input_path, text_column, PACK_WINDOW, start=existing_count,
+                           aligned=False))
+        count = 0
+        rows = []
+        tokens = 0
+
+        def flush():
+            indices = np.array([r[0] for r in rows])
+            batch = {
+                "index": count, "start_index": int(indices[0]),
+                "values": [r[1] for r in rows],
+                "debug_values": [r[2] for r in rows],
+                "inputs": [r[3] for r in rows],
+                "token_counts": [r[4] for r in rows],
+            }
+            if order is not None:
+                batch["indices"] = indices
+            return batch
+
+        for window, values in windows:
+            start = time.perf_counter()
+            texts = prepare_text_batch(values, prefix, indices=window)
+            inputs, counts = prepare_inputs(texts)
+            timings["prepare"] += time.perf_counter() - start
+            for k, pos in enumerate(window):
+                if rows and (tokens + counts[k] > request_tokens
+                             or (request_items and len(rows) >= request_items)):
+                    yield flush()
+                    count += 1
+                    rows = []
+                    tokens = 0
+                rows.append((pos, values[k], texts[k], inputs[k], counts[k]))
+                tokens += counts[k]
+        if rows:
+            yield flush()
+
+    def pending_batches():
+        if pack_by_tokens:
+            yield from packed_batches()
+            return
+        if order is not None:
+            remaining = order if covered is None else order[~covered[order]]
+            for i, indices in enumerate(chunked_iterable(remaining, batch_size)):
+                yield {"index": i, "start_index": int(indices[0]), "indices": indices,
+                       "values": [sentences[j] for j in indices]}
+            return
+        # Rows before existing_count were stored by a previous run (re-embedding
+        # them would append duplicate ls_index rows). Chunks stay aligned to
+        # batch_size, so a partially stored batch (final partial batch of a
+        # completed run, or a changed batch_size) resumes at its first
+        # missing row.
+        for start_index, values in iter_column_chunks(input_path, text_column, batch_size,
+                                                      start=existing_count):
+            yield {"index": start_index // batch_size, "start_index": start_index,
+                   "values": values}
+
+    def prepare(batch):
+        nonlocal token_counter
         if input_type == "image":
             # decode this batch only; rows that fail get a 1x1 black placeholder
-            batch_inputs = decode_image_batch(batch, start_index=start_index)
+            batch["inputs"] = decode_image_batch(batch["values"],
+                                                 start_index=batch["start_index"],
+                                                 indices=batch.get("indices"))
+            # the debug parquet keeps the raw stored values for images
+            batch["debug_values"] = batch["values"]
+        elif "inputs" in batch:
+            pass  # prepared while packing requests
         else:
-            batch_inputs = batch
-        try:
-            if is_late_interaction:
-                mean_vectors, token_vectors_list = model.embed_multi(batch_inputs, dimensions=dimensions)
-                append_embeddings(
-                    DATA_DIR, dataset_id, embedding_id,
-                    mean_vectors, start_index=start_index,
-                    token_vectors_list=token_vectors_list,
-                )
-                if collect_tokens:
-                    token_counts.extend(len(tv) for tv in token_vectors_list)
-            else:
-                embeddings = np.array(model.embed(batch_inputs, dimensions=dimensions))
-                append_embeddings(
-                    DATA_DIR, dataset_id, embedding_id,
-                    embeddings, start_index=start_index,
-                )
-                if collect_tokens and token_counter is not None:
-                    try:
-                        token_counts.extend(token_counter(batch_inputs))
-                    except Exception as te:
-                        print("token counting disabled:", te)
-                        token_counter = None
-        except Exception as e:
-            print(batch)
-            print("error embedding batch", i, e)
-            print("exiting prematurely", embedding_id)
-            # extract the rows from the last batch from df
-            df_batch = df.iloc[start_index:start_index + len(batch)].copy()
-            df_batch["_ls_text_"] = batch
-            batch_path = os.path.join(embedding_dir, f"{embedding_id}-batch-{i}.parquet")
-            df_batch.to_parquet(batch_path)
-            print("wrote original data for batch along with processed inputs in _ls_sentences_ column to\n", batch_path)
-            print("debug with command:")
-            print("ls-embed-debug", batch_path, model_id)
-            print("already-embedded batches are preserved; resume from the last "
-                  "completed batch with:")
-            print(f"ls-embed {dataset_id} {text_column} {model_id} --rerun {embedding_id}")
+            batch["inputs"] = prepare_text_batch(batch["values"], prefix,
+                                                 start_index=batch["start_index"],
+                                                 indices=batch.get("indices"))
+            batch["debug_values"] = batch["inputs"]
+            if prepare_inputs is not None:
+                batch["inputs"], counts = prepare_inputs(batch["inputs"])
+                if counts is not None:
+                    batch["token_counts"] = counts
+            elif collect_tokens and token_counter is not None and not is_late_interaction:
+                try:
+                    batch["token_counts"] = token_counter(batch["inputs"])
+                except Exception as te:
+                    print("token counting disabled:", te)
+                    token_counter = None
+        if embedding_cache is not None:
+            from latentscope.util.embedding_cache import content_key
+            # images are keyed on their stored bytes, text on the prefixed input
+            keyed = batch["values"] if input_type == "image" else batch["debug_values"]
+            batch["cache_keys"] = [content_key(cache_ns, v) for v in keyed]
+
+    def embed_with_cache(inputs, keys):
+        found = embedding_cache.get_many(keys)
+        missing = [j for j, key in enumerate(keys) if key not in found]
+        fresh = None
+        if missing:
+            fresh = np.asarray(call_model([inputs[j] for j in missing]), dtype=np.float32)
+            embedding_cache.put_many([keys[j] for j in missing], fresh)
+        dim = fresh.shape[1] if fresh is not None else len(next(iter(found.values())))
+        vectors = np.empty((len(keys), dim), dtype=np.float32)
+        if fresh is not None:
+            vectors[missing] = fresh
+        for j, key in enumerate(keys):
+            if key in found:
+                vectors[j] = found[key]
+        return vectors
+
+    def encode(batch):
+        if is_late_interaction:
+            mean_vectors, token_vectors_list = model.embed_multi(batch["inputs"], dimensions=dimensions)
+            batch["vectors"] = mean_vectors
+            batch["token_vectors"] = token_vectors_list
+            batch["token_counts"] = [len(tv) for tv in token_vectors_list]
+        elif embedding_cache is not None:
+            batch["vectors"] = embed_with_cache(batch["inputs"], batch["cache_keys"])
+            batch["token_vectors"] = None
+        else:
+            batch["vectors"] = np.array(call_model(batch["inputs"], batch.get("token_counts")))
+            batch["token_vectors"] = None
+        # inputs (decoded images in particular) are no longer needed
+        batch["inputs"] = None
+
+    def write(batch):
+        append_embeddings(
+            DATA_DIR, dataset_id, embedding_id,
+            batch["vectors"], start_index=batch["start_index"],
+            token_vectors_list=batch["token_vectors"],
+            ls_indices=batch.get("indices"),
+        )
+        written["rows"] += len(batch["vectors"])
+        if collect_tokens and batch.get("token_counts") is not None:
+            token_counts.extend(batch["token_counts"])
+        batch["vectors"] = batch["token_vectors"] = None
+
+    written = {"rows": 0}
+    timings = {"prepare": 0.0, "encode": 0.0, "write": 0.0}
+    run = _run_pipelined if pipeline else _run_serial
+    if rate_limiter is not None:
+        def run(*args, **kwargs):
+            _run_concurrent(*args, concurrency=concurrency, **kwargs)
+        if pipeline:
+            print("--pipeline ignored: --concurrency already overlaps encoding and writes")
+    elif pipeline:
+        print(f"pipelined embedding: up to {PIPELINE_DEPTH} batches prepared and "
+              "written in the background")
+    skipped_batches = min(existing_count // batch_size, total_batches)
+    if pack_by_tokens:
+        # the number of packed requests isn't known upfront
+        total_batches = None
+        skipped_batches = 0
+    elif order is not None:
+        remaining_rows = n_rows - (int(covered.sum()) if covered is not None else 0)
+        total_batches = (remaining_rows + batch_size - 1) // batch_size
+        skipped_batches = 0
+    run_start = time.perf_counter()
+    try:
+        with tqdm(total=total_batches, initial=skipped_batches) as progress:
+            run(pending_batches(), prepare, encode, write, timings, progress=progress)
+    except _BatchFailure as failure:
+        batch = failure.batch
+        i = batch["index"]
+        start_index = batch["start_index"]
+        debug_values = batch.get("debug_values", batch["values"])
+        print(debug_values)
+        print("error embedding batch", i, failure.error)
+        print("exiting prematurely", embedding_id)
+        # extract the rows from the last batch from input.parquet
+        if batch.get("indices") is not None:
+            df_batch = read_rows(input_path, batch["indices"])
+        else:
+            df_batch = read_rows(input_path, range(start_index, start_index + len(debug_values)))
+        df_batch["_ls_text_"] = debug_values
+        batch_path = os.path.join(embedding_dir, f"{embedding_id}-batch-{i}.parquet")
+        df_batch.to_parquet(batch_path)
+        print("wrote original data for batch along with processed inputs in _ls_sentences_ column to\n", batch_path)
+        print("debug with command:")
+        print("ls-embed-debug", batch_path, model_id)
+        print("already-embedded batches are preserved; resume from the last "
+              "completed batch with:")
+        print(f"ls-embed {dataset_id} {text_column} {model_id} --rerun {embedding_id}")
+
+        sys.exit(1)
+    _report_throughput(timings, written["rows"], time.perf_counter() - run_start)
+    if rate_limiter is not None:
+        api_stats = rate_limiter.stats()
+        print(f"api: {api_stats['calls']} calls, {api_stats['throttled']} rate limited, "
+              f"final concurrency {api_stats['concurrency']}, "
+              f"{api_stats['rate_wait_seconds']}s waiting on quota")
+
+    cache_stats = None
+    if embedding_cache is not None:
+        cache_stats = embedding_cache.stats()
+        embedding_cache.close()
+        print(f"embedding cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+              f"{cache_stats['evicted']} evicted")
+
+    extra_meta = {}
+    if getattr(model, "backend", None):
+        extra_meta["backend"] = model.backend
+    if order is not None and sort_by_length:
+        extra_meta["sort_by_length"] = True
+    if cache_stats is not None:
+        extra_meta["cache"] = {k: cache_stats[k] for k in ("hits", "misses", "evicted")}
+    _finish_embedding(
+        DATA_DIR, dataset_id, embedding_id, model_id=model_id, text_column=text_column,
+        input_type=input_type, max_seq_length=max_seq_length, prefix=prefix,
+        task=getattr(model, "task", None), late_interaction=is_late_interaction,
+        token_stats=summarize_token_counts(token_counts) if collect_tokens else None,
+        extra_meta=extra_meta, precision=precision, token_index=token_index,
+        tune_index=tune_index,
+    )
 
-            sys.exit(1)
+def summarize_token_counts(token_counts):
+    """Token stats (#77) for the embedding meta, so the UI can surface tokens
+    per doc + total. None when nothing was counted."""
+    import numpy as np
+    if not token_counts:
+        return None
+    arr = np.asarray(token_counts)
+    return {
+        "total": int(arr.sum()),
+        "mean": round(float(arr.mean()), 2),
+        "min": int(arr.min()),
+        "max": int(arr.max()),
+        "count": int(arr.size),
+    }
+
+
+def _finish_embedding(DATA_DIR, dataset_id, embedding_id, model_id, text_column, input_type,
+                      max_seq_length, prefix, task, late_interaction, token_stats=None,
+                      extra_meta=None, precision="float32", token_index=False,
+                      tune_index=False):
+    """Record the model in the history, quantize, compact and index the
+    table (with `tune_index`, tuning the vector index by measured recall;
+    with `token_index`, also building the token-level index of a late
+    interaction embedding), write the embedding's .json meta and clean up
+    stale debug batches."""
+    is_late_interaction = late_interaction
+    embedding_dir = os.path.join(DATA_DIR, dataset_id, "embeddings")
 
     # track history of model_id used
     history_file_path = os.path.join(DATA_DIR, "embedding_model_history.csv")
@@ -352,38 +1202,55 @@ def embed(dataset_id, text_column, model_id, prefix, rerun, dimensions, batch_si
 
     # Compact fragments (one per batch was written) and index for search
     from latentscope.util.embedding_store import (
+        build_token_index,
         create_scalar_index,
         create_vector_index,
         get_embedding_stats,
         optimize_table,
+        quantize_embeddings,
+        sort_embeddings,
+        write_embedding_sidecar,
     )
+    # Length-bucketed and resumed runs append rows out of order; put them
+    # back in ls_index order so every later pass reads one sequential scan.
+    if sort_embeddings(DATA_DIR, dataset_id, embedding_id):
+        print("rewrote the embedding table in ls_index order")
+    # Stats come from the full-precision vectors; int8 storage derives its
+    # per-dimension scale and offset from them.
+    stats = get_embedding_stats(DATA_DIR, dataset_id, embedding_id)
+    if precision and precision != "float32":
+        print(f"storing vectors as {precision}")
+        quantize_embeddings(DATA_DIR, dataset_id, embedding_id, precision,
+                            min_values=stats["min_values"], max_values=stats["max_values"])
+
     # All rows are written at this point; never let housekeeping kill the run
     # (searches fall back to a brute-force scan without the indexes).
+    vector_index = None
     try:
         print("optimizing embedding table")
         optimize_table(DATA_DIR, dataset_id, embedding_id)
         print("creating indexes")
-        create_vector_index(DATA_DIR, dataset_id, embedding_id)
+        vector_index = create_vector_index(DATA_DIR, dataset_id, embedding_id, tune=tune_index)
         if is_late_interaction:
             # token-vector lookups filter on ls_index
             create_scalar_index(DATA_DIR, dataset_id, embedding_id)
     except Exception as e:
         print(f"Warning: table optimize/index failed ({e}); continuing without index")
+    if token_index and is_late_interaction:
+        try:
+            build_token_index(DATA_DIR, dataset_id, embedding_id)
+        except Exception as e:
+            print(f"Warning: building the token index failed ({e}); "
+                  "MaxSim search falls back to mean-vector candidates")
+    try:
+        # Last, so the sidecar matches the final table version.
+        sidecar = write_embedding_sidecar(DATA_DIR, dataset_id, embedding_id)
+        if sidecar:
+            print("wrote memory-mappable matrix", sidecar)
+    except Exception as e:
+        print(f"Warning: writing the embedding matrix sidecar failed ({e})")
 
-    # Get stats from the stored embeddings
-    stats = get_embedding_stats(DATA_DIR, dataset_id, embedding_id)
-
-    # Summarize token counts (#77) so the UI can surface tokens per doc + total.
-    token_stats = None
-    if collect_tokens and token_counts:
-        arr = np.asarray(token_counts)
-        token_stats = {
-            "total": int(arr.sum()),
-            "mean": round(float(arr.mean()), 2),
-            "min": int(arr.min()),
-            "max": int(arr.max()),
-            "count": int(arr.size),
-        }
+    if token_stats is not None:
         print(f"tokens: {token_stats['total']} total, {token_stats['mean']} avg/doc")
 
     meta = {
@@ -395,12 +1262,16 @@ def embed(dataset_id, text_column, model_id, prefix, rerun, dimensions, batch_si
         "dimensions": stats["dimensions"],
         "max_seq_length": max_seq_length,
         "prefix": prefix,
-        "task": getattr(model, "task", None),
+        "task": task,
         "late_interaction": is_late_interaction,
         "min_values": stats["min_values"],
         "max_values": stats["max_values"],
         "token_stats": token_stats,
+        "precision": precision or "float32",
     }
+    if vector_index is not None:
+        meta["vector_index"] = vector_index
+    meta.update(extra_meta or {})
 
     with open(os.path.join(embedding_dir, f"{embedding_id}.json"), 'w') as f:
         json.dump(meta, f, indent=2)
@@ -423,11 +1294,16 @@ def truncate():
     args = parser.parse_args()
     embed_truncate(args.dataset_id, args.embedding_id, args.dimensions)
 
-def embed_truncate(dataset_id, embedding_id, dimensions):
+def embed_truncate(dataset_id, embedding_id, dimensions, batch_size=65536):
     import numpy as np
 
-    from latentscope.util.embedding_store import append_embeddings
-    from latentscope.util.embedding_store import load_embeddings as lance_load
+    from latentscope.util.embedding_store import (
+        append_embeddings,
+        create_vector_index,
+        iter_embeddings,
+        optimize_table,
+        write_embedding_sidecar,
+    )
 
     DATA_DIR = get_data_dir()
     embedding_dir = os.path.join(DATA_DIR, dataset_id, "embeddings")
@@ -452,37 +1328,287 @@ def embed_truncate(dataset_id, embedding_id, dimensions):
     new_embedding_id = f"embedding-{next_embedding_number:03d}"
     print("RUNNING:", new_embedding_id)
 
-    # Load embeddings (from LanceDB or HDF5)
-    embeddings = lance_load(DATA_DIR, dataset_id, embedding_id)
-
-    print("truncating to", dimensions, "dimensions")
-    matroyshka = embeddings[:, :dimensions]
-    # Normalize the truncated embeddings
-    matroyshka = matroyshka / np.linalg.norm(matroyshka, axis=1, keepdims=True)
-
-    # Store in LanceDB
-    append_embeddings(DATA_DIR, dataset_id, new_embedding_id, matroyshka, start_index=0)
+    # Stream the source (LanceDB or HDF5) in ls_index order, so only one
+    # chunk of rows is ever in memory
+    output_dimensions = min(dimensions, embedding_meta.get("dimensions") or dimensions)
+    print("truncating to", output_dimensions, "dimensions")
+    start_index = 0
+    for _, embeddings in iter_embeddings(DATA_DIR, dataset_id, embedding_id, batch_size):
+        matroyshka = embeddings[:, :dimensions]
+        # Normalize the truncated embeddings
+        matroyshka = matroyshka / np.linalg.norm(matroyshka, axis=1, keepdims=True)
+        append_embeddings(DATA_DIR, dataset_id, new_embedding_id, matroyshka,
+                          start_index=start_index)
+        start_index += len(matroyshka)
+
+    # Compact the one-fragment-per-chunk table and index it, as ls-embed does
+    vector_index = None
+    try:
+        optimize_table(DATA_DIR, dataset_id, new_embedding_id)
+        vector_index = create_vector_index(DATA_DIR, dataset_id, new_embedding_id)
+    except Exception as e:
+        print(f"Warning: table optimize/index failed ({e}); continuing without index")
+    try:
+        write_embedding_sidecar(DATA_DIR, dataset_id, new_embedding_id)
+    except Exception as e:
+        print(f"Warning: writing the embedding matrix sidecar failed ({e})")
 
-    # Calculate min and max values for each index
-    np.min(matroyshka, axis=0)
-    np.max(matroyshka, axis=0)
+    meta = {
+        "id": new_embedding_id,
+        "model_id": embedding_meta["model_id"],
+        "dataset_id": dataset_id,
+        "text_column": embedding_meta["text_column"],
+        "max_seq_length": embedding_meta.get("max_seq_length"),
+        "dimensions": output_dimensions,
+        "prefix": embedding_meta["prefix"],
+        "late_interaction": False,
+    }
+    if vector_index is not None:
+        meta["vector_index"] = vector_index
 
     with open(os.path.join(embedding_dir, f"{new_embedding_id}.json"), 'w') as f:
-        json.dump({
-            "id": new_embedding_id,
-            "model_id": embedding_meta["model_id"],
-            "dataset_id": dataset_id,
-            "text_column": embedding_meta["text_column"],
-            "max_seq_length": embedding_meta.get("max_seq_length"),
-            "dimensions": matroyshka.shape[1],
-            "prefix": embedding_meta["prefix"],
-            "late_interaction": False,
-            }, f, indent=2)
+        json.dump(meta, f, indent=2)
 
     print("wrote", new_embedding_id, "to LanceDB")
     print("done")
 
 
+def token_index():
+    parser = argparse.ArgumentParser(
+        description='Build the token-level (PLAID-style) index of a late interaction embedding')
+    parser.add_argument('dataset_id', type=str, help='Dataset id (directory name in data/)')
+    parser.add_argument('embedding_id', type=str, help='ID of embedding to index')
+    parser.add_argument('--centroids', type=int, default=None,
+                        help='Number of token centroids (default: ~4 * sqrt(tokens))')
+    parser.add_argument('--nbits', type=int, default=2,
+                        help='Bits per dimension of the compressed token residuals')
+    args = parser.parse_args()
+    from latentscope.util.embedding_store import build_token_index
+    build_token_index(get_data_dir(), args.dataset_id, args.embedding_id,
+                      num_centroids=args.centroids, nbits=args.nbits)
+
+
+def tune_index():
+    parser = argparse.ArgumentParser(
+        description='Rebuild the vector index of an embedding with the cheapest settings that '
+                    'reach a target recall@k, measured on held-out rows')
+    parser.add_argument('dataset_id', type=str, help='Dataset id (directory name in data/)')
+    parser.add_argument('embedding_id', type=str, help='ID of embedding to index')
+    parser.add_argument('--target_recall', type=float, default=None,
+                        help='Recall@k to reach (default: 0.95)')
+    parser.add_argument('--k', type=int, default=10, help='Neighbors per query')
+    parser.add_argument('--queries', type=int, default=100, help='Held-out query rows')
+    args = parser.parse_args()
+    tune_embedding_index(args.dataset_id, args.embedding_id, args.target_recall, args.k,
+                         args.queries)
+
+
+def tune_embedding_index(dataset_id, embedding_id, target_recall=None, k=10, n_queries=100):
+    """Tune and rebuild the vector index, record it in the embedding meta,
+    and refresh what the new table version made stale (the matrix sidecar
+    and a current token index)."""
+    from latentscope.util.embedding_store import (
+        build_token_index,
+        create_vector_index,
+        get_token_index,
+        write_embedding_sidecar,
+    )
+
+    DATA_DIR = get_data_dir()
+    had_token_index = get_token_index(DATA_DIR, dataset_id, embedding_id) is not None
+    vector_index = create_vector_index(DATA_DIR, dataset_id, embedding_id, tune=True,
+                                       target_recall=target_recall, k=k, n_queries=n_queries)
+    if vector_index is None:
+        print("no vector index for this embedding (under 256 rows, or stored as int8/binary)")
+        return None
+
+    metadata_path = os.path.join(DATA_DIR, dataset_id, "embeddings", f"{embedding_id}.json")
+    with open(metadata_path) as f:
+        metadata = json.load(f)
+    metadata["vector_index"] = vector_index
+    with open(metadata_path, 'w') as f:
+        json.dump(metadata, f, indent=2)
+
+    if had_token_index:
+        build_token_index(DATA_DIR, dataset_id, embedding_id)
+    if write_embedding_sidecar(DATA_DIR, dataset_id, embedding_id):
+        print("rewrote memory-mappable matrix for the new table version")
+    return vector_index
+
+
+def migrate_embeddings():
+    parser = argparse.ArgumentParser(
+        description='Migrate every legacy HDF5 embedding under the data dir to LanceDB, '
+                    'several at a time')
+    parser.add_argument('dataset_ids', type=str, nargs='*',
+                        help='Only migrate these datasets (default: all)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Parallel migration processes (default: number of CPUs)')
+    parser.add_argument('--batch_size', type=int, default=65536,
+                        help='Rows per Arrow batch written to LanceDB')
+    args = parser.parse_args()
+    migrate_all_embeddings(args.dataset_ids or None, workers=args.workers,
+                           batch_size=args.batch_size)
+
+
+def _migrate_embedding(params):
+    """Worker for ls-migrate-embeddings: migrate one HDF5 embedding, then
+    compact the table and build its vector index once."""
+    from latentscope.util.embedding_store import (
+        create_vector_index,
+        migrate_hdf5_to_lancedb,
+        optimize_table,
+    )
+
+    DATA_DIR = params["data_dir"]
+    dataset_id = params["dataset_id"]
+    embedding_id = params["embedding_id"]
+    start = time.perf_counter()
+    result = migrate_hdf5_to_lancedb(DATA_DIR, dataset_id, embedding_id,
+                                     batch_size=params["batch_size"])
+    optimize_table(DATA_DIR, dataset_id, embedding_id)
+    vector_index = create_vector_index(DATA_DIR, dataset_id, embedding_id)
+    metadata_path = os.path.join(DATA_DIR, dataset_id, "embeddings", f"{embedding_id}.json")
+    if vector_index is not None and os.path.exists(metadata_path):
+        with open(metadata_path) as f:
+            metadata = json.load(f)
+        metadata["vector_index"] = vector_index
+        with open(metadata_path, 'w') as f:
+            json.dump(metadata, f, indent=2)
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def _migration_done(DATA_DIR, planned):
+    """Whether a planned HDF5 embedding needs no more work: its table holds
+    every HDF5 row and is indexed (or too small to index). Re-optimizing or
+    re-indexing such a table would replace a tuned index and bump the table
+    version, invalidating its sidecar and token index. A table whose HDF5
+    is gone was verified before the file was removed."""
+    import h5py
+
+    from latentscope.util.embedding_store import (
+        _embedding_table_name,
+        _has_vector_index,
+        _open_table,
+    )
+    from latentscope.util.index_tuning import MIN_INDEX_ROWS
+
+    dataset_id = planned["dataset_id"]
+    embedding_id = planned["embedding_id"]
+    tbl = _open_table(DATA_DIR, dataset_id, _embedding_table_name(embedding_id))
+    if tbl is None:
+        return False
+    rows = tbl.count_rows()
+    metadata_path = os.path.join(DATA_DIR, dataset_id, "embeddings", f"{embedding_id}.json")
+    metadata = {}
+    if os.path.exists(metadata_path):
+        with open(metadata_path) as f:
+            metadata = json.load(f)
+    indexed = "vector_index" in metadata or rows < MIN_INDEX_ROWS or _has_vector_index(tbl)
+    if not os.path.exists(planned["path"]):
+        if not indexed:
+            print(f"{dataset_id}/{embedding_id} has no vector index; "
+                  f"build one with ls-tune-index {dataset_id} {embedding_id}")
+        return True
+    with h5py.File(planned["path"], "r") as f:
+        total_rows = f["embeddings"].shape[0]
+    return rows == total_rows and indexed
+
+
+def migrate_all_embeddings(dataset_ids=None, workers=None, batch_size=65536):
+    """ls-migrate-embeddings: migrate the legacy HDF5 embeddings of all
+    datasets (or `dataset_ids`) in a process pool, largest first.
+
+    Each embedding is converted in `batch_size`-row Arrow batches, verified,
+    and compacted and indexed once at the end. The plan is saved in the data
+    dir until every embedding is done, so an interrupted run picks up where
+    it stopped (a half-written table is dropped and migrated again).
+    Embeddings whose table is already complete and indexed are left alone,
+    even if their HDF5 file is still there.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    from latentscope.util.embedding_store import _human_readable_size, find_hdf5_embeddings
+
+    DATA_DIR = get_data_dir()
+    plan_path = os.path.join(DATA_DIR, "migrate-embeddings.json")
+    plan = {"embeddings": []}
+    if os.path.exists(plan_path):
+        with open(plan_path) as f:
+            plan = json.load(f)
+        print(f"resuming the migration plan in {plan_path}")
+    planned = {(e["dataset_id"], e["embedding_id"]) for e in plan["embeddings"]}
+    for found in find_hdf5_embeddings(DATA_DIR, dataset_ids):
+        if (found["dataset_id"], found["embedding_id"]) not in planned:
+            plan["embeddings"].append({**found, "complete": False})
+
+    def save_plan():
+        with open(plan_path, "w") as f:
+            json.dump(plan, f, indent=2)
+
+    def finish():
+        if all(e["complete"] for e in plan["embeddings"]) and os.path.exists(plan_path):
+            os.remove(plan_path)
+
+    for e in plan["embeddings"]:
+        if not e["complete"] and _migration_done(DATA_DIR, e):
+            e["complete"] = True
+            print(f"{e['dataset_id']}/{e['embedding_id']} is already migrated and indexed")
+    pending = [e for e in plan["embeddings"] if not e["complete"]
+               and (dataset_ids is None or e["dataset_id"] in dataset_ids)]
+    if not pending:
+        print("no HDF5 embeddings to migrate")
+        finish()
+        return []
+    save_plan()
+
+    workers = min(workers or os.cpu_count() or 1, len(pending))
+    total_bytes = sum(e["bytes"] for e in pending)
+    print(f"migrating {len(pending)} embedding(s) ({_human_readable_size(total_bytes)} of HDF5) "
+          f"with {workers} worker processes")
+    start = time.perf_counter()
+    rows = done_bytes = 0
+    results = []
+    failures = []
+    context = multiprocessing.get_context(WORKER_START_METHOD)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = {pool.submit(_migrate_embedding, {**e, "data_dir": DATA_DIR,
+                                                    "batch_size": batch_size}): e
+                   for e in pending}
+        for future in as_completed(futures):
+            e = futures[future]
+            name = f"{e['dataset_id']}/{e['embedding_id']}"
+            try:
+                result = future.result()
+            except Exception as err:
+                failures.append(e)
+                print(f"{name} failed: {err}")
+                continue
+            e["complete"] = True
+            save_plan()
+            results.append({"dataset_id": e["dataset_id"], "embedding_id": e["embedding_id"],
+                            **result})
+            rows += result["rows"]
+            done_bytes += e["bytes"]
+            elapsed = time.perf_counter() - start
+            print(f"{name}: {result['status']}, {result['rows']} rows in "
+                  f"{result['seconds']:.1f}s ({len(results)}/{len(pending)} done, "
+                  f"{rows / elapsed:,.0f} rows/s, "
+                  f"{done_bytes / elapsed / 2**20:.1f} MB/s overall)")
+
+    elapsed = time.perf_counter() - start
+    print(f"migrated {len(results)} embedding(s), {rows} rows, "
+          f"{_human_readable_size(done_bytes)} in {elapsed:.1f}s "
+          f"({rows / elapsed:,.0f} rows/s, {done_bytes / elapsed / 2**20:.1f} MB/s)")
+    if failures:
+        print(f"{len(failures)} embedding(s) failed; run ls-migrate-embeddings again to retry them")
+        sys.exit(1)
+    finish()
+    return results
+
+
 def update_embedding_stats():
     parser = argparse.ArgumentParser(description='Update embedding stats')
     parser.add_argument('dataset_id', type=str, help='Dataset id (directory name in data/)')
@@ -493,19 +1619,13 @@ def update_embedding_stats():
 def embedding_stats(dataset_id, embedding_id):
     import os
 
-    import numpy as np
-
-    from latentscope.util.embedding_store import load_embeddings as lance_load
+    from latentscope.util.embedding_store import get_embedding_stats
 
     DATA_DIR = get_data_dir()
     embedding_dir = os.path.join(DATA_DIR, dataset_id, "embeddings")
 
-    # Load embeddings from LanceDB or HDF5
-    embeddings = lance_load(DATA_DIR, dataset_id, embedding_id)
-
-    # Calculate min and max values for each index
-    min_values = np.min(embeddings, axis=0)
-    max_values = np.max(embeddings, axis=0)
+    # One streaming pass over the LanceDB table (or HDF5 file)
+    stats = get_embedding_stats(DATA_DIR, dataset_id, embedding_id)
 
     metadata_path = os.path.join(embedding_dir, f"{embedding_id}.json")
     # Read existing metadata
@@ -513,8 +1633,8 @@ def embedding_stats(dataset_id, embedding_id):
         metadata = json.load(f)
 
     # Add min and max values to metadata
-    metadata['min_values'] = min_values.tolist()
-    metadata['max_values'] = max_values.tolist()
+    metadata['min_values'] = stats['min_values']
+    metadata['max_values'] = stats['max_values']
 
     # Write updated metadata back to file
     with open(metadata_path, 'w') as f:
@@ -523,6 +1643,69 @@ def embedding_stats(dataset_id, embedding_id):
     print(f"Updated metadata for {embedding_id} with min and max values")
 
 
+# Fixed small local model so backend numbers are comparable between machines.
+BENCHMARK_MODEL_ID = "huggingface-sentence-transformers___all-MiniLM-L6-v2"
+
+
+def benchmark():
+    parser = argparse.ArgumentParser(description='Compare embedding throughput across inference backends')
+    parser.add_argument('--model_id', type=str, default=BENCHMARK_MODEL_ID,
+                        help='Local sentence-transformers model to benchmark')
+    parser.add_argument('--backends', type=str, default=",".join(BACKENDS),
+                        help='Comma separated backends to compare (the first is the reference)')
+    parser.add_argument('--dataset_id', type=str, default=None,
+                        help='Benchmark on rows of this dataset instead of generated text')
+    parser.add_argument('--text_column', type=str, default=None, help='Text column of --dataset_id')
+    parser.add_argument('--rows', type=int, default=2000, help='Number of rows to embed')
+    parser.add_argument('--batch_size', type=int, default=64, help='Batch size')
+    args = parser.parse_args()
+    texts = None
+    if args.dataset_id:
+        from latentscope.util.parquet_stream import iter_column_chunks
+        input_path = os.path.join(get_data_dir(), args.dataset_id, "input.parquet")
+        _, values = next(iter_column_chunks(input_path, args.text_column, args.rows))
+        texts = prepare_text_batch(values)
+    embed_benchmark(args.model_id, args.backends.split(","), n_rows=args.rows,
+                    batch_size=args.batch_size, texts=texts)
+
+
+def embed_benchmark(model_id, backends=BACKENDS, n_rows=2000, batch_size=64, texts=None):
+    """Embed the same rows with each backend and report rows/sec and the
+    lowest cosine similarity to the first backend's vectors."""
+    import numpy as np
+
+    from latentscope.models.providers.transformers import PROBE_SENTENCES, min_cosine
+
+    if texts is None:
+        texts = [f"{PROBE_SENTENCES[i % len(PROBE_SENTENCES)]} (row {i})" for i in range(n_rows)]
+    texts = texts[:n_rows]
+    results = []
+    reference = None
+    for backend in backends:
+        model = get_embedding_model(model_id)
+        model.backend = backend
+        model.load_model()
+        model.embed(texts[:batch_size])  # warm up (first-call graph setup, thread pools)
+        start = time.perf_counter()
+        vectors = []
+        for i in range(0, len(texts), batch_size):
+            vectors.extend(model.embed(texts[i:i + batch_size]))
+        seconds = time.perf_counter() - start
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if reference is None:
+            reference = vectors
+        result = {
+            "backend": backend,
+            "rows_per_sec": round(len(texts) / seconds, 1) if seconds > 0 else float("inf"),
+            "min_cosine": round(min_cosine(reference, vectors), 6),
+        }
+        results.append(result)
+        print(f"{backend:>10}: {result['rows_per_sec']:.1f} rows/s, "
+              f"min cosine vs {backends[0]} {result['min_cosine']:.4f}")
+        del model
+    return results
+
+
 def debug():
     parser = argparse.ArgumentParser(description='Debug embedding a batch')
     parser.add_argument('parquet_file', type=str, help='Parquet file output by embed process')
@@ -0,0 +1,140 @@
+# Usage: ls-preview-benchmark [--points 10000 100000 1000000] [--dimensions 2]
+#        ls-preview-benchmark --points 5000000 --matplotlib_max 0
+#
+# Time to render a 1024px umap thumbnail with the numpy rasterizer in
+# latentscope.util.preview against the matplotlib scatter it replaced, on
+# synthetic clustered layouts. --cluster adds Spectral label colours and
+# hull outlines, as ls-cluster draws them; --dimensions 3 benchmarks the
+# depth-cued 3D thumbnail. matplotlib is skipped above --matplotlib_max
+# points, where it takes minutes.
+import argparse
+import math
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from latentscope.util.preview import (
+    calculate_point_size,
+    label_colors,
+    render_points,
+    render_points_3d,
+)
+
+
+def synthetic_layout(n_points, dimensions=2, n_clusters=50, seed=0):
+    """(points, labels): Gaussian blobs of varying width, scaled to [-1, 1]."""
+    rng = np.random.default_rng(seed)
+    centers = rng.uniform(-1, 1, size=(n_clusters, dimensions))
+    widths = rng.uniform(0.02, 0.12, size=n_clusters)
+    labels = rng.integers(n_clusters, size=n_points)
+    points = centers[labels] + rng.normal(size=(n_points, dimensions)) * widths[labels, None]
+    points = 2 * (points - points.min(axis=0)) / np.ptp(points, axis=0) - 1
+    return points.astype(np.float32), labels
+
+
+def _matplotlib_preview(points, out_path, dimensions=2, labels=None, hulls=None):
+    """The old thumbnail: a matplotlib scatter (depth-cued in 3D)."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    point_size = calculate_point_size(len(points))
+    if dimensions >= 3:
+        x, y, z = points[:, 0], points[:, 1], points[:, 2]
+        fig = plt.figure(figsize=(14.22, 14.22))
+        ax = fig.add_subplot(111, projection='3d')
+        elev, azim = 22, -60
+        ax.view_init(elev=elev, azim=azim)
+        e, a = math.radians(elev), math.radians(azim)
+        depth = (x * math.cos(e) * math.cos(a) + y * math.cos(e) * math.sin(a)
+                 + z * math.sin(e))
+        t = (depth - depth.min()) / (depth.max() - depth.min())
+        order = np.argsort(depth)
+        base = float(np.clip(point_size, 4, 16))
+        colors = plt.cm.viridis(0.12 + 0.72 * t)
+        colors[:, 3] = 0.25 + 0.55 * t
+        ax.scatter(x[order], y[order], z[order], s=(base * (0.4 + 0.9 * t))[order],
+                   c=colors[order], edgecolors='none', depthshade=False)
+        ax.set_axis_off()
+        ax.set_position([-0.18, -0.18, 1.36, 1.36])
+        fig.savefig(out_path, dpi=72)
+        plt.close(fig)
+        return
+
+    fig, ax = plt.subplots(figsize=(14.22, 14.22))
+    ax.scatter(points[:, 0], points[:, 1], s=point_size, alpha=0.5, c=labels,
+               cmap='Spectral' if labels is not None else None)
+    for hull in hulls or []:
+        closed = np.vstack([hull, hull[:1]])
+        ax.plot(closed[:, 0], closed[:, 1], 'k-')
+    ax.axis('off')
+    ax.set_position([0, 0, 1, 1])
+    fig.savefig(out_path)
+    plt.close(fig)
+
+
+def _cluster_hulls(points, labels):
+    from scipy.spatial import ConvexHull
+
+    hulls = []
+    for label in np.unique(labels):
+        members = points[labels == label, :2]
+        if len(members) >= 3:
+            hulls.append(members[ConvexHull(members).vertices])
+    return hulls
+
+
+def _timed(render):
+    start = time.perf_counter()
+    render()
+    return round(time.perf_counter() - start, 3)
+
+
+def benchmark_preview(n_points, dimensions=2, cluster=False, matplotlib=True, seed=0):
+    """Return {method: seconds} for one synthetic layout."""
+    points, labels = synthetic_layout(n_points, dimensions, seed=seed)
+    hulls = _cluster_hulls(points, labels) if cluster else None
+    results = {}
+    with tempfile.TemporaryDirectory() as out_dir:
+        path = os.path.join(out_dir, "numpy.png")
+        if dimensions >= 3:
+            results["numpy"] = _timed(lambda: render_points_3d(points, path))
+        else:
+            colors = label_colors(labels) if cluster else None
+            results["numpy"] = _timed(lambda: render_points(points, path, colors=colors,
+                                                            hulls=hulls))
+        if matplotlib:
+            path = os.path.join(out_dir, "matplotlib.png")
+            results["matplotlib"] = _timed(lambda: _matplotlib_preview(
+                points, path, dimensions, labels if cluster else None, hulls))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Umap thumbnail rendering: numpy rasterizer vs matplotlib scatter"
+    )
+    parser.add_argument("--points", type=int, nargs="+", default=[10000, 100000, 1000000],
+                        help="Layout sizes to render")
+    parser.add_argument("--dimensions", type=int, default=2, choices=[2, 3])
+    parser.add_argument("--cluster", action="store_true",
+                        help="Render the cluster thumbnail (label colours and hulls)")
+    parser.add_argument("--matplotlib_max", type=int, default=1000000,
+                        help="Skip matplotlib for layouts larger than this")
+    args = parser.parse_args()
+    print(f"{'points':>10} {'numpy s':>9} {'matplotlib s':>13} {'speedup':>8}")
+    for n_points in args.points:
+        results = benchmark_preview(n_points, args.dimensions, args.cluster,
+                                    matplotlib=n_points <= args.matplotlib_max)
+        fast = results["numpy"]
+        slow = results.get("matplotlib")
+        if slow:
+            print(f"{n_points:>10} {fast:>9.2f} {slow:>13.2f} {slow / fast:>7.1f}x")
+        else:
+            print(f"{n_points:>10} {fast:>9.2f} {'-':>13} {'-':>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -116,9 +116,9 @@ def saer(dataset_id, embedding_id, model_id, k_expansion, device,
             buffer = []
             buffered = 0
 
-        for _, vec_list in tqdm(iter_token_vectors(DATA_DIR, dataset_id, embedding_id),
-                                desc="Encoding token batches"):
-            flat = np.concatenate(vec_list)
+        for _, flat, _ in tqdm(iter_token_vectors(DATA_DIR, dataset_id, embedding_id,
+                                                  flat=True),
+                               desc="Encoding token batches"):
             total_rows += len(flat)
             buffer.append(flat)
             buffered += len(flat)
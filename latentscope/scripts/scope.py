@@ -72,7 +72,7 @@ def main():
 
 
 
-def export_lance(directory, dataset, scope_id, metric="cosine", partitions=256):
+def export_lance(directory, dataset, scope_id, metric="cosine", partitions=256, tune_index=None):
     import h5py
     import lancedb
     import numpy as np
@@ -140,14 +140,26 @@ def export_lance(directory, dataset, scope_id, metric="cosine", partitions=256):
     tbl = db.create_table(table_name, arrow_table)
 
     print(f"Creating ANN index for embeddings on table '{table_name}'")
+    from latentscope.util.index_tuning import MIN_INDEX_ROWS, default_index_config, tune_ivf_pq
+
     num_rows = len(scope_df)
-    actual_partitions = min(partitions, max(1, num_rows // 10))
-    sub_vectors = max(1, dim // 16)
-    if num_rows >= 256:
-        print(f"Partitioning into {actual_partitions} partitions, {sub_vectors} sub-vectors")
-        tbl.create_index(num_partitions=actual_partitions, num_sub_vectors=sub_vectors, metric=metric)
-    else:
+    if tune_index is None:
+        # tune the scope table when its embedding's index was tuned
+        embedding_meta_path = os.path.join(dataset_path, "embeddings", f"{embedding_id}.json")
+        with open(embedding_meta_path) as f:
+            tune_index = "recall" in (json.load(f).get("vector_index") or {})
+    if num_rows < MIN_INDEX_ROWS:
         print(f"Dataset too small ({num_rows} rows) for IVF index, skipping ANN index")
+    elif tune_index:
+        scope_meta["vector_index"] = tune_ivf_pq(tbl, metric=metric, id_column="index")
+        with open(os.path.join(scope_path, f"{scope_id}.json"), "w") as f:
+            json.dump(scope_meta, f, indent=2)
+    else:
+        config = default_index_config(num_rows, dim)
+        config["num_partitions"] = min(partitions, config["num_partitions"])
+        print(f"Partitioning into {config['num_partitions']} partitions, "
+              f"{config['num_sub_vectors']} sub-vectors")
+        tbl.create_index(metric=metric, **config)
 
     print(f"Creating index for cluster on table '{table_name}'")
     tbl.create_scalar_index("cluster", index_type="BTREE")
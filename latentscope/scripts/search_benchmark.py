@@ -0,0 +1,186 @@
+# Usage: ls-search-benchmark [--rows 100000] [--dimensions 384] [--k 10]
+#        ls-search-benchmark --multi_probe [--rows 1000000] [--query_tokens 32]
+#        ls-search-benchmark --tune [--rows 100000] [--dimensions 384]
+#
+# Recall@k of the binary (sign-bit) prefilter + exact rerank used by
+# /api/search/nn?mode=binary, against brute-force cosine search, on synthetic
+# clustered vectors. Prints one line per candidate count so the
+# recall/latency tradeoff of the `candidates` parameter is visible.
+#
+# --multi_probe instead times the candidate search of a late interaction
+# query (the mean plus every query token) against an indexed LanceDB table:
+# one search_nn per probe versus a single search_nn_many.
+#
+# --tune compares the recall@k of the default IVF_PQ index of an embedding
+# table with the index ls-tune-index picks for it (printing every setting
+# it measured).
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from latentscope.util.binary_index import BinaryIndex
+
+
+def synthetic_embeddings(n_rows, dimensions, n_clusters=100, seed=0):
+    """Gaussian clusters around random centers, plus a shared offset so that,
+    like real embedding models, the data isn't centered on the origin."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, dimensions)).astype(np.float32)
+    offset = rng.normal(scale=2.0, size=dimensions).astype(np.float32)
+    labels = rng.integers(n_clusters, size=n_rows)
+    noise = rng.normal(scale=0.6, size=(n_rows, dimensions)).astype(np.float32)
+    return centers[labels] + noise + offset
+
+
+def benchmark_binary_search(n_rows=100000, dimensions=384, k=10,
+                            candidates=(250, 500, 1000, 2000, 4000), n_queries=100, seed=0):
+    """Return [{candidates, recall, ms_per_query}] for each candidate count."""
+    vectors = synthetic_embeddings(n_rows, dimensions, seed=seed)
+    rng = np.random.default_rng(seed + 1)
+    queries = vectors[rng.choice(n_rows, size=n_queries, replace=False)]
+    queries = queries + rng.normal(scale=0.3, size=queries.shape).astype(np.float32)
+
+    start = time.perf_counter()
+    index = BinaryIndex.build(lambda: iter([(np.arange(n_rows), vectors)]))
+    build_seconds = time.perf_counter() - start
+    print(f"{n_rows} x {dimensions}: built in {build_seconds:.2f}s, "
+          f"{index.codes.nbytes / 1024 ** 2:.1f} MB of codes "
+          f"(float32: {vectors.nbytes / 1024 ** 2:.1f} MB)")
+
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    start = time.perf_counter()
+    exact = []
+    for query in queries:
+        scores = normed @ (query / np.linalg.norm(query))
+        top = np.argpartition(-scores, k)[:k]
+        exact.append(set(top.tolist()))
+    brute_ms = (time.perf_counter() - start) * 1000 / n_queries
+    print(f"brute force: {brute_ms:.2f} ms/query")
+
+    results = []
+    for n_candidates in candidates:
+        hits = 0
+        start = time.perf_counter()
+        for query, truth in zip(queries, exact):
+            found, _ = index.search(query, lambda positions: vectors[positions], limit=k,
+                                    candidates=n_candidates)
+            hits += len(truth & set(found))
+        ms = (time.perf_counter() - start) * 1000 / n_queries
+        result = {"candidates": n_candidates, "recall": hits / (k * n_queries),
+                  "ms_per_query": round(ms, 3)}
+        results.append(result)
+        print(f"candidates {n_candidates:>6}: recall@{k} {result['recall']:.3f}, "
+              f"{ms:.2f} ms/query")
+    return results
+
+
+def benchmark_multi_probe(n_rows=1000000, dimensions=128, query_tokens=32, limit=100,
+                          repeats=5, seed=0):
+    """Return {method: ms per late interaction query} for per-probe
+    search_nn calls and one batched search_nn_many call."""
+    from latentscope.util.embedding_store import (
+        append_embeddings,
+        create_vector_index,
+        search_nn,
+        search_nn_many,
+    )
+
+    rng = np.random.default_rng(seed)
+    results = {}
+    with tempfile.TemporaryDirectory() as data_dir:
+        os.makedirs(os.path.join(data_dir, "bench", "lancedb"))
+        start = time.perf_counter()
+        for offset in range(0, n_rows, 100000):
+            batch = synthetic_embeddings(min(100000, n_rows - offset), dimensions,
+                                         seed=seed + offset)
+            append_embeddings(data_dir, "bench", "embedding-001", batch, start_index=offset)
+        create_vector_index(data_dir, "bench", "embedding-001")
+        print(f"{n_rows} x {dimensions}: written and indexed in "
+              f"{time.perf_counter() - start:.1f}s")
+
+        probes = rng.normal(size=(query_tokens + 1, dimensions)).astype(np.float32)
+        methods = {
+            "search_nn per probe": lambda: [
+                search_nn(data_dir, "bench", "embedding-001", probe, limit=limit)
+                for probe in probes],
+            "search_nn_many": lambda: search_nn_many(
+                data_dir, "bench", "embedding-001", probes, limit=limit),
+        }
+        for name, run in methods.items():
+            run()  # warm the table handle and index caches
+            start = time.perf_counter()
+            for _ in range(repeats):
+                run()
+            results[name] = (time.perf_counter() - start) * 1000 / repeats
+            print(f"{name:>20}: {results[name]:.1f} ms per {query_tokens}-token query")
+    return results
+
+
+def benchmark_index_tuning(n_rows=100000, dimensions=384, k=10, n_queries=100,
+                           target_recall=0.95, seed=0):
+    """Return {"default": {recall, ms_per_query}, "tuned": tuning result} on
+    synthetic clustered vectors."""
+    from latentscope.util.embedding_store import (
+        _embedding_table_name,
+        _open_table,
+        append_embeddings,
+        create_vector_index,
+    )
+    from latentscope.util.index_tuning import held_out_queries, measure_recall
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        os.makedirs(os.path.join(data_dir, "bench", "lancedb"))
+        for offset in range(0, n_rows, 100000):
+            batch = synthetic_embeddings(min(100000, n_rows - offset), dimensions,
+                                         seed=seed + offset)
+            append_embeddings(data_dir, "bench", "embedding-001", batch, start_index=offset)
+        tbl = _open_table(data_dir, "bench", _embedding_table_name("embedding-001"))
+
+        config = create_vector_index(data_dir, "bench", "embedding-001")
+        ids, queries, truth = held_out_queries(tbl, k, n_queries, seed=seed)
+        recall, ms = measure_recall(tbl, ids, queries, truth, k, nprobes=20)
+        default = {"recall": round(recall, 4), "ms_per_query": round(ms, 3)}
+        print(f"default {config['num_partitions']} partitions x {config['num_sub_vectors']} "
+              f"sub-vectors: recall@{k} {recall:.3f}, {ms:.2f} ms/query")
+
+        tuned = create_vector_index(data_dir, "bench", "embedding-001", tune=True,
+                                    target_recall=target_recall, k=k, n_queries=n_queries)
+    return {"default": default, "tuned": tuned}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Recall@k of binary prefilter search vs brute force on synthetic data"
+    )
+    parser.add_argument("--rows", type=int, default=100000, help="Number of vectors")
+    parser.add_argument("--dimensions", type=int, default=384, help="Vector dimensions")
+    parser.add_argument("--k", type=int, default=10, help="Neighbors per query")
+    parser.add_argument("--queries", type=int, default=100, help="Number of queries")
+    parser.add_argument("--candidates", type=str, default="250,500,1000,2000,4000",
+                        help="Comma separated candidate counts to compare")
+    parser.add_argument("--multi_probe", action="store_true",
+                        help="Time late interaction candidate search instead")
+    parser.add_argument("--query_tokens", type=int, default=32,
+                        help="Query tokens per late interaction query (--multi_probe)")
+    parser.add_argument("--tune", action="store_true",
+                        help="Compare the default vector index with a recall-tuned one")
+    parser.add_argument("--target_recall", type=float, default=0.95,
+                        help="Recall@k the tuned index must reach (--tune)")
+    args = parser.parse_args()
+    if args.tune:
+        benchmark_index_tuning(args.rows, args.dimensions, args.k, args.queries,
+                               args.target_recall)
+        return
+    if args.multi_probe:
+        benchmark_multi_probe(args.rows, args.dimensions, args.query_tokens)
+        return
+    benchmark_binary_search(args.rows, args.dimensions, k=args.k,
+                            candidates=[int(c) for c in args.candidates.split(",")],
+                            n_queries=args.queries)
+
+
+if __name__ == "__main__":
+    main()
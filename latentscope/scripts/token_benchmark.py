@@ -0,0 +1,252 @@
+# Usage: ls-token-benchmark [--docs 10000] [--tokens 100] [--dimensions 128]
+#        ls-token-benchmark --index [--docs 20000] [--tokens 50]
+#        ls-token-benchmark --rerank [--tokens 100]
+#
+# Throughput of streaming every token vector of a late interaction table
+# (iter_token_vectors, a sequential Lance scan) against the per-batch
+# `ls_index >= a AND ls_index < b` filter queries it replaced, on a synthetic
+# table of docs x tokens float16 token vectors written to a temp directory.
+# Vectors are kept float16 by default so the numbers measure reading, not the
+# upcast both paths share (--float32 to include it).
+#
+# --index instead measures late interaction retrieval: recall@k against
+# exact MaxSim over every document, and latency, for the mean-vector
+# candidate search and for the token-level (PLAID-style) index. Documents
+# draw tokens from a Zipf-distributed vocabulary; queries are a few of one
+# document's rarest tokens, which a mean vector dilutes.
+#
+# --rerank times the MaxSim rerank of late interaction search on 200 to 5000
+# candidates: the per-document loop it used to run against maxsim_scores on
+# one float16 token buffer.
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from latentscope.util.embedding_store import (
+    _connect,
+    _embedding_table_name,
+    _token_matrix,
+    append_embeddings,
+    build_token_index,
+    iter_token_vectors,
+    load_token_vectors,
+    search_late_interaction,
+    split_token_matrix,
+)
+from latentscope.util.token_index import maxsim_scores
+
+
+def write_synthetic_tokens(data_dir, dataset_id, embedding_id, n_docs, mean_tokens, dimensions,
+                           batch_size=1000, seed=0):
+    """Write n_docs documents of ~mean_tokens random token vectors each;
+    returns the total number of tokens."""
+    rng = np.random.default_rng(seed)
+    os.makedirs(os.path.join(data_dir, dataset_id, "lancedb"), exist_ok=True)
+    total = 0
+    for start in range(0, n_docs, batch_size):
+        n = min(batch_size, n_docs - start)
+        lengths = rng.integers(mean_tokens // 2, mean_tokens * 3 // 2 + 1, size=n)
+        tokens = [rng.normal(size=(int(t), dimensions)).astype(np.float32) for t in lengths]
+        append_embeddings(data_dir, dataset_id, embedding_id,
+                          rng.normal(size=(n, dimensions)).astype(np.float32),
+                          start_index=start, token_vectors_list=tokens)
+        total += int(lengths.sum())
+    return total
+
+
+def _filter_query_batches(data_dir, dataset_id, embedding_id, row_batch_size, dtype=None):
+    """The old iter_token_vectors: one filtered query per batch of documents."""
+    tbl = _connect(data_dir, dataset_id).open_table(_embedding_table_name(embedding_id))
+    n = tbl.count_rows()
+    for start in range(0, n, row_batch_size):
+        stop = min(start + row_batch_size, n)
+        data = (tbl.search().where(f"ls_index >= {start} AND ls_index < {stop}")
+                .select(["ls_index", "token_vectors"]).limit(stop - start).to_arrow())
+        yield _token_matrix(data.sort_by("ls_index")["token_vectors"], dtype)[0]
+
+
+def benchmark_token_streaming(n_docs=10000, mean_tokens=100, dimensions=128, row_batch_size=256,
+                              batch_bytes=None, dtype=None):
+    """Return {method: tokens_per_second} for the scanner and filter queries."""
+    results = {}
+    with tempfile.TemporaryDirectory() as data_dir:
+        start = time.perf_counter()
+        n_tokens = write_synthetic_tokens(data_dir, "bench", "embedding-001", n_docs,
+                                          mean_tokens, dimensions)
+        print(f"wrote {n_docs} docs / {n_tokens} tokens x {dimensions} "
+              f"in {time.perf_counter() - start:.1f}s")
+
+        methods = {
+            "scan": lambda: (matrix for _, matrix, _ in iter_token_vectors(
+                data_dir, "bench", "embedding-001", row_batch_size=row_batch_size,
+                flat=True, batch_bytes=batch_bytes, dtype=dtype)),
+            "filter_queries": lambda: _filter_query_batches(
+                data_dir, "bench", "embedding-001", row_batch_size, dtype),
+        }
+        for name, batches in methods.items():
+            start = time.perf_counter()
+            seen = sum(len(matrix) for matrix in batches())
+            seconds = time.perf_counter() - start
+            assert seen == n_tokens, f"{name} streamed {seen} of {n_tokens} tokens"
+            results[name] = n_tokens / seconds
+            print(f"{name:>15}: {seconds:.2f}s, {results[name]:,.0f} tokens/s")
+    return results
+
+
+def write_synthetic_corpus(data_dir, dataset_id, embedding_id, n_docs, mean_tokens, dimensions,
+                           vocabulary=5000, batch_size=1000, seed=0):
+    """Late interaction documents whose tokens are Zipf-distributed terms
+    plus noise; returns (term vectors, each document's term ids)."""
+    rng = np.random.default_rng(seed)
+    terms = rng.normal(size=(vocabulary, dimensions)).astype(np.float32)
+    terms /= np.linalg.norm(terms, axis=1, keepdims=True)
+    frequency = 1.0 / np.arange(1, vocabulary + 1)
+    frequency /= frequency.sum()
+    os.makedirs(os.path.join(data_dir, dataset_id, "lancedb"), exist_ok=True)
+    doc_terms = []
+    for start in range(0, n_docs, batch_size):
+        n = min(batch_size, n_docs - start)
+        tokens = []
+        for length in rng.integers(mean_tokens // 2, mean_tokens * 3 // 2 + 1, size=n):
+            ids = rng.choice(vocabulary, size=int(length), p=frequency)
+            doc_terms.append(ids)
+            noise = rng.normal(scale=0.3 / np.sqrt(dimensions), size=(len(ids), dimensions))
+            tokens.append((terms[ids] + noise).astype(np.float32))
+        means = np.stack([t.mean(axis=0) for t in tokens])
+        append_embeddings(data_dir, dataset_id, embedding_id, means, start_index=start,
+                          token_vectors_list=tokens)
+    return terms, doc_terms
+
+
+def exact_maxsim_topk(matrix, offsets, query, k):
+    """Top-k documents by exact MaxSim over the whole corpus."""
+    q = query / np.linalg.norm(query, axis=1, keepdims=True)
+    normed = matrix / (np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-10)
+    scores = np.maximum.reduceat(q @ normed.T, offsets[:-1], axis=1).sum(axis=0)
+    return np.argsort(-scores, kind="stable")[:k]
+
+
+def benchmark_token_index(n_docs=20000, mean_tokens=50, dimensions=128, n_queries=50,
+                          query_tokens=4, k=10, num_centroids=None, nprobe=None, seed=0):
+    """Return {method: {"recall": recall@k, "ms_per_query": ...}} for the
+    mean-vector candidates and the token index."""
+    rng = np.random.default_rng(seed + 1)
+    results = {}
+    with tempfile.TemporaryDirectory() as data_dir:
+        start = time.perf_counter()
+        terms, doc_terms = write_synthetic_corpus(data_dir, "bench", "embedding-001", n_docs,
+                                                  mean_tokens, dimensions, seed=seed)
+        print(f"wrote {n_docs} docs in {time.perf_counter() - start:.1f}s")
+        build_token_index(data_dir, "bench", "embedding-001", num_centroids=num_centroids)
+
+        # Queries: the rarest terms of random documents, plus noise
+        queries = []
+        for doc in rng.choice(n_docs, size=n_queries, replace=False):
+            rare = np.unique(doc_terms[doc])[-query_tokens:]
+            noise = rng.normal(scale=0.3 / np.sqrt(dimensions), size=(len(rare), dimensions))
+            queries.append((terms[rare] + noise).astype(np.float32))
+        matrix, offsets = load_token_vectors(data_dir, "bench", "embedding-001", flat=True)
+        truth = [set(exact_maxsim_topk(matrix, offsets, q, k).tolist()) for q in queries]
+
+        for name, use_index in (("mean vectors", False), ("token index", True)):
+            search_late_interaction(data_dir, "bench", "embedding-001", queries[0],
+                                    final_limit=k, use_token_index=use_index)
+            hits = 0
+            start = time.perf_counter()
+            for query, expected in zip(queries, truth):
+                found, _ = search_late_interaction(data_dir, "bench", "embedding-001", query,
+                                                   final_limit=k, use_token_index=use_index,
+                                                   nprobe=nprobe)
+                hits += len(expected & set(found))
+            ms = (time.perf_counter() - start) * 1000 / n_queries
+            results[name] = {"recall": hits / (k * n_queries), "ms_per_query": round(ms, 2)}
+            print(f"{name:>13}: recall@{k} {results[name]['recall']:.3f}, {ms:.1f} ms/query")
+    return results
+
+
+def _loop_maxsim(query, token_vectors_list):
+    """The old rerank: normalize and score each document separately."""
+    q_norm = query / (np.linalg.norm(query, axis=1, keepdims=True) + 1e-10)
+    scores = []
+    for doc_tokens in token_vectors_list:
+        if len(doc_tokens) == 0:
+            scores.append(0.0)
+            continue
+        d_norm = doc_tokens / (np.linalg.norm(doc_tokens, axis=1, keepdims=True) + 1e-10)
+        scores.append(float((q_norm @ d_norm.T).max(axis=1).sum()))
+    return scores
+
+
+def benchmark_maxsim_rerank(candidates=(200, 500, 1000, 2000, 5000), mean_tokens=100,
+                            dimensions=128, query_tokens=32, repeats=5, seed=0):
+    """Return [{candidates, loop_ms, batched_ms}]: MaxSim rerank latency of
+    the per-document loop and of maxsim_scores. Both start from the float16
+    buffer of unit-norm tokens a candidate load returns; the loop's timing
+    includes the float32 upcast its load used to do."""
+    rng = np.random.default_rng(seed)
+    query = rng.normal(size=(query_tokens, dimensions)).astype(np.float32)
+    results = []
+    for n in candidates:
+        lengths = rng.integers(mean_tokens // 2, mean_tokens * 3 // 2 + 1, size=n)
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        matrix = rng.normal(size=(int(offsets[-1]), dimensions)).astype(np.float32)
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+        buffer = matrix.astype(np.float16)
+
+        methods = {
+            "loop_ms": lambda: _loop_maxsim(
+                query, split_token_matrix(buffer.astype(np.float32), offsets)),
+            "batched_ms": lambda: maxsim_scores(query, buffer, offsets),
+        }
+        timings = {}
+        for name, run in methods.items():
+            run()
+            start = time.perf_counter()
+            for _ in range(repeats):
+                run()
+            timings[name] = round((time.perf_counter() - start) * 1000 / repeats, 2)
+        np.testing.assert_allclose(methods["batched_ms"](), methods["loop_ms"](), atol=1e-3)
+        results.append({"candidates": n, **timings})
+        print(f"{n:>5} candidates: loop {timings['loop_ms']:.1f} ms, "
+              f"maxsim_scores {timings['batched_ms']:.1f} ms")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Token vector streaming throughput: Lance scan vs filter queries"
+    )
+    parser.add_argument("--docs", type=int, default=10000, help="Number of documents")
+    parser.add_argument("--tokens", type=int, default=100, help="Mean tokens per document")
+    parser.add_argument("--dimensions", type=int, default=128, help="Token vector dimensions")
+    parser.add_argument("--row_batch_size", type=int, default=256, help="Documents per batch")
+    parser.add_argument("--batch_bytes", type=int, default=None,
+                        help="Size scan batches by bytes of token vectors instead")
+    parser.add_argument("--float32", action="store_true",
+                        help="Include the float16 -> float32 upcast in the timings")
+    parser.add_argument("--index", action="store_true",
+                        help="Benchmark token index retrieval instead of streaming")
+    parser.add_argument("--centroids", type=int, default=None,
+                        help="Token index centroids (--index)")
+    parser.add_argument("--nprobe", type=int, default=None,
+                        help="Centroids probed per query token (--index)")
+    parser.add_argument("--rerank", action="store_true",
+                        help="Benchmark the MaxSim rerank instead of streaming")
+    args = parser.parse_args()
+    if args.rerank:
+        benchmark_maxsim_rerank(mean_tokens=args.tokens, dimensions=args.dimensions)
+        return
+    if args.index:
+        benchmark_token_index(args.docs, args.tokens, args.dimensions,
+                              num_centroids=args.centroids, nprobe=args.nprobe)
+        return
+    benchmark_token_streaming(args.docs, args.tokens, args.dimensions, args.row_batch_size,
+                              args.batch_bytes, np.float32 if args.float32 else None)
+
+
+if __name__ == "__main__":
+    main()
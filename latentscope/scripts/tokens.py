@@ -54,6 +54,7 @@ def tokenizer(dataset_id, embedding_id, batch_size=500):
         drop_token_metadata,
         load_num_tokens,
     )
+    from latentscope.util.parquet_stream import count_rows, iter_column_chunks
 
     text_column = emb_meta["text_column"]
     prefix = emb_meta.get("prefix") or ""
@@ -62,10 +63,11 @@ def tokenizer(dataset_id, embedding_id, batch_size=500):
     print("loading document token counts")
     num_tokens = load_num_tokens(DATA_DIR, dataset_id, embedding_id)
 
-    df = pd.read_parquet(
-        os.path.join(DATA_DIR, dataset_id, "input.parquet"), columns=[text_column])
-    if len(df) != len(num_tokens):
-        print(f"Row count mismatch: input.parquet has {len(df)} rows but the "
+    # Stream the text column batch by batch rather than loading input.parquet
+    input_path = os.path.join(DATA_DIR, dataset_id, "input.parquet")
+    n_rows = count_rows(input_path)
+    if n_rows != len(num_tokens):
+        print(f"Row count mismatch: input.parquet has {n_rows} rows but the "
               f"embedding has {len(num_tokens)}. Was the dataset re-ingested "
               "after embedding?")
         sys.exit(1)
@@ -96,13 +98,11 @@ def tokenizer(dataset_id, embedding_id, batch_size=500):
     prefix_len = len(prefix)
     token_index = 0
     mismatches = []
-    total_batches = (len(df) + batch_size - 1) // batch_size
+    total_batches = (n_rows + batch_size - 1) // batch_size
 
-    texts = df[text_column]
-    for b in tqdm(range(total_batches)):
-        start_row = b * batch_size
-        end_row = min(start_row + batch_size, len(df))
-        raw = [prep(texts.iloc[i]) for i in range(start_row, end_row)]
+    chunks = iter_column_chunks(input_path, text_column, batch_size)
+    for start_row, values in tqdm(chunks, total=total_batches):
+        raw = [prep(s) for s in values]
         batch_tokens = model.tokenize_documents([prefix + s for s in raw])
 
         ls_indices, token_pos, token_strs, char_starts, char_ends = [], [], [], [], []
@@ -165,15 +165,15 @@ def tokenizer(dataset_id, embedding_id, batch_size=500):
         "text_column": text_column,
         "prefix": prefix,
         "total_tokens": token_index,
-        "rows": len(df),
-        "avg_tokens_per_row": round(token_index / max(len(df), 1), 2),
+        "rows": n_rows,
+        "avg_tokens_per_row": round(token_index / max(n_rows, 1), 2),
     }
     with open(os.path.join(DATA_DIR, dataset_id, "embeddings",
                            f"{embedding_id}-tokens.json"), "w") as f:
         json.dump(tokens_meta, f, indent=2)
 
     written = count_token_metadata(DATA_DIR, dataset_id, embedding_id)
-    print(f"done: {written} tokens across {len(df)} documents")
+    print(f"done: {written} tokens across {n_rows} documents")
 
 
 if __name__ == "__main__":
@@ -31,9 +31,22 @@ def main():
     parser.add_argument('--granularity', type=str, choices=['rows', 'tokens'], default='rows',
                         help='Project one point per dataset row (default) or one point per '
                              'token of a late-interaction embedding (requires ls-tokenize)')
-    parser.add_argument('--fit_sample', type=int, default=1_000_000,
-                        help='Token granularity only: max tokens the reducer is fit on; '
-                             'the rest are batch-transformed through the fitted reducer')
+    parser.add_argument('--fit_sample', '--fit-sample', dest='fit_sample', type=int, default=None,
+                        help='Fit the reducer on at most this many rows (tokens with '
+                             '--granularity tokens, default 1000000) and stream the rest '
+                             'through it in batches, for embeddings too large for memory')
+    parser.add_argument('--fit_strategy', type=str, choices=['random', 'stratified'],
+                        default='random',
+                        help='How --fit_sample rows are picked: uniformly at random, or one '
+                             'from each of fit_sample equal slices of the rows')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Token granularity only: processes transforming the tokens '
+                             'the reducer was not fit on (default: 4). Each loads its own '
+                             'copy of the reducer, about the size of the fit sample '
+                             '(~512 MB per 1M tokens at 128 dimensions) plus its kNN graph')
+    parser.add_argument('--no_knn_cache', action='store_true',
+                        help="Compute the kNN graph for this run instead of reusing the "
+                             "embedding's stored one")
     parser.add_argument('--name', type=str, help='Human-friendly name for this umap', default=None)
     parser.add_argument('--description', type=str, help='Free-text description for this umap',
                         default=None)
@@ -50,8 +63,8 @@ def main():
             parser.error("--granularity tokens cannot be combined with "
                          "--align/--init/--sae_id/--register-to/--transform-from")
         token_umapper(args.dataset_id, args.embedding_id, args.neighbors, args.min_dist,
-                      seed=seed, fit_sample=args.fit_sample, save=args.save,
-                      name=args.name, description=args.description)
+                      seed=seed, fit_sample=args.fit_sample or 1_000_000, save=args.save,
+                      name=args.name, description=args.description, workers=args.workers)
     elif args.transform_from:
         if args.align or args.init or args.save or args.sae_id or args.register_to:
             parser.error("--transform-from cannot be combined with "
@@ -69,80 +82,29 @@ def main():
     else:
         umapper(args.dataset_id, args.embedding_id, args.neighbors, args.min_dist, save=args.save,
                 init=args.init, align=args.align, seed=seed, register_to=args.register_to,
-                name=args.name, description=args.description, dimensions=args.dimensions)
+                name=args.name, description=args.description, dimensions=args.dimensions,
+                knn_cache=not args.no_knn_cache, fit_sample=args.fit_sample,
+                fit_strategy=args.fit_strategy)
 
 
-# TODO move this into shared space
-def calculate_point_size(num_points, min_size=10, max_size=30, base_num_points=100):
-    import numpy as np
-    """
-    Calculate the size of points for a scatter plot based on the number of points.
-    """
-    # TODO fix this to actually calculate a log scale between min and max size
-    if num_points <= base_num_points:
-        return max_size
-    else:
-        return min(min_size + min_size * np.log(num_points / base_num_points), max_size)
+def _save_umap_preview(umap_embeddings, out_path, dimensions=2, point_size=None):
+    """Render the gallery thumbnail PNG for a umap run (1024x1024, axis-free,
+    filling the frame; see latentscope.util.preview).
 
-def _save_umap_preview(umap_embeddings, out_path, dimensions=2):
-    """Render the gallery thumbnail PNG for a umap run.
-
-    2D umaps get the classic flat scatter (unchanged). 3D umaps (``dimensions``
-    >= 3, with a z column) get a matplotlib 3D scatter with subtle depth cueing:
-    points are drawn back-to-front and their size / opacity / lightness fall off
-    with distance from the camera so the projection reads as a volume rather than
-    a flat blob. Output is 1024x1024 at 72 dpi, axis-free, filling the frame.
+    2D umaps get the classic flat scatter. 3D umaps (``dimensions`` >= 3, with
+    a z column) get a depth-cued projection: points are drawn back-to-front
+    and their size / opacity / lightness fall off with distance from the
+    camera so the projection reads as a volume rather than a flat blob.
     """
-    import math
-
-    import matplotlib.pyplot as plt
-    import numpy as np
-
-    point_size = calculate_point_size(umap_embeddings.shape[0])
+    from latentscope.util.preview import calculate_point_size, render_points, render_points_3d
 
+    if point_size is None:
+        point_size = calculate_point_size(umap_embeddings.shape[0])
     if dimensions >= 3 and umap_embeddings.shape[1] >= 3:
-        x = umap_embeddings[:, 0]
-        y = umap_embeddings[:, 1]
-        z = umap_embeddings[:, 2]
-        fig = plt.figure(figsize=(14.22, 14.22))  # 1024px at 72 dpi
-        ax = fig.add_subplot(111, projection='3d')
-        elev, azim = 22, -60
-        ax.view_init(elev=elev, azim=azim)
-        # Unit vector from the scene toward the camera (matplotlib elev/azim
-        # convention) -> a per-point depth scalar for the cueing ramp.
-        e, a = math.radians(elev), math.radians(azim)
-        cam = np.array([math.cos(e) * math.cos(a),
-                        math.cos(e) * math.sin(a),
-                        math.sin(e)])
-        depth = x * cam[0] + y * cam[1] + z * cam[2]
-        dmin, dmax = float(depth.min()), float(depth.max())
-        t = (depth - dmin) / (dmax - dmin) if dmax > dmin else np.zeros_like(depth)
-        order = np.argsort(depth)  # far first, near points drawn on top
-        base = float(np.clip(point_size, 4, 16))
-        sizes = base * (0.4 + 0.9 * t)
-        colors = plt.cm.viridis(0.12 + 0.72 * t)
-        colors[:, 3] = 0.25 + 0.55 * t  # nearer points more opaque
-        ax.scatter(x[order], y[order], z[order], s=sizes[order], c=colors[order],
-                   edgecolors='none', depthshade=False)
-        ax.set_axis_off()
-        try:
-            ax.set_box_aspect((1, 1, 1))
-        except Exception:
-            pass
-        # Overscan the axes so the projected cloud fills the thumbnail instead
-        # of floating in the middle of the 3D axes' bounding cube.
-        ax.set_position([-0.18, -0.18, 1.36, 1.36])
-        fig.savefig(out_path, dpi=72)
-        plt.close(fig)
+        render_points_3d(umap_embeddings, out_path, point_size=point_size)
         return
-
-    fig, ax = plt.subplots(figsize=(14.22, 14.22))  # 1024px by 1024px at 72 dpi
     print("POINT SIZE", point_size, "for", umap_embeddings.shape[0], "points")
-    ax.scatter(umap_embeddings[:, 0], umap_embeddings[:, 1], s=point_size, alpha=0.5)
-    ax.axis('off')  # remove axis
-    ax.set_position([0, 0, 1, 1])  # remove margins
-    fig.savefig(out_path)
-    plt.close(fig)
+    render_points(umap_embeddings, out_path, point_size=point_size)
 
 
 def load_embeddings(dataset_id, embedding_id):
@@ -172,8 +134,10 @@ def load_embeddings(dataset_id, embedding_id):
         # Use LanceDB-backed store (with HDF5 fallback)
         return lance_load_embeddings(DATA_DIR, dataset_id, embedding_id)
 
-def _make_cpu_reducer(neighbors, min_dist, seed, init_array=None, n_components=2):
-    """Build a CPU umap-learn reducer with our canonical params."""
+def _make_cpu_reducer(neighbors, min_dist, seed, init_array=None, n_components=2, knn=None):
+    """Build a CPU umap-learn reducer with our canonical params. `knn` is a
+    precomputed (indices, distances) cosine kNN graph with `neighbors`
+    columns (see latentscope.util.knn_graph)."""
     import umap
 
     kwargs = dict(
@@ -186,6 +150,8 @@ def _make_cpu_reducer(neighbors, min_dist, seed, init_array=None, n_components=2
     )
     if init_array is not None:
         kwargs['init'] = init_array
+    if knn is not None:
+        kwargs['precomputed_knn'] = knn
     return umap.UMAP(**kwargs)
 
 
@@ -225,13 +191,15 @@ def _to_numpy(arr):
     return np.asarray(arr)
 
 
-def _reduce_umap(embeddings, neighbors, min_dist, seed, use_cuml, init_array=None, n_components=2):
+def _reduce_umap(embeddings, neighbors, min_dist, seed, use_cuml, init_array=None, n_components=2,
+                 knn=None):
     """Fit-transform embeddings to ``n_components`` dims, preferring cuML when requested.
 
     Returns (umap_embeddings, reducer). On the GPU path the fitted cuML reducer
     is returned too (callers only pickle CPU reducers). If cuML construction or
     fit raises, we log a clear message and fall back to CPU umap-learn so a run
-    never dies on the GPU path. Array warm-start (init_array) is CPU-only.
+    never dies on the GPU path. Array warm-start (init_array) is CPU-only, and
+    so is the precomputed kNN graph `knn`.
     """
     if use_cuml and init_array is None:
         try:
@@ -246,7 +214,8 @@ def _reduce_umap(embeddings, neighbors, min_dist, seed, use_cuml, init_array=Non
     elif use_cuml and init_array is not None:
         print("umapper: warm-start init has no cuML equivalent; using CPU umap-learn")
 
-    reducer = _make_cpu_reducer(neighbors, min_dist, seed, init_array, n_components=n_components)
+    reducer = _make_cpu_reducer(neighbors, min_dist, seed, init_array, n_components=n_components,
+                                knn=knn)
     print("umapper: reducing with CPU umap-learn UMAP (metric=cosine)")
     sys.stdout.flush()
     umap_embeddings = reducer.fit_transform(embeddings)
@@ -427,7 +396,17 @@ def transform_umap(dataset_id, embedding_id, transform_from, name=None, descript
 
 
 def umapper(dataset_id, embedding_id, neighbors=25, min_dist=0.1, save=False, init=None, align=None,
-            seed=None, register_to=None, name=None, description=None, dimensions=2):
+            seed=None, register_to=None, name=None, description=None, dimensions=2,
+            knn_cache=True, fit_sample=None, fit_strategy="random"):
+    # --fit_sample: embeddings with more rows than that are fit on landmarks
+    # and streamed through the reducer instead of loaded whole
+    if fit_sample and _embedding_rows(dataset_id, embedding_id) > fit_sample:
+        if init or align or register_to:
+            raise ValueError("--fit_sample cannot be combined with --init/--align/--register-to")
+        return landmark_umapper(dataset_id, embedding_id, neighbors, min_dist, fit_sample,
+                                fit_strategy=fit_strategy, seed=seed, save=save, name=name,
+                                description=description, dimensions=dimensions)
+
     DATA_DIR = get_data_dir()
     # read in the embeddings
 
@@ -444,7 +423,6 @@ def umapper(dataset_id, embedding_id, neighbors=25, min_dist=0.1, save=False, in
     import pickle
 
     import h5py
-    import matplotlib.pyplot as plt
     import numpy as np
     import pandas as pd
     import umap
@@ -663,9 +641,19 @@ def umapper(dataset_id, embedding_id, neighbors=25, min_dist=0.1, save=False, in
         print("umapper: --save pickles a CPU reducer; running CPU umap-learn")
     print("reducing", embeddings.shape[1], "embeddings to", dimensions, "dimensions")
 
+    # The kNN graph is shared by every CPU run on this embedding (see
+    # latentscope.util.knn_graph). Not with --save: a reducer fit on a
+    # precomputed graph has no search index, so it can't --transform-from.
+    knn = None
+    if knn_cache and not save and not (use_cuml and init_array is None) \
+            and isinstance(embeddings, np.ndarray):
+        from latentscope.util.knn_graph import get_knn_graph
+        knn = get_knn_graph(DATA_DIR, dataset_id, embedding_id, embeddings, neighbors,
+                            seed=seed)
+
     umap_embeddings, reducer = _reduce_umap(
         embeddings, neighbors, min_dist, seed, use_cuml, init_array=init_array,
-        n_components=dimensions
+        n_components=dimensions, knn=knn
     )
     process_umap_embeddings(umap_id, umap_embeddings, embedding_id)
 
@@ -676,17 +664,488 @@ def umapper(dataset_id, embedding_id, neighbors=25, min_dist=0.1, save=False, in
 
     print("done with", umap_id)
 
+
+def _peak_rss_mb():
+    """Peak resident set size of this process in MB (None where the
+    resource module is unavailable, i.e. Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes on Linux
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _embedding_rows(dataset_id, embedding_id):
+    """Row count of an embedding without loading it (LanceDB or legacy HDF5)."""
+    from latentscope.util.embedding_store import get_embedding_count
+    DATA_DIR = get_data_dir()
+    count = get_embedding_count(DATA_DIR, dataset_id, embedding_id)
+    emb_path = os.path.join(DATA_DIR, dataset_id, "embeddings", f"{embedding_id}.h5")
+    if count == 0 and os.path.exists(emb_path):
+        import h5py
+        with h5py.File(emb_path, 'r') as f:
+            count = f["embeddings"].shape[0]
+    return count
+
+
+def _landmark_positions(total, fit_sample, strategy, seed):
+    """Sorted row positions of the fit set: a uniform random sample, or
+    ("stratified") one random row from each of `fit_sample` equal slices of
+    the rows, so every stretch of the dataset is represented."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed if seed is not None else 0)
+    if strategy == "stratified":
+        edges = np.linspace(0, total, fit_sample + 1).astype(np.int64)
+        return edges[:-1] + (rng.random(fit_sample) * np.diff(edges)).astype(np.int64)
+    return np.sort(rng.choice(total, size=fit_sample, replace=False))
+
+
+def landmark_umapper(dataset_id, embedding_id, neighbors=25, min_dist=0.1, fit_sample=100_000,
+                     fit_strategy="random", seed=None, save=False, name=None, description=None,
+                     dimensions=2, batch_size=65536):
+    """ls-umap --fit_sample: UMAP an embedding too large to hold in memory.
+
+    The reducer is fit on `fit_sample` landmark rows (see _landmark_positions),
+    then the remaining rows are streamed through reducer.transform
+    `batch_size` at a time with iter_embeddings. Raw coordinates go to a
+    scratch memmap next to the umap (8-12 bytes a row); once their min/max is
+    known they are normalized and written to the parquet one row group at a
+    time. Only the landmarks and one batch of vectors are ever resident; the
+    peak RSS is recorded in the meta as peak_rss_mb.
+    """
+    import pickle
+
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    from latentscope.util.embedding_store import iter_embeddings
+
+    DATA_DIR = get_data_dir()
+    umap_dir = os.path.join(DATA_DIR, dataset_id, "umaps")
+    if not os.path.exists(umap_dir):
+        os.makedirs(umap_dir)
+    umap_id = _next_umap_id(umap_dir)
+    print("RUNNING:", umap_id, f"(fit_sample={fit_sample}, {fit_strategy})")
+
+    total = _embedding_rows(dataset_id, embedding_id)
+    fit_sample = min(fit_sample, total)
+    landmarks = _landmark_positions(total, fit_sample, fit_strategy, seed)
+    print(f"fitting on {fit_sample} of {total} rows, then transforming the rest")
+
+    parts = []
+    position = 0
+    for _, vectors in iter_embeddings(DATA_DIR, dataset_id, embedding_id, batch_size):
+        lo, hi = np.searchsorted(landmarks, [position, position + len(vectors)])
+        if hi > lo:
+            parts.append(vectors[landmarks[lo:hi] - position])
+        position += len(vectors)
+    fit_matrix = np.concatenate(parts)
+    parts = None
+
+    # the transform needs the reducer's own search index, so the stored kNN
+    # graph (which is of the whole embedding anyway) isn't used here
+    from latentscope.util.device import resolve_device
+    res = resolve_device()
+    use_cuml = res.use_cuml and not save
+    if res.use_cuml and save:
+        print("umapper: --save pickles a CPU reducer; running CPU umap-learn")
+    landmark_coords, reducer = _reduce_umap(fit_matrix, neighbors, min_dist, seed, use_cuml,
+                                            n_components=dimensions)
+    landmark_coords = _to_numpy(landmark_coords).astype(np.float32)
+    fit_matrix = None
+
+    scratch_path = os.path.join(umap_dir, f"{umap_id}.coords.tmp")
+    coords = np.lib.format.open_memmap(scratch_path, mode="w+", dtype=np.float32,
+                                       shape=(total, dimensions))
+    try:
+        min_values = np.full(dimensions, np.inf, dtype=np.float32)
+        max_values = np.full(dimensions, -np.inf, dtype=np.float32)
+        position = 0
+        for _, vectors in iter_embeddings(DATA_DIR, dataset_id, embedding_id, batch_size):
+            stop = position + len(vectors)
+            lo, hi = np.searchsorted(landmarks, [position, stop])
+            chunk = np.empty((len(vectors), dimensions), dtype=np.float32)
+            # landmarks keep their fitted positions
+            is_landmark = np.zeros(len(vectors), dtype=bool)
+            is_landmark[landmarks[lo:hi] - position] = True
+            chunk[is_landmark] = landmark_coords[lo:hi]
+            if not is_landmark.all():
+                chunk[~is_landmark] = _to_numpy(reducer.transform(vectors[~is_landmark]))
+            coords[position:stop] = chunk
+            min_values = np.minimum(min_values, chunk.min(axis=0))
+            max_values = np.maximum(max_values, chunk.max(axis=0))
+            print(f"transformed {stop} of {total} rows")
+            sys.stdout.flush()
+            position = stop
+        assert position == total, f"projected {position} rows, expected {total}"
+
+        print("writing normalized umap", umap_id)
+        columns = _umap_columns(dimensions)
+        output_file = os.path.join(umap_dir, f"{umap_id}.parquet")
+        schema = pa.schema([(c, pa.float32()) for c in columns])
+        with pq.ParquetWriter(output_file, schema) as writer:
+            for start in range(0, total, batch_size):
+                # Scale the embeddings to the range [-1, 1], in place so the
+                # preview below reads the normalized layout
+                block = coords[start:start + batch_size]
+                block[:] = 2 * (block - min_values) / (max_values - min_values) - 1
+                writer.write_table(pa.table(
+                    {c: block[:, i] for i, c in enumerate(columns)}, schema=schema))
+        print("wrote", output_file)
+        coords.flush()
+        _save_umap_preview(coords, os.path.join(umap_dir, f"{umap_id}.png"),
+                           dimensions=dimensions)
+    finally:
+        del coords
+        os.remove(scratch_path)
+
+    with open(os.path.join(umap_dir, f'{umap_id}.json'), 'w') as f:
+        meta = {
+            "id": umap_id,
+            "embedding_id": embedding_id,
+            "neighbors": neighbors,
+            "min_dist": min_dist,
+            "dimensions": dimensions,
+            "min_values": min_values.tolist(),
+            "max_values": max_values.tolist(),
+            "fit_sample": int(fit_sample),
+            "fit_strategy": fit_strategy,
+            "total_rows": int(total),
+            "peak_rss_mb": _peak_rss_mb(),
+        }
+        if name is not None:
+            meta["name"] = name
+        if description is not None:
+            meta["description"] = description
+        json.dump(meta, f, indent=2)
+
+    if save:
+        with open(os.path.join(umap_dir, f'{umap_id}.pkl'), 'wb') as f:
+            pickle.dump(reducer, f)
+
+    print("done with", umap_id, f"(peak RSS {meta['peak_rss_mb']} MB)")
+    return umap_id
+
+
+def sweep():
+    parser = argparse.ArgumentParser(
+        description='UMAP an embedding for every combination of neighbors, min_dist and '
+                    'dimensions, sharing the neighbour graph between runs')
+    parser.add_argument('dataset_id', type=str, help='Dataset name (directory name in data/)')
+    parser.add_argument('embedding_id', type=str, help='Name of embedding model to use')
+    parser.add_argument('--neighbors', type=int, nargs='+', default=[25],
+                        help='n_neighbors values to try')
+    parser.add_argument('--min_dist', type=float, nargs='+', default=[0.075],
+                        help='min_dist values to try')
+    parser.add_argument('--dimensions', type=int, nargs='+', default=[2],
+                        help='Output dimensions to try (2 or 3)')
+    parser.add_argument('--seed', type=int, help='Random seed', default=None)
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Parallel layout processes (default: number of CPUs)')
+    parser.add_argument('--no_knn_cache', action='store_true',
+                        help="Compute the kNN graph for this sweep instead of reusing the "
+                             "embedding's stored one")
+    args = parser.parse_args()
+    seed = None if args.seed == -1 else args.seed
+    umap_sweep(args.dataset_id, args.embedding_id, args.neighbors, args.min_dist,
+               args.dimensions, seed=seed, workers=args.workers,
+               knn_cache=not args.no_knn_cache)
+
+
+def _next_sweep_id(sweep_dir):
+    numbers = [int(m.group(1)) for m in
+               (re.match(r"sweep-(\d+)\.json$", f) for f in os.listdir(sweep_dir)) if m]
+    return f"sweep-{max(numbers, default=0) + 1:03d}"
+
+
+def _sweep_layout(params):
+    """Worker for ls-umap-sweep: run UMAP's layout optimization for one grid
+    point from the shared fuzzy graph and spectral init, then write it as a
+    normal umap-NNN (parquet, preview, meta)."""
+    import time
+
+    import numpy as np
+    import pandas as pd
+    import scipy.sparse
+    from sklearn.utils import check_random_state
+    from umap.umap_ import find_ab_params, simplicial_set_embedding
+
+    start = time.perf_counter()
+    graph = scipy.sparse.load_npz(params["graph_path"])
+    init = np.load(params["init_path"])
+    a, b = find_ab_params(1.0, params["min_dist"])
+    seed = params["seed"]
+    # the arguments umap.UMAP.fit passes with its default settings
+    umap_embeddings, _ = simplicial_set_embedding(
+        None, graph, params["dimensions"], 1.0, a, b, 1.0, 5, None, init,
+        check_random_state(seed), "cosine", {}, False, {}, False, parallel=seed is None)
+    layout_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    umap_id = params["umap_id"]
+    umap_dir = params["umap_dir"]
+    min_values = np.min(umap_embeddings, axis=0)
+    max_values = np.max(umap_embeddings, axis=0)
+    # Scale the embeddings to the range [-1, 1]
+    umap_embeddings = 2 * (umap_embeddings - min_values) / (max_values - min_values) - 1
+    df = pd.DataFrame(umap_embeddings, columns=_umap_columns(params["dimensions"]))
+    df.to_parquet(os.path.join(umap_dir, f"{umap_id}.parquet"))
+    _save_umap_preview(umap_embeddings, os.path.join(umap_dir, f"{umap_id}.png"),
+                       dimensions=params["dimensions"])
+    with open(os.path.join(umap_dir, f"{umap_id}.json"), 'w') as f:
+        json.dump({
+            "id": umap_id,
+            "embedding_id": params["embedding_id"],
+            "neighbors": params["neighbors"],
+            "min_dist": params["min_dist"],
+            "dimensions": params["dimensions"],
+            "min_values": min_values.tolist(),
+            "max_values": max_values.tolist(),
+            "sweep": params["sweep_id"],
+        }, f, indent=2)
+    return {"umap_id": umap_id, "layout_seconds": round(layout_seconds, 2),
+            "write_seconds": round(time.perf_counter() - start, 2)}
+
+
+def umap_sweep(dataset_id, embedding_id, neighbors=(25,), min_dists=(0.075,), dimensions=(2,),
+               seed=None, workers=None, knn_cache=True):
+    """ls-umap-sweep: one umap-NNN per (neighbors, min_dist, dimensions).
+
+    The embeddings are loaded once and the kNN graph is built once (for the
+    largest neighbors, or taken from the embedding's stored graph). The fuzzy
+    graph is built once per neighbors value and the spectral initialization
+    once per (neighbors, dimensions); only the layout optimization runs per
+    grid point, in parallel worker processes. The summary, with per-stage
+    timings, is written to umaps/sweeps/sweep-NNN.json and returned.
+    """
+    import multiprocessing
+    import shutil
+    import time
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    import numpy as np
+    import scipy.sparse
+    from sklearn.utils import check_random_state
+    from umap.spectral import spectral_layout
+    from umap.umap_ import fuzzy_simplicial_set
+
+    from latentscope.scripts.embed import WORKER_START_METHOD
+    from latentscope.util.knn_graph import compute_knn_graph, get_knn_graph
+
+    DATA_DIR = get_data_dir()
+    umap_dir = os.path.join(DATA_DIR, dataset_id, "umaps")
+    sweep_dir = os.path.join(umap_dir, "sweeps")
+    os.makedirs(sweep_dir, exist_ok=True)
+    sweep_id = _next_sweep_id(sweep_dir)
+    print("RUNNING:", sweep_id)
+    neighbors = sorted(set(neighbors))
+    grid = [(n, m, d) for n in neighbors for m in sorted(set(min_dists))
+            for d in sorted(set(dimensions))]
+    timings = {"fuzzy_graph": {}, "spectral_init": {}}
+    total_start = start = time.perf_counter()
+
+    if embedding_id.startswith("sae"):
+        raise ValueError("ls-umap-sweep runs on dense embeddings, not SAE activations")
+    embeddings = load_embeddings(dataset_id, embedding_id)
+    timings["load"] = round(time.perf_counter() - start, 2)
+    print(f"loaded {embeddings.shape} embeddings in {timings['load']}s")
+
+    start = time.perf_counter()
+    if knn_cache:
+        knn_indices, knn_dists = get_knn_graph(DATA_DIR, dataset_id, embedding_id, embeddings,
+                                               max(neighbors), seed=seed)
+    else:
+        knn_indices, knn_dists = compute_knn_graph(embeddings, max(neighbors), seed=seed)
+    timings["knn"] = round(time.perf_counter() - start, 2)
+
+    # Shared inputs go to disk for the workers rather than being pickled
+    # into every task.
+    work_dir = os.path.join(sweep_dir, f"{sweep_id}-work")
+    os.makedirs(work_dir, exist_ok=True)
+    graph_paths, init_paths = {}, {}
+    for n in neighbors:
+        start = time.perf_counter()
+        graph, _, _ = fuzzy_simplicial_set(
+            embeddings, n, check_random_state(seed), "cosine",
+            knn_indices=np.ascontiguousarray(knn_indices[:, :n]),
+            knn_dists=np.ascontiguousarray(knn_dists[:, :n]))
+        graph = graph.tocoo()
+        graph.sum_duplicates()
+        graph_paths[n] = os.path.join(work_dir, f"graph-{n}.npz")
+        scipy.sparse.save_npz(graph_paths[n], graph, compressed=False)
+        timings["fuzzy_graph"][str(n)] = round(time.perf_counter() - start, 2)
+        for d in sorted(set(dimensions)):
+            start = time.perf_counter()
+            random_state = check_random_state(seed)
+            init = spectral_layout(embeddings, graph, d, random_state, metric="cosine",
+                                   metric_kwds={})
+            # scaled and jittered as umap.UMAP does for init="spectral"
+            init = (init * (10.0 / np.abs(init).max())).astype(np.float32)
+            init += random_state.normal(scale=0.0001, size=init.shape).astype(np.float32)
+            init_paths[n, d] = os.path.join(work_dir, f"init-{n}-{d}.npy")
+            np.save(init_paths[n, d], init)
+            timings["spectral_init"][f"{n}-{d}"] = round(time.perf_counter() - start, 2)
+        print(f"neighbors {n}: fuzzy graph in {timings['fuzzy_graph'][str(n)]}s")
+    del embeddings, knn_indices, knn_dists
+
+    first = int(_next_umap_id(umap_dir).split("-")[1])
+    points = [{"umap_id": f"umap-{first + i:03d}", "neighbors": n, "min_dist": m,
+               "dimensions": d} for i, (n, m, d) in enumerate(grid)]
+    workers = min(workers or os.cpu_count() or 1, len(points))
+    print(f"optimizing {len(points)} layouts with {workers} worker processes")
+    start = time.perf_counter()
+    context = multiprocessing.get_context(WORKER_START_METHOD)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            futures = {pool.submit(_sweep_layout, {
+                **point, "embedding_id": embedding_id, "umap_dir": umap_dir, "seed": seed,
+                "sweep_id": sweep_id, "graph_path": graph_paths[point["neighbors"]],
+                "init_path": init_paths[point["neighbors"], point["dimensions"]],
+            }): point for point in points}
+            for future in as_completed(futures):
+                point = futures[future]
+                point.update(future.result())
+                print(f"{point['umap_id']}: neighbors {point['neighbors']}, min_dist "
+                      f"{point['min_dist']}, {point['dimensions']}D layout in "
+                      f"{point['layout_seconds']}s")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    timings["layouts"] = round(time.perf_counter() - start, 2)
+    timings["total"] = round(time.perf_counter() - total_start, 2)
+
+    summary = {"id": sweep_id, "embedding_id": embedding_id, "seed": seed,
+               "workers": workers, "umaps": points, "timings": timings}
+    with open(os.path.join(sweep_dir, f"{sweep_id}.json"), 'w') as f:
+        json.dump(summary, f, indent=2)
+    print(f"load {timings['load']}s, knn {timings['knn']}s, "
+          f"fuzzy graphs {sum(timings['fuzzy_graph'].values()):.2f}s, "
+          f"spectral inits {sum(timings['spectral_init'].values()):.2f}s, "
+          f"layouts {timings['layouts']}s, total {timings['total']}s")
+    print("done with", sweep_id)
+    return summary
+
+
+# The fitted reducer of a token transform worker (set by _init_token_transform)
+_TOKEN_REDUCER = None
+# Default token transform processes. Each one holds its own copy of the
+# reducer, which keeps the fit sample (up to 1M tokens, ~512 MB at 128
+# dimensions) plus its kNN graph and search index, so this stays small.
+TOKEN_TRANSFORM_WORKERS = 4
+
+
+def _available_memory():
+    """Bytes of memory available to new processes, or None where the OS
+    doesn't say (MemAvailable is Linux-only)."""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _init_token_transform(reducer_path, threads):
+    """Token transform worker initializer: cap numba's threads so the workers
+    share the cores, then load the pickled reducer once per process."""
+    global _TOKEN_REDUCER
+    os.environ["NUMBA_NUM_THREADS"] = str(threads)
+    import pickle
+    with open(reducer_path, "rb") as f:
+        _TOKEN_REDUCER = pickle.load(f)
+
+
+def _transform_token_range(params, reducer=None):
+    """Transform tokens [start, stop) of the scratch token memmap into the
+    matching rows of the coordinate memmap."""
+    import numpy as np
+
+    if reducer is None:
+        reducer = _TOKEN_REDUCER
+    start, stop = params["start"], params["stop"]
+    tokens = np.load(params["tokens_path"], mmap_mode="r")
+    coords = np.load(params["coords_path"], mmap_mode="r+")
+    batch = np.asarray(tokens[start:stop], dtype=np.float32)
+    coords[start:stop] = _to_numpy(reducer.transform(batch))
+    coords.flush()
+    return stop - start
+
+
+def _transform_token_chunks(reducer, tokens_path, coords_path, total_tokens, batch_tokens,
+                            workers=None, cpu_reducer=True):
+    """Run reducer.transform over the spilled tokens in `batch_tokens`
+    chunks, in `workers` spawned processes (default TOKEN_TRANSFORM_WORKERS)
+    that each load the pickled reducer once. Workers are capped so their
+    reducer copies fit in the available memory. cuML reducers, and a single
+    worker, transform in this process."""
+    import multiprocessing
+    import pickle
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    from latentscope.scripts.embed import WORKER_START_METHOD
+    from latentscope.util.embedding_store import _human_readable_size
+
+    chunks = [{"start": start, "stop": min(start + batch_tokens, total_tokens),
+               "tokens_path": tokens_path, "coords_path": coords_path}
+              for start in range(0, total_tokens, batch_tokens)]
+    workers = min(workers or TOKEN_TRANSFORM_WORKERS, len(chunks))
+    reducer_path = f"{coords_path}.reducer.pkl"
+    if workers > 1 and cpu_reducer:
+        with open(reducer_path, "wb") as f:
+            pickle.dump(reducer, f)
+        reducer_bytes = os.path.getsize(reducer_path)
+        available = _available_memory()
+        if available is not None and available // reducer_bytes < workers:
+            workers = max(1, int(available // reducer_bytes))
+            print(f"using {workers} token transform worker(s): each loads a "
+                  f"{_human_readable_size(reducer_bytes)} reducer, "
+                  f"{_human_readable_size(available)} of memory is available")
+        if workers <= 1:
+            os.remove(reducer_path)
+    done = 0
+    if workers <= 1 or not cpu_reducer:
+        print(f"transforming {len(chunks)} chunks of tokens")
+        for chunk in chunks:
+            done += _transform_token_range(chunk, reducer)
+            print(f"transformed {done} of {total_tokens} tokens")
+            sys.stdout.flush()
+        return
+
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    print(f"transforming {len(chunks)} chunks of tokens with {workers} worker processes, "
+          f"{threads} threads each")
+    context = multiprocessing.get_context(WORKER_START_METHOD)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=_init_token_transform,
+                                 initargs=(reducer_path, threads)) as pool:
+            for future in as_completed([pool.submit(_transform_token_range, chunk)
+                                        for chunk in chunks]):
+                done += future.result()
+                print(f"transformed {done} of {total_tokens} tokens")
+                sys.stdout.flush()
+    finally:
+        os.remove(reducer_path)
+
+
 def token_umapper(dataset_id, embedding_id, neighbors=25, min_dist=0.1, seed=None,
                   fit_sample=1_000_000, save=False, name=None, description=None,
-                  transform_batch_tokens=250_000):
+                  transform_batch_tokens=250_000, workers=None):
     """Project every token of a late-interaction embedding to 2D.
 
     One point per stored token vector, in global token_index order (the same
     order ls-tokenize writes metadata in). Token counts routinely reach
-    millions, so the full token set is never materialized: the reducer is fit
-    on at most `fit_sample` uniformly sampled tokens, then every token is
-    streamed through reducer.transform in bounded batches. When the corpus
-    fits inside `fit_sample` a plain fit_transform runs instead.
+    millions, so the full token set is never materialized: the token table
+    is read once, gathering a uniform sample of at most `fit_sample` tokens
+    to fit the reducer on while spilling every token (float16, as stored) to
+    a scratch memmap. Every token is then transformed from the memmap in
+    `transform_batch_tokens` chunks across `workers` processes. When the
+    corpus fits inside `fit_sample` a plain fit_transform runs instead.
     """
     DATA_DIR = get_data_dir()
     umap_dir = os.path.join(DATA_DIR, dataset_id, "umaps")
@@ -697,8 +1156,8 @@ def token_umapper(dataset_id, embedding_id, neighbors=25, min_dist=0.1, seed=Non
     print("RUNNING:", umap_id, "(granularity=tokens)")
 
     import pickle
+    import time
 
-    import matplotlib.pyplot as plt
     import numpy as np
     import pandas as pd
 
@@ -724,16 +1183,21 @@ def token_umapper(dataset_id, embedding_id, neighbors=25, min_dist=0.1, seed=Non
     if res.use_cuml and save:
         print("umapper: --save pickles a CPU reducer; running CPU umap-learn")
 
+    timings = {}
     if total_tokens <= fit_sample:
         print("fitting on all tokens")
+        start = time.perf_counter()
         parts = []
-        for _, vec_list in iter_token_vectors(DATA_DIR, dataset_id, embedding_id):
-            parts.append(np.concatenate(vec_list))
+        for _, flat, _ in iter_token_vectors(DATA_DIR, dataset_id, embedding_id, flat=True):
+            parts.append(flat)
         all_tokens = np.concatenate(parts)
         parts = None
+        timings["stream"] = round(time.perf_counter() - start, 2)
+        start = time.perf_counter()
         umap_embeddings, reducer = _reduce_umap(
             all_tokens, neighbors, min_dist, seed, use_cuml)
         all_tokens = None
+        timings["fit"] = round(time.perf_counter() - start, 2)
         fit_n = total_tokens
     else:
         fit_n = fit_sample
@@ -742,42 +1206,53 @@ def token_umapper(dataset_id, embedding_id, neighbors=25, min_dist=0.1, seed=Non
         rng = np.random.default_rng(seed if seed is not None else 0)
         sample_idx = np.sort(rng.choice(total_tokens, size=fit_n, replace=False))
 
+        # One pass over the token table: the sample is gathered on the way
+        # and every token is spilled, as stored (float16), to a scratch
+        # memmap that the transform then reads instead of the table.
+        start = time.perf_counter()
+        tokens_path = os.path.join(umap_dir, f"{umap_id}.tokens.tmp")
+        coords_path = os.path.join(umap_dir, f"{umap_id}.coords.tmp")
+        tokens = None
         parts = []
         position = 0
-        for _, vec_list in iter_token_vectors(DATA_DIR, dataset_id, embedding_id):
-            flat = np.concatenate(vec_list)
-            lo = np.searchsorted(sample_idx, position)
-            hi = np.searchsorted(sample_idx, position + len(flat))
-            if hi > lo:
-                parts.append(flat[sample_idx[lo:hi] - position])
-            position += len(flat)
-        fit_matrix = np.concatenate(parts)
-        parts = None
-
-        _, reducer = _reduce_umap(fit_matrix, neighbors, min_dist, seed, use_cuml)
-        fit_matrix = None
-
-        print("transforming all tokens through the fitted reducer")
-        outputs = []
-        buffer = []
-        buffered = 0
-        def flush():
-            nonlocal buffer, buffered
-            if not buffer:
-                return
-            batch = np.concatenate(buffer)
-            outputs.append(_to_numpy(reducer.transform(batch)).astype(np.float32))
-            buffer = []
-            buffered = 0
-        for _, vec_list in iter_token_vectors(DATA_DIR, dataset_id, embedding_id):
-            flat = np.concatenate(vec_list)
-            buffer.append(flat)
-            buffered += len(flat)
-            if buffered >= transform_batch_tokens:
-                flush()
-        flush()
-        umap_embeddings = np.concatenate(outputs)
-        outputs = None
+        try:
+            for _, flat, _ in iter_token_vectors(DATA_DIR, dataset_id, embedding_id,
+                                                 dtype=None, flat=True):
+                if tokens is None:
+                    tokens = np.lib.format.open_memmap(
+                        tokens_path, mode="w+", dtype=flat.dtype,
+                        shape=(total_tokens, flat.shape[1]))
+                tokens[position:position + len(flat)] = flat
+                lo, hi = np.searchsorted(sample_idx, [position, position + len(flat)])
+                if hi > lo:
+                    parts.append(flat[sample_idx[lo:hi] - position].astype(np.float32))
+                position += len(flat)
+            assert position == total_tokens, (
+                f"streamed {position} tokens, expected {total_tokens}")
+            tokens.flush()
+            del tokens
+            fit_matrix = np.concatenate(parts)
+            parts = None
+            timings["stream"] = round(time.perf_counter() - start, 2)
+
+            start = time.perf_counter()
+            _, reducer = _reduce_umap(fit_matrix, neighbors, min_dist, seed, use_cuml)
+            fit_matrix = None
+            timings["fit"] = round(time.perf_counter() - start, 2)
+
+            start = time.perf_counter()
+            coords = np.lib.format.open_memmap(coords_path, mode="w+", dtype=np.float32,
+                                               shape=(total_tokens, 2))
+            del coords
+            _transform_token_chunks(reducer, tokens_path, coords_path, total_tokens,
+                                    transform_batch_tokens, workers, cpu_reducer=not use_cuml)
+            umap_embeddings = np.load(coords_path)
+            timings["transform"] = round(time.perf_counter() - start, 2)
+        finally:
+            for path in (tokens_path, coords_path):
+                if os.path.exists(path):
+                    os.remove(path)
+    print("token umap stages (s):", timings)
 
     assert len(umap_embeddings) == total_tokens, (
         f"projected {len(umap_embeddings)} tokens, expected {total_tokens}")
@@ -793,17 +1268,11 @@ def token_umapper(dataset_id, embedding_id, neighbors=25, min_dist=0.1, seed=Non
     df.to_parquet(output_file)
     print("wrote", output_file)
 
-    fig, ax = plt.subplots(figsize=(14.22, 14.22))
     # calculate_point_size is tuned for row counts; token maps are 100-300x
     # denser, so scale the preview marker down or the PNG is a solid blob
     n_points = umap_embeddings.shape[0]
-    point_size = 0.1 if n_points > 100_000 else calculate_point_size(n_points)
-    print("POINT SIZE", point_size, "for", n_points, "points")
-    plt.scatter(umap_embeddings[:, 0], umap_embeddings[:, 1], s=point_size, alpha=0.5)
-    plt.axis('off')
-    plt.gca().set_position([0, 0, 1, 1])
-    plt.savefig(os.path.join(umap_dir, f"{umap_id}.png"))
-    plt.close(fig)
+    _save_umap_preview(umap_embeddings, os.path.join(umap_dir, f"{umap_id}.png"),
+                       point_size=0.1 if n_points > 100_000 else None)
 
     with open(os.path.join(umap_dir, f'{umap_id}.json'), 'w') as f:
         meta = {
@@ -816,6 +1285,7 @@ def token_umapper(dataset_id, embedding_id, neighbors=25, min_dist=0.1, seed=Non
             "granularity": "tokens",
             "total_tokens": int(total_tokens),
             "fit_sample": int(fit_n),
+            "timings": timings,
         }
         if name is not None:
             meta["name"] = name
@@ -848,7 +1318,6 @@ def sparse_umapper(dataset_id, embedding_id, sae_id, neighbors=25, min_dist=0.1,
     import pickle
 
     import h5py
-    import matplotlib.pyplot as plt
     import numpy as np
     import pandas as pd
     import umap
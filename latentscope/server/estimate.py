@@ -39,6 +39,7 @@ def estimate_embed():
         model_id: embedding model ID
         text_column: text column name
         dimensions: optional dimension truncation
+        precision: storage precision (float32, float16, int8, binary)
     """
     DATA_DIR = _data_dir()
     dataset = request.args.get('dataset')
@@ -46,9 +47,13 @@ def estimate_embed():
     text_column = request.args.get('text_column')
     dimensions = request.args.get('dimensions')
     dimensions = int(dimensions) if dimensions else None
+    precision = request.args.get('precision', 'float32')
 
     if not dataset or not model_id:
         return jsonify({"error": "Missing dataset or model_id"}), 400
+    from latentscope.util.embedding_store import PRECISIONS
+    if precision not in PRECISIONS:
+        return jsonify({"error": f"Unknown precision '{precision}'"}), 400
 
     import numpy as np
     import pandas as pd
@@ -103,6 +108,7 @@ def estimate_embed():
         num_rows, est_dimensions,
         has_tokens=is_late_interaction,
         avg_tokens_per_doc=int(avg_tokens_per_doc),
+        precision=precision,
     )
 
     # Time estimate (rough heuristics)
@@ -227,6 +233,7 @@ def benchmark_embed():
         text_column: text column name
         sample_size: number of items to benchmark (default 10)
         dimensions: optional dimension truncation
+        precision: storage precision (float32, float16, int8, binary)
     """
     DATA_DIR = _data_dir()
     dataset = request.args.get('dataset')
@@ -235,9 +242,13 @@ def benchmark_embed():
     sample_size = int(request.args.get('sample_size', 10))
     dimensions = request.args.get('dimensions')
     dimensions = int(dimensions) if dimensions else None
+    precision = request.args.get('precision', 'float32')
 
     if not dataset or not model_id or not text_column:
         return jsonify({"error": "Missing required parameters"}), 400
+    from latentscope.util.embedding_store import PRECISIONS
+    if precision not in PRECISIONS:
+        return jsonify({"error": f"Unknown precision '{precision}'"}), 400
 
     import numpy as np
     import pandas as pd
@@ -289,6 +300,7 @@ def benchmark_embed():
         num_rows, sample_dim,
         has_tokens=is_late_interaction,
         avg_tokens_per_doc=avg_tokens,
+        precision=precision,
     )
 
     return jsonify({
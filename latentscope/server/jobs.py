@@ -334,6 +334,24 @@ def run_embed():
     max_seq_length = request.values.get('max_seq_length')
     # Task for task-conditioned models (jina-v3/v5). Consumed by ls-embed.
     task = request.values.get('task')
+    # Overlap input prep / encoding / LanceDB writes (ls-embed --pipeline)
+    pipeline = request.values.get('pipeline')
+    # Reuse vectors from the shared content-addressed cache (ls-embed --cache)
+    cache = request.values.get('cache')
+    # Batch rows of similar token length together (ls-embed --sort-by-length)
+    sort_by_length = request.values.get('sort_by_length')
+    # Batches in flight for API providers (ls-embed --concurrency)
+    concurrency = request.values.get('concurrency')
+    # Worker processes for local models (ls-embed --workers)
+    workers = request.values.get('workers')
+    # Inference backend for local models: torch, onnx or onnx-int8
+    backend = request.values.get('backend')
+    # Storage precision of the vectors: float32, float16, int8 or binary
+    precision = request.values.get('precision')
+    # Build the token-level index of a late interaction embedding
+    token_index = request.values.get('token_index')
+    # Choose the vector index parameters by measured recall
+    tune_index = request.values.get('tune_index')
 
     err = _require_params(dataset=dataset, text_column=text_column, model_id=model_id,
                           prefix=prefix, batch_size=batch_size)
@@ -349,6 +367,24 @@ def run_embed():
         command.append(f'--max_seq_length={max_seq_length}')
     if task:
         command.append(f'--task={task}')
+    if pipeline:
+        command.append('--pipeline')
+    if cache:
+        command.append('--cache')
+    if sort_by_length:
+        command.append('--sort_by_length')
+    if concurrency:
+        command.append(f'--concurrency={concurrency}')
+    if workers:
+        command.append(f'--workers={workers}')
+    if backend:
+        command.append(f'--backend={backend}')
+    if precision:
+        command.append(f'--precision={precision}')
+    if token_index:
+        command.append('--token_index')
+    if tune_index:
+        command.append('--tune_index')
     threading.Thread(target=run_job, args=(data_dir, dataset, job_id, command)).start()
     return jsonify({"job_id": job_id})
 
@@ -502,7 +538,10 @@ def run_umap():
     description = request.values.get('description')
     # Token-granularity maps (one point per late-interaction token)
     granularity = request.values.get('granularity')
+    # Fit on a sample and stream the rest through the reducer (tokens, or
+    # rows of an embedding too large for memory)
     fit_sample = request.values.get('fit_sample')
+    fit_strategy = request.values.get('fit_strategy')
 
     if transform_from:
         # neighbors/min_dist are ignored by the transform path (the saved
@@ -538,6 +577,8 @@ def run_umap():
         command.append(f'--granularity={granularity}')
     if fit_sample:
         command.append(f'--fit_sample={fit_sample}')
+    if fit_strategy:
+        command.append(f'--fit_strategy={fit_strategy}')
     if name:
         command.append(f'--name={name}')
     if description:
@@ -546,6 +587,39 @@ def run_umap():
     return jsonify({"job_id": job_id})
 
 
+@jobs_write_bp.route('/umap_sweep', methods=['GET', 'POST'])
+def run_umap_sweep():
+    """Grid of umaps sharing one neighbour graph. neighbors, min_dist and
+    dimensions are comma-separated lists; every combination becomes a
+    umap-NNN."""
+    data_dir = _data_dir()
+    dataset = _safe_dataset(request.values.get('dataset'))
+    embedding_id = request.values.get('embedding_id')
+    neighbors = request.values.get('neighbors')
+    min_dist = request.values.get('min_dist')
+    dimensions = request.values.get('dimensions')
+    seed = request.values.get('seed')
+    workers = request.values.get('workers')
+
+    err = _require_params(dataset=dataset, embedding_id=embedding_id,
+                          neighbors=neighbors, min_dist=min_dist)
+    if err:
+        return err
+
+    job_id = str(uuid.uuid4())
+    command = ['ls-umap-sweep', dataset, embedding_id]
+    command += ['--neighbors', *[v.strip() for v in neighbors.split(',') if v.strip()]]
+    command += ['--min_dist', *[v.strip() for v in min_dist.split(',') if v.strip()]]
+    if dimensions:
+        command += ['--dimensions', *[v.strip() for v in dimensions.split(',') if v.strip()]]
+    if seed:
+        command.append(f'--seed={seed}')
+    if workers:
+        command.append(f'--workers={workers}')
+    threading.Thread(target=run_job, args=(data_dir, dataset, job_id, command)).start()
+    return jsonify({"job_id": job_id})
+
+
 @jobs_write_bp.route('/tokenize', methods=['GET', 'POST'])
 def run_tokenize():
     data_dir = _data_dir()
@@ -23,6 +23,17 @@ EMBEDDINGS = LRUCache(maxsize=2)  # loaded embedding models
 NN_CACHE = LRUCache(maxsize=2)  # fitted sklearn NearestNeighbors, keyed (dataset, embedding_id)
 
 
+def _load_query_model(metadata):
+    """Load the model an embedding was made with, on the same inference
+    backend, so queries land in the same space. ONNX backends load the export
+    ls-embed cached in the data dir."""
+    model = get_embedding_model(metadata.get('model_id'))
+    if metadata.get('backend') and hasattr(model, 'backend'):
+        model.backend = metadata['backend']
+    model.load_model()
+    return model
+
+
 @search_bp.route('/nn', methods=['GET'])
 def nn():
     import numpy as np
@@ -38,15 +49,20 @@ def nn():
     # ColBERT-style embedding, so it's the default whenever the embedding
     # supports it. Pass late_interaction=false to force mean-vector ANN.
     use_late_interaction = request.args.get('late_interaction', 'true').lower() == 'true'
+    # mode=binary: in-memory sign-bit Hamming prefilter + exact cosine rerank
+    # of `candidates` rows, instead of the LanceDB vector index.
+    mode = request.args.get('mode', 'ann')
+    if mode not in ('ann', 'binary'):
+        return jsonify({"error": f"Unknown search mode '{mode}'"}), 400
+    candidates = request.args.get('candidates')
+    candidates = int(candidates) if candidates else None
 
     cache_key = dataset + "-" + embedding_id
     model = EMBEDDINGS.get(cache_key)
     if model is None:
         with open(os.path.join(DATA_DIR, dataset, "embeddings", embedding_id + ".json")) as f:
             metadata = json.load(f)
-        model_id = metadata.get('model_id')
-        model = get_embedding_model(model_id)
-        model.load_model()
+        model = _load_query_model(metadata)
         EMBEDDINGS[cache_key] = model
 
     # Check if late interaction search is requested and supported
@@ -70,7 +86,8 @@ def nn():
             return nn_lance(DATA_DIR, dataset, scope_id, model, query, dimensions)
 
     if use_late_interaction and is_late_interaction and has_token_vecs:
-        return nn_late_interaction(DATA_DIR, dataset, embedding_id, model, query, dimensions)
+        return nn_late_interaction(DATA_DIR, dataset, embedding_id, model, query, dimensions,
+                                   vector_index=emb_meta.get('vector_index'))
 
     # Try embedding-level LanceDB table. Only the existence check is guarded:
     # once a table exists this path is always taken, so an embed/search error
@@ -84,13 +101,18 @@ def nn():
     if count > 0:
         embedding = np.array(model.embed_query([query], dimensions=dimensions))
         query_vec = embedding[0] if embedding.ndim > 1 else embedding
+        # query settings chosen by ls-tune-index / ls-embed --tune_index
+        vector_index = emb_meta.get('vector_index') or {}
         indices, distances = search_nn(
-            DATA_DIR, dataset, embedding_id, query_vec, limit=150
+            DATA_DIR, dataset, embedding_id, query_vec, limit=150,
+            mode=mode, candidates=candidates, nprobes=vector_index.get('nprobes'),
+            refine_factor=vector_index.get('refine_factor'),
         )
         return jsonify(
             indices=indices,
             distances=distances,
             search_embedding=embedding.tolist(),
+            search_type=mode,
         )
 
     # Fallback: legacy HDF5-era embeddings (no lance table) — fit sklearn
@@ -121,15 +143,29 @@ def nn_lance(data_dir, dataset, scope_id, model, query, dimensions):
     import lancedb
     db = lancedb.connect(os.path.join(data_dir, dataset, "lancedb"))
     table = db.open_table(scope_id)
+    # query settings of a tuned scope index (export_lance)
+    vector_index = {}
+    scope_meta_path = os.path.join(data_dir, dataset, "scopes", scope_id + ".json")
+    if os.path.exists(scope_meta_path):
+        with open(scope_meta_path) as f:
+            vector_index = json.load(f).get("vector_index") or {}
     embedding = model.embed_query([query], dimensions=dimensions)
-    results = table.search(embedding).metric("cosine").select(["index"]).limit(100).to_list()
+    search = table.search(embedding).metric("cosine")
+    if vector_index.get("nprobes"):
+        search = search.nprobes(vector_index["nprobes"])
+    if vector_index.get("refine_factor"):
+        search = search.refine_factor(vector_index["refine_factor"])
+    results = search.select(["index"]).limit(100).to_list()
     indices = [result["index"] for result in results]
     distances = [result["_distance"] for result in results]
     return jsonify(indices=indices, distances=distances, search_embedding=embedding)
 
 
-def nn_late_interaction(data_dir, dataset, embedding_id, model, query, dimensions):
-    """Late interaction (MaxSim) search using per-token embeddings."""
+def nn_late_interaction(data_dir, dataset, embedding_id, model, query, dimensions,
+                        vector_index=None):
+    """Late interaction (MaxSim) search using per-token embeddings.
+    `vector_index` is the embedding meta's tuned index settings, used by the
+    mean-vector candidate search."""
     import numpy as np
 
     from latentscope.util.embedding_store import search_late_interaction
@@ -142,9 +178,11 @@ def nn_late_interaction(data_dir, dataset, embedding_id, model, query, dimension
     mean_embedding = query_tokens.mean(axis=0)
     mean_embedding = mean_embedding / (np.linalg.norm(mean_embedding) + 1e-10)
 
+    vector_index = vector_index or {}
     indices, scores = search_late_interaction(
         data_dir, dataset, embedding_id,
         query_tokens, prefilter_limit=200, final_limit=100,
+        nprobes=vector_index.get('nprobes'), refine_factor=vector_index.get('refine_factor'),
     )
 
     return jsonify(
@@ -221,9 +259,7 @@ def features():
     if model is None:
         with open(os.path.join(DATA_DIR, dataset, "embeddings", embedding_id + ".json")) as f:
             metadata = json.load(f)
-        model_id = metadata.get('model_id')
-        model = get_embedding_model(model_id)
-        model.load_model()
+        model = _load_query_model(metadata)
         EMBEDDINGS[embedding_id] = model
 
     nn_key = (dataset, embedding_id)
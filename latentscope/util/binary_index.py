@@ -0,0 +1,153 @@
+"""Binary (sign-bit) prefilter for nearest-neighbor search (/nn?mode=binary).
+
+Every vector is reduced to one bit per dimension, packed 8 dimensions per
+byte, and kept in memory: 1M x 1024-dim vectors take 128 MB instead of 4 GB
+of float32. A query is encoded the same way, every row is scored by Hamming
+distance (XOR + popcount), and the closest few thousand candidates are then
+reranked by exact cosine against their stored vectors.
+
+Building is two streaming passes over the table (mean, then encode) with no
+training step, unlike the IVF-PQ index, and recall is tuned at query time
+with the number of candidates.
+
+Bits are taken relative to the per-dimension mean rather than zero. Many
+embedding models leave some dimensions on one side of zero for almost every
+row, and those bits would carry no information.
+"""
+
+import numpy as np
+
+DEFAULT_CANDIDATES = 2000
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def pad_codes(codes):
+    """Zero-pad packed codes to whole 8-byte words (padding bits match in
+    every row, so Hamming distances are unchanged)."""
+    pad = -codes.shape[1] % 8
+    if pad:
+        codes = np.pad(codes, ((0, 0), (0, pad)))
+    return np.ascontiguousarray(codes)
+
+
+def hamming_distances(codes, query_code, chunk_rows=262144):
+    """Hamming distance from `query_code` (B,) to every row of `codes` (N, B),
+    in chunks so the XOR temporary stays small. With numpy >= 2 and codes
+    padded to 8-byte words, XOR and popcount run on uint64 words."""
+    if hasattr(np, "bitwise_count") and codes.shape[1] % 8 == 0:
+        codes = codes.view(np.uint64)
+        query_code = np.ascontiguousarray(query_code).view(np.uint64)
+        popcount = np.bitwise_count
+    else:
+        def popcount(block):
+            return _POPCOUNT[block]
+    out = np.empty(len(codes), dtype=np.int32)
+    for start in range(0, len(codes), chunk_rows):
+        block = np.bitwise_xor(codes[start:start + chunk_rows], query_code)
+        out[start:start + len(block)] = popcount(block).sum(axis=1, dtype=np.int32)
+    return out
+
+
+class BinaryIndex:
+    """Packed sign codes for a set of vectors.
+
+    Parameters
+    ----------
+    codes : np.ndarray
+        (N, ceil(D / 8)) uint8 packed bits (zero-padded to 8-byte words).
+    ls_index : np.ndarray
+        Row index of each code.
+    center : np.ndarray or None
+        Per-dimension threshold the bits were taken against (None: zero).
+    version : object
+        Version of the source table the codes were built from.
+    """
+
+    def __init__(self, codes, ls_index, center=None, version=None):
+        self.codes = pad_codes(codes) if codes is not None else None
+        self.ls_index = np.asarray(ls_index, dtype=np.int64)
+        self.center = center
+        self.version = version
+
+    @classmethod
+    def build(cls, scan, version=None):
+        """Build from ``scan()``, a callable returning a fresh iterator of
+        (ls_index, vectors) batches. It is called twice: once for the
+        per-dimension mean and once to encode, so only the codes are ever
+        held in memory.
+        """
+        total = None
+        count = 0
+        for _, vectors in scan():
+            part = vectors.sum(axis=0, dtype=np.float64)
+            total = part if total is None else total + part
+            count += len(vectors)
+        if count == 0:
+            return cls(np.zeros((0, 0), dtype=np.uint8), np.zeros(0, dtype=np.int64),
+                       version=version)
+        index = cls(None, np.zeros(0, dtype=np.int64), (total / count).astype(np.float32),
+                    version)
+        ls_index, codes = [], []
+        for indices, vectors in scan():
+            ls_index.append(np.asarray(indices, dtype=np.int64))
+            codes.append(index.encode(vectors))
+        index.ls_index = np.concatenate(ls_index)
+        index.codes = pad_codes(np.concatenate(codes))
+        return index
+
+    def encode(self, vectors):
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        if self.center is not None:
+            vectors = vectors - self.center
+        return pad_codes(np.packbits(vectors > 0, axis=1))
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + self.ls_index.nbytes
+
+    def __len__(self):
+        return len(self.ls_index)
+
+    def candidates(self, query_vector, n):
+        """Positions of the `n` rows closest in Hamming distance, nearest first."""
+        distances = hamming_distances(self.codes, self.encode(query_vector)[0])
+        n = min(n, len(distances))
+        if n < len(distances):
+            positions = np.argpartition(distances, n)[:n]
+        else:
+            positions = np.arange(len(distances))
+        return positions[np.argsort(distances[positions], kind="stable")]
+
+    def search(self, query_vector, fetch_vectors, limit=150, candidates=DEFAULT_CANDIDATES):
+        """Hamming prefilter, then exact cosine rerank.
+
+        ``fetch_vectors(positions)`` returns the full-precision vectors of
+        those rows (float32, in the given order). Returns (ls_indices,
+        cosine distances) for the best `limit` rows, nearest first.
+        """
+        positions = self.candidates(query_vector, max(candidates, limit))
+        if len(positions) == 0:
+            return [], []
+        vectors = fetch_vectors(positions)
+        query = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+        query = query / (np.linalg.norm(query) + 1e-10)
+        norms = np.linalg.norm(vectors, axis=1) + 1e-10
+        distances = 1.0 - (vectors @ query) / norms
+        order = np.argsort(distances, kind="stable")[:limit]
+        return self.ls_index[positions[order]].tolist(), distances[order].tolist()
+
+
+def recall_at_k(vectors, queries, k=10, candidates=DEFAULT_CANDIDATES):
+    """Fraction of the exact cosine top-k that the binary prefilter + rerank
+    returns, averaged over `queries`."""
+    index = BinaryIndex.build(lambda: iter([(np.arange(len(vectors)), vectors)]))
+    normed = vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-10)
+    hits = 0
+    for query in queries:
+        q = query / (np.linalg.norm(query) + 1e-10)
+        exact = np.argsort(-(normed @ q), kind="stable")[:k]
+        found, _ = index.search(query, lambda positions: vectors[positions], limit=k,
+                                candidates=candidates)
+        hits += len(set(exact.tolist()) & set(found))
+    return hits / (k * len(queries))
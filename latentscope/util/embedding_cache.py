@@ -0,0 +1,197 @@
+"""Content-addressed cache of dense embedding vectors (ls-embed --cache).
+
+Re-ingesting a dataset with a handful of changed rows, embedding two
+overlapping datasets, or redoing a run only to change UMAP parameters all
+re-encode rows that were already embedded with the same model. The cache maps
+a hash of everything that determines a vector — model id, task, prefix,
+dimensions, max_seq_length and the input text (or image bytes) — to the stored
+vector, so those rows never reach the provider again.
+
+The cache is a single SQLite file under the data directory: it is a plain
+key/value store shared by every dataset (and by concurrent ls-embed
+processes), which is what SQLite's locking is for, and sqlite3 ships with
+Python so no dependency is added. Entries carry a last-used timestamp and the
+least recently used ones are evicted once the file grows past ``max_bytes``.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+DEFAULT_MAX_BYTES = 4 * 1024 ** 3
+
+# Stay under SQLite's default host-parameter limit (999) per statement.
+_QUERY_CHUNK = 500
+
+# After an eviction pass the cache is trimmed to this fraction of max_bytes,
+# so a full cache doesn't evict on every single batch.
+_EVICT_TO = 0.9
+
+
+def cache_path(data_dir):
+    """Return the location of the shared embedding cache for a data dir."""
+    return os.path.join(data_dir, ".cache", "embeddings.sqlite")
+
+
+def cache_namespace(model_id, task=None, prefix="", dimensions=None, max_seq_length=None,
+                    backend=None):
+    """Serialize the embedding settings that, with the input, fix a vector.
+
+    A non-default inference backend (onnx, onnx-int8) produces slightly
+    different vectors, so it is part of the namespace; torch keeps the
+    original key layout so existing caches stay valid.
+    """
+    settings = [model_id, task, prefix or "", dimensions, max_seq_length]
+    if backend not in (None, "torch"):
+        settings.append(backend)
+    return json.dumps(settings, separators=(",", ":"))
+
+
+def content_key(namespace, value):
+    """Hash one input (text, raw image bytes or an HF ``{"bytes": ...}`` image
+    dict) under a namespace from :func:`cache_namespace`."""
+    digest = hashlib.sha256(namespace.encode("utf-8"))
+    if isinstance(value, dict):
+        value = value.get("bytes")
+    if isinstance(value, (bytes, bytearray)):
+        digest.update(b"\x00b")
+        digest.update(value)
+    elif value is None:
+        digest.update(b"\x00n")
+    else:
+        digest.update(b"\x00s")
+        digest.update(str(value).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class EmbeddingCache:
+    """Size-bounded, persistent key -> float32 vector store.
+
+    Parameters
+    ----------
+    path : str
+        SQLite file to open (created with its parent directory if missing).
+    max_bytes : int
+        Approximate bound on the stored vector payload. When exceeded, the
+        least recently used entries are evicted.
+
+    ``hits``, ``misses`` and ``evicted`` count rows for the lifetime of this
+    object; :meth:`stats` summarizes them for the embedding meta. Methods may
+    be called from several threads (ls-embed --concurrency).
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_bytes = int(max_bytes)
+        self.conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.lock = threading.RLock()
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS vectors ("
+            "key TEXT PRIMARY KEY, dim INTEGER NOT NULL, vector BLOB NOT NULL, "
+            "nbytes INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS vectors_last_used ON vectors (last_used)")
+        self.conn.commit()
+        self._total_bytes = self.conn.execute(
+            "SELECT COALESCE(SUM(nbytes), 0) FROM vectors").fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def get_many(self, keys):
+        """Return ``{key: vector}`` for the keys present in the cache.
+
+        Counts one hit or miss per requested key (duplicates included) and
+        refreshes the last-used time of every hit.
+        """
+        with self.lock:
+            return self._get_many(keys)
+
+    def _get_many(self, keys):
+        unique = list(dict.fromkeys(keys))
+        found = {}
+        for i in range(0, len(unique), _QUERY_CHUNK):
+            chunk = unique[i:i + _QUERY_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT key, vector FROM vectors WHERE key IN ({placeholders})", chunk)
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32)
+        if found:
+            now = time.time()
+            self.conn.executemany(
+                "UPDATE vectors SET last_used = ? WHERE key = ?",
+                [(now, key) for key in found])
+            self.conn.commit()
+        n_hits = sum(1 for key in keys if key in found)
+        self.hits += n_hits
+        self.misses += len(keys) - n_hits
+        return found
+
+    def put_many(self, keys, vectors):
+        """Store one vector per key (existing keys are left untouched: equal
+        keys mean equal inputs), then evict down to the size bound."""
+        with self.lock:
+            self._put_many(keys, vectors)
+
+    def _put_many(self, keys, vectors):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        now = time.time()
+        rows = [
+            (key, int(vec.shape[0]), vec.tobytes(), int(vec.nbytes), now)
+            for key, vec in zip(keys, vectors)
+        ]
+        before = self.conn.total_changes
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO vectors (key, dim, vector, nbytes, last_used) "
+            "VALUES (?, ?, ?, ?, ?)", rows)
+        self.conn.commit()
+        inserted = self.conn.total_changes - before
+        if inserted:
+            self._total_bytes += inserted * (rows[0][3] if rows else 0)
+        if self._total_bytes > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        # Resync first: other processes may have added or evicted entries.
+        self._total_bytes = self.conn.execute(
+            "SELECT COALESCE(SUM(nbytes), 0) FROM vectors").fetchone()[0]
+        excess = self._total_bytes - int(self.max_bytes * _EVICT_TO)
+        if excess <= 0:
+            return
+        victims = []
+        freed = 0
+        for key, nbytes in self.conn.execute(
+                "SELECT key, nbytes FROM vectors ORDER BY last_used"):
+            victims.append((key,))
+            freed += nbytes
+            if freed >= excess:
+                break
+        self.conn.executemany("DELETE FROM vectors WHERE key = ?", victims)
+        self.conn.commit()
+        self._total_bytes -= freed
+        self.evicted += len(victims)
+
+    def stats(self):
+        """Counters for this run plus the cache's current size."""
+        with self.lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evicted": self.evicted,
+            "entries": entries,
+            "bytes": int(self._total_bytes),
+            "max_bytes": self.max_bytes,
+        }
+
+    def close(self):
+        self.conn.close()
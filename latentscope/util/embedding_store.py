@@ -8,10 +8,16 @@ Replaces the previous HDF5-based storage with LanceDB tables that support:
 - Backward-compatible reading of legacy HDF5 files
 """
 
+import atexit
+import gc
 import os
+import threading
+import time
 
 import numpy as np
 
+from latentscope.util.lru import LRUCache
+
 
 def _lance_db_path(data_dir, dataset_id):
     """Return the LanceDB directory for a dataset."""
@@ -23,13 +29,114 @@ def _embedding_table_name(embedding_id):
     return f"emb-{embedding_id}"
 
 
+def _shard_table_name(embedding_id, shard):
+    """Return the staging table for one ls-embed --workers shard. Not an
+    "emb-" name, so shards never show up as embeddings."""
+    return f"shard-{embedding_id}-{shard:03d}"
+
+
+# Storage precisions for the dense vector column (ls-embed --precision).
+# float16 stays searchable by LanceDB's ANN index; int8 (per-dimension scale
+# and offset from the embedding's min/max) and binary (1 sign bit per
+# dimension) are scanned exactly by search_nn and dequantized on load.
+PRECISIONS = ("float32", "float16", "int8", "binary")
+# Arrow schema metadata key holding the quantization parameters, so a table
+# can be dequantized without its .json meta.
+_PRECISION_KEY = b"latentscope.precision"
+# Field metadata on token_vectors: the stored token vectors are unit norm
+# (normalized by append_embeddings), so MaxSim needs no per-query norms.
+_UNIT_NORM_KEY = b"latentscope.unit_norm"
+
+
+# Process-wide LanceDB handles. Connecting and opening a table reads the
+# directory and the table manifest, and the server used to do that several
+# times per request (get_embedding_count, then search_nn, then once per query
+# token in search_late_interaction). Cached tables are revalidated on every
+# use: a stat of the table directory catches a drop (or drop and recreate)
+# by another process, and checkout_latest() moves the handle to the newest
+# version, so rows appended by a running ls-embed are still seen.
+_CONNECTIONS = LRUCache(maxsize=32)
+_TABLES = LRUCache(maxsize=128)
+_HANDLE_LOCK = threading.Lock()
+
+
 def _connect(data_dir, dataset_id):
-    """Connect to the LanceDB database for a dataset."""
+    """Connect to the LanceDB database for a dataset (cached per process)."""
     import lancedb
 
     db_path = _lance_db_path(data_dir, dataset_id)
-    os.makedirs(db_path, exist_ok=True)
-    return lancedb.connect(db_path)
+    with _HANDLE_LOCK:
+        db = _CONNECTIONS.get(db_path)
+    if db is None:
+        os.makedirs(db_path, exist_ok=True)
+        db = lancedb.connect(db_path)
+        with _HANDLE_LOCK:
+            _CONNECTIONS[db_path] = db
+    return db
+
+
+def _table_inode(data_dir, dataset_id, table_name):
+    try:
+        return os.stat(os.path.join(_lance_db_path(data_dir, dataset_id),
+                                    f"{table_name}.lance")).st_ino
+    except OSError:
+        return None
+
+
+def _open_table(data_dir, dataset_id, table_name):
+    """Open a table through the handle cache, refreshed to its latest
+    version. Returns None if the table doesn't exist."""
+    key = (_lance_db_path(data_dir, dataset_id), table_name)
+    inode = _table_inode(data_dir, dataset_id, table_name)
+    with _HANDLE_LOCK:
+        cached = _TABLES.get(key)
+    if cached is not None:
+        tbl, cached_inode = cached
+        if inode is not None and inode == cached_inode:
+            try:
+                tbl.checkout_latest()
+                return tbl
+            except (RuntimeError, ValueError, OSError):
+                pass
+        _forget_table(data_dir, dataset_id, table_name)
+    if inode is None:
+        return None
+    try:
+        tbl = _connect(data_dir, dataset_id).open_table(table_name)
+    except ValueError:
+        return None
+    with _HANDLE_LOCK:
+        _TABLES[key] = (tbl, inode)
+    return tbl
+
+
+def _create_table(data_dir, dataset_id, table_name, data, **kwargs):
+    """db.create_table, caching the new handle in place of any old one."""
+    tbl = _connect(data_dir, dataset_id).create_table(table_name, data, **kwargs)
+    with _HANDLE_LOCK:
+        _TABLES[(_lance_db_path(data_dir, dataset_id), table_name)] = (
+            tbl, _table_inode(data_dir, dataset_id, table_name))
+    return tbl
+
+
+def _drop_table(data_dir, dataset_id, table_name):
+    _forget_table(data_dir, dataset_id, table_name)
+    _connect(data_dir, dataset_id).drop_table(table_name)
+
+
+def _forget_table(data_dir, dataset_id, table_name):
+    with _HANDLE_LOCK:
+        _TABLES.pop((_lance_db_path(data_dir, dataset_id), table_name))
+
+
+@atexit.register
+def _close_handles():
+    """Release cached handles before interpreter shutdown: LanceDB objects
+    still alive while Python finalizes can abort the process on exit."""
+    with _HANDLE_LOCK:
+        _TABLES.clear()
+        _CONNECTIONS.clear()
+    gc.collect()
 
 
 def _get_table_names(db):
@@ -42,7 +149,7 @@ def _get_table_names(db):
 
 
 def append_embeddings(data_dir, dataset_id, embedding_id, vectors, start_index=0,
-                      token_vectors_list=None):
+                      token_vectors_list=None, ls_indices=None, shard=None):
     """Append a batch of embeddings to the LanceDB table.
 
     Parameters
@@ -61,12 +168,21 @@ def append_embeddings(data_dir, dataset_id, embedding_id, vectors, start_index=0
     token_vectors_list : list[np.ndarray] or None
         Per-token vectors for late interaction models.  Each element is a
         (T_i, D) array where T_i varies per document.  None for standard
-        embeddings.
+        embeddings.  Stored normalized to unit norm, as float16.
+    ls_indices : array-like of int or None
+        Explicit row index of each vector, for batches that are not a
+        contiguous range (e.g. length-bucketed embedding).  Overrides
+        start_index when given.
+    shard : int or None
+        Write to this shard's staging table instead of the embedding table
+        (see merge_embedding_shards).
     """
     import pyarrow as pa
 
-    db = _connect(data_dir, dataset_id)
-    table_name = _embedding_table_name(embedding_id)
+    if shard is not None:
+        table_name = _shard_table_name(embedding_id, shard)
+    else:
+        table_name = _embedding_table_name(embedding_id)
 
     n, dim = vectors.shape
 
@@ -75,15 +191,22 @@ def append_embeddings(data_dir, dataset_id, embedding_id, vectors, start_index=0
     # float64 storage is 4x the size of the float16 we use here, and the
     # row-dict path creates millions of PyFloat objects per batch.
     vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    if ls_indices is not None:
+        ls_index = pa.array(np.asarray(ls_indices, dtype=np.int64), pa.int64())
+        if len(ls_index) != n:
+            raise ValueError(f"got {len(ls_index)} ls_indices for {n} vectors")
+    else:
+        ls_index = pa.array(range(start_index, start_index + n), pa.int64())
     columns = {
-        "ls_index": pa.array(range(start_index, start_index + n), pa.int64()),
+        "ls_index": ls_index,
         "vector": pa.FixedSizeListArray.from_arrays(
             pa.array(vectors.reshape(-1), pa.float32()), dim),
     }
     if token_vectors_list is not None:
         lengths = [len(tv) for tv in token_vectors_list]
-        flat = np.concatenate(token_vectors_list).astype(np.float16)
-        flat = np.ascontiguousarray(flat).reshape(-1)
+        flat = np.concatenate(token_vectors_list).astype(np.float32).reshape(-1, dim)
+        flat /= np.linalg.norm(flat, axis=1, keepdims=True) + 1e-10
+        flat = flat.astype(np.float16).reshape(-1)
         inner = pa.FixedSizeListArray.from_arrays(pa.array(flat, pa.float16()), dim)
         offsets = np.zeros(n + 1, dtype=np.int32)
         np.cumsum(lengths, out=offsets[1:])
@@ -91,15 +214,171 @@ def append_embeddings(data_dir, dataset_id, embedding_id, vectors, start_index=0
             pa.array(offsets, pa.int32()), inner)
         columns["num_tokens"] = pa.array(lengths, pa.int32())
     batch = pa.table(columns)
-
-    if table_name in _get_table_names(db):
-        tbl = db.open_table(table_name)
+    if token_vectors_list is not None:
+        field = batch.schema.field("token_vectors").with_metadata({_UNIT_NORM_KEY: b"true"})
+        batch = batch.cast(batch.schema.set(batch.schema.get_field_index("token_vectors"),
+                                            field))
+
+    tbl = _open_table(data_dir, dataset_id, table_name)
+    if tbl is not None:
+        if _precision_info(tbl.schema)["precision"] in ("int8", "binary"):
+            raise ValueError(f"{embedding_id} is stored quantized and can't be appended to; "
+                             "embed into a new embedding id instead")
         if tbl.schema != batch.schema:
             # Legacy table (e.g. resuming a pre-schema run): cast to its schema
             batch = batch.cast(tbl.schema)
         tbl.add(batch)
     else:
-        db.create_table(table_name, batch)
+        _create_table(data_dir, dataset_id, table_name, batch)
+
+
+def _precision_info(schema):
+    """Quantization parameters recorded in a table's schema metadata."""
+    import json
+
+    raw = (schema.metadata or {}).get(_PRECISION_KEY)
+    if raw is None:
+        return {"precision": "float32"}
+    info = json.loads(raw)
+    for key in ("scale", "offset"):
+        if key in info:
+            info[key] = np.asarray(info[key], dtype=np.float32)
+    return info
+
+
+def get_embedding_precision(data_dir, dataset_id, embedding_id):
+    """Return the storage precision info of an embedding table: a dict with
+    "precision" and, for int8, per-dimension "scale"/"offset" arrays; for
+    binary, the unpacked "dimensions"."""
+    tbl = _open_table(data_dir, dataset_id, _embedding_table_name(embedding_id))
+    if tbl is None:
+        return {"precision": "float32"}
+    return _precision_info(tbl.schema)
+
+
+def quantize_vectors(vectors, precision, min_values=None, max_values=None):
+    """Encode float vectors for storage; returns (codes, info).
+
+    int8 maps each dimension's [min, max] onto the 256 code values; binary
+    keeps the sign of each dimension, 8 dimensions per byte.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if precision == "float32":
+        return vectors, {"precision": "float32"}
+    if precision == "float16":
+        return vectors.astype(np.float16), {"precision": "float16"}
+    if precision == "int8":
+        lo = np.asarray(min_values if min_values is not None else vectors.min(axis=0),
+                        dtype=np.float32)
+        hi = np.asarray(max_values if max_values is not None else vectors.max(axis=0),
+                        dtype=np.float32)
+        scale = (hi - lo) / 255.0
+        scale[scale == 0] = 1.0
+        codes = np.clip(np.rint((vectors - lo) / scale), 0, 255) - 128
+        return codes.astype(np.int8), {"precision": "int8", "scale": scale, "offset": lo}
+    if precision == "binary":
+        return (np.packbits(vectors > 0, axis=1),
+                {"precision": "binary", "dimensions": int(vectors.shape[1])})
+    raise ValueError(f"Unknown precision '{precision}' (expected one of {', '.join(PRECISIONS)})")
+
+
+def dequantize_vectors(codes, info):
+    """Decode stored vectors back to float32 (binary decodes to +/-1)."""
+    precision = info["precision"]
+    if precision == "int8":
+        return (codes.astype(np.float32) + 128) * info["scale"] + info["offset"]
+    if precision == "binary":
+        bits = np.unpackbits(codes, axis=1, count=info["dimensions"])
+        return bits.astype(np.float32) * 2 - 1
+    return codes.astype(np.float32, copy=False)
+
+
+def quantize_embeddings(data_dir, dataset_id, embedding_id, precision, min_values=None,
+                        max_values=None, batch_size=10000):
+    """Rewrite a finished float32 embedding table's vector column in
+    `precision`, streaming `batch_size` rows at a time.
+
+    The parameters go into the table's schema metadata, so load_embeddings
+    and search_nn dequantize transparently. Other columns (token vectors)
+    are copied unchanged.
+    """
+    import json
+
+    import pyarrow as pa
+
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision '{precision}' (expected one of "
+                         f"{', '.join(PRECISIONS)})")
+    if precision == "float32":
+        return
+    table_name = _embedding_table_name(embedding_id)
+    tbl = _open_table(data_dir, dataset_id, table_name)
+    if tbl is None:
+        raise ValueError(f"No LanceDB table for {embedding_id}")
+    current = _precision_info(tbl.schema)["precision"]
+    if current == precision:
+        return  # e.g. --rerun of a finished run
+    if current != "float32":
+        raise ValueError(f"{embedding_id} is already stored as {current}")
+    dim = tbl.schema.field("vector").type.list_size
+    if precision == "int8" and (min_values is None or max_values is None):
+        stats = get_embedding_stats(data_dir, dataset_id, embedding_id)
+        min_values, max_values = stats["min_values"], stats["max_values"]
+
+    _, info = quantize_vectors(np.zeros((1, dim), dtype=np.float32), precision,
+                               min_values, max_values)
+    value_type = {"float16": pa.float16(), "int8": pa.int8(), "binary": pa.uint8()}[precision]
+    width = -(-dim // 8) if precision == "binary" else dim
+    meta = {k: (v.tolist() if isinstance(v, np.ndarray) else v) for k, v in info.items()}
+    fields = [pa.field("vector", pa.list_(value_type, width)) if f.name == "vector" else f
+              for f in tbl.schema]
+    schema = pa.schema(fields, metadata={_PRECISION_KEY: json.dumps(meta).encode()})
+
+    # Read from the pinned current version while the overwrite commits a new
+    # one; the old data files stay valid until the next cleanup.
+    source = tbl.to_lance()
+
+    def batches():
+        for batch in source.to_batches(batch_size=batch_size):
+            vectors = batch.column("vector").flatten().to_numpy(zero_copy_only=False)
+            codes, _ = quantize_vectors(vectors.reshape(batch.num_rows, dim), precision,
+                                        min_values, max_values)
+            columns = [
+                pa.FixedSizeListArray.from_arrays(pa.array(codes.reshape(-1), value_type), width)
+                if name == "vector" else batch.column(name)
+                for name in schema.names
+            ]
+            yield pa.RecordBatch.from_arrays(columns, schema=schema)
+
+    _create_table(data_dir, dataset_id, table_name, batches(), schema=schema, mode="overwrite")
+
+
+def sort_embeddings(data_dir, dataset_id, embedding_id, batch_size=10000):
+    """Rewrite an embedding table in ls_index order, if it isn't already.
+
+    Length-bucketed (--sort-by-length) and resumed runs append rows out of
+    order; every later ordered read of such a table would fetch rows by
+    position instead of streaming one sequential scan. Returns True if the
+    table was rewritten.
+    """
+    table_name = _embedding_table_name(embedding_id)
+    tbl = _open_table(data_dir, dataset_id, table_name)
+    if tbl is None:
+        return False
+    # Read from the pinned current version while the overwrite commits a new
+    # one (see quantize_embeddings).
+    source = tbl.to_lance()
+    ls_index = source.to_table(columns=["ls_index"]).column(0).to_numpy()
+    if np.all(ls_index[1:] > ls_index[:-1]):
+        return False
+    schema = tbl.schema
+
+    def batches():
+        for data in _ordered_batches(source, schema.names, batch_size):
+            yield from data.select(schema.names).cast(schema).to_batches()
+
+    _create_table(data_dir, dataset_id, table_name, batches(), schema=schema, mode="overwrite")
+    return True
 
 
 def list_embedding_ids(data_dir, dataset_id):
@@ -119,85 +398,226 @@ def list_embedding_ids(data_dir, dataset_id):
     ]
 
 
-def get_embedding_count(data_dir, dataset_id, embedding_id):
-    """Return the number of embeddings stored, or 0 if none."""
-    db = _connect(data_dir, dataset_id)
-    table_name = _embedding_table_name(embedding_id)
-    if table_name in _get_table_names(db):
-        tbl = db.open_table(table_name)
+def get_embedding_count(data_dir, dataset_id, embedding_id, shard=None):
+    """Return the number of embeddings stored (in one shard's staging table
+    if `shard` is given), or 0 if none."""
+    if shard is not None:
+        table_name = _shard_table_name(embedding_id, shard)
+    else:
+        table_name = _embedding_table_name(embedding_id)
+    tbl = _open_table(data_dir, dataset_id, table_name)
+    if tbl is not None:
         return tbl.count_rows()
     return 0
 
 
-def load_embeddings(data_dir, dataset_id, embedding_id):
+def merge_embedding_shards(data_dir, dataset_id, embedding_id, shards, on_progress=None):
+    """Append each shard's staging table to the embedding table, then drop it.
+
+    Parameters
+    ----------
+    shards : list of (shard, start, end)
+        Shard numbers and the ls_index range [start, end) each one covers.
+    on_progress : callable(shard, rows) or None
+
+    Each shard is added in a single commit, so a crash mid-merge leaves every
+    shard either fully merged or untouched; rerunning skips shards whose
+    range is already present in the embedding table.
+    """
+    table_name = _embedding_table_name(embedding_id)
+    for shard, start, end in shards:
+        shard_table = _shard_table_name(embedding_id, shard)
+        src = _open_table(data_dir, dataset_id, shard_table)
+        if src is None:
+            continue
+        rows = src.count_rows()
+        tbl = _open_table(data_dir, dataset_id, table_name)
+        if tbl is not None:
+            merged = tbl.count_rows(f"ls_index >= {int(start)} AND ls_index < {int(end)}")
+            if merged == 0 and rows:
+                tbl.add(src.to_lance().to_batches())
+        elif rows:
+            _create_table(data_dir, dataset_id, table_name, src.to_lance().to_batches(),
+                          schema=src.schema)
+        _drop_table(data_dir, dataset_id, shard_table)
+        if on_progress is not None:
+            on_progress(shard, rows)
+
+
+def get_embedded_indices(data_dir, dataset_id, embedding_id):
+    """Return the sorted ls_index values stored so far (int64), or an empty
+    array if the table doesn't exist.
+
+    Runs that embed rows out of order (length-bucketed batching) resume by
+    index coverage rather than by row count.
+    """
+    table_name = _embedding_table_name(embedding_id)
+    tbl = _open_table(data_dir, dataset_id, table_name)
+    if tbl is None:
+        return np.zeros(0, dtype=np.int64)
+    data = tbl.to_lance().to_table(columns=["ls_index"])
+    return np.sort(data["ls_index"].to_numpy().astype(np.int64))
+
+
+def _sidecar_path(data_dir, dataset_id, embedding_id, version):
+    """Row-ordered float32 .npy copy of an embedding table at `version`."""
+    return os.path.join(data_dir, dataset_id, "embeddings", f"{embedding_id}.v{version}.npy")
+
+
+def write_embedding_sidecar(data_dir, dataset_id, embedding_id):
+    """Write the finished embedding matrix (ls_index order, float32) as a
+    .npy next to the embedding meta, for load_embeddings to memory-map.
+
+    The file name carries the table version it was written from; any later
+    append, optimize or rewrite bumps the version, so a stale sidecar is
+    never read. Older sidecars for the embedding are removed. Skipped for
+    quantized (float16/int8/binary) tables, where a float32 copy would undo
+    the space savings. Returns the path, or None if skipped.
+    """
+    table_name = _embedding_table_name(embedding_id)
+    tbl = _open_table(data_dir, dataset_id, table_name)
+    if tbl is None:
+        return None
+    if _precision_info(tbl.schema)["precision"] != "float32":
+        return None
+    path = _sidecar_path(data_dir, dataset_id, embedding_id, tbl.version)
+    vectors = load_embeddings(data_dir, dataset_id, embedding_id, mmap=False)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, vectors)
+    os.replace(tmp_path, path)
+    prefix = f"{embedding_id}.v"
+    for entry in os.listdir(os.path.dirname(path)):
+        if entry.startswith(prefix) and entry.endswith(".npy") and \
+                entry != os.path.basename(path):
+            os.remove(os.path.join(os.path.dirname(path), entry))
+    return path
+
+
+def load_embeddings(data_dir, dataset_id, embedding_id, dequantize=True, mmap=True):
     """Load all dense (mean) embeddings as a numpy array.
 
     Falls back to HDF5 if LanceDB table doesn't exist (backward compat).
 
+    If the embedding has a current .npy sidecar (write_embedding_sidecar),
+    it is memory-mapped read-only instead of re-reading the table, so
+    processes share one page-cached copy. Pass ``mmap=False`` for an
+    in-memory array read from the table.
+
+    Quantized tables (see quantize_embeddings) are decoded to float32 unless
+    `dequantize` is False, in which case the stored form is returned as is:
+    float16 vectors, int8 codes, or packed sign bits (N, ceil(D / 8)) uint8.
+
     Returns
     -------
     np.ndarray of shape (N, D)
     """
-    db = _connect(data_dir, dataset_id)
-    table_name = _embedding_table_name(embedding_id)
-
-    if table_name in _get_table_names(db):
-        tbl = db.open_table(table_name)
-        # Read only the columns we need: for late interaction tables the
-        # token_vectors column is 50-100x the size of the mean vectors and
-        # to_pandas() on all columns would materialize it for nothing.
-        data = tbl.to_lance().to_table(columns=["ls_index", "vector"])
-        order = np.argsort(data["ls_index"].to_numpy())
-        vec_col = data["vector"].combine_chunks()
-        flat = vec_col.flatten().to_numpy(zero_copy_only=False)
-        vectors = flat.reshape(len(data), -1).astype(np.float32, copy=False)
-        return np.ascontiguousarray(vectors[order])
+    tbl = _open_table(data_dir, dataset_id, _embedding_table_name(embedding_id))
+    if tbl is not None:
+        if mmap and dequantize:
+            path = _sidecar_path(data_dir, dataset_id, embedding_id, tbl.version)
+            if os.path.exists(path):
+                return np.load(path, mmap_mode="r")
+        _, vectors = _read_vectors(tbl.to_lance(), dequantize)
+        return vectors
 
     # Fallback: try legacy HDF5
     return _load_hdf5_embeddings(data_dir, dataset_id, embedding_id)
 
 
-def load_token_vectors(data_dir, dataset_id, embedding_id, indices=None):
+def _read_vectors(dataset, dequantize=True):
+    """(sorted ls_index, vectors in that order) from a Lance dataset."""
+    # Read only the columns we need: for late interaction tables the
+    # token_vectors column is 50-100x the size of the mean vectors and
+    # to_pandas() on all columns would materialize it for nothing.
+    data = dataset.to_table(columns=["ls_index", "vector"])
+    ls_index = data["ls_index"].to_numpy()
+    order = np.argsort(ls_index)
+    vec_col = data["vector"].combine_chunks()
+    flat = vec_col.flatten().to_numpy(zero_copy_only=False)
+    vectors = flat.reshape(len(data), -1)[order]
+    if dequantize:
+        vectors = dequantize_vectors(vectors, _precision_info(dataset.schema))
+    return ls_index[order], np.ascontiguousarray(vectors)
+
+
+def _token_matrix(token_column, dtype=np.float32):
+    """Decode an Arrow ``list<fixed_size_list<float16>>`` token column into
+    one (T, D) matrix of every token vector plus (N + 1,) int64 document
+    offsets, straight from the Arrow buffers.
+
+    The cast to `dtype` (None keeps the stored float16) is a single
+    vectorized step; no per-token Python objects are created.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if isinstance(token_column, pa.ChunkedArray):
+        token_column = token_column.combine_chunks()
+    lengths = pc.list_value_length(token_column).fill_null(0).to_numpy(zero_copy_only=False)
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    tokens = token_column.flatten()  # accounts for slicing, unlike .values
+    values = tokens.flatten().to_numpy(zero_copy_only=False)
+    if pa.types.is_fixed_size_list(tokens.type):
+        dim = tokens.type.list_size
+    else:  # legacy list<list<double>> tables
+        dim = len(values) // offsets[-1] if offsets[-1] else 0
+    matrix = values.reshape(int(offsets[-1]), dim)
+    if dtype is not None:
+        matrix = matrix.astype(dtype, copy=False)
+    return matrix, offsets
+
+
+def split_token_matrix(matrix, offsets):
+    """Per-document views (no copies) into a token matrix from _token_matrix."""
+    return [matrix[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+
+def load_token_vectors(data_dir, dataset_id, embedding_id, indices=None, dtype=np.float32,
+                       flat=False):
     """Load per-token vectors for late interaction models.
 
     Parameters
     ----------
     indices : list[int] or None
         If given, load only these row indices.  Otherwise load all.
+    dtype : numpy dtype or None
+        Upcast the stored float16 vectors to this type (None: keep float16).
+    flat : bool
+        Return ``(matrix, offsets)`` instead of a list: every token vector in
+        one (T, D) array and the (N + 1,) offsets of each document's tokens.
 
     Returns
     -------
     list[np.ndarray]
-        Each element is (T_i, D) array of token vectors for that document.
+        Each element is (T_i, D) array of token vectors for that document,
+        a view into one shared matrix.
     """
-    db = _connect(data_dir, dataset_id)
     table_name = _embedding_table_name(embedding_id)
-
-    if table_name not in _get_table_names(db):
+    tbl = _open_table(data_dir, dataset_id, table_name)
+    if tbl is None:
         raise ValueError(f"No LanceDB table for {embedding_id}. "
                          "Token vectors are only available for LanceDB embeddings.")
 
-    tbl = db.open_table(table_name)
-
     if "token_vectors" not in tbl.schema.names:
         raise ValueError(f"Embedding {embedding_id} does not have token vectors "
                          "(not a late interaction embedding).")
 
     if indices is not None:
         # Filter to specific indices
-        df = tbl.search().where(
+        data = tbl.search().where(
             f"ls_index IN ({','.join(str(i) for i in indices)})"
-        ).select(["ls_index", "token_vectors"]).to_pandas()
+        ).select(["ls_index", "token_vectors"]).limit(len(indices)).to_arrow()
     else:
-        df = tbl.to_pandas()
+        data = tbl.to_lance().to_table(columns=["ls_index", "token_vectors"])
 
-    df = df.sort_values("ls_index")
-    result = []
-    for tv in df["token_vectors"].tolist():
-        # tv may be a numpy array of numpy arrays, or a list of lists
-        arr = np.stack(tv).astype(np.float32)
-        result.append(arr)
-    return result
+    data = data.sort_by("ls_index")
+    matrix, offsets = _token_matrix(data["token_vectors"], dtype)
+    if flat:
+        return matrix, offsets
+    return split_token_matrix(matrix, offsets)
 
 
 def load_num_tokens(data_dir, dataset_id, embedding_id):
@@ -207,12 +627,10 @@ def load_num_tokens(data_dir, dataset_id, embedding_id):
     -------
     np.ndarray of shape (N,) int32, in ls_index order.
     """
-    db = _connect(data_dir, dataset_id)
     table_name = _embedding_table_name(embedding_id)
-
-    if table_name not in _get_table_names(db):
+    tbl = _open_table(data_dir, dataset_id, table_name)
+    if tbl is None:
         raise ValueError(f"No LanceDB table for {embedding_id}")
-    tbl = db.open_table(table_name)
     if "num_tokens" not in tbl.schema.names:
         raise ValueError(f"Embedding {embedding_id} does not have token vectors "
                          "(not a late interaction embedding).")
@@ -221,40 +639,132 @@ def load_num_tokens(data_dir, dataset_id, embedding_id):
     return data["num_tokens"].to_numpy()[order].astype(np.int32)
 
 
-def iter_token_vectors(data_dir, dataset_id, embedding_id, row_batch_size=256):
+def _token_batch_rows(ds, batch_bytes):
+    """Documents per batch so one batch of float16 token vectors is about
+    `batch_bytes` (from the mean num_tokens, when the table has it)."""
+    if ds.count_rows() == 0:
+        return 1
+    dim = ds.schema.field("token_vectors").type.value_type
+    dim = dim.list_size if hasattr(dim, "list_size") else 1
+    if "num_tokens" in ds.schema.names:
+        mean_tokens = max(1.0, float(np.mean(
+            ds.to_table(columns=["num_tokens"]).column(0).to_numpy())))
+    else:
+        mean_tokens = 50.0
+    return max(1, int(batch_bytes // (mean_tokens * dim * 2)))
+
+
+def iter_token_vectors(data_dir, dataset_id, embedding_id, row_batch_size=256,
+                       dtype=np.float32, flat=False, batch_bytes=None, fragment_readahead=4):
     """Stream per-token vectors for all documents, in ls_index order.
 
     Never materializes the full token set: reads `row_batch_size` documents
-    per LanceDB query.
+    at a time from one sequential Lance scan (projected to ls_index and
+    token_vectors, with `fragment_readahead` fragments read ahead). If
+    `batch_bytes` is given it overrides `row_batch_size` with however many
+    documents make roughly that many bytes of token vectors.
+
+    Rows come in ls_index order even from an unordered table (see
+    _ordered_batches).
 
     Yields
     ------
     (ls_indices, token_vectors_list) : (np.ndarray of int64, list[np.ndarray])
-        token_vectors_list[i] has shape (T_i, D) float32 and belongs to
-        document ls_indices[i].
+        token_vectors_list[i] has shape (T_i, D) (float32 unless `dtype`
+        says otherwise) and belongs to document ls_indices[i].
+    (ls_indices, matrix, offsets) when ``flat`` is True
+        The batch's token vectors as one (T, D) matrix, document i's tokens
+        being ``matrix[offsets[i]:offsets[i + 1]]``.
     """
-    db = _connect(data_dir, dataset_id)
     table_name = _embedding_table_name(embedding_id)
-    if table_name not in _get_table_names(db):
+    tbl = _open_table(data_dir, dataset_id, table_name)
+    if tbl is None:
         raise ValueError(f"No LanceDB table for {embedding_id}")
-    tbl = db.open_table(table_name)
     if "token_vectors" not in tbl.schema.names:
         raise ValueError(f"Embedding {embedding_id} does not have token vectors "
                          "(not a late interaction embedding).")
 
-    n = tbl.count_rows()
-    for start in range(0, n, row_batch_size):
-        stop = min(start + row_batch_size, n)
-        df = (
-            tbl.search()
-            .where(f"ls_index >= {start} AND ls_index < {stop}")
-            .select(["ls_index", "token_vectors"])
-            .limit(stop - start)
-            .to_pandas()
-        )
-        df = df.sort_values("ls_index")
-        vecs = [np.stack(tv).astype(np.float32) for tv in df["token_vectors"]]
-        yield df["ls_index"].to_numpy(), vecs
+    ds = tbl.to_lance()
+    if batch_bytes:
+        row_batch_size = _token_batch_rows(ds, batch_bytes)
+    for data in _ordered_batches(ds, ["ls_index", "token_vectors"], row_batch_size,
+                                 fragment_readahead):
+        ls_indices = data["ls_index"].to_numpy()
+        matrix, offsets = _token_matrix(data["token_vectors"], dtype)
+        if flat:
+            yield ls_indices, matrix, offsets
+        else:
+            yield ls_indices, split_token_matrix(matrix, offsets)
+
+
+def _ordered_batches(ds, columns, batch_size, fragment_readahead=4):
+    """Non-empty record batches of `columns` (which include ls_index) in
+    ls_index order, at most `batch_size` rows each.
+
+    ls-embed leaves its tables in ls_index order (sort_embeddings rewrites
+    length-bucketed and resumed runs), so rows stream straight through one
+    sequential scan. Only if the ls_index column turns out to be unordered
+    (e.g. a table from an older run) are rows instead fetched by position
+    in ls_index order.
+    """
+    ls_index = ds.to_table(columns=["ls_index"]).column(0).to_numpy()
+    if np.all(ls_index[1:] > ls_index[:-1]):
+        batches = ds.to_batches(columns=columns, batch_size=batch_size, scan_in_order=True,
+                                fragment_readahead=fragment_readahead)
+    else:
+        order = np.argsort(ls_index, kind="stable")
+
+        def take_in_order():
+            for start in range(0, len(order), batch_size):
+                positions = order[start:start + batch_size]
+                # read in storage order, then put back in ls_index order
+                by_position = np.argsort(positions)
+                data = ds.take(positions[by_position], columns=columns)
+                yield data.take(np.argsort(by_position))
+
+        batches = take_in_order()
+    for data in batches:
+        if data.num_rows:
+            yield data
+
+
+def iter_embeddings(data_dir, dataset_id, embedding_id, batch_size=65536, dequantize=True):
+    """Stream the dense (mean) embeddings in ls_index order, `batch_size`
+    rows at a time, so whole-table passes (stats, truncation) run in bounded
+    memory. Falls back to slices of a legacy HDF5 file.
+
+    Yields
+    ------
+    (ls_indices, vectors) : (np.ndarray of int64, np.ndarray of shape (n, D))
+        float32 vectors unless `dequantize` is False (see load_embeddings).
+    """
+    tbl = _open_table(data_dir, dataset_id, _embedding_table_name(embedding_id))
+    if tbl is None:
+        import h5py
+
+        emb_path = os.path.join(data_dir, dataset_id, "embeddings", f"{embedding_id}.h5")
+        if not os.path.exists(emb_path):
+            raise FileNotFoundError(f"No embeddings found for {embedding_id} "
+                                    f"(checked LanceDB and HDF5 at {emb_path})")
+        with h5py.File(emb_path, "r") as f:
+            dset = f["embeddings"]
+            for start in range(0, len(dset), batch_size):
+                vectors = np.asarray(dset[start:start + batch_size])
+                yield np.arange(start, start + len(vectors), dtype=np.int64), vectors
+        return
+
+    import pyarrow as pa
+
+    ds = tbl.to_lance()
+    info = _precision_info(ds.schema)
+    for data in _ordered_batches(ds, ["ls_index", "vector"], batch_size):
+        column = data["vector"]
+        if isinstance(column, pa.ChunkedArray):
+            column = column.combine_chunks()
+        vectors = column.flatten().to_numpy(zero_copy_only=False).reshape(data.num_rows, -1)
+        if dequantize:
+            vectors = dequantize_vectors(vectors, info)
+        yield data["ls_index"].to_numpy(), np.ascontiguousarray(vectors)
 
 
 # ---------------------------------------------------------------------------
@@ -283,7 +793,6 @@ def append_token_metadata(data_dir, dataset_id, embedding_id, ls_indices,
     """
     import pyarrow as pa
 
-    db = _connect(data_dir, dataset_id)
     table_name = _token_table_name(embedding_id)
 
     n = len(token_strs)
@@ -297,33 +806,31 @@ def append_token_metadata(data_dir, dataset_id, embedding_id, ls_indices,
         "char_end": pa.array(np.asarray(char_ends, dtype=np.int32), pa.int32()),
     })
 
-    if table_name in _get_table_names(db):
-        db.open_table(table_name).add(batch)
+    tbl = _open_table(data_dir, dataset_id, table_name)
+    if tbl is not None:
+        tbl.add(batch)
     else:
-        db.create_table(table_name, batch)
+        _create_table(data_dir, dataset_id, table_name, batch)
 
 
 def drop_token_metadata(data_dir, dataset_id, embedding_id):
     """Remove the token metadata table if it exists (for re-runs)."""
-    db = _connect(data_dir, dataset_id)
     table_name = _token_table_name(embedding_id)
-    if table_name in _get_table_names(db):
-        db.drop_table(table_name)
+    if _open_table(data_dir, dataset_id, table_name) is not None:
+        _drop_table(data_dir, dataset_id, table_name)
 
 
 def has_token_metadata(data_dir, dataset_id, embedding_id):
     """Check whether ls-tokenize has been run for this embedding."""
-    db = _connect(data_dir, dataset_id)
-    return _token_table_name(embedding_id) in _get_table_names(db)
+    return _open_table(data_dir, dataset_id, _token_table_name(embedding_id)) is not None
 
 
 def count_token_metadata(data_dir, dataset_id, embedding_id):
     """Return the total number of token metadata rows."""
-    db = _connect(data_dir, dataset_id)
-    table_name = _token_table_name(embedding_id)
-    if table_name not in _get_table_names(db):
+    tbl = _open_table(data_dir, dataset_id, _token_table_name(embedding_id))
+    if tbl is None:
         return 0
-    return db.open_table(table_name).count_rows()
+    return tbl.count_rows()
 
 
 def load_token_metadata(data_dir, dataset_id, embedding_id, token_indices=None,
@@ -343,11 +850,10 @@ def load_token_metadata(data_dir, dataset_id, embedding_id, token_indices=None,
     -------
     pd.DataFrame sorted by token_index.
     """
-    db = _connect(data_dir, dataset_id)
     table_name = _token_table_name(embedding_id)
-    if table_name not in _get_table_names(db):
+    tbl = _open_table(data_dir, dataset_id, table_name)
+    if tbl is None:
         raise ValueError(f"No token metadata for {embedding_id}. Run ls-tokenize first.")
-    tbl = db.open_table(table_name)
 
     if token_indices is not None:
         values = ",".join(str(int(i)) for i in token_indices)
@@ -369,61 +875,65 @@ def load_token_metadata(data_dir, dataset_id, embedding_id, token_indices=None,
 
 def create_token_metadata_indexes(data_dir, dataset_id, embedding_id):
     """BTREE indexes for the two lookup patterns: by token and by parent doc."""
-    db = _connect(data_dir, dataset_id)
     table_name = _token_table_name(embedding_id)
-    if table_name not in _get_table_names(db):
+    tbl = _open_table(data_dir, dataset_id, table_name)
+    if tbl is None:
         return
-    tbl = db.open_table(table_name)
     tbl.create_scalar_index("token_index")
     tbl.create_scalar_index("ls_index")
 
 
 def has_token_vectors(data_dir, dataset_id, embedding_id):
     """Check if this embedding has per-token vectors (late interaction)."""
-    db = _connect(data_dir, dataset_id)
     table_name = _embedding_table_name(embedding_id)
-    if table_name not in _get_table_names(db):
+    tbl = _open_table(data_dir, dataset_id, table_name)
+    if tbl is None:
         return False
-    tbl = db.open_table(table_name)
     return "token_vectors" in tbl.schema.names
 
 
-def create_vector_index(data_dir, dataset_id, embedding_id, metric="cosine"):
+def create_vector_index(data_dir, dataset_id, embedding_id, metric="cosine", tune=False,
+                        target_recall=None, k=10, n_queries=100):
     """Create an ANN index on the mean vector column.
 
-    No-op below 256 rows (too few for an IVF index); brute-force search is
-    fast at that scale anyway.
+    With `tune`, the IVF_PQ parameters and the query-time nprobes and
+    refine_factor are chosen by measured recall on held-out rows (see
+    index_tuning.tune_ivf_pq) instead of taken from the row count and
+    dimension. Returns the index parameters (with recall and latency when
+    tuned), for the embedding meta's "vector_index", or None if no index
+    was built: below 256 rows (brute-force search is fast at that scale
+    anyway) and for int8/binary tables.
     """
-    db = _connect(data_dir, dataset_id)
+    from latentscope.util.index_tuning import (
+        DEFAULT_TARGET_RECALL,
+        MIN_INDEX_ROWS,
+        default_index_config,
+        tune_ivf_pq,
+    )
+
     table_name = _embedding_table_name(embedding_id)
-    if table_name not in _get_table_names(db):
-        return
-    tbl = db.open_table(table_name)
+    tbl = _open_table(data_dir, dataset_id, table_name)
+    if tbl is None:
+        return None
+    if _precision_info(tbl.schema)["precision"] in ("int8", "binary"):
+        return None  # codes aren't in the metric space; search_nn scans them exactly
     num_rows = tbl.count_rows()
-    if num_rows < 256:
-        return  # too few rows for IVF index
-    dim = tbl.schema.field("vector").type.list_size
-    partitions = min(256, num_rows // 10)
-    # IVF_PQ requires num_sub_vectors to divide the vector dimension; user
-    # supplied --dimensions values can be arbitrary, so pick the largest
-    # divisor of dim that is <= dim // 16 (falling back to 1).
-    target = max(1, dim // 16)
-    sub_vectors = next(d for d in range(target, 0, -1) if dim % d == 0)
-    tbl.create_index(
-        num_partitions=partitions,
-        num_sub_vectors=sub_vectors,
-        metric=metric,
-        vector_column_name="vector",
-    )
+    if num_rows < MIN_INDEX_ROWS:
+        return None  # too few rows for IVF index
+    if tune:
+        return tune_ivf_pq(tbl, metric=metric, k=k, n_queries=n_queries,
+                           target_recall=target_recall or DEFAULT_TARGET_RECALL)
+    config = default_index_config(num_rows, tbl.schema.field("vector").type.list_size)
+    tbl.create_index(metric=metric, vector_column_name="vector", **config)
+    return {"index_type": "IVF_PQ", "metric": metric, **config}
 
 
 def create_scalar_index(data_dir, dataset_id, embedding_id, column="ls_index"):
     """Create a BTREE index on a scalar column (used by token-vector lookups)."""
-    db = _connect(data_dir, dataset_id)
     table_name = _embedding_table_name(embedding_id)
-    if table_name not in _get_table_names(db):
+    tbl = _open_table(data_dir, dataset_id, table_name)
+    if tbl is None:
         return
-    tbl = db.open_table(table_name)
     tbl.create_scalar_index(column)
 
 
@@ -433,51 +943,348 @@ def optimize_table(data_dir, dataset_id, embedding_id):
     Embedding runs append one fragment per batch (10k fragments per 1M rows
     at the default batch size); compaction keeps reads and count_rows fast.
     """
-    db = _connect(data_dir, dataset_id)
     table_name = _embedding_table_name(embedding_id)
-    if table_name not in _get_table_names(db):
+    tbl = _open_table(data_dir, dataset_id, table_name)
+    if tbl is None:
         return
-    tbl = db.open_table(table_name)
     tbl.optimize()
 
 
-def search_nn(data_dir, dataset_id, embedding_id, query_vector, limit=150, metric="cosine"):
+def search_nn(data_dir, dataset_id, embedding_id, query_vector, limit=150, metric="cosine",
+              mode="ann", candidates=None, nprobes=None, refine_factor=None):
     """Search for nearest neighbors using the mean vector.
 
+    ``mode="binary"`` uses the in-memory sign-bit prefilter with an exact
+    cosine rerank of `candidates` rows (see search_nn_binary) instead of the
+    LanceDB vector index. `nprobes` and `refine_factor` tune the vector
+    index query (the embedding meta's "vector_index" records tuned values;
+    None: LanceDB's defaults).
+
     Returns (indices, distances) arrays.
     """
-    db = _connect(data_dir, dataset_id)
+    if mode == "binary":
+        if metric != "cosine":
+            raise ValueError("binary search mode only supports the cosine metric")
+        return search_nn_binary(data_dir, dataset_id, embedding_id, query_vector, limit=limit,
+                                candidates=candidates)
+    if mode != "ann":
+        raise ValueError(f"Unknown search mode '{mode}' (expected 'ann' or 'binary')")
     table_name = _embedding_table_name(embedding_id)
-
-    if table_name not in _get_table_names(db):
+    tbl = _open_table(data_dir, dataset_id, table_name)
+    if tbl is None:
         raise ValueError(f"No LanceDB table for {embedding_id}")
-
-    tbl = db.open_table(table_name)
-    results = (
-        tbl.search(query_vector, vector_column_name="vector")
-        .metric(metric)
-        .select(["ls_index"])
-        .limit(limit)
-        .to_list()
-    )
+    info = _precision_info(tbl.schema)
+    if info["precision"] in ("int8", "binary"):
+        return _scan_quantized(tbl, info, query_vector, limit, metric)
+    query = tbl.search(query_vector, vector_column_name="vector").metric(metric)
+    if nprobes:
+        query = query.nprobes(int(nprobes))
+    if refine_factor:
+        query = query.refine_factor(int(refine_factor))
+    results = query.select(["ls_index", "_distance"]).limit(limit).to_list()
     indices = [r["ls_index"] for r in results]
     distances = [r["_distance"] for r in results]
     return indices, distances
 
 
+def _scan_quantized(tbl, info, query_vector, limit, metric, batch_size=65536):
+    """Exact nearest neighbors over a quantized table: dequantize a batch at
+    a time and keep a running top `limit`."""
+    query = np.asarray(query_vector, dtype=np.float32).reshape(1, -1)
+    return _exact_topk(_iter_vectors(tbl.to_lance(), info, batch_size), query, limit, metric)[0]
+
+
+def _iter_vectors(dataset, info, batch_size=65536):
+    """Yield (ls_index, dequantized vectors, None) batches of a table scan."""
+    for batch in dataset.to_batches(columns=["ls_index", "vector"], batch_size=batch_size):
+        codes = batch.column("vector").flatten().to_numpy(zero_copy_only=False)
+        vectors = dequantize_vectors(codes.reshape(batch.num_rows, -1), info)
+        yield batch.column("ls_index").to_numpy(), vectors, None
+
+
+def _exact_topk(batches, queries, limit, metric):
+    """Exact top `limit` rows for every query over (ls_index, vectors, norms)
+    batches (norms may be None), scoring all queries against a batch with
+    one matmul. Distances follow LanceDB's conventions (cosine: 1 - cos,
+    l2: squared, dot: 1 - dot). Returns [(indices, distances)] per query.
+    """
+    if metric not in ("cosine", "l2", "dot"):
+        raise ValueError(f"Unsupported metric '{metric}'")
+    queries = np.asarray(queries, dtype=np.float32)
+    if metric == "cosine":
+        queries = queries / (np.linalg.norm(queries, axis=1, keepdims=True) + 1e-10)
+    best_idx = np.zeros((len(queries), 0), dtype=np.int64)
+    best_dist = np.zeros((len(queries), 0), dtype=np.float32)
+    for ls_index, vectors, norms in batches:
+        if len(vectors) == 0:
+            continue
+        scores = queries @ np.asarray(vectors, dtype=np.float32).T
+        if metric == "cosine":
+            if norms is None:
+                norms = np.linalg.norm(vectors, axis=1) + 1e-10
+            dist = 1.0 - scores / norms
+        elif metric == "l2":
+            sq = np.einsum("ij,ij->i", vectors, vectors, dtype=np.float32)
+            dist = np.maximum(np.sum(queries ** 2, axis=1)[:, None] - 2 * scores + sq, 0)
+        else:
+            dist = 1.0 - scores
+        best_idx = np.concatenate(
+            [best_idx, np.broadcast_to(np.asarray(ls_index, dtype=np.int64), dist.shape)], axis=1)
+        best_dist = np.concatenate([best_dist, dist.astype(np.float32)], axis=1)
+        if best_dist.shape[1] > limit:
+            keep = np.argpartition(best_dist, limit - 1, axis=1)[:, :limit]
+            best_idx = np.take_along_axis(best_idx, keep, axis=1)
+            best_dist = np.take_along_axis(best_dist, keep, axis=1)
+    order = np.argsort(best_dist, axis=1, kind="stable")
+    best_idx = np.take_along_axis(best_idx, order, axis=1)
+    best_dist = np.take_along_axis(best_dist, order, axis=1)
+    return [(i.tolist(), d.tolist()) for i, d in zip(best_idx, best_dist)]
+
+
+# search_nn_many keeps tables with at most this many rows x dimensions in
+# memory (dequantized float32, 256 MB) and answers every probe with a matmul.
+RESIDENT_MAX_VALUES = 1 << 26
+_RESIDENT_VECTORS = LRUCache(maxsize=4)
+_RESIDENT_LOCK = threading.Lock()
+
+
+def _resident_vectors(data_dir, dataset_id, embedding_id, tbl):
+    """(ls_index, vectors, norms) of an embedding table, cached per table
+    version. Uses the .npy sidecar when there is one."""
+    dataset = tbl.to_lance()
+    key = (os.path.abspath(data_dir), dataset_id, embedding_id)
+    with _RESIDENT_LOCK:
+        entry = _RESIDENT_VECTORS.get(key)
+        if entry is not None and entry[0] == dataset.version:
+            return entry[1:]
+        path = _sidecar_path(data_dir, dataset_id, embedding_id, dataset.version)
+        if os.path.exists(path):
+            vectors = np.load(path, mmap_mode="r")
+            ls_index = np.arange(len(vectors), dtype=np.int64)
+        else:
+            ls_index, vectors = _read_vectors(dataset)
+        norms = (np.linalg.norm(vectors, axis=1) + 1e-10).astype(np.float32)
+        _RESIDENT_VECTORS[key] = (dataset.version, ls_index, vectors, norms)
+        return ls_index, vectors, norms
+
+
+def _has_vector_index(tbl):
+    return any("vector" in index.columns for index in tbl.list_indices())
+
+
+def search_nn_many(data_dir, dataset_id, embedding_id, query_vectors, limit=150,
+                   metric="cosine", nprobes=None, refine_factor=None):
+    """Nearest neighbors for several query vectors in one pass.
+
+    Tables of up to RESIDENT_MAX_VALUES rows x dimensions are searched
+    exactly against an in-memory copy, one matmul for all queries. Larger
+    tables with an ANN index get a single batched LanceDB query; larger
+    tables without one (or stored as int8/binary) get one exact scan shared
+    by all queries.
+
+    Parameters
+    ----------
+    query_vectors : np.ndarray
+        Shape (Q, D).
+    limit : int or sequence of int
+        Results per query, or one limit per query.
+    nprobes, refine_factor : int or None
+        Vector index query settings for the batched LanceDB query (the
+        embedding meta's "vector_index", as chosen by ls-tune-index).
+
+    Returns
+    -------
+    list of (indices, distances), one per query, nearest first.
+    """
+    queries = np.atleast_2d(np.asarray(query_vectors, dtype=np.float32))
+    if len(queries) == 0:
+        return []
+    limits = np.broadcast_to(np.asarray(limit, dtype=np.int64), (len(queries),))
+    k = int(limits.max())
+    tbl = _open_table(data_dir, dataset_id, _embedding_table_name(embedding_id))
+    if tbl is None:
+        raise ValueError(f"No LanceDB table for {embedding_id}")
+    info = _precision_info(tbl.schema)
+    dimensions = info.get("dimensions") or tbl.schema.field("vector").type.list_size
+
+    if tbl.count_rows() * dimensions <= RESIDENT_MAX_VALUES:
+        ls_index, vectors, norms = _resident_vectors(data_dir, dataset_id, embedding_id, tbl)
+        results = _exact_topk([(ls_index, vectors, norms)], queries, k, metric)
+    elif info["precision"] in ("int8", "binary") or not _has_vector_index(tbl):
+        results = _exact_topk(_iter_vectors(tbl.to_lance(), info), queries, k, metric)
+    else:
+        query = tbl.search(list(queries), vector_column_name="vector").metric(metric)
+        if nprobes:
+            query = query.nprobes(int(nprobes))
+        if refine_factor:
+            query = query.refine_factor(int(refine_factor))
+        data = query.select(["ls_index"]).limit(k).to_arrow()
+        query_index = data["query_index"].to_numpy()
+        indices = data["ls_index"].to_numpy()
+        distances = data["_distance"].to_numpy()
+        results = []
+        for q in range(len(queries)):
+            rows = np.flatnonzero(query_index == q)
+            rows = rows[np.argsort(distances[rows], kind="stable")]
+            results.append((indices[rows].tolist(), distances[rows].tolist()))
+    return [(idx[:n], dist[:n]) for (idx, dist), n in zip(results, limits.tolist())]
+
+
+# Memory-resident sign-bit indexes for search_nn(mode="binary"), keyed by
+# table; rebuilt when the table version changes.
+_BINARY_INDEXES = LRUCache(maxsize=4)
+_BINARY_INDEX_LOCK = threading.Lock()
+
+
+def get_binary_index(data_dir, dataset_id, embedding_id, batch_size=65536):
+    """Return the BinaryIndex for an embedding, building it on first use
+    (a streaming scan of the table, no training)."""
+    from latentscope.util.binary_index import BinaryIndex
+
+    tbl = _open_table(data_dir, dataset_id, _embedding_table_name(embedding_id))
+    if tbl is None:
+        raise ValueError(f"No LanceDB table for {embedding_id}")
+    dataset = tbl.to_lance()
+    key = (os.path.abspath(data_dir), dataset_id, embedding_id)
+    with _BINARY_INDEX_LOCK:
+        index = _BINARY_INDEXES.get(key)
+        if index is not None and index.version == dataset.version:
+            return index
+        info = _precision_info(dataset.schema)
+
+        def scan(dequantize=True):
+            for batch in dataset.to_batches(columns=["ls_index", "vector"],
+                                            batch_size=batch_size):
+                codes = batch.column("vector").flatten().to_numpy(zero_copy_only=False)
+                codes = codes.reshape(batch.num_rows, -1)
+                vectors = dequantize_vectors(codes, info) if dequantize else codes
+                yield batch.column("ls_index").to_numpy(), vectors
+
+        start = time.perf_counter()
+        if info["precision"] == "binary":
+            # Already sign bits: use the stored codes as they are.
+            parts = list(scan(dequantize=False))
+            index = BinaryIndex(np.concatenate([codes for _, codes in parts]),
+                                np.concatenate([idx for idx, _ in parts]),
+                                version=dataset.version)
+        else:
+            index = BinaryIndex.build(scan, version=dataset.version)
+        print(f"built binary index for {embedding_id}: {len(index)} rows, "
+              f"{index.nbytes / 1024 ** 2:.1f} MB in {time.perf_counter() - start:.1f}s")
+        _BINARY_INDEXES[key] = index
+        return index
+
+
+def search_nn_binary(data_dir, dataset_id, embedding_id, query_vector, limit=150,
+                     candidates=None):
+    """Hamming-distance prefilter over the in-memory sign bits, then exact
+    cosine rerank of the best `candidates` rows against their stored
+    vectors. Returns (indices, cosine distances)."""
+    from latentscope.util.binary_index import DEFAULT_CANDIDATES
+
+    index = get_binary_index(data_dir, dataset_id, embedding_id)
+    # Pin the version the index was built from: positions refer to it.
+    dataset = _open_table(data_dir, dataset_id, _embedding_table_name(embedding_id)).to_lance()
+    if dataset.version != index.version:
+        dataset = dataset.checkout_version(index.version)
+    info = _precision_info(dataset.schema)
+
+    def fetch_vectors(positions):
+        order = np.argsort(positions)
+        rows = dataset.take(positions[order], columns=["vector"])
+        codes = rows.column("vector").combine_chunks().flatten().to_numpy(zero_copy_only=False)
+        decoded = dequantize_vectors(codes.reshape(len(positions), -1), info)
+        vectors = np.empty_like(decoded)
+        vectors[order] = decoded
+        return vectors
+
+    return index.search(query_vector, fetch_vectors, limit=limit,
+                        candidates=candidates or DEFAULT_CANDIDATES)
+
+
+def _token_index_path(data_dir, dataset_id, embedding_id):
+    """Directory of an embedding's token-level index (see build_token_index)."""
+    return os.path.join(data_dir, dataset_id, "embeddings", f"{embedding_id}-token-index")
+
+
+def build_token_index(data_dir, dataset_id, embedding_id, num_centroids=None, nbits=2,
+                      row_batch_size=256):
+    """Build and save the token-level (PLAID-style) index of a late
+    interaction embedding from two streaming passes over its token vectors.
+    The index records the table version it was built from and is ignored
+    by searches once the table changes. Returns the TokenIndex.
+    """
+    from latentscope.util.token_index import TokenIndex
+
+    tbl = _open_table(data_dir, dataset_id, _embedding_table_name(embedding_id))
+    if tbl is None or "token_vectors" not in tbl.schema.names:
+        raise ValueError(f"Embedding {embedding_id} does not have token vectors "
+                         "(not a late interaction embedding).")
+    version = tbl.version
+    n_tokens = int(load_num_tokens(data_dir, dataset_id, embedding_id).sum())
+    start = time.perf_counter()
+    index = TokenIndex.build(
+        lambda: iter_token_vectors(data_dir, dataset_id, embedding_id,
+                                   row_batch_size=row_batch_size, flat=True),
+        n_tokens, num_centroids=num_centroids, nbits=nbits, version=version)
+    path = _token_index_path(data_dir, dataset_id, embedding_id)
+    index.save(path)
+    with _TOKEN_INDEX_LOCK:
+        _TOKEN_INDEXES.pop(os.path.abspath(path))
+    print(f"built token index for {embedding_id}: {len(index.centroids)} centroids over "
+          f"{n_tokens} tokens, {index.nbytes / 1024 ** 2:.1f} MB in "
+          f"{time.perf_counter() - start:.1f}s")
+    return index
+
+
+# Loaded token indexes, keyed by directory; reloaded when rebuilt.
+_TOKEN_INDEXES = LRUCache(maxsize=4)
+_TOKEN_INDEX_LOCK = threading.Lock()
+
+
+def get_token_index(data_dir, dataset_id, embedding_id):
+    """Return the embedding's token index, or None if it has none or the
+    index was built from an older version of the table."""
+    from latentscope.util.token_index import TokenIndex
+
+    path = os.path.abspath(_token_index_path(data_dir, dataset_id, embedding_id))
+    meta_path = os.path.join(path, "meta.json")
+    if not os.path.exists(meta_path):
+        return None
+    tbl = _open_table(data_dir, dataset_id, _embedding_table_name(embedding_id))
+    if tbl is None:
+        return None
+    mtime = os.path.getmtime(meta_path)
+    with _TOKEN_INDEX_LOCK:
+        cached = _TOKEN_INDEXES.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, TokenIndex.load(path))
+            _TOKEN_INDEXES[path] = cached
+    index = cached[1]
+    if index.version != tbl.version:
+        return None
+    return index
+
+
 def search_late_interaction(data_dir, dataset_id, embedding_id, query_token_vectors,
-                            prefilter_limit=None, final_limit=50, metric="cosine"):
+                            prefilter_limit=None, final_limit=50, metric="cosine",
+                            use_token_index=True, nprobe=None, nprobes=None,
+                            refine_factor=None):
     """Late interaction (MaxSim) search.
 
-    1. Gather candidates: ANN search on the mean query vector PLUS a search
-       per query token (union). A mean-pooled-query prefilter alone misses
-       documents matched by a single rare query token whose signal is diluted
-       by averaging; searching each query token separately recovers documents
-       whose mean leans toward that token. (Both searches still run against
-       mean *document* vectors — a true token-level index over all document
-       tokens is future work.)
-    2. Load per-token vectors for candidates.
-    3. Re-rank using MaxSim scoring.
+    1. Gather candidates. With a current token index (build_token_index,
+       cosine metric) every query token probes its nearest token centroids
+       and the index returns its best `prefilter_limit` documents. Otherwise:
+       ANN search on the mean query vector PLUS a search per query token
+       (union), all in one search_nn_many batch. A mean-pooled-query
+       prefilter alone misses documents matched by a single rare query token
+       whose signal is diluted by averaging; searching each query token
+       separately recovers documents whose mean leans toward that token,
+       but both still run against mean *document* vectors, which the token
+       index doesn't.
+    2. Load per-token vectors for candidates, as one flat float16 buffer.
+    3. Re-rank by exact MaxSim (maxsim_scores: chunked matmuls and a
+       segmented max, not a loop over documents).
 
     Parameters
     ----------
@@ -488,6 +1295,13 @@ def search_late_interaction(data_dir, dataset_id, embedding_id, query_token_vect
         corpus-size-scaled value in [200, 2000].
     final_limit : int
         Number of final results to return.
+    use_token_index : bool
+        Use the token index when there is a current one.
+    nprobe : int or None
+        Token centroids probed per query token (token index only).
+    nprobes, refine_factor : int or None
+        Vector index query settings for the mean-vector candidate search
+        (see search_nn_many).
 
     Returns
     -------
@@ -498,52 +1312,49 @@ def search_late_interaction(data_dir, dataset_id, embedding_id, query_token_vect
         n_rows = get_embedding_count(data_dir, dataset_id, embedding_id)
         prefilter_limit = int(min(max(200, n_rows // 100), 2000))
 
-    # Step 1a: ANN search using mean of query tokens
-    query_mean = query_token_vectors.mean(axis=0).astype(np.float32)
-    mean_candidates, _ = search_nn(
-        data_dir, dataset_id, embedding_id,
-        query_mean, limit=prefilter_limit, metric=metric,
-    )
-    candidates = set(mean_candidates)
+    token_index = None
+    if use_token_index and metric == "cosine":
+        token_index = get_token_index(data_dir, dataset_id, embedding_id)
+    if token_index is not None:
+        from latentscope.util.token_index import DEFAULT_NPROBE
 
-    # Step 1b: union in per-query-token candidates
-    n_query_tokens = len(query_token_vectors)
-    per_token_limit = max(20, prefilter_limit // max(n_query_tokens, 1))
-    for q_vec in query_token_vectors:
-        token_candidates, _ = search_nn(
+        # Step 1: candidates from the token centroids nearest each query token
+        candidates, _ = token_index.search(query_token_vectors, k=prefilter_limit,
+                                           nprobe=nprobe or DEFAULT_NPROBE)
+    else:
+        # Step 1: the mean of the query tokens plus every query token,
+        # searched in one batch; the union of their results is the candidate set
+        query_mean = query_token_vectors.mean(axis=0).astype(np.float32)
+        n_query_tokens = len(query_token_vectors)
+        per_token_limit = max(20, prefilter_limit // max(n_query_tokens, 1))
+        probes = search_nn_many(
             data_dir, dataset_id, embedding_id,
-            q_vec.astype(np.float32), limit=per_token_limit, metric=metric,
+            np.vstack([query_mean, query_token_vectors]),
+            limit=[prefilter_limit] + [per_token_limit] * n_query_tokens, metric=metric,
+            nprobes=nprobes, refine_factor=refine_factor,
         )
-        candidates.update(token_candidates)
+        candidates = set()
+        for probe_candidates, _ in probes:
+            candidates.update(probe_candidates)
 
     candidate_indices = sorted(candidates)
     if not candidate_indices:
         return [], []
 
-    # Step 2: Load token vectors for candidates
-    candidate_token_vecs = load_token_vectors(
-        data_dir, dataset_id, embedding_id, indices=candidate_indices,
+    # Step 2: token vectors of every candidate, as one float16 buffer
+    matrix, offsets = load_token_vectors(
+        data_dir, dataset_id, embedding_id, indices=candidate_indices, dtype=None, flat=True,
     )
 
-    # Step 3: MaxSim re-ranking
-    q_norm = query_token_vectors / (
-        np.linalg.norm(query_token_vectors, axis=1, keepdims=True) + 1e-10)
-    scores = []
-    for doc_tokens in candidate_token_vecs:
-        # doc_tokens shape: (T_d, D), query_token_vectors shape: (Q, D)
-        # MaxSim: for each query token, find max similarity with any doc token, then sum
-        if len(doc_tokens) == 0:
-            scores.append(0.0)
-            continue
-        d_norm = doc_tokens / (np.linalg.norm(doc_tokens, axis=1, keepdims=True) + 1e-10)
-        sim_matrix = q_norm @ d_norm.T  # (Q, T_d)
-        max_sims = sim_matrix.max(axis=1)  # (Q,)
-        scores.append(float(max_sims.sum()))
+    # Step 3: MaxSim re-ranking in a few batched matmuls
+    from latentscope.util.token_index import maxsim_scores
 
-    # Sort by score descending
-    ranked = sorted(zip(candidate_indices, scores), key=lambda x: -x[1])
-    ranked = ranked[:final_limit]
-    return [r[0] for r in ranked], [r[1] for r in ranked]
+    tbl = _open_table(data_dir, dataset_id, _embedding_table_name(embedding_id))
+    field = tbl.schema.field("token_vectors")
+    normalized = (field.metadata or {}).get(_UNIT_NORM_KEY) == b"true"
+    scores = maxsim_scores(query_token_vectors, matrix, offsets, normalized=normalized)
+    order = np.argsort(-scores, kind="stable")[:final_limit]
+    return [candidate_indices[i] for i in order], scores[order].tolist()
 
 
 def _load_hdf5_embeddings(data_dir, dataset_id, embedding_id):
@@ -558,14 +1369,37 @@ def _load_hdf5_embeddings(data_dir, dataset_id, embedding_id):
         return np.array(f["embeddings"])
 
 
-def get_embedding_stats(data_dir, dataset_id, embedding_id):
-    """Compute min/max values per dimension for the embedding."""
-    embeddings = load_embeddings(data_dir, dataset_id, embedding_id)
+def get_embedding_stats(data_dir, dataset_id, embedding_id, batch_size=65536):
+    """Per-dimension min, max, mean and variance of the embedding, from one
+    streaming pass (iter_embeddings) with running min/max and batch means
+    and squared deviations merged in float64 (Chan et al.), so tables larger
+    than RAM work. min/max match np.min/np.max over the whole matrix."""
+    count = 0
+    lo = hi = mean = m2 = None
+    for _, vectors in iter_embeddings(data_dir, dataset_id, embedding_id, batch_size):
+        n = len(vectors)
+        batch_mean = vectors.mean(axis=0, dtype=np.float64)
+        batch_m2 = np.square(vectors - batch_mean).sum(axis=0)
+        if count == 0:
+            lo, hi = vectors.min(axis=0), vectors.max(axis=0)
+            mean, m2 = batch_mean, batch_m2
+        else:
+            lo = np.minimum(lo, vectors.min(axis=0))
+            hi = np.maximum(hi, vectors.max(axis=0))
+            delta = batch_mean - mean
+            total = count + n
+            mean = mean + delta * (n / total)
+            m2 = m2 + batch_m2 + delta ** 2 * (count * n / total)
+        count += n
+    if count == 0:
+        raise ValueError(f"Embedding {embedding_id} has no rows")
     return {
-        "min_values": np.min(embeddings, axis=0).tolist(),
-        "max_values": np.max(embeddings, axis=0).tolist(),
-        "dimensions": embeddings.shape[1],
-        "count": embeddings.shape[0],
+        "min_values": lo.tolist(),
+        "max_values": hi.tolist(),
+        "mean_values": mean.tolist(),
+        "variance_values": (m2 / count).tolist(),
+        "dimensions": len(lo),
+        "count": count,
     }
 
 
@@ -576,9 +1410,7 @@ def get_storage_format(data_dir, dataset_id, embedding_id):
     -------
     str : "lancedb", "hdf5", or "none"
     """
-    db = _connect(data_dir, dataset_id)
-    table_name = _embedding_table_name(embedding_id)
-    if table_name in _get_table_names(db):
+    if _open_table(data_dir, dataset_id, _embedding_table_name(embedding_id)) is not None:
         return "lancedb"
 
     emb_path = os.path.join(data_dir, dataset_id, "embeddings", f"{embedding_id}.h5")
@@ -588,12 +1420,41 @@ def get_storage_format(data_dir, dataset_id, embedding_id):
     return "none"
 
 
+def find_hdf5_embeddings(data_dir, dataset_ids=None):
+    """Legacy `embeddings/embedding-*.h5` files under the data dir (or only
+    in `dataset_ids`), largest first.
+
+    Returns
+    -------
+    list of dict with dataset_id, embedding_id, path and bytes
+    """
+    import re
+
+    if dataset_ids is None:
+        dataset_ids = sorted(d for d in os.listdir(data_dir)
+                             if os.path.isdir(os.path.join(data_dir, d, "embeddings")))
+    found = []
+    for dataset_id in dataset_ids:
+        emb_dir = os.path.join(data_dir, dataset_id, "embeddings")
+        if not os.path.isdir(emb_dir):
+            continue
+        for name in sorted(os.listdir(emb_dir)):
+            match = re.fullmatch(r"(embedding-\d+)\.h5", name)
+            if match:
+                path = os.path.join(emb_dir, name)
+                found.append({"dataset_id": dataset_id, "embedding_id": match.group(1),
+                              "path": path, "bytes": os.path.getsize(path)})
+    return sorted(found, key=lambda e: -e["bytes"])
+
+
 def migrate_hdf5_to_lancedb(data_dir, dataset_id, embedding_id, batch_size=1000,
                              on_progress=None):
     """Migrate an HDF5 embedding to LanceDB format.
 
     Parameters
     ----------
+    batch_size : int
+        Rows per appended Arrow batch (one table fragment each).
     on_progress : callable or None
         Called with (current_row, total_rows) for progress reporting.
 
@@ -607,7 +1468,6 @@ def migrate_hdf5_to_lancedb(data_dir, dataset_id, embedding_id, batch_size=1000,
     if not os.path.exists(emb_path):
         raise FileNotFoundError(f"No HDF5 file at {emb_path}")
 
-    db = _connect(data_dir, dataset_id)
     table_name = _embedding_table_name(embedding_id)
 
     with h5py.File(emb_path, "r") as f:
@@ -618,14 +1478,14 @@ def migrate_hdf5_to_lancedb(data_dir, dataset_id, embedding_id, batch_size=1000,
     # interrupted migration (killed process) — in that case it is shorter
     # than the HDF5 source and must be dropped and re-migrated, otherwise it
     # shadows the intact HDF5 in load_embeddings and silently truncates data.
-    if table_name in _get_table_names(db):
-        tbl = db.open_table(table_name)
+    tbl = _open_table(data_dir, dataset_id, table_name)
+    if tbl is not None:
         existing = tbl.count_rows()
         if existing == total_rows:
             return {"status": "already_migrated", "rows": existing}
         print(f"Found partial migration ({existing}/{total_rows} rows) — "
               "dropping and re-migrating")
-        db.drop_table(table_name)
+        _drop_table(data_dir, dataset_id, table_name)
 
     try:
         # Copy from HDF5 in batches to avoid memory issues
@@ -646,24 +1506,30 @@ def migrate_hdf5_to_lancedb(data_dir, dataset_id, embedding_id, batch_size=1000,
                 f"got {lance_count} in LanceDB"
             )
 
-        lance_vectors = load_embeddings(data_dir, dataset_id, embedding_id)
         rng = np.random.default_rng(0)
         sample_size = min(16, total_rows)
         sample = rng.choice(total_rows, size=sample_size, replace=False)
         # Always include the endpoints
         check_indices = sorted(set(sample.tolist()) | {0, total_rows - 1})
+        # Read back only the sampled rows, not the whole table
+        tbl = _open_table(data_dir, dataset_id, table_name)
+        rows = tbl.to_lance().to_table(
+            columns=["ls_index", "vector"],
+            filter=f"ls_index IN ({', '.join(map(str, check_indices))})")
+        lance_vectors = dict(zip(rows["ls_index"].to_pylist(), rows["vector"].to_pylist()))
         with h5py.File(emb_path, "r") as f:
             for idx in check_indices:
                 h5_vec = np.array(f["embeddings"][idx])
-                if not np.allclose(lance_vectors[idx], h5_vec, atol=1e-6):
+                if idx not in lance_vectors or \
+                        not np.allclose(lance_vectors[idx], h5_vec, atol=1e-6):
                     raise RuntimeError(
                         f"Migration verification failed: vector mismatch at row {idx}"
                     )
     except BaseException:
         # Never leave a partial table behind: it would shadow the intact
         # HDF5 file in load_embeddings.
-        if table_name in _get_table_names(db):
-            db.drop_table(table_name)
+        if _open_table(data_dir, dataset_id, table_name) is not None:
+            _drop_table(data_dir, dataset_id, table_name)
         raise
 
     # Verification passed — remove the HDF5 file
@@ -681,16 +1547,25 @@ def migrate_hdf5_to_lancedb(data_dir, dataset_id, embedding_id, batch_size=1000,
     }
 
 
-def estimate_embedding_storage(num_rows, dimensions, has_tokens=False, avg_tokens_per_doc=50):
+def _vector_bytes(dimensions, precision):
+    """Bytes per stored dense vector at a storage precision."""
+    if precision == "binary":
+        return -(-dimensions // 8)
+    return dimensions * {"float32": 4, "float16": 2, "int8": 1}[precision]
+
+
+def estimate_embedding_storage(num_rows, dimensions, has_tokens=False, avg_tokens_per_doc=50,
+                               precision="float32"):
     """Estimate storage requirements for embeddings.
 
-    Returns dict with estimated sizes in bytes and human-readable strings.
+    Returns dict with estimated sizes in bytes and human-readable strings,
+    including the dense-vector savings of `precision` over float32.
     """
-    mean_bytes_per_float = 4  # float32
     token_bytes_per_float = 2  # float16 (see append_embeddings schema)
 
     # Mean vector storage
-    mean_bytes = num_rows * dimensions * mean_bytes_per_float
+    mean_bytes = num_rows * _vector_bytes(dimensions, precision)
+    float32_mean_bytes = num_rows * _vector_bytes(dimensions, "float32")
 
     # Token vector storage (if late interaction)
     token_bytes = 0
@@ -701,8 +1576,12 @@ def estimate_embedding_storage(num_rows, dimensions, has_tokens=False, avg_token
     overhead = 1.2
     total_bytes = int((mean_bytes + token_bytes) * overhead)
 
+    savings = int((float32_mean_bytes - mean_bytes) * overhead)
     return {
+        "precision": precision,
         "mean_vector_bytes": mean_bytes,
+        "savings_bytes": savings,
+        "savings_human": _human_readable_size(savings),
         "token_vector_bytes": token_bytes,
         "total_bytes": total_bytes,
         "total_human": _human_readable_size(total_bytes),
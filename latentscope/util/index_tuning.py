@@ -0,0 +1,149 @@
+"""Self-tuning IVF-PQ vector index (ls-tune-index, ls-embed --tune_index).
+
+The untuned index takes its partitions from the row count and its
+sub-vectors from the dimension, and nothing says what recall that gives.
+tune_ivf_pq measures it instead:
+
+- a sample of table rows is held out as queries, and their exact top k
+  (not counting the row itself) comes from a brute-force scan;
+- the index is built for each (num_partitions, num_sub_vectors) of a small
+  grid, and every (nprobes, refine_factor) is timed on the queries;
+- the fastest setting whose recall@k meets the target wins (the most
+  accurate one if none does), and the index is left built with it.
+
+The result is stored as "vector_index" in the embedding's .json meta, and
+the /nn route searches with its nprobes and refine_factor.
+"""
+
+import time
+
+import numpy as np
+
+DEFAULT_TARGET_RECALL = 0.95
+NPROBES = (10, 20, 40, 80)
+REFINE_FACTORS = (None, 5, 20)
+# IVF_PQ trains 256 codes per sub-vector, so smaller tables get no index
+MIN_INDEX_ROWS = 256
+
+
+def _sub_vectors(dimensions, target):
+    """Largest divisor of `dimensions` that is <= target (IVF_PQ requires
+    num_sub_vectors to divide the vector dimension; user supplied
+    --dimensions values can be arbitrary)."""
+    target = max(1, min(dimensions, target))
+    return next(d for d in range(target, 0, -1) if dimensions % d == 0)
+
+
+def default_index_config(num_rows, dimensions):
+    """The untuned parameters: up to 256 partitions of at least 10 rows,
+    sub-vectors of ~16 dimensions."""
+    return {"num_partitions": max(1, min(256, num_rows // 10)),
+            "num_sub_vectors": _sub_vectors(dimensions, dimensions // 16)}
+
+
+def index_grid(num_rows, dimensions):
+    """Build configurations to try: partitions at 1 and 2 x sqrt(rows) (at
+    least 40 rows each), sub-vectors of ~16 and ~8 dimensions. PQ precision
+    and refine_factor matter far more for recall than the partitioning."""
+    root = np.sqrt(num_rows)
+    most = max(1, num_rows // 40)
+    partitions = sorted({int(np.clip(round(root * f), 1, most)) for f in (1, 2)})
+    sub_vectors = sorted({_sub_vectors(dimensions, dimensions // 16),
+                          _sub_vectors(dimensions, dimensions // 8)})
+    return [{"num_partitions": p, "num_sub_vectors": s} for p in partitions for s in sub_vectors]
+
+
+def _vectors(column):
+    flat = column.flatten().to_numpy(zero_copy_only=False)
+    return flat.astype(np.float32, copy=False).reshape(len(column), -1)
+
+
+def held_out_queries(tbl, k=10, n_queries=100, metric="cosine", id_column="ls_index",
+                     seed=0):
+    """Sample `n_queries` rows as queries; returns (ids, query vectors,
+    exact top-k id sets without the query row itself)."""
+    from latentscope.util.embedding_store import _exact_topk
+
+    dataset = tbl.to_lance()
+    rng = np.random.default_rng(seed)
+    n = dataset.count_rows()
+    rows = np.sort(rng.choice(n, size=min(n_queries, n), replace=False))
+    sample = dataset.take(rows, columns=[id_column, "vector"])
+    ids = sample[id_column].to_numpy()
+    queries = _vectors(sample["vector"].combine_chunks())
+
+    def batches():
+        for batch in dataset.to_batches(columns=[id_column, "vector"], batch_size=65536):
+            yield batch.column(id_column).to_numpy(), _vectors(batch.column("vector")), None
+
+    exact = _exact_topk(batches(), queries, k + 1, metric)
+    truth = [set([i for i in indices if i != own][:k])
+             for (indices, _), own in zip(exact, ids.tolist())]
+    return ids, queries, truth
+
+
+def measure_recall(tbl, ids, queries, truth, k=10, metric="cosine", nprobes=20,
+                   refine_factor=None, id_column="ls_index"):
+    """Recall@k of the current index against `truth`, and ms per query
+    (one query at a time, as /nn runs them)."""
+
+    def search(query):
+        builder = tbl.search(query, vector_column_name="vector").metric(metric).nprobes(nprobes)
+        if refine_factor:
+            builder = builder.refine_factor(refine_factor)
+        data = builder.select([id_column, "_distance"]).limit(k + 1).to_arrow()
+        return data[id_column].to_pylist()
+
+    search(queries[0])  # load the index into the cache
+    hits = 0
+    start = time.perf_counter()
+    for own, query, expected in zip(ids.tolist(), queries, truth):
+        found = [i for i in search(query) if i != own][:k]
+        hits += len(expected & set(found))
+    ms = (time.perf_counter() - start) * 1000 / len(queries)
+    return hits / max(1, sum(len(t) for t in truth)), ms
+
+
+def tune_ivf_pq(tbl, metric="cosine", target_recall=DEFAULT_TARGET_RECALL, k=10,
+                n_queries=100, id_column="ls_index", grid=None, nprobes=None,
+                refine_factors=None, seed=0):
+    """Build the IVF_PQ index of `tbl`'s vector column with the cheapest
+    measured settings that reach `target_recall`; returns the chosen
+    parameters with their recall and latency. `grid`, `nprobes` and
+    `refine_factors` default to index_grid(), NPROBES and REFINE_FACTORS."""
+    nprobes = nprobes or NPROBES
+    refine_factors = refine_factors or REFINE_FACTORS
+    num_rows = tbl.count_rows()
+    dimensions = tbl.schema.field("vector").type.list_size
+    ids, queries, truth = held_out_queries(tbl, k, n_queries, metric, id_column, seed)
+
+    trials = []
+    for config in grid or index_grid(num_rows, dimensions):
+        start = time.perf_counter()
+        tbl.create_index(metric=metric, vector_column_name="vector", **config)
+        print(f"IVF_PQ {config['num_partitions']} partitions x {config['num_sub_vectors']} "
+              f"sub-vectors: built in {time.perf_counter() - start:.1f}s")
+        for probes in sorted({min(p, config["num_partitions"]) for p in nprobes}):
+            for refine in refine_factors:
+                recall, ms = measure_recall(tbl, ids, queries, truth, k, metric, probes, refine,
+                                            id_column)
+                trials.append({**config, "nprobes": probes, "refine_factor": refine,
+                               "recall": round(recall, 4), "ms_per_query": round(ms, 3)})
+                print(f"  nprobes {probes:>3}, refine {refine or '-':>2}: "
+                      f"recall@{k} {recall:.3f}, {ms:.2f} ms/query")
+
+    meeting = [t for t in trials if t["recall"] >= target_recall]
+    if meeting:
+        best = min(meeting, key=lambda t: t["ms_per_query"])
+    else:
+        best = max(trials, key=lambda t: (t["recall"], -t["ms_per_query"]))
+        print(f"no setting reached recall {target_recall}; using the most accurate")
+    built = trials[-1]
+    config = {key: best[key] for key in ("num_partitions", "num_sub_vectors")}
+    if config != {key: built[key] for key in config}:
+        tbl.create_index(metric=metric, vector_column_name="vector", **config)
+    print(f"chose {config['num_partitions']} partitions x {config['num_sub_vectors']} "
+          f"sub-vectors, nprobes {best['nprobes']}, refine {best['refine_factor']}: "
+          f"recall@{k} {best['recall']:.3f}")
+    return {"index_type": "IVF_PQ", "metric": metric, **best, "k": k,
+            "target_recall": target_recall, "num_queries": len(queries), "num_rows": num_rows}
@@ -0,0 +1,186 @@
+"""Persisted k-nearest-neighbour graphs of embeddings.
+
+UMAP and EVoC both start by finding every row's nearest neighbours, which
+on a large embedding is most of their run time and does not depend on
+min_dist, the output dimensions or the cluster parameters. get_knn_graph
+computes the graph once per (embedding, metric, k_max) and keeps it next
+to the embedding:
+
+    embeddings/<embedding_id>-knn/<metric>-<k_max>.indices.npy    int32
+    embeddings/<embedding_id>-knn/<metric>-<k_max>.distances.npy  float32
+    embeddings/<embedding_id>-knn/<metric>-<k_max>.json
+
+Any later run asking for k <= k_max memory-maps it and takes the first k
+columns. Rows are sorted by distance with the row itself first, as
+umap.UMAP(precomputed_knn=...) expects. The .json records a fingerprint of
+the vectors, so a graph of an embedding that has since changed (appended
+rows, quantization) is never used.
+"""
+
+import hashlib
+import json
+import os
+import re
+import time
+
+import numpy as np
+
+# Built graphs hold at least this many neighbours, so trying a few larger
+# n_neighbors values doesn't rebuild.
+DEFAULT_K_MAX = 64
+# Below this many rows the neighbours are found exactly (as UMAP itself does)
+EXACT_MAX_ROWS = 4096
+
+
+def _graph_dir(data_dir, dataset_id, embedding_id):
+    """Directory of an embedding's kNN graphs (a directory, like the token
+    index, so the graph metas aren't listed as embeddings)."""
+    return os.path.join(data_dir, dataset_id, "embeddings", f"{embedding_id}-knn")
+
+
+def _graph_prefix(data_dir, dataset_id, embedding_id, metric, k_max):
+    return os.path.join(_graph_dir(data_dir, dataset_id, embedding_id), f"{metric}-{k_max}")
+
+
+def fingerprint(vectors):
+    """Cheap identity of a matrix: its shape and dtype plus 64 evenly spaced
+    rows (enough to notice appends and re-embeds without reading it all)."""
+    digest = hashlib.sha1(f"{vectors.shape}{vectors.dtype}".encode())
+    rows = np.unique(np.linspace(0, len(vectors) - 1, num=64).astype(np.int64))
+    digest.update(np.ascontiguousarray(vectors[rows]).tobytes())
+    return digest.hexdigest()
+
+
+def _exact_knn(vectors, k, metric, chunk_rows=1024):
+    """Brute-force kNN for small matrices, the row itself first."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if metric == "cosine":
+        vectors = vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-10)
+    else:
+        squared = np.einsum("ij,ij->i", vectors, vectors)
+    indices = np.empty((len(vectors), k), dtype=np.int32)
+    distances = np.empty((len(vectors), k), dtype=np.float32)
+    for start in range(0, len(vectors), chunk_rows):
+        stop = min(start + chunk_rows, len(vectors))
+        dots = vectors[start:stop] @ vectors.T
+        if metric == "cosine":
+            dist = np.maximum(1 - dots, 0)
+        else:
+            dist = np.sqrt(np.maximum(squared[start:stop, None] - 2 * dots + squared, 0))
+        own = np.arange(start, stop)
+        dist[own - start, own] = -1  # the row itself sorts first, at distance 0
+        nearest = np.argpartition(dist, k - 1, axis=1)[:, :k]
+        nearest_dist = np.take_along_axis(dist, nearest, axis=1)
+        order = np.argsort(nearest_dist, axis=1, kind="stable")
+        indices[start:stop] = np.take_along_axis(nearest, order, axis=1)
+        distances[start:stop] = np.maximum(np.take_along_axis(nearest_dist, order, axis=1), 0)
+    return indices, distances
+
+
+def compute_knn_graph(vectors, k, metric="cosine", seed=None):
+    """(indices, distances) of each row's k nearest rows, shape (n, k).
+
+    Small matrices are searched exactly; larger ones with NN-descent, using
+    the settings umap.UMAP would use for its own graph.
+    """
+    k = min(k, len(vectors))
+    if len(vectors) <= EXACT_MAX_ROWS and metric in ("cosine", "euclidean"):
+        return _exact_knn(vectors, k, metric)
+
+    from pynndescent import NNDescent
+
+    n = len(vectors)
+    index = NNDescent(
+        vectors,
+        metric=metric,
+        n_neighbors=k,
+        random_state=seed,
+        n_trees=min(64, 5 + int(round(n ** 0.5 / 20.0))),
+        n_iters=max(5, int(round(np.log2(n)))),
+        max_candidates=60,
+        low_memory=True,
+        verbose=True,
+    )
+    indices, distances = index.neighbor_graph
+    return indices.astype(np.int32), distances.astype(np.float32)
+
+
+def _graphs(data_dir, dataset_id, embedding_id, metric):
+    """{k_max: meta} of the stored graphs of an embedding for `metric`."""
+    graph_dir = _graph_dir(data_dir, dataset_id, embedding_id)
+    if not os.path.isdir(graph_dir):
+        return {}
+    pattern = re.compile(rf"{re.escape(metric)}-(\d+)\.json$")
+    graphs = {}
+    for name in os.listdir(graph_dir):
+        match = pattern.match(name)
+        if match:
+            with open(os.path.join(graph_dir, name)) as f:
+                graphs[int(match.group(1))] = json.load(f)
+    return graphs
+
+
+def _remove_graph(data_dir, dataset_id, embedding_id, metric, k_max):
+    prefix = _graph_prefix(data_dir, dataset_id, embedding_id, metric, k_max)
+    for suffix in (".json", ".indices.npy", ".distances.npy"):
+        if os.path.exists(prefix + suffix):
+            os.remove(prefix + suffix)
+
+
+def load_knn_graph(data_dir, dataset_id, embedding_id, vectors, k, metric="cosine"):
+    """The first k neighbours from the smallest stored graph with k_max >= k
+    that was built from `vectors` (only those columns are read from the
+    memory-mapped arrays); None if there is none."""
+    key = fingerprint(vectors)
+    for k_max, meta in sorted(_graphs(data_dir, dataset_id, embedding_id, metric).items()):
+        if k_max < k or meta.get("fingerprint") != key:
+            continue
+        prefix = _graph_prefix(data_dir, dataset_id, embedding_id, metric, k_max)
+        indices = np.load(prefix + ".indices.npy", mmap_mode="r")
+        distances = np.load(prefix + ".distances.npy", mmap_mode="r")
+        return np.ascontiguousarray(indices[:, :k]), np.ascontiguousarray(distances[:, :k])
+    return None
+
+
+def save_knn_graph(data_dir, dataset_id, embedding_id, vectors, indices, distances,
+                   metric="cosine", seconds=None):
+    """Store a graph, replacing the embedding's graphs it supersedes (fewer
+    neighbours, or built from different vectors). Returns the path prefix."""
+    k_max = indices.shape[1]
+    key = fingerprint(vectors)
+    prefix = _graph_prefix(data_dir, dataset_id, embedding_id, metric, k_max)
+    os.makedirs(os.path.dirname(prefix), exist_ok=True)
+    for name, array in ((".indices.npy", indices), (".distances.npy", distances)):
+        with open(prefix + name + ".tmp", "wb") as f:
+            np.save(f, array)
+        os.replace(prefix + name + ".tmp", prefix + name)
+    # the meta goes last: a graph without one is never read
+    with open(prefix + ".json", "w") as f:
+        json.dump({"embedding_id": embedding_id, "metric": metric, "k_max": k_max,
+                   "rows": len(indices), "fingerprint": key, "seconds": seconds}, f, indent=2)
+    for other, meta in _graphs(data_dir, dataset_id, embedding_id, metric).items():
+        if other != k_max and (other < k_max or meta.get("fingerprint") != key):
+            _remove_graph(data_dir, dataset_id, embedding_id, metric, other)
+    return prefix
+
+
+def get_knn_graph(data_dir, dataset_id, embedding_id, vectors, k, metric="cosine",
+                  k_max=None, seed=None):
+    """(indices, distances) of the k nearest neighbours of every row of
+    `vectors` (the embedding's matrix), from the stored graph if there is a
+    current one, else computed with k_max = max(k, DEFAULT_K_MAX) neighbours
+    and stored for later runs."""
+    k = min(k, len(vectors))
+    graph = load_knn_graph(data_dir, dataset_id, embedding_id, vectors, k, metric)
+    if graph is not None:
+        print(f"using the stored {metric} kNN graph of {embedding_id} (k={k})")
+        return graph
+    k_max = min(max(k, k_max or DEFAULT_K_MAX), len(vectors))
+    print(f"computing the {metric} kNN graph of {embedding_id} (k_max={k_max})")
+    start = time.perf_counter()
+    indices, distances = compute_knn_graph(vectors, k_max, metric, seed)
+    seconds = round(time.perf_counter() - start, 2)
+    print(f"kNN graph built in {seconds}s")
+    save_knn_graph(data_dir, dataset_id, embedding_id, vectors, indices, distances, metric,
+                   seconds)
+    return np.ascontiguousarray(indices[:, :k]), np.ascontiguousarray(distances[:, :k])
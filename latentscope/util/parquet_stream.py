@@ -0,0 +1,96 @@
+"""Column-projected, streaming reads of a dataset's input.parquet.
+
+ls-embed and ls-tokenize only need one column, but ``pd.read_parquet`` loads
+every column (image blobs included) for every row before the first batch is
+processed. These helpers read just the target column, a batch of rows at a
+time, so memory is bounded by the batch size rather than the dataset size.
+Values come out exactly as ``pd.read_parquet(...)[column].tolist()`` would
+produce them (pandas conversion per batch), so null handling downstream is
+unchanged.
+"""
+
+import numpy as np
+
+
+def count_rows(path):
+    """Number of rows in a parquet file (from the footer, no data read)."""
+    import pyarrow.parquet as pq
+
+    return pq.ParquetFile(path).metadata.num_rows
+
+
+def _row_group_starts(metadata):
+    starts = np.zeros(metadata.num_row_groups + 1, dtype=np.int64)
+    for rg in range(metadata.num_row_groups):
+        starts[rg + 1] = starts[rg] + metadata.row_group(rg).num_rows
+    return starts
+
+
+def iter_column_chunks(path, column, chunk_size, start=0, aligned=True):
+    """Yield ``(start_index, values)`` for `column`, `chunk_size` rows at a
+    time, beginning at row `start`.
+
+    With ``aligned`` (the default) chunk boundaries fall on multiples of
+    `chunk_size`, so the first chunk of a resumed read is the remainder of the
+    batch `start` falls in — the same batches a read from row 0 would give.
+    Row groups entirely before `start` are skipped without being read.
+    """
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path)
+    starts = _row_group_starts(parquet_file.metadata)
+    total = int(starts[-1])
+    if start >= total:
+        return
+    first_rg = int(np.searchsorted(starts, start, side="right") - 1)
+    position = int(starts[first_rg])
+    chunk_start = start
+    chunk_end = ((start // chunk_size) + 1) * chunk_size if aligned else start + chunk_size
+    buffer = []
+    for record_batch in parquet_file.iter_batches(
+            batch_size=chunk_size, columns=[column],
+            row_groups=range(first_rg, parquet_file.metadata.num_row_groups)):
+        values = record_batch.column(0).to_pandas().tolist()
+        skip = min(len(values), max(0, start - position))
+        position += len(values)
+        buffer.extend(values[skip:])
+        while len(buffer) >= chunk_end - chunk_start:
+            size = chunk_end - chunk_start
+            yield chunk_start, buffer[:size]
+            buffer = buffer[size:]
+            chunk_start = chunk_end
+            chunk_end += chunk_size
+    if buffer:
+        yield chunk_start, buffer
+
+
+def read_column(path, column):
+    """Read one whole column as a list (for modes that need random access)."""
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(path, columns=[column])
+    return table.column(0).to_pandas().tolist()
+
+
+def read_rows(path, indices):
+    """Read the given row positions (all columns) as a DataFrame indexed by
+    position, touching only the row groups that contain them."""
+    import pandas as pd
+    import pyarrow.parquet as pq
+
+    indices = np.asarray(indices, dtype=np.int64)
+    parquet_file = pq.ParquetFile(path)
+    starts = _row_group_starts(parquet_file.metadata)
+    groups = np.searchsorted(starts, indices, side="right") - 1
+    frames = []
+    positions = []
+    for rg in np.unique(groups):
+        in_group = indices[groups == rg]
+        table = parquet_file.read_row_group(int(rg)).take(in_group - starts[rg])
+        frames.append(table.to_pandas())
+        positions.append(in_group)
+    if not frames:
+        return pd.DataFrame()
+    df = pd.concat(frames, ignore_index=True)
+    df.index = np.concatenate(positions)
+    return df.loc[indices]
@@ -0,0 +1,168 @@
+"""Client-side rate limiting for concurrent API embedding (ls-embed --concurrency).
+
+Hosted embedding APIs cap both requests and tokens per minute, and answer
+with HTTP 429 when a client exceeds either. Sending one batch at a time never
+gets near those caps — the run is bound by round-trip latency instead — so
+ls-embed keeps several batches in flight and paces them here:
+
+- two token buckets (requests/min and tokens/min) refill continuously and
+  block a call until its share is available;
+- the number of concurrent calls follows AIMD (additive increase,
+  multiplicative decrease, as in TCP congestion control): every success
+  grows the limit by roughly one call per window, every 429 halves it.
+
+429s are usually retried inside the provider by ``retry_transient``; the
+limiter observes them through ``retry_listener`` so a provider's internal
+retry still throttles the whole engine.
+"""
+
+import threading
+import time
+
+from latentscope.util.retry import is_rate_limit_error, retry_listener
+
+
+class TokenBucket:
+    """Blocking token bucket refilled at ``rate_per_minute``.
+
+    ``capacity`` (default: ten seconds of refill) bounds bursts. A request
+    larger than the capacity waits for a full bucket and then overdraws it,
+    so oversized batches are slowed down rather than refused.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(capacity if capacity is not None else max(1.0, self.rate * 10))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount=1):
+        """Block until ``amount`` tokens (capped at the capacity) are available
+        and take them. Returns the seconds spent waiting."""
+        waited = 0.0
+        needed = min(float(amount), self.capacity)
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= needed:
+                    self.tokens -= amount
+                    return waited
+                delay = (needed - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class AIMDLimiter:
+    """Concurrency limit that grows by ~1 per window of successes and halves
+    on rate-limit responses, between 1 and ``max_concurrency``.
+
+    Each call records the epoch it started in; only the first 429 of an epoch
+    halves the limit, so a burst of in-flight calls all hitting the same
+    limit backs off once, not once per call.
+    """
+
+    def __init__(self, max_concurrency):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.limit = float(self.max_concurrency)
+        self.in_flight = 0
+        self.epoch = 0
+        self.cond = threading.Condition()
+
+    def acquire(self):
+        """Wait for a free slot; returns the current epoch."""
+        with self.cond:
+            while self.in_flight >= max(1, int(self.limit)):
+                self.cond.wait()
+            self.in_flight += 1
+            return self.epoch
+
+    def release(self):
+        with self.cond:
+            self.in_flight -= 1
+            self.cond.notify_all()
+
+    def on_success(self):
+        with self.cond:
+            self.limit = min(self.max_concurrency, self.limit + 1.0 / self.limit)
+            self.cond.notify_all()
+
+    def on_throttle(self, epoch):
+        """Halve the limit, once per epoch. Returns True if it was halved."""
+        with self.cond:
+            if epoch != self.epoch:
+                return False
+            self.limit = max(1.0, self.limit / 2)
+            self.epoch += 1
+            return True
+
+
+class RateLimiter:
+    """Gate provider calls made from several threads.
+
+    Parameters
+    ----------
+    max_concurrency : int
+        Upper bound on calls in flight (the AIMD limit starts here).
+    requests_per_minute, tokens_per_minute : float or None
+        Provider quotas; None disables that bucket.
+    """
+
+    def __init__(self, max_concurrency, requests_per_minute=None, tokens_per_minute=None):
+        self.aimd = AIMDLimiter(max_concurrency)
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.throttled = 0
+        self.backoffs = 0
+        self.waited = 0.0
+
+    def _on_error(self, err, epoch):
+        if not is_rate_limit_error(err):
+            return
+        halved = self.aimd.on_throttle(epoch)
+        with self.lock:
+            self.throttled += 1
+            self.backoffs += int(halved)
+        if halved:
+            print(f"rate limited; reducing concurrency to {int(self.aimd.limit)}", flush=True)
+
+    def call(self, fn, tokens=0):
+        """Run ``fn()`` once a concurrency slot and the request/token budget
+        are available; 429s seen along the way (retried or raised) back off
+        the concurrency limit."""
+        epoch = self.aimd.acquire()
+        try:
+            waited = 0.0
+            if self.requests is not None:
+                waited += self.requests.acquire(1)
+            if self.tokens is not None and tokens:
+                waited += self.tokens.acquire(tokens)
+            with retry_listener(lambda err: self._on_error(err, epoch)):
+                try:
+                    result = fn()
+                except Exception as err:
+                    self._on_error(err, epoch)
+                    raise
+            self.aimd.on_success()
+            with self.lock:
+                self.calls += 1
+                self.waited += waited
+            return result
+        finally:
+            self.aimd.release()
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "throttled": self.throttled,
+            "backoffs": self.backoffs,
+            "concurrency": int(self.aimd.limit),
+            "rate_wait_seconds": round(self.waited, 2),
+        }
@@ -7,8 +7,10 @@ so no SDK exception classes are imported at module import time, preserving the
 lazy-import convention.
 """
 
+import contextlib
 import functools
 import random
+import threading
 import time
 
 # HTTP statuses considered transient: request timeout, rate limit, server errors
@@ -17,6 +19,9 @@ TRANSIENT_STATUSES = frozenset({408, 429}) | frozenset(range(500, 600))
 # Attribute names that commonly carry an HTTP status across SDKs
 _STATUS_ATTRS = ("status_code", "http_status", "status", "code")
 
+# Per-thread callback told about every retried error (see retry_listener)
+_local = threading.local()
+
 
 def _extract_status(exc):
     """Best-effort extraction of an HTTP status code from an exception."""
@@ -55,6 +60,30 @@ def is_transient_error(exc):
     return False
 
 
+def is_rate_limit_error(exc):
+    """True for HTTP 429 responses (or SDK errors named like RateLimitError)."""
+    status = _extract_status(exc)
+    if status is not None:
+        return status == 429
+    return any("ratelimit" in klass.__name__.lower() for klass in type(exc).__mro__)
+
+
+@contextlib.contextmanager
+def retry_listener(callback):
+    """Call `callback(err)` for every error retry_transient retries on the
+    current thread, before it sleeps.
+
+    Lets a caller that wraps provider calls (the concurrent API embedding
+    engine) observe the 429s a provider retries internally and throttle.
+    """
+    previous = getattr(_local, "listener", None)
+    _local.listener = callback
+    try:
+        yield
+    finally:
+        _local.listener = previous
+
+
 def retry_transient(tries=4, base=1.0, max_delay=30.0, is_transient=None):
     """Decorator retrying the wrapped call on transient errors with backoff.
 
@@ -75,6 +104,9 @@ def retry_transient(tries=4, base=1.0, max_delay=30.0, is_transient=None):
                 except Exception as err:
                     if attempt >= tries - 1 or not is_transient(err):
                         raise
+                    listener = getattr(_local, "listener", None)
+                    if listener is not None:
+                        listener(err)
                     delay = min(base * 2**attempt, max_delay)
                     delay = min(delay + random.uniform(0, 0.1 * delay), max_delay)
                     # print (not log) so jobs.py's subprocess capture surfaces
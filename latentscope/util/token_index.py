@@ -0,0 +1,285 @@
+"""Token-level index for late interaction retrieval (PLAID-style).
+
+search_late_interaction otherwise gathers candidates from mean document
+vectors only, which misses documents matched by a single rare query token.
+This index covers every document token:
+
+- token vectors are clustered into centroids (spherical k-means on a sample);
+- each centroid keeps an inverted list of the documents that have a token
+  assigned to it;
+- each token keeps its centroid id and its residual from that centroid,
+  quantized to `nbits` per dimension.
+
+A query token probes its `nprobe` nearest centroids. The union of their
+inverted lists is scored by centroid interaction (every document token
+approximated by its centroid), and the best `ndocs` are scored again with
+decompressed token vectors (centroid + residual). The caller reranks the
+survivors with exact MaxSim against the stored token vectors.
+
+Building is two streaming passes over the token vectors (sample, then
+assign), so only a batch of full-precision vectors is held at a time.
+
+maxsim_scores is the exact MaxSim reranker over a flat token buffer that
+search_late_interaction finishes with, with or without an index.
+"""
+
+import json
+import os
+import shutil
+
+import numpy as np
+
+DEFAULT_NPROBE = 4
+# Files of a saved index; the large per-token arrays are memory-mapped on load.
+_ARRAYS = ("centroids", "cutoffs", "weights", "doc_ids", "doc_offsets", "codes", "residuals",
+           "ivf_offsets", "ivf_docs")
+_MMAP = ("codes", "residuals", "ivf_docs")
+
+
+def default_num_centroids(n_tokens):
+    """Power of two near 4 * sqrt(n_tokens), between 16 and 2 ** 14."""
+    if n_tokens <= 0:
+        return 16
+    return int(min(2 ** 14, max(16, 2 ** int(np.log2(4 * np.sqrt(n_tokens))))))
+
+
+def _normalize(x):
+    x = np.asarray(x, dtype=np.float32)
+    return x / (np.linalg.norm(x, axis=1, keepdims=True) + 1e-10)
+
+
+def maxsim_scores(query_tokens, matrix, offsets, normalized=True, chunk_tokens=1 << 13):
+    """MaxSim of the (Q, D) query against every document of a flat token
+    buffer (``matrix`` (T, D), any float dtype, with document i's tokens at
+    ``offsets[i]:offsets[i + 1]``): the sum over query tokens of the best
+    cosine with any of the document's tokens. Documents without tokens
+    score 0.
+
+    Chunks of whole documents are upcast to float32 and scored with one
+    matmul and a segmented max (np.maximum.reduceat) each; chunks of a few
+    thousand tokens keep the upcast and the score matrix in cache. With
+    ``normalized`` the stored tokens are taken to be unit norm already.
+    """
+    query = _normalize(np.atleast_2d(query_tokens))
+    offsets = np.asarray(offsets, dtype=np.int64)
+    out = np.zeros(len(offsets) - 1, dtype=np.float32)
+    nonempty = np.flatnonzero(np.diff(offsets))
+    first = 0
+    while first < len(nonempty):
+        # whole documents up to chunk_tokens tokens, at least one per chunk
+        begin = offsets[nonempty[first]]
+        last = max(first + 1, int(np.searchsorted(offsets[nonempty + 1], begin + chunk_tokens,
+                                                  side="right")))
+        docs = nonempty[first:last]
+        tokens = np.asarray(matrix[begin:offsets[docs[-1] + 1]], dtype=np.float32)
+        if not normalized:
+            tokens = _normalize(tokens)
+        scores = query @ tokens.T
+        out[docs] = np.maximum.reduceat(scores, offsets[docs] - begin, axis=1).sum(axis=0)
+        first = last
+    return out
+
+
+def _assign(vectors, centroids, chunk_rows=16384):
+    """Nearest centroid (max dot product) of each normalized vector."""
+    out = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), chunk_rows):
+        scores = vectors[start:start + chunk_rows] @ centroids.T
+        out[start:start + len(scores)] = np.argmax(scores, axis=1)
+    return out
+
+
+def spherical_kmeans(vectors, k, iterations=10, seed=0):
+    """Unit-norm centroids of normalized `vectors` (Lloyd's algorithm on
+    cosine similarity). Empty clusters are re-seeded from random points."""
+    rng = np.random.default_rng(seed)
+    k = min(k, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        labels = _assign(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        counts = np.bincount(labels, minlength=k)
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = vectors[rng.choice(len(vectors), size=int(empty.sum()))]
+        centroids = _normalize(sums)
+    return centroids
+
+
+def _pack_residuals(buckets, nbits):
+    """(T, D) bucket ids < 2 ** nbits -> (T, ceil(D * nbits / 8)) uint8,
+    first dimension in the high bits."""
+    shifts = np.arange(nbits - 1, -1, -1, dtype=np.uint8)
+    bits = (buckets[:, :, None] >> shifts) & 1
+    return np.packbits(bits.reshape(len(buckets), -1).astype(np.uint8), axis=1)
+
+
+def _residual_table(weights, nbits):
+    """(256, 8 // nbits) decoded residual values of every packed byte, so
+    decompression is one lookup per byte."""
+    per_byte = 8 // nbits
+    shifts = 8 - nbits * np.arange(1, per_byte + 1)
+    buckets = (np.arange(256)[:, None] >> shifts) & (2 ** nbits - 1)
+    return np.asarray(weights, dtype=np.float32)[buckets]
+
+
+class TokenIndex:
+    """Centroids, inverted lists and compressed residuals of every token.
+
+    Documents are addressed by position (0..N-1 in ls_index order);
+    ``doc_ids`` maps positions back to ls_index values and
+    ``doc_offsets[p]:doc_offsets[p + 1]`` are the tokens of position p in
+    ``codes``/``residuals``.
+    """
+
+    def __init__(self, centroids, cutoffs, weights, doc_ids, doc_offsets, codes, residuals,
+                 ivf_offsets, ivf_docs, nbits=2, version=None):
+        self.centroids = centroids
+        self.cutoffs = cutoffs
+        self.weights = weights
+        self.doc_ids = doc_ids
+        self.doc_offsets = doc_offsets
+        self.codes = codes
+        self.residuals = residuals
+        self.ivf_offsets = ivf_offsets
+        self.ivf_docs = ivf_docs
+        self.nbits = nbits
+        self.version = version
+        self._residual_values = _residual_table(weights, nbits)
+
+    @classmethod
+    def build(cls, scan, n_tokens, num_centroids=None, nbits=2, sample_size=None,
+              iterations=10, seed=0, version=None):
+        """Build from ``scan()``, a callable returning a fresh iterator of
+        (ls_indices, matrix, offsets) batches in ls_index order, as
+        ``iter_token_vectors(..., flat=True)`` yields them. It is called
+        twice: once to sample tokens for k-means, once to assign every token.
+        """
+        if nbits not in (1, 2, 4, 8):
+            raise ValueError(f"nbits must be 1, 2, 4 or 8, not {nbits}")
+        rng = np.random.default_rng(seed)
+        num_centroids = num_centroids or default_num_centroids(n_tokens)
+        sample_size = sample_size or num_centroids * 64
+        keep = min(1.0, sample_size / max(n_tokens, 1))
+        sample = []
+        for _, matrix, _ in scan():
+            mask = rng.random(len(matrix)) < keep
+            sample.append(_normalize(matrix[mask]))
+        sample = np.concatenate(sample) if sample else np.zeros((0, 0), dtype=np.float32)
+        if len(sample) == 0:
+            raise ValueError("no token vectors to index")
+        centroids = spherical_kmeans(sample, num_centroids, iterations, seed)
+
+        # Residual buckets: equal-population cutoffs over all dimensions, each
+        # bucket decoded to its median.
+        buckets = 2 ** nbits
+        residuals = (sample - centroids[_assign(sample, centroids)]).ravel()
+        cutoffs = np.quantile(residuals, np.arange(1, buckets) / buckets).astype(np.float32)
+        weights = np.quantile(residuals, (np.arange(buckets) + 0.5) / buckets).astype(np.float32)
+
+        doc_ids, lengths, codes, packed = [], [], [], []
+        for ls_indices, matrix, offsets in scan():
+            vectors = _normalize(matrix)
+            assigned = _assign(vectors, centroids)
+            doc_ids.append(np.asarray(ls_indices, dtype=np.int64))
+            lengths.append(np.diff(offsets))
+            codes.append(assigned)
+            residual = np.searchsorted(cutoffs, vectors - centroids[assigned]).astype(np.uint8)
+            packed.append(_pack_residuals(residual, nbits))
+        doc_ids = np.concatenate(doc_ids)
+        lengths = np.concatenate(lengths)
+        codes = np.concatenate(codes)
+        doc_offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=doc_offsets[1:])
+
+        # Inverted lists: the distinct (centroid, document) pairs, by centroid.
+        n_docs = len(doc_ids)
+        pairs = np.unique(codes.astype(np.int64) * n_docs
+                          + np.repeat(np.arange(n_docs, dtype=np.int64), lengths))
+        ivf_offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(pairs // n_docs, minlength=len(centroids)), out=ivf_offsets[1:])
+        return cls(centroids, cutoffs, weights, doc_ids, doc_offsets, codes,
+                   np.concatenate(packed), ivf_offsets, (pairs % n_docs).astype(np.int32),
+                   nbits=nbits, version=version)
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in _ARRAYS)
+
+    def save(self, path):
+        """Write the index to directory `path` (replaced atomically)."""
+        partial = path + ".partial"
+        shutil.rmtree(partial, ignore_errors=True)
+        os.makedirs(partial)
+        for name in _ARRAYS:
+            np.save(os.path.join(partial, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(partial, "meta.json"), "w") as f:
+            json.dump({"nbits": self.nbits, "version": self.version,
+                       "num_centroids": len(self.centroids), "num_docs": len(self),
+                       "num_tokens": len(self.codes)}, f, indent=2)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(partial, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"),
+                                mmap_mode="r" if name in _MMAP else None)
+                  for name in _ARRAYS}
+        return cls(nbits=meta["nbits"], version=meta["version"], **arrays)
+
+    def decompress(self, positions):
+        """Approximate unit-norm token vectors (centroid + residual) of the
+        given token positions."""
+        dimensions = self.centroids.shape[1]
+        # np.take is several times faster than fancy indexing for this gather
+        residuals = np.take(self._residual_values, self.residuals[positions], axis=0)
+        residuals = residuals.reshape(len(positions), -1)[:, :dimensions]
+        return _normalize(self.centroids[self.codes[positions]] + residuals)
+
+    def _maxsim(self, docs, score_tokens, chunk_tokens=1 << 18):
+        """Sum over query tokens of the max score over each doc's tokens, with
+        ``score_tokens(token_positions)`` returning (Q, len(positions))."""
+        starts = self.doc_offsets[docs]
+        lengths = self.doc_offsets[docs + 1] - starts
+        out = np.empty(len(docs), dtype=np.float32)
+        first = 0
+        while first < len(docs):
+            # at least one document per chunk, then up to chunk_tokens tokens
+            last = first + max(1, int(np.searchsorted(np.cumsum(lengths[first:]),
+                                                      chunk_tokens, side="right")))
+            seg = lengths[first:last]
+            seg_starts = np.zeros(len(seg), dtype=np.int64)
+            np.cumsum(seg[:-1], out=seg_starts[1:])
+            positions = (np.repeat(starts[first:last] - seg_starts, seg)
+                         + np.arange(int(seg.sum())))
+            scores = score_tokens(positions)
+            out[first:last] = np.maximum.reduceat(scores, seg_starts, axis=1).sum(axis=0)
+            first = last
+        return out
+
+    def search(self, query_tokens, k=100, nprobe=DEFAULT_NPROBE, ndocs=None):
+        """Best `k` documents for the (Q, D) query tokens: returns
+        (ls_indices, approximate MaxSim scores), best first."""
+        query = _normalize(np.atleast_2d(query_tokens))
+        centroid_scores = query @ self.centroids.T
+        nprobe = min(nprobe, len(self.centroids))
+        cells = np.unique(np.argpartition(-centroid_scores, nprobe - 1, axis=1)[:, :nprobe])
+        docs = np.unique(np.concatenate(
+            [self.ivf_docs[self.ivf_offsets[c]:self.ivf_offsets[c + 1]] for c in cells]))
+        if len(docs) == 0:
+            return [], []
+
+        # Centroid interaction, then decompressed MaxSim on the survivors.
+        approx = self._maxsim(docs, lambda positions: centroid_scores[:, self.codes[positions]])
+        ndocs = ndocs or max(4 * k, 256)
+        if len(docs) > ndocs:
+            docs = docs[np.argpartition(-approx, ndocs - 1)[:ndocs]]
+        scores = self._maxsim(docs, lambda positions: query @ self.decompress(positions).T)
+        order = np.argsort(-scores, kind="stable")[:k]
+        return self.doc_ids[docs[order]].tolist(), scores[order].tolist()
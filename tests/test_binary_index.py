@@ -0,0 +1,111 @@
+"""Tests for the sign-bit prefilter behind /api/search/nn?mode=binary."""
+import json
+import os
+
+import numpy as np
+import pytest
+
+from latentscope.scripts.search_benchmark import synthetic_embeddings
+from latentscope.util.binary_index import BinaryIndex, hamming_distances, recall_at_k
+
+
+def test_hamming_matches_unpacked_bits():
+    rng = np.random.default_rng(0)
+    bits = rng.integers(0, 2, size=(50, 70)).astype(bool)
+    query = rng.integers(0, 2, size=70).astype(bool)
+    expected = (bits != query).sum(axis=1)
+    codes, query_code = np.packbits(bits, axis=1), np.packbits(query)
+    # unpadded (byte lookup) and word-padded (uint64 popcount) paths agree
+    np.testing.assert_array_equal(hamming_distances(codes, query_code), expected)
+    index = BinaryIndex(codes, np.arange(50))
+    assert index.codes.shape[1] == 16
+    padded_query = np.pad(query_code, (0, 16 - len(query_code)))
+    np.testing.assert_array_equal(hamming_distances(index.codes, padded_query, chunk_rows=7),
+                                  expected)
+
+
+def test_recall_on_clustered_data():
+    vectors = synthetic_embeddings(5000, 64, n_clusters=20)
+    queries = vectors[:20] + np.random.default_rng(1).normal(scale=0.3, size=(20, 64))
+    assert recall_at_k(vectors, queries, k=10, candidates=500) >= 0.95
+    # the prefilter is what limits recall: too few candidates loses neighbors
+    assert recall_at_k(vectors, queries, k=10, candidates=10) < 0.95
+
+
+@pytest.fixture
+def store(tmp_data_dir):
+    from latentscope.util.embedding_store import _BINARY_INDEXES, append_embeddings
+
+    _BINARY_INDEXES.clear()
+    vectors = synthetic_embeddings(600, 32, n_clusters=10)
+    append_embeddings(tmp_data_dir, "ds", "embedding-001", vectors, start_index=0)
+    emb_dir = os.path.join(tmp_data_dir, "ds", "embeddings")
+    os.makedirs(emb_dir)
+    with open(os.path.join(emb_dir, "embedding-001.json"), "w") as f:
+        json.dump({"id": "embedding-001", "model_id": "fake", "dimensions": 32}, f)
+    return tmp_data_dir, vectors
+
+
+def test_search_nn_binary_mode_is_exact_after_rerank(store):
+    from latentscope.util.embedding_store import get_binary_index, search_nn
+
+    data_dir, vectors = store
+    indices, distances = search_nn(data_dir, "ds", "embedding-001", vectors[42], limit=5,
+                                   mode="binary", candidates=200)
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    exact = np.argsort(-(normed @ normed[42]))[:5]
+    assert indices == exact.tolist()
+    assert distances[0] == pytest.approx(0.0, abs=1e-5)
+    assert get_binary_index(data_dir, "ds", "embedding-001") is \
+        get_binary_index(data_dir, "ds", "embedding-001")
+
+
+def test_binary_index_rebuilds_when_table_changes(store):
+    from latentscope.util.embedding_store import (
+        append_embeddings,
+        get_binary_index,
+        search_nn,
+    )
+
+    data_dir, vectors = store
+    before = get_binary_index(data_dir, "ds", "embedding-001")
+    extra = -vectors[:1]
+    append_embeddings(data_dir, "ds", "embedding-001", extra, start_index=600)
+    after = get_binary_index(data_dir, "ds", "embedding-001")
+    assert len(after) == 601 and after is not before
+    indices, _ = search_nn(data_dir, "ds", "embedding-001", extra[0], limit=1, mode="binary")
+    assert indices == [600]
+
+
+def test_binary_mode_on_binary_precision_table(store):
+    from latentscope.util.embedding_store import quantize_embeddings, search_nn
+
+    data_dir, vectors = store
+    quantize_embeddings(data_dir, "ds", "embedding-001", "binary")
+    indices, _ = search_nn(data_dir, "ds", "embedding-001", vectors[7], limit=3,
+                           mode="binary")
+    assert 7 in indices
+
+
+def test_nn_route_binary_mode(client, store, monkeypatch):
+    import latentscope.server.search as search_mod
+
+    data_dir, vectors = store
+
+    class FakeProvider:
+        def load_model(self):
+            pass
+
+        def embed_query(self, inputs, dimensions=None):
+            return [vectors[3].tolist()]
+
+    monkeypatch.setattr(search_mod, "get_embedding_model", lambda model_id: FakeProvider())
+    search_mod.EMBEDDINGS.clear()
+    res = client.get("/api/search/nn?dataset=ds&embedding_id=embedding-001&query=q"
+                     "&mode=binary&candidates=100")
+    assert res.status_code == 200
+    data = res.get_json()
+    assert data["search_type"] == "binary"
+    assert data["indices"][0] == 3
+    res = client.get("/api/search/nn?dataset=ds&embedding_id=embedding-001&query=q&mode=bogus")
+    assert res.status_code == 400
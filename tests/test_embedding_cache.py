@@ -0,0 +1,83 @@
+"""Tests for the content-addressed embedding cache (ls-embed --cache)."""
+import time
+
+import numpy as np
+
+from latentscope.util.embedding_cache import (
+    EmbeddingCache,
+    cache_namespace,
+    cache_path,
+    content_key,
+)
+
+
+def _cache(tmp_data_dir, **kwargs):
+    return EmbeddingCache(cache_path(tmp_data_dir), **kwargs)
+
+
+class TestContentKey:
+    def test_key_depends_on_every_setting(self):
+        base = cache_namespace("model-a", "retrieval", "doc: ", 256, 512)
+        variants = [
+            cache_namespace("model-b", "retrieval", "doc: ", 256, 512),
+            cache_namespace("model-a", "clustering", "doc: ", 256, 512),
+            cache_namespace("model-a", "retrieval", "", 256, 512),
+            cache_namespace("model-a", "retrieval", "doc: ", None, 512),
+            cache_namespace("model-a", "retrieval", "doc: ", 256, None),
+            cache_namespace("model-a", "retrieval", "doc: ", 256, 512, backend="onnx-int8"),
+        ]
+        keys = {content_key(ns, "hello") for ns in [base, *variants]}
+        assert len(keys) == len(variants) + 1
+        assert content_key(base, "hello") == content_key(base, "hello")
+        # the default backend keeps the original key layout
+        assert cache_namespace("model-a", "retrieval", "doc: ", 256, 512, backend="torch") == base
+
+    def test_image_dict_and_raw_bytes_share_a_key(self):
+        ns = cache_namespace("clip")
+        assert content_key(ns, {"bytes": b"\x89PNG", "path": None}) == content_key(ns, b"\x89PNG")
+        # bytes and the equivalent text are distinct inputs
+        assert content_key(ns, b"abc") != content_key(ns, "abc")
+
+
+class TestEmbeddingCache:
+    def test_roundtrip_and_counters(self, tmp_data_dir):
+        cache = _cache(tmp_data_dir)
+        vectors = np.random.rand(3, 8).astype(np.float32)
+        cache.put_many(["a", "b", "c"], vectors)
+
+        found = cache.get_many(["a", "c", "z", "a"])
+        assert set(found) == {"a", "c"}
+        np.testing.assert_array_equal(found["c"], vectors[2])
+        assert cache.hits == 3
+        assert cache.misses == 1
+        stats = cache.stats()
+        assert stats["entries"] == 3
+        assert stats["bytes"] == 3 * 8 * 4
+        cache.close()
+
+    def test_persists_across_instances(self, tmp_data_dir):
+        cache = _cache(tmp_data_dir)
+        cache.put_many(["k"], np.ones((1, 4), dtype=np.float32))
+        cache.close()
+
+        reopened = _cache(tmp_data_dir)
+        np.testing.assert_array_equal(reopened.get_many(["k"])["k"], np.ones(4))
+        assert reopened.stats()["bytes"] == 16
+        reopened.close()
+
+    def test_evicts_least_recently_used(self, tmp_data_dir):
+        # 10 entries of 64 bytes fit; the 11th forces eviction
+        cache = _cache(tmp_data_dir, max_bytes=10 * 64)
+        for i in range(10):
+            cache.put_many([f"k{i}"], np.full((1, 16), i, dtype=np.float32))
+            time.sleep(0.002)
+        cache.get_many(["k0"])  # refresh: k0 is now the most recently used
+        cache.put_many(["k10"], np.zeros((1, 16), dtype=np.float32))
+
+        stats = cache.stats()
+        assert stats["bytes"] <= cache.max_bytes
+        assert cache.evicted >= 1
+        remaining = cache.get_many([f"k{i}" for i in range(11)])
+        assert "k0" in remaining and "k10" in remaining
+        assert "k1" not in remaining
+        cache.close()
@@ -169,6 +169,98 @@ def test_get_embedding_stats(data_dir):
     assert stats["max_values"] == [1.0, 2.0, 5.0]
 
 
+def test_streamed_stats_match_in_memory(data_dir):
+    """Stats from small batches of an unordered table and of an HDF5 file
+    equal the numpy reductions over the whole matrix."""
+    import lancedb
+    import pyarrow as pa
+
+    from latentscope.util.embedding_store import (
+        append_embeddings,
+        get_embedding_stats,
+        iter_embeddings,
+    )
+
+    rng = np.random.default_rng(4)
+    vectors = (rng.normal(size=(103, 6)) * 3 + 1).astype(np.float32)
+    for start in range(0, 103, 40):
+        append_embeddings(data_dir, "test-dataset", "embedding-001",
+                          vectors[start:start + 40], start_index=start)
+    db = lancedb.connect(os.path.join(data_dir, "test-dataset", "lancedb"))
+    data = db.open_table("emb-embedding-001").to_arrow()
+    db.create_table("emb-embedding-002", data.take(pa.array(rng.permutation(103))))
+    _write_h5(data_dir, "embedding-003", vectors)
+
+    for embedding_id in ("embedding-001", "embedding-002", "embedding-003"):
+        batches = list(iter_embeddings(data_dir, "test-dataset", embedding_id, batch_size=16))
+        assert max(len(ids) for ids, _ in batches) == 16
+        assert np.concatenate([ids for ids, _ in batches]).tolist() == list(range(103))
+        np.testing.assert_array_equal(np.concatenate([v for _, v in batches]), vectors)
+
+        stats = get_embedding_stats(data_dir, "test-dataset", embedding_id, batch_size=16)
+        assert stats["count"] == 103 and stats["dimensions"] == 6
+        assert stats["min_values"] == vectors.min(axis=0).tolist()
+        assert stats["max_values"] == vectors.max(axis=0).tolist()
+        np.testing.assert_allclose(stats["mean_values"], vectors.mean(axis=0, dtype=np.float64))
+        np.testing.assert_allclose(stats["variance_values"], vectors.var(axis=0, dtype=np.float64))
+
+
+def test_truncation_streams_the_in_memory_result(data_dir, monkeypatch):
+    from latentscope.scripts.embed import embed_truncate, embedding_stats
+    from latentscope.util.embedding_store import (
+        _embedding_table_name,
+        _open_table,
+        append_embeddings,
+        load_embeddings,
+    )
+
+    monkeypatch.setenv("LATENT_SCOPE_DATA", data_dir)
+    vectors = np.random.default_rng(5).normal(size=(50, 12)).astype(np.float32)
+    append_embeddings(data_dir, "test-dataset", "embedding-001", vectors[:30], start_index=0)
+    append_embeddings(data_dir, "test-dataset", "embedding-001", vectors[30:], start_index=30)
+    emb_dir = os.path.join(data_dir, "test-dataset", "embeddings")
+    with open(os.path.join(emb_dir, "embedding-001.json"), "w") as f:
+        json.dump({"id": "embedding-001", "model_id": "fake", "text_column": "text",
+                   "prefix": "", "dimensions": 12}, f)
+
+    embed_truncate("test-dataset", "embedding-001", 5, batch_size=7)
+    truncated = vectors[:, :5] / np.linalg.norm(vectors[:, :5], axis=1, keepdims=True)
+    np.testing.assert_array_equal(
+        load_embeddings(data_dir, "test-dataset", "embedding-002"), truncated)
+    # the 8 appended chunks are compacted like a finished ls-embed table
+    tbl = _open_table(data_dir, "test-dataset", _embedding_table_name("embedding-002"))
+    assert len(tbl.to_lance().get_fragments()) == 1
+    with open(os.path.join(emb_dir, "embedding-002.json")) as f:
+        assert json.load(f)["dimensions"] == 5
+
+    embedding_stats("test-dataset", "embedding-002")
+    with open(os.path.join(emb_dir, "embedding-002.json")) as f:
+        meta = json.load(f)
+    assert meta["min_values"] == truncated.min(axis=0).tolist()
+    assert meta["max_values"] == truncated.max(axis=0).tolist()
+
+
+
+def test_truncating_an_empty_embedding(data_dir, monkeypatch):
+    import pyarrow as pa
+
+    from latentscope.scripts.embed import embed_truncate
+    from latentscope.util.embedding_store import _connect
+
+    monkeypatch.setenv("LATENT_SCOPE_DATA", data_dir)
+    schema = pa.schema([pa.field("ls_index", pa.int64()),
+                        pa.field("vector", pa.list_(pa.float32(), 12))])
+    _connect(data_dir, "test-dataset").create_table("emb-embedding-001", schema=schema)
+    emb_dir = os.path.join(data_dir, "test-dataset", "embeddings")
+    with open(os.path.join(emb_dir, "embedding-001.json"), "w") as f:
+        json.dump({"id": "embedding-001", "model_id": "fake", "text_column": "text",
+                   "prefix": "", "dimensions": 12}, f)
+
+    embed_truncate("test-dataset", "embedding-001", 16)
+    with open(os.path.join(emb_dir, "embedding-002.json")) as f:
+        assert json.load(f)["dimensions"] == 12
+
+
 def _write_h5(data_dir, embedding_id, vectors):
     import h5py
 
@@ -287,10 +379,159 @@ def test_token_vectors_stored_as_float16(data_dir):
     assert schema.field("token_vectors").type == pa.list_(pa.list_(pa.float16(), 8))
     assert schema.field("num_tokens").type == pa.int32()
 
-    # roundtrip within fp16 precision
+    # token vectors are stored unit norm, and flagged as such
+    assert schema.field("token_vectors").metadata == {b"latentscope.unit_norm": b"true"}
     loaded = load_token_vectors(data_dir, "test-dataset", "embedding-001")
     assert [tv.shape for tv in loaded] == [(3, 8), (5, 8), (2, 8), (7, 8)]
-    np.testing.assert_allclose(loaded[1], token_vectors[1], atol=1e-3)
+    expected = token_vectors[1] / np.linalg.norm(token_vectors[1], axis=1, keepdims=True)
+    np.testing.assert_allclose(loaded[1], expected, atol=1e-3)
+
+
+def test_token_vectors_flat_matrix(data_dir):
+    """flat=True returns one matrix plus offsets; the list form is views into
+    it, and dtype=None keeps the stored float16."""
+    from latentscope.util.embedding_store import (
+        append_embeddings,
+        iter_token_vectors,
+        load_token_vectors,
+    )
+
+    rng = np.random.default_rng(0)
+    lengths = [3, 0, 5, 1, 4, 2]
+    token_vectors = [rng.normal(size=(t, 8)).astype(np.float32) for t in lengths]
+    token_vectors = [tv / np.linalg.norm(tv, axis=1, keepdims=True) for tv in token_vectors]
+    append_embeddings(data_dir, "test-dataset", "embedding-001",
+                      rng.normal(size=(6, 8)).astype(np.float32),
+                      token_vectors_list=token_vectors)
+
+    matrix, offsets = load_token_vectors(data_dir, "test-dataset", "embedding-001", flat=True)
+    assert matrix.shape == (sum(lengths), 8) and matrix.dtype == np.float32
+    np.testing.assert_array_equal(np.diff(offsets), lengths)
+    np.testing.assert_allclose(matrix, np.concatenate(token_vectors), atol=1e-2)
+
+    loaded = load_token_vectors(data_dir, "test-dataset", "embedding-001")
+    assert [tv.shape[0] for tv in loaded] == lengths
+    assert all(tv.base is not None for tv in loaded if len(tv))
+
+    half = load_token_vectors(data_dir, "test-dataset", "embedding-001", dtype=None)
+    assert half[0].dtype == np.float16
+
+    subset = load_token_vectors(data_dir, "test-dataset", "embedding-001", indices=[4, 2])
+    np.testing.assert_array_equal(subset[0], loaded[2])
+    np.testing.assert_array_equal(subset[1], loaded[4])
+
+    batches = list(iter_token_vectors(data_dir, "test-dataset", "embedding-001",
+                                      row_batch_size=4, flat=True))
+    assert [b[0].tolist() for b in batches] == [[0, 1, 2, 3], [4, 5]]
+    np.testing.assert_array_equal(np.concatenate([b[1] for b in batches]), matrix)
+    np.testing.assert_array_equal(batches[1][2], [0, 4, 6])
+
+
+def test_iter_token_vectors_scans_fragments_and_unordered_tables(data_dir):
+    """The sequential scan streams rows across fragments in batches of at most
+    row_batch_size; a table whose ls_index is out of order still streams in
+    order."""
+    import lancedb
+    import pyarrow as pa
+
+    from latentscope.util.embedding_store import (
+        append_embeddings,
+        iter_token_vectors,
+        load_token_vectors,
+    )
+
+    rng = np.random.default_rng(2)
+    token_vectors = [rng.normal(size=(int(t), 8)).astype(np.float32)
+                     for t in rng.integers(1, 6, size=15)]
+    token_vectors = [tv / np.linalg.norm(tv, axis=1, keepdims=True) for tv in token_vectors]
+    for start in range(0, 15, 5):
+        append_embeddings(data_dir, "test-dataset", "embedding-001",
+                          rng.normal(size=(5, 8)).astype(np.float32), start_index=start,
+                          token_vectors_list=token_vectors[start:start + 5])
+    batches = list(iter_token_vectors(data_dir, "test-dataset", "embedding-001",
+                                      row_batch_size=4))
+    assert max(len(b[0]) for b in batches) == 4
+    assert np.concatenate([b[0] for b in batches]).tolist() == list(range(15))
+    streamed = [tv for _, tvs in batches for tv in tvs]
+    for got, want in zip(streamed, token_vectors):
+        np.testing.assert_allclose(got, want, atol=1e-2)
+
+    # ~2 documents' worth of float16 tokens per batch
+    mean_tokens = np.mean([len(tv) for tv in token_vectors])
+    by_bytes = list(iter_token_vectors(data_dir, "test-dataset", "embedding-001",
+                                       batch_bytes=int(2 * mean_tokens * 8 * 2) + 1))
+    assert max(len(b[0]) for b in by_bytes) == 2
+
+    db = lancedb.connect(os.path.join(data_dir, "test-dataset", "lancedb"))
+    data = db.open_table("emb-embedding-001").to_arrow()
+    shuffled = data.take(pa.array(rng.permutation(15)))
+    db.create_table("emb-embedding-002", shuffled)
+    batches = list(iter_token_vectors(data_dir, "test-dataset", "embedding-002",
+                                      row_batch_size=4, flat=True))
+    assert np.concatenate([b[0] for b in batches]).tolist() == list(range(15))
+    expected, _ = load_token_vectors(data_dir, "test-dataset", "embedding-001", flat=True)
+    np.testing.assert_array_equal(np.concatenate([b[1] for b in batches]), expected)
+
+
+
+def test_sort_embeddings_restores_ls_index_order(data_dir):
+    """Rows appended out of order (as length-bucketed runs write them) are
+    rewritten in ls_index order, token vectors and field metadata intact."""
+    from latentscope.util.embedding_store import (
+        _embedding_table_name,
+        _open_table,
+        append_embeddings,
+        load_embeddings,
+        load_token_vectors,
+        sort_embeddings,
+    )
+
+    rng = np.random.default_rng(3)
+    vectors = rng.normal(size=(12, 8)).astype(np.float32)
+    token_vectors = [rng.normal(size=(int(t), 8)).astype(np.float32)
+                     for t in rng.integers(1, 5, size=12)]
+    order = rng.permutation(12)
+    for batch in np.array_split(order, 4):
+        append_embeddings(data_dir, "test-dataset", "embedding-001", vectors[batch],
+                          token_vectors_list=[token_vectors[i] for i in batch],
+                          ls_indices=batch)
+    before, _ = load_token_vectors(data_dir, "test-dataset", "embedding-001", flat=True)
+
+    assert sort_embeddings(data_dir, "test-dataset", "embedding-001", batch_size=5)
+    tbl = _open_table(data_dir, "test-dataset", _embedding_table_name("embedding-001"))
+    assert tbl.to_arrow().column("ls_index").to_pylist() == list(range(12))
+    np.testing.assert_allclose(load_embeddings(data_dir, "test-dataset", "embedding-001"),
+                               vectors, atol=1e-6)
+    after, _ = load_token_vectors(data_dir, "test-dataset", "embedding-001", flat=True)
+    np.testing.assert_array_equal(after, before)
+    assert tbl.schema.field("token_vectors").metadata
+    # already in order: nothing to do
+    assert not sort_embeddings(data_dir, "test-dataset", "embedding-001")
+
+def test_token_streaming_benchmark_runs():
+    from latentscope.scripts.token_benchmark import benchmark_token_streaming
+
+    results = benchmark_token_streaming(n_docs=40, mean_tokens=4, dimensions=8,
+                                        row_batch_size=16)
+    assert set(results) == {"scan", "filter_queries"}
+
+
+def test_token_vectors_from_legacy_list_schema(data_dir):
+    """Tables from before the explicit schema store list<list<double>>."""
+    import lancedb
+
+    from latentscope.util.embedding_store import load_token_vectors
+
+    rng = np.random.default_rng(1)
+    token_vectors = [rng.normal(size=(t, 4)) for t in (2, 3)]
+    db = lancedb.connect(os.path.join(data_dir, "test-dataset", "lancedb"))
+    db.create_table("emb-embedding-001", [
+        {"ls_index": i, "vector": rng.normal(size=4).tolist(),
+         "token_vectors": tv.tolist()} for i, tv in enumerate(token_vectors)
+    ])
+    loaded = load_token_vectors(data_dir, "test-dataset", "embedding-001")
+    assert [tv.shape for tv in loaded] == [(2, 4), (3, 4)]
+    np.testing.assert_allclose(loaded[1], token_vectors[1], atol=1e-6)
 
 
 def test_append_to_legacy_schema_table(data_dir):
@@ -422,6 +663,69 @@ def test_migration_reports_monotonic_progress(data_dir):
     assert currents[-1] == 100  # reaches the full count
 
 
+def test_bulk_migration_across_datasets_resumes(data_dir, monkeypatch, capfd):
+    """ls-migrate-embeddings migrates every dataset's HDF5 files in worker
+    processes, redoes a half-written table, and indexes each table once."""
+    from latentscope.scripts.embed import migrate_all_embeddings
+    from latentscope.util.embedding_store import (
+        _embedding_table_name,
+        _has_vector_index,
+        _open_table,
+        append_embeddings,
+        find_hdf5_embeddings,
+        load_embeddings,
+    )
+
+    monkeypatch.setenv("LATENT_SCOPE_DATA", data_dir)
+    rng = np.random.default_rng(6)
+    small = rng.normal(size=(40, 16)).astype(np.float32)
+    large = rng.normal(size=(300, 16)).astype(np.float32)
+    _write_h5(data_dir, "embedding-001", small)
+    os.makedirs(os.path.join(data_dir, "other", "embeddings"))
+    h5_path = os.path.join(data_dir, "other", "embeddings", "embedding-002.h5")
+    os.rename(_write_h5(data_dir, "embedding-002", large), h5_path)
+    with open(os.path.join(data_dir, "other", "embeddings", "embedding-002.json"), "w") as f:
+        json.dump({"id": "embedding-002", "dimensions": 16}, f)
+    # an interrupted earlier run left part of a table behind
+    append_embeddings(data_dir, "other", "embedding-002", large[:100])
+
+    found = find_hdf5_embeddings(data_dir)
+    assert [(e["dataset_id"], e["embedding_id"]) for e in found] == [
+        ("other", "embedding-002"), ("test-dataset", "embedding-001")]
+
+    results = migrate_all_embeddings(workers=2, batch_size=64)
+    assert sorted(r["rows"] for r in results) == [40, 300]
+    assert find_hdf5_embeddings(data_dir) == []
+    assert not os.path.exists(os.path.join(data_dir, "migrate-embeddings.json"))
+    np.testing.assert_array_equal(load_embeddings(data_dir, "test-dataset", "embedding-001"),
+                                  small)
+    np.testing.assert_array_equal(load_embeddings(data_dir, "other", "embedding-002"), large)
+    assert _has_vector_index(_open_table(data_dir, "other", _embedding_table_name("embedding-002")))
+    with open(os.path.join(data_dir, "other", "embeddings", "embedding-002.json")) as f:
+        assert json.load(f)["vector_index"]["index_type"] == "IVF_PQ"
+    out = capfd.readouterr().out
+    assert "migrated 2 embedding(s), 340 rows" in out and "rows/s" in out
+
+    assert migrate_all_embeddings() == []
+
+    # a legacy file kept next to its migrated, (tuned) indexed table is left
+    # alone: no re-index over the tuned parameters, no new table version
+    _write_h5(data_dir, "embedding-003", large)
+    migrate_all_embeddings(["test-dataset"])
+    meta_path = os.path.join(data_dir, "test-dataset", "embeddings", "embedding-003.json")
+    tuned = {"index_type": "IVF_PQ", "num_partitions": 3, "nprobes": 7, "refine_factor": 4}
+    with open(meta_path, "w") as f:
+        json.dump({"id": "embedding-003", "vector_index": tuned}, f)
+    table = _embedding_table_name("embedding-003")
+    version = _open_table(data_dir, "test-dataset", table).version
+    h5_path = _write_h5(data_dir, "embedding-003", large)
+    assert migrate_all_embeddings() == []
+    assert os.path.exists(h5_path)
+    assert _open_table(data_dir, "test-dataset", table).version == version
+    with open(meta_path) as f:
+        assert json.load(f)["vector_index"] == tuned
+
+
 # ---------------------------------------------------------------------------
 # MaxSim ranking correctness (WP-H): relevant doc must outrank irrelevant one
 # ---------------------------------------------------------------------------
@@ -502,3 +806,349 @@ def test_maxsim_single_relevant_doc_wins_among_noise(data_dir):
     assert indices[0] == planted, f"expected planted doc {planted} first, got {indices[:5]}"
     assert scores[0] == pytest.approx(1.0, abs=1e-4)
     assert scores[0] > scores[1]
+
+
+def test_merge_shards_in_index_order_and_skips_merged(data_dir):
+    from latentscope.util.embedding_store import (
+        append_embeddings,
+        get_embedding_count,
+        load_embeddings,
+        merge_embedding_shards,
+    )
+
+    vectors = np.random.rand(30, 16).astype(np.float32)
+    # shard 1 finishes first; shard 0 is written in two batches
+    append_embeddings(data_dir, "test-dataset", "embedding-001", vectors[15:], start_index=15,
+                      shard=1)
+    append_embeddings(data_dir, "test-dataset", "embedding-001", vectors[:10], start_index=0,
+                      shard=0)
+    append_embeddings(data_dir, "test-dataset", "embedding-001", vectors[10:15], start_index=10,
+                      shard=0)
+    assert get_embedding_count(data_dir, "test-dataset", "embedding-001", shard=0) == 15
+    assert get_embedding_count(data_dir, "test-dataset", "embedding-001") == 0
+
+    merged = []
+    shards = [(0, 0, 15), (1, 15, 30)]
+    merge_embedding_shards(data_dir, "test-dataset", "embedding-001", shards,
+                           on_progress=lambda shard, rows: merged.append((shard, rows)))
+    assert merged == [(0, 15), (1, 15)]
+    np.testing.assert_allclose(load_embeddings(data_dir, "test-dataset", "embedding-001"),
+                               vectors, atol=1e-6)
+    assert get_embedding_count(data_dir, "test-dataset", "embedding-001", shard=1) == 0
+
+    # a rerun after the merge finished is a no-op
+    merge_embedding_shards(data_dir, "test-dataset", "embedding-001", shards)
+    assert get_embedding_count(data_dir, "test-dataset", "embedding-001") == 30
+
+
+@pytest.mark.parametrize("precision,atol", [("float16", 1e-3), ("int8", 0.01)])
+def test_quantized_storage_dequantizes_on_load(data_dir, precision, atol):
+    from latentscope.util.embedding_store import (
+        append_embeddings,
+        get_embedding_precision,
+        load_embeddings,
+        quantize_embeddings,
+    )
+
+    rng = np.random.default_rng(0)
+    vectors = rng.uniform(-1, 1, size=(300, 24)).astype(np.float32)
+    append_embeddings(data_dir, "test-dataset", "embedding-001", vectors[:200], start_index=0)
+    append_embeddings(data_dir, "test-dataset", "embedding-001", vectors[200:], start_index=200)
+    quantize_embeddings(data_dir, "test-dataset", "embedding-001", precision, batch_size=64)
+
+    assert get_embedding_precision(data_dir, "test-dataset", "embedding-001")["precision"] \
+        == precision
+    loaded = load_embeddings(data_dir, "test-dataset", "embedding-001")
+    assert loaded.dtype == np.float32
+    np.testing.assert_allclose(loaded, vectors, atol=atol)
+    compact = load_embeddings(data_dir, "test-dataset", "embedding-001", dequantize=False)
+    assert compact.dtype == {"float16": np.float16, "int8": np.int8}[precision]
+    assert compact.shape == vectors.shape
+
+
+def test_binary_storage_keeps_signs(data_dir):
+    from latentscope.util.embedding_store import (
+        append_embeddings,
+        load_embeddings,
+        quantize_embeddings,
+    )
+
+    vectors = np.random.default_rng(1).normal(size=(50, 20)).astype(np.float32)
+    append_embeddings(data_dir, "test-dataset", "embedding-001", vectors, start_index=0)
+    quantize_embeddings(data_dir, "test-dataset", "embedding-001", "binary")
+
+    packed = load_embeddings(data_dir, "test-dataset", "embedding-001", dequantize=False)
+    assert packed.dtype == np.uint8 and packed.shape == (50, 3)
+    np.testing.assert_array_equal(load_embeddings(data_dir, "test-dataset", "embedding-001"),
+                                  np.where(vectors > 0, 1.0, -1.0))
+
+
+@pytest.mark.parametrize("precision", ["float16", "int8"])
+def test_search_quantized_table(data_dir, precision):
+    from latentscope.util.embedding_store import (
+        append_embeddings,
+        create_vector_index,
+        quantize_embeddings,
+        search_nn,
+    )
+
+    vectors = np.random.default_rng(2).normal(size=(400, 32)).astype(np.float32)
+    append_embeddings(data_dir, "test-dataset", "embedding-001", vectors, start_index=0)
+    quantize_embeddings(data_dir, "test-dataset", "embedding-001", precision)
+    create_vector_index(data_dir, "test-dataset", "embedding-001")
+
+    indices, distances = search_nn(data_dir, "test-dataset", "embedding-001", vectors[17],
+                                   limit=5)
+    assert indices[0] == 17
+    assert len(indices) == 5
+    assert distances == sorted(distances)
+
+
+def test_quantized_table_rejects_appends(data_dir):
+    from latentscope.util.embedding_store import append_embeddings, quantize_embeddings
+
+    vectors = np.random.rand(10, 8).astype(np.float32)
+    append_embeddings(data_dir, "test-dataset", "embedding-001", vectors, start_index=0)
+    quantize_embeddings(data_dir, "test-dataset", "embedding-001", "int8")
+    # finishing a --rerun quantizes again: a no-op at the same precision
+    quantize_embeddings(data_dir, "test-dataset", "embedding-001", "int8")
+    with pytest.raises(ValueError, match="quantized"):
+        append_embeddings(data_dir, "test-dataset", "embedding-001", vectors, start_index=10)
+
+
+def test_estimate_storage_precision_savings():
+    from latentscope.util.embedding_store import estimate_embedding_storage
+
+    full = estimate_embedding_storage(1000, 1024)
+    assert full["savings_bytes"] == 0
+    int8 = estimate_embedding_storage(1000, 1024, precision="int8")
+    assert int8["mean_vector_bytes"] == 1000 * 1024
+    binary = estimate_embedding_storage(1000, 1024, precision="binary")
+    assert binary["mean_vector_bytes"] == 1000 * 128
+    assert full["total_bytes"] - binary["total_bytes"] == pytest.approx(binary["savings_bytes"],
+                                                                        abs=1)
+
+
+def test_sidecar_is_memory_mapped_until_the_table_changes(data_dir):
+    from latentscope.util.embedding_store import (
+        append_embeddings,
+        load_embeddings,
+        optimize_table,
+        write_embedding_sidecar,
+    )
+
+    vectors = np.random.rand(40, 8).astype(np.float32)
+    append_embeddings(data_dir, "test-dataset", "embedding-001", vectors[20:], start_index=20)
+    append_embeddings(data_dir, "test-dataset", "embedding-001", vectors[:20], start_index=0)
+    first = write_embedding_sidecar(data_dir, "test-dataset", "embedding-001")
+
+    loaded = load_embeddings(data_dir, "test-dataset", "embedding-001")
+    assert isinstance(loaded, np.memmap) and not loaded.flags.writeable
+    np.testing.assert_array_equal(loaded, vectors)
+
+    # any new table version (append, optimize, rewrite) makes the sidecar stale
+    more = np.random.rand(5, 8).astype(np.float32)
+    append_embeddings(data_dir, "test-dataset", "embedding-001", more, start_index=40)
+    loaded = load_embeddings(data_dir, "test-dataset", "embedding-001")
+    assert not isinstance(loaded, np.memmap)
+    np.testing.assert_array_equal(loaded, np.concatenate([vectors, more]))
+
+    optimize_table(data_dir, "test-dataset", "embedding-001")
+    second = write_embedding_sidecar(data_dir, "test-dataset", "embedding-001")
+    assert second != first and not os.path.exists(first)
+    assert load_embeddings(data_dir, "test-dataset", "embedding-001").shape == (45, 8)
+
+
+@pytest.mark.parametrize("precision", ["float16", "int8", "binary"])
+def test_no_sidecar_for_quantized_tables(data_dir, precision):
+    from latentscope.util.embedding_store import (
+        append_embeddings,
+        quantize_embeddings,
+        write_embedding_sidecar,
+    )
+
+    append_embeddings(data_dir, "test-dataset", "embedding-001",
+                      np.random.rand(10, 8).astype(np.float32), start_index=0)
+    quantize_embeddings(data_dir, "test-dataset", "embedding-001", precision)
+    assert write_embedding_sidecar(data_dir, "test-dataset", "embedding-001") is None
+
+
+def test_table_handles_are_cached_and_see_outside_writes(data_dir, monkeypatch):
+    """Repeated calls reuse one connection and table handle, yet appends,
+    drops and recreates made through other connections are still seen."""
+    import lancedb
+    import pyarrow as pa
+
+    from latentscope.util import embedding_store
+    from latentscope.util.embedding_store import (
+        append_embeddings,
+        get_embedding_count,
+        search_nn,
+    )
+
+    vectors = np.random.rand(10, 8).astype(np.float32)
+    append_embeddings(data_dir, "test-dataset", "embedding-001", vectors)
+
+    connects = []
+    real_connect = lancedb.connect
+    monkeypatch.setattr(lancedb, "connect",
+                        lambda *a, **kw: connects.append(a) or real_connect(*a, **kw))
+    for _ in range(3):
+        assert get_embedding_count(data_dir, "test-dataset", "embedding-001") == 10
+        search_nn(data_dir, "test-dataset", "embedding-001", vectors[0], limit=3)
+    assert connects == []
+    first = embedding_store._open_table(data_dir, "test-dataset", "emb-embedding-001")
+    assert embedding_store._open_table(data_dir, "test-dataset", "emb-embedding-001") is first
+
+    # another writer (e.g. a running ls-embed process) appends
+    other = real_connect(os.path.join(data_dir, "test-dataset", "lancedb"))
+    other.open_table("emb-embedding-001").add(pa.table({
+        "ls_index": pa.array(range(10, 15), pa.int64()),
+        "vector": pa.FixedSizeListArray.from_arrays(
+            pa.array(np.random.rand(40).astype(np.float32)), 8),
+    }))
+    assert get_embedding_count(data_dir, "test-dataset", "embedding-001") == 15
+
+    other.drop_table("emb-embedding-001")
+    assert get_embedding_count(data_dir, "test-dataset", "embedding-001") == 0
+    other.create_table("emb-embedding-001", pa.table({
+        "ls_index": pa.array(range(3), pa.int64()),
+        "vector": pa.FixedSizeListArray.from_arrays(
+            pa.array(np.random.rand(24).astype(np.float32)), 8),
+    }))
+    assert get_embedding_count(data_dir, "test-dataset", "embedding-001") == 3
+
+
+def test_process_exits_cleanly_with_cached_handles(data_dir):
+    """Cached handles are released at exit; LanceDB objects alive during
+    interpreter finalization can abort the process."""
+    import subprocess
+    import sys
+
+    script = (
+        "import numpy as np\n"
+        "from latentscope.util.embedding_store import append_embeddings, get_embedding_count\n"
+        f"append_embeddings({data_dir!r}, 'test-dataset', 'embedding-001',\n"
+        "                  np.random.rand(5, 8).astype(np.float32))\n"
+        f"get_embedding_count({data_dir!r}, 'test-dataset', 'embedding-001')\n"
+    )
+    for _ in range(3):
+        result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True)
+        assert result.returncode == 0, result.stderr[-2000:]
+
+
+@pytest.mark.parametrize("metric", ["cosine", "l2", "dot"])
+def test_search_nn_many_matches_brute_force(data_dir, monkeypatch, metric):
+    """The in-memory matmul and the shared streaming scan both return the
+    exact neighbors of every query, honoring per-query limits."""
+    from latentscope.util import embedding_store
+    from latentscope.util.embedding_store import append_embeddings, search_nn_many
+
+    rng = np.random.default_rng(4)
+    vectors = rng.normal(size=(300, 16)).astype(np.float32)
+    for start in range(0, 300, 100):
+        append_embeddings(data_dir, "test-dataset", "embedding-001",
+                          vectors[start:start + 100], start_index=start)
+    queries = rng.normal(size=(6, 16)).astype(np.float32)
+    limits = [10, 3, 3, 3, 3, 3]
+
+    if metric == "cosine":
+        normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        expected = 1 - (queries / np.linalg.norm(queries, axis=1, keepdims=True)) @ normed.T
+    elif metric == "l2":
+        expected = ((queries[:, None, :] - vectors[None]) ** 2).sum(axis=2)
+    else:
+        expected = 1 - queries @ vectors.T
+
+    resident = search_nn_many(data_dir, "test-dataset", "embedding-001", queries,
+                              limit=limits, metric=metric)
+    monkeypatch.setattr(embedding_store, "RESIDENT_MAX_VALUES", 0)
+    scanned = search_nn_many(data_dir, "test-dataset", "embedding-001", queries,
+                             limit=limits, metric=metric)
+    for results in (resident, scanned):
+        assert [len(indices) for indices, _ in results] == limits
+        for q, (indices, distances) in enumerate(results):
+            assert indices == np.argsort(expected[q], kind="stable")[:limits[q]].tolist()
+            np.testing.assert_allclose(distances, np.sort(expected[q])[:limits[q]],
+                                       rtol=1e-4, atol=1e-4)
+
+
+def test_search_nn_many_batched_index_query(data_dir, monkeypatch):
+    """Above the in-memory size, an indexed table answers all queries with
+    one LanceDB query, giving the same results as one search_nn per query."""
+    from latentscope.util import embedding_store
+    from latentscope.util.embedding_store import (
+        append_embeddings,
+        create_vector_index,
+        search_nn,
+        search_nn_many,
+    )
+
+    vectors = np.random.default_rng(5).normal(size=(400, 32)).astype(np.float32)
+    append_embeddings(data_dir, "test-dataset", "embedding-001", vectors)
+    create_vector_index(data_dir, "test-dataset", "embedding-001")
+    monkeypatch.setattr(embedding_store, "RESIDENT_MAX_VALUES", 0)
+
+    results = search_nn_many(data_dir, "test-dataset", "embedding-001", vectors[[3, 50, 7]],
+                             limit=5)
+    for (indices, distances), row in zip(results, [3, 50, 7]):
+        single, single_distances = search_nn(data_dir, "test-dataset", "embedding-001",
+                                             vectors[row], limit=5)
+        assert indices == single
+        np.testing.assert_allclose(distances, single_distances, rtol=1e-5)
+        assert distances == sorted(distances)
+
+
+
+def test_tuned_index_settings_reach_the_batched_query(data_dir, monkeypatch):
+    """search_late_interaction passes the tuned nprobes and refine_factor on
+    to search_nn_many's batched LanceDB query."""
+    from lancedb.query import LanceVectorQueryBuilder
+
+    from latentscope.util import embedding_store
+    from latentscope.util.embedding_store import (
+        append_embeddings,
+        create_vector_index,
+        search_late_interaction,
+    )
+
+    rng = np.random.default_rng(7)
+    token_vectors = [rng.normal(size=(3, 32)).astype(np.float32) for _ in range(300)]
+    append_embeddings(data_dir, "test-dataset", "embedding-001",
+                      np.stack([tv.mean(axis=0) for tv in token_vectors]),
+                      token_vectors_list=token_vectors)
+    create_vector_index(data_dir, "test-dataset", "embedding-001")
+    monkeypatch.setattr(embedding_store, "RESIDENT_MAX_VALUES", 0)
+    calls = []
+    for name in ("nprobes", "refine_factor"):
+        original = getattr(LanceVectorQueryBuilder, name)
+        monkeypatch.setattr(LanceVectorQueryBuilder, name,
+                            lambda self, value, name=name, original=original:
+                            calls.append((name, value)) or original(self, value))
+
+    indices, _ = search_late_interaction(data_dir, "test-dataset", "embedding-001",
+                                         token_vectors[42], final_limit=5,
+                                         use_token_index=False, nprobes=7, refine_factor=3)
+    assert calls == [("nprobes", 7), ("refine_factor", 3)]
+    assert indices[0] == 42
+
+def test_search_nn_many_resident_copy_follows_table_version(data_dir):
+    from latentscope.util.embedding_store import append_embeddings, search_nn_many
+
+    vectors = np.random.default_rng(6).normal(size=(20, 8)).astype(np.float32)
+    append_embeddings(data_dir, "test-dataset", "embedding-001", vectors[:10])
+    [(indices, _)] = search_nn_many(data_dir, "test-dataset", "embedding-001", vectors[15:16],
+                                    limit=1)
+    assert indices[0] < 10
+    append_embeddings(data_dir, "test-dataset", "embedding-001", vectors[10:], start_index=10)
+    [(indices, _)] = search_nn_many(data_dir, "test-dataset", "embedding-001", vectors[15:16],
+                                    limit=1)
+    assert indices == [15]
+
+
+def test_multi_probe_benchmark_runs():
+    from latentscope.scripts.search_benchmark import benchmark_multi_probe
+
+    results = benchmark_multi_probe(n_rows=300, dimensions=16, query_tokens=4, limit=5,
+                                    repeats=1)
+    assert set(results) == {"search_nn per probe", "search_nn_many"}
@@ -0,0 +1,111 @@
+"""Tests for the recall-tuned vector index (ls-tune-index, ls-embed --tune_index)."""
+import json
+import os
+
+import numpy as np
+import pytest
+
+from latentscope.scripts.search_benchmark import synthetic_embeddings
+from latentscope.util.index_tuning import default_index_config, index_grid
+
+GRID = [{"num_partitions": 4, "num_sub_vectors": 2}, {"num_partitions": 8, "num_sub_vectors": 4}]
+
+
+@pytest.mark.parametrize("dimensions", [16, 100, 384, 7])
+def test_sub_vectors_divide_the_dimension(dimensions):
+    configs = index_grid(100000, dimensions) + [default_index_config(100000, dimensions)]
+    assert all(dimensions % c["num_sub_vectors"] == 0 for c in configs)
+    assert {c["num_partitions"] for c in index_grid(100000, dimensions)} == {316, 632}
+    # small tables keep at least 40 rows per partition
+    assert max(c["num_partitions"] for c in index_grid(400, dimensions)) == 10
+
+
+@pytest.fixture
+def indexed_store(tmp_data_dir):
+    from latentscope.util.embedding_store import append_embeddings
+
+    vectors = synthetic_embeddings(1200, 16, n_clusters=8)
+    append_embeddings(tmp_data_dir, "ds", "embedding-001", vectors)
+    emb_dir = os.path.join(tmp_data_dir, "ds", "embeddings")
+    os.makedirs(emb_dir)
+    with open(os.path.join(emb_dir, "embedding-001.json"), "w") as f:
+        json.dump({"id": "embedding-001", "model_id": "fake", "dimensions": 16}, f)
+    return tmp_data_dir, vectors
+
+
+def test_tuning_picks_a_setting_that_meets_the_target(indexed_store):
+    from latentscope.util.embedding_store import _embedding_table_name, _open_table
+    from latentscope.util.index_tuning import held_out_queries, measure_recall, tune_ivf_pq
+
+    data_dir, vectors = indexed_store
+    tbl = _open_table(data_dir, "ds", _embedding_table_name("embedding-001"))
+    ids, queries, truth = held_out_queries(tbl, k=5, n_queries=20)
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = normed @ normed[ids[0]]
+    scores[ids[0]] = -np.inf
+    assert truth[0] == set(np.argsort(-scores)[:5].tolist())
+
+    result = tune_ivf_pq(tbl, k=5, n_queries=20, target_recall=0.9, grid=GRID,
+                         nprobes=(2, 8), refine_factors=(None, 20))
+    assert result["recall"] >= 0.9 and result["num_rows"] == 1200
+    # an index is left on the table, and the chosen settings reproduce their recall
+    assert [i.name for i in tbl.list_indices()]
+    recall, _ = measure_recall(tbl, ids, queries, truth, k=5, nprobes=result["nprobes"],
+                               refine_factor=result["refine_factor"])
+    assert recall >= 0.9
+
+
+def test_tuned_index_is_recorded_and_used_by_nn(client, indexed_store, monkeypatch):
+    import latentscope.scripts.embed as embed_mod
+    import latentscope.server.search as search_mod
+    import latentscope.util.index_tuning as tuning
+    from latentscope.util import embedding_store
+
+    data_dir, vectors = indexed_store
+    monkeypatch.setenv("LATENT_SCOPE_DATA", data_dir)
+    monkeypatch.setattr(tuning, "index_grid", lambda rows, dims: GRID)
+    monkeypatch.setattr(tuning, "NPROBES", (2, 8))
+    monkeypatch.setattr(tuning, "REFINE_FACTORS", (None, 20))
+    result = embed_mod.tune_embedding_index("ds", "embedding-001", target_recall=0.9, k=5,
+                                            n_queries=20)
+    with open(os.path.join(data_dir, "ds", "embeddings", "embedding-001.json")) as f:
+        assert json.load(f)["vector_index"] == result
+
+    class FakeProvider:
+        def load_model(self):
+            pass
+
+        def embed_query(self, inputs, dimensions=None):
+            return [vectors[3].tolist()]
+
+    calls = []
+    search_nn = embedding_store.search_nn
+    monkeypatch.setattr(embedding_store, "search_nn",
+                        lambda *args, **kwargs: calls.append(kwargs) or search_nn(*args, **kwargs))
+    monkeypatch.setattr(search_mod, "get_embedding_model", lambda model_id: FakeProvider())
+    search_mod.EMBEDDINGS.clear()
+    res = client.get("/api/search/nn?dataset=ds&embedding_id=embedding-001&query=q")
+    assert res.status_code == 200 and res.get_json()["indices"][0] == 3
+    assert calls[0]["nprobes"] == result["nprobes"]
+    assert calls[0]["refine_factor"] == result["refine_factor"]
+
+
+def test_untuned_index_parameters_are_returned(indexed_store):
+    from latentscope.util.embedding_store import create_vector_index, search_nn
+
+    data_dir, vectors = indexed_store
+    assert create_vector_index(data_dir, "ds", "embedding-001") == {
+        "index_type": "IVF_PQ", "metric": "cosine", "num_partitions": 120, "num_sub_vectors": 1}
+    indices, _ = search_nn(data_dir, "ds", "embedding-001", vectors[5], limit=3, nprobes=120,
+                           refine_factor=10)
+    assert indices[0] == 5
+
+
+def test_index_tuning_benchmark_runs(monkeypatch):
+    import latentscope.util.index_tuning as tuning
+    from latentscope.scripts.search_benchmark import benchmark_index_tuning
+
+    monkeypatch.setattr(tuning, "index_grid", lambda rows, dims: GRID)
+    results = benchmark_index_tuning(n_rows=1000, dimensions=16, k=5, n_queries=10)
+    assert set(results) == {"default", "tuned"}
+    assert results["tuned"]["recall"] >= 0.9
@@ -307,6 +307,62 @@ class TestClusterCommand:
         assert not any(c.startswith("--base_n_clusters") for c in cmd)
 
 
+
+class TestEmbedCommand:
+    """Optional /embed parameters sent empty must not reach ls-embed."""
+
+    def _capture_command(self, client, monkeypatch, query):
+        import latentscope.server.jobs as jobs_mod
+        captured = {}
+        done = threading.Event()
+
+        def fake_run_job(data_dir, dataset, job_id, command):
+            captured["command"] = command
+            done.set()
+
+        monkeypatch.setattr(jobs_mod, "run_job", fake_run_job)
+        res = client.get(f"/api/jobs/embed?{query}")
+        assert res.status_code == 200
+        assert done.wait(5)
+        return captured["command"]
+
+    def test_flags_forwarded(self, client, monkeypatch):
+        cmd = self._capture_command(
+            client, monkeypatch,
+            "dataset=ds1&text_column=text&model_id=m&prefix=&batch_size=100"
+            "&concurrency=4&workers=2")
+        assert "--concurrency=4" in cmd
+        assert "--workers=2" in cmd
+
+    def test_empty_values_omitted(self, client, monkeypatch):
+        cmd = self._capture_command(
+            client, monkeypatch,
+            "dataset=ds1&text_column=text&model_id=m&prefix=&batch_size=100"
+            "&concurrency=&workers=")
+        assert not any(c.startswith("--concurrency") for c in cmd)
+        assert not any(c.startswith("--workers") for c in cmd)
+
+def test_umap_sweep_route_expands_the_grid(client, monkeypatch):
+    import latentscope.server.jobs as jobs_mod
+    captured = {}
+    done = threading.Event()
+
+    def fake_run_job(data_dir, dataset, job_id, command):
+        captured["command"] = command
+        done.set()
+
+    monkeypatch.setattr(jobs_mod, "run_job", fake_run_job)
+    res = client.get("/api/jobs/umap_sweep?dataset=ds1&embedding_id=embedding-001"
+                     "&neighbors=15,30&min_dist=0.05,0.1,0.5&dimensions=2,3&seed=4")
+    assert res.status_code == 200
+    assert done.wait(5)
+    assert captured["command"] == [
+        "ls-umap-sweep", "ds1", "embedding-001", "--neighbors", "15", "30",
+        "--min_dist", "0.05", "0.1", "0.5", "--dimensions", "2", "3", "--seed=4"]
+    assert client.get("/api/jobs/umap_sweep?dataset=ds1&embedding_id=embedding-001"
+                      ).status_code == 400
+
+
 def test_readonly_app_does_not_reconcile_jobs(tmp_data_dir):
     """Codex review on #119: read-only deployments must not mutate the data
     dir — starting the app in read_only mode must leave stale 'running' job
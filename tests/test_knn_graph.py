@@ -0,0 +1,126 @@
+"""Tests for the persisted kNN graph shared by ls-umap and EVoC clustering."""
+import json
+import os
+
+import numpy as np
+import pytest
+
+import latentscope.util.knn_graph as knn_graph
+from tests.test_pipeline_e2e import FakeEmbedProvider, make_input_df
+
+
+def _exact_neighbours(vectors, k):
+    """(indices, cosine distances) by a float64 sort of all pairs."""
+    normed = vectors / np.linalg.norm(vectors.astype(np.float64), axis=1, keepdims=True)
+    distances = 1 - normed @ normed.T
+    np.fill_diagonal(distances, -1)
+    order = np.argsort(distances, axis=1, kind="stable")[:, :k]
+    return order, np.maximum(np.take_along_axis(distances, order, axis=1), 0)
+
+
+@pytest.fixture
+def count_builds(monkeypatch):
+    builds = []
+    compute = knn_graph.compute_knn_graph
+
+    def counting(vectors, k, metric="cosine", seed=None):
+        builds.append(k)
+        return compute(vectors, k, metric, seed)
+
+    monkeypatch.setattr(knn_graph, "compute_knn_graph", counting)
+    return builds
+
+
+@pytest.mark.parametrize("metric", ["cosine", "euclidean"])
+def test_exact_graph_puts_each_row_first(metric):
+    vectors = np.random.default_rng(0).normal(size=(300, 8)).astype(np.float32)
+    vectors[7] = vectors[3]  # a duplicate row still comes first in its own list
+    indices, distances = knn_graph._exact_knn(vectors, 10, metric, chunk_rows=64)
+    assert indices.dtype == np.int32 and distances.dtype == np.float32
+    assert (indices[:, 0] == np.arange(300)).all() and (distances[:, 0] == 0).all()
+    assert (np.diff(distances, axis=1) >= 0).all()
+    if metric == "cosine":
+        expected, expected_distances = _exact_neighbours(vectors, 10)
+        np.testing.assert_allclose(distances, expected_distances, atol=1e-5)
+        assert np.mean(indices == expected) > 0.99  # only near-ties may swap
+
+
+def test_nn_descent_graph_recall(monkeypatch):
+    monkeypatch.setattr(knn_graph, "EXACT_MAX_ROWS", 0)
+    rng = np.random.default_rng(1)
+    centers = rng.normal(size=(20, 16))
+    vectors = (centers[rng.integers(0, 20, size=2000)]
+               + rng.normal(scale=0.3, size=(2000, 16))).astype(np.float32)
+    indices, distances = knn_graph.compute_knn_graph(vectors, 10, seed=0)
+    assert indices.shape == (2000, 10) and indices.dtype == np.int32
+    exact, _ = _exact_neighbours(vectors, 10)
+    recall = np.mean([len(set(a) & set(b)) / 10 for a, b in zip(indices, exact)])
+    assert recall >= 0.9
+
+
+def test_graph_is_reused_for_smaller_k_and_rebuilt_when_stale(tmp_data_dir, count_builds):
+    vectors = np.random.default_rng(2).normal(size=(200, 8)).astype(np.float32)
+    indices, _ = knn_graph.get_knn_graph(tmp_data_dir, "ds", "embedding-001", vectors, 10)
+    assert count_builds == [64] and indices.shape == (200, 10)
+    prefix = os.path.join(tmp_data_dir, "ds", "embeddings", "embedding-001-knn", "cosine-64")
+    with open(prefix + ".json") as f:
+        assert json.load(f)["rows"] == 200
+    assert np.load(prefix + ".indices.npy").shape == (200, 64)
+
+    again, _ = knn_graph.get_knn_graph(tmp_data_dir, "ds", "embedding-001", vectors, 5)
+    np.testing.assert_array_equal(again, indices[:, :5])
+    assert count_builds == [64]
+
+    # more neighbours than stored: rebuilt, and the smaller graph is replaced
+    knn_graph.get_knn_graph(tmp_data_dir, "ds", "embedding-001", vectors, 80)
+    assert count_builds == [64, 80]
+    assert not os.path.exists(prefix + ".json")
+    # appended rows change the fingerprint
+    grown = np.concatenate([vectors, vectors[:3] + 1])
+    knn_graph.get_knn_graph(tmp_data_dir, "ds", "embedding-001", grown, 10)
+    assert count_builds == [64, 80, 64]
+    assert knn_graph.load_knn_graph(tmp_data_dir, "ds", "embedding-001", vectors, 10) is None
+
+
+def test_umap_and_evoc_share_one_graph(tmp_data_dir, monkeypatch, count_builds):
+    import evoc.clustering
+
+    import latentscope.scripts.embed as embed_mod
+    from latentscope.scripts.cluster import clusterer
+    from latentscope.scripts.embed import embed
+    from latentscope.scripts.ingest import ingest
+    from latentscope.scripts.umapper import umapper
+
+    monkeypatch.setenv("LATENT_SCOPE_DATA", tmp_data_dir)
+    monkeypatch.setenv("LATENT_SCOPE_NO_DOTENV", "1")
+    monkeypatch.setattr(embed_mod, "get_embedding_model", lambda model_id: FakeEmbedProvider())
+    ingest("knn", make_input_df(), text_column="text")
+    embed("knn", "text", "fake-test-model", prefix=None, rerun=None, dimensions=None,
+          batch_size=50)
+
+    umapper("knn", "embedding-001", neighbors=10, min_dist=0.1, seed=1)
+    umapper("knn", "embedding-001", neighbors=15, min_dist=0.5, seed=1, dimensions=3)
+    evoc_graphs = []
+    real_knn_graph = evoc.clustering.knn_graph
+    clusterer("knn", "umap-001", samples=5, min_samples=3, cluster_selection_epsilon=0.0,
+              column=None, method="evoc", n_neighbors=12, seed=1)
+    assert evoc.clustering.knn_graph is real_knn_graph
+    assert count_builds == [64]
+    for umap_id in ("umap-001", "umap-002"):
+        assert os.path.exists(os.path.join(tmp_data_dir, "knn", "umaps", f"{umap_id}.parquet"))
+    with open(os.path.join(tmp_data_dir, "knn", "clusters", "cluster-001.json")) as f:
+        assert json.load(f)["n_clusters"] >= 2
+
+    # EVoC receives the stored neighbours, in its -log2(similarity) distances
+    monkeypatch.setattr(evoc.clustering, "knn_graph",
+                        lambda data, n_neighbors=30, **kw: evoc_graphs.append(n_neighbors))
+    from latentscope.scripts.cluster import _evoc_precomputed_knn
+
+    indices = np.tile(np.arange(4, dtype=np.int32), (4, 1))
+    distances = np.tile(np.array([0.0, 0.5, 0.75, 1.5], dtype=np.float32), (4, 1))
+    with _evoc_precomputed_knn((indices, distances)):
+        inds, dists = evoc.clustering.knn_graph(np.zeros((4, 2)), n_neighbors=3)
+        evoc.clustering.knn_graph(np.zeros((5, 2)), n_neighbors=3)
+    np.testing.assert_array_equal(inds, indices[:, :3])
+    np.testing.assert_allclose(dists[0], [0.0, 1.0, 2.0])
+    assert evoc_graphs == [3]  # the wrong-sized input went to EVoC's own graph
@@ -114,6 +114,143 @@ class TestModel2VecModels:
         assert not hasattr(provider, "model")  # weights not loaded
 
 
+class CountingWordEncoder:
+    """tiktoken-shaped encoder (encode -> list of ids) over whitespace words
+    that counts how often each text is tokenized."""
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, text):
+        self.encoded.append(text)
+        return text.split(" ")
+
+    def decode(self, ids):
+        return " ".join(ids)
+
+
+class TestAPIEmbedPreparation:
+    def test_truncate_to_tokens_encodes_each_text_once(self):
+        from latentscope.models.providers.base import truncate_to_tokens
+
+        enc = CountingWordEncoder()
+        texts, counts = truncate_to_tokens(enc, ["a b c d e", "f g"], max_tokens=3)
+        assert texts == ["a b c", "f g"]
+        assert counts == [3, 2]
+        assert enc.encoded == ["a b c d e", "f g"]
+
+    def test_hf_encoding_ids(self):
+        from latentscope.models.providers.base import truncate_to_tokens
+
+        class Encoding:
+            def __init__(self, ids):
+                self.ids = ids
+
+        class HFTokenizer:
+            def encode(self, text):
+                return Encoding(text.split(" "))
+
+            def decode(self, ids):
+                return " ".join(ids)
+
+        texts, counts = truncate_to_tokens(HFTokenizer(), ["a b c"], max_tokens=2)
+        assert texts == ["a b"]
+        assert counts == [2]
+
+    def test_openai_prepare_normalizes_and_truncates(self):
+        from latentscope.models.providers.openai import OpenAIEmbedProvider
+
+        provider = OpenAIEmbedProvider("fake-model", {"max_tokens": 2})
+        provider.encoder = CountingWordEncoder()
+        texts, counts = provider.prepare_inputs(["one\ntwo three", "four"])
+        assert texts == ["one two", "four"]
+        assert counts == [2, 1]
+        assert len(provider.encoder.encoded) == 2
+
+    def test_embed_is_prepare_then_request(self):
+        from latentscope.models.providers.openai import OpenAIEmbedProvider
+
+        sent = []
+
+        class FakeEmbeddingsAPI:
+            def create(self, input, model, **kwargs):
+                sent.append(list(input))
+
+                class Item:
+                    embedding = [0.0]
+
+                class Response:
+                    data = [Item() for _ in input]
+
+                return Response()
+
+        class FakeClient:
+            embeddings = FakeEmbeddingsAPI()
+
+        provider = OpenAIEmbedProvider("fake-model", {"max_tokens": 1})
+        provider.client = FakeClient()
+        provider.encoder = CountingWordEncoder()
+        assert provider.embed(["a b", "c"]) == [[0.0], [0.0]]
+        assert sent == [["a", "c"]]
+
+
+class TestInferenceBackends:
+    def test_min_cosine(self):
+        import numpy as np
+
+        from latentscope.models.providers.transformers import min_cosine
+
+        a = np.array([[1.0, 0.0], [0.0, 2.0]])
+        assert min_cosine(a, a * 3) == pytest.approx(1.0)
+        b = np.array([[1.0, 0.0], [1.0, 1.0]])
+        assert min_cosine(a, b) == pytest.approx(np.sqrt(0.5))
+
+    def test_export_dir_is_per_model_and_backend(self):
+        from latentscope.models.providers.transformers import onnx_export_dir
+
+        path = onnx_export_dir("/data", "BAAI/bge-small-en-v1.5", "onnx-int8")
+        assert path == os.path.join("/data", "models", "onnx", "BAAI___bge-small-en-v1.5",
+                                    "onnx-int8")
+        assert path != onnx_export_dir("/data", "BAAI/bge-small-en-v1.5", "onnx")
+
+
+@pytest.mark.skipif(
+    not os.environ.get("LS_TEST_REAL_MODELS"),
+    reason="set LS_TEST_REAL_MODELS=1 to run model-download tests",
+)
+@pytest.mark.parametrize("backend", ["onnx", "onnx-int8"])
+def test_onnx_backend_real_model(backend, tmp_path, monkeypatch):
+    """The export is validated against torch, cached in the data dir and
+    reused by the next load."""
+    import numpy as np
+
+    from latentscope.models import get_embedding_model
+    from latentscope.models.providers.transformers import onnx_export_dir
+
+    monkeypatch.setenv("LATENT_SCOPE_DATA", str(tmp_path))
+    model_id = "huggingface-sentence-transformers___all-MiniLM-L6-v2"
+    texts = ["A short document about cooking pasta.", "The stock market fell sharply."]
+
+    torch_provider = get_embedding_model(model_id)
+    torch_provider.device = "cpu"
+    torch_provider.load_model()
+    expected = np.array(torch_provider.embed(texts))
+
+    provider = get_embedding_model(model_id)
+    provider.backend = backend
+    provider.load_model()
+    export_dir = onnx_export_dir(str(tmp_path), "sentence-transformers/all-MiniLM-L6-v2", backend)
+    assert os.path.exists(os.path.join(export_dir, "latentscope_export.json"))
+    got = np.array(provider.embed(texts))
+    assert np.min(np.sum(expected * got, axis=1)) > 0.95
+
+    mtime = os.path.getmtime(os.path.join(export_dir, "latentscope_export.json"))
+    again = get_embedding_model(model_id)
+    again.backend = backend
+    again.load_model()
+    assert os.path.getmtime(os.path.join(export_dir, "latentscope_export.json")) == mtime
+
+
 @pytest.mark.skipif(
     not os.environ.get("LS_TEST_REAL_MODELS"),
     reason="set LS_TEST_REAL_MODELS=1 to run model-download tests",
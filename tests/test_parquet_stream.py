@@ -0,0 +1,72 @@
+"""Tests for the column-projected streaming input.parquet reader."""
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from latentscope.util.parquet_stream import (
+    count_rows,
+    iter_column_chunks,
+    read_column,
+    read_rows,
+)
+
+
+@pytest.fixture
+def parquet_path(tmp_path):
+    """25 rows in row groups of 7, with nulls in a string and an int column."""
+    df = pd.DataFrame({
+        "text": [None if i % 6 == 0 else f"row {i}" for i in range(25)],
+        "count": pd.array([None if i % 5 == 0 else i for i in range(25)], dtype="Int64"),
+        "blob": [bytes([i]) * 100 for i in range(25)],
+    })
+    path = str(tmp_path / "input.parquet")
+    pq.write_table(pa.Table.from_pandas(df), path, row_group_size=7)
+    return path
+
+
+def test_chunks_match_pandas_values(parquet_path):
+    expected = pd.read_parquet(parquet_path)
+    for column in ("text", "count"):
+        chunks = list(iter_column_chunks(parquet_path, column, 4))
+        assert [start for start, _ in chunks] == list(range(0, 25, 4))
+        values = [v for _, chunk in chunks for v in chunk]
+        want = expected[column].tolist()
+        assert len(values) == len(want)
+        for got, ref in zip(values, want):
+            assert (pd.isna(got) and pd.isna(ref)) or got == ref
+
+
+def test_resume_start_keeps_batch_alignment(parquet_path):
+    chunks = list(iter_column_chunks(parquet_path, "text", 4, start=10))
+    assert [(start, len(values)) for start, values in chunks] == [
+        (10, 2), (12, 4), (16, 4), (20, 4), (24, 1)]
+    assert chunks[0][1] == ["row 10", "row 11"]
+
+
+def test_resume_start_several_batches_into_a_row_group(tmp_path):
+    path = str(tmp_path / "one_group.parquet")
+    pq.write_table(pa.table({"text": [f"row {i}" for i in range(100)]}), path)
+    chunks = list(iter_column_chunks(path, "text", 10, start=60))
+    assert [start for start, _ in chunks] == [60, 70, 80, 90]
+    assert chunks[0][1][0] == "row 60"
+
+
+def test_unaligned_chunks(parquet_path):
+    chunks = list(iter_column_chunks(parquet_path, "text", 4, start=10, aligned=False))
+    assert [start for start, _ in chunks] == [10, 14, 18, 22]
+    assert chunks[-1][1] == ["row 22", "row 23", None]
+
+
+def test_start_past_end_yields_nothing(parquet_path):
+    assert list(iter_column_chunks(parquet_path, "text", 4, start=25)) == []
+
+
+def test_read_column_and_rows(parquet_path):
+    assert count_rows(parquet_path) == 25
+    assert read_column(parquet_path, "text")[:3] == [None, "row 1", "row 2"]
+    rows = read_rows(parquet_path, [20, 3, 8])
+    assert list(rows.index) == [20, 3, 8]
+    assert rows["text"].tolist() == ["row 20", "row 3", "row 8"]
+    np.testing.assert_array_equal(rows["blob"].map(len).to_numpy(), [100, 100, 100])
@@ -100,6 +100,8 @@ def test_full_pipeline_small_dataset(pipeline_env):
     assert get_embedding_count(data_dir, dataset_id, "embedding-001") == n_total
     vectors = load_embeddings(data_dir, dataset_id, "embedding-001")
     assert vectors.shape == (n_total, DIM)
+    # the finished run left a memory-mappable sidecar that later loads share
+    assert isinstance(vectors, np.memmap)
     # row alignment: stored vector i must equal the provider's output for text i
     provider = FakeEmbedProvider()
     np.testing.assert_allclose(vectors[7], provider._vector(df["text"].iloc[7]),
@@ -643,6 +645,44 @@ def test_token_umapper_sample_fit_path(pipeline_env, monkeypatch):
         assert json.load(f)["fit_sample"] == total_tokens // 3
 
 
+def test_token_umapper_reads_the_token_table_once(pipeline_env, monkeypatch, capsys):
+    """The sample fit path streams the token table a single time; the
+    transform runs from the spilled copy, in worker processes or not, with
+    the same result. Workers are capped to the reducer copies that fit in
+    memory."""
+    data_dir = pipeline_env
+    dataset_id = "e2e-tokonce"
+    _setup_tokenized_dataset(data_dir, dataset_id, monkeypatch)
+
+    from latentscope.util import embedding_store
+    total_tokens = embedding_store.count_token_metadata(data_dir, dataset_id, "embedding-001")
+    streams = []
+    iter_token_vectors = embedding_store.iter_token_vectors
+    monkeypatch.setattr(embedding_store, "iter_token_vectors",
+                        lambda *args, **kwargs: streams.append(1) or
+                        iter_token_vectors(*args, **kwargs))
+
+    from latentscope.scripts import umapper
+    layouts = []
+    for workers, available in ((1, None), (2, None), (2, 1)):
+        monkeypatch.setattr(umapper, "_available_memory", lambda: available)
+        umap_id = umapper.token_umapper(dataset_id, "embedding-001", neighbors=10,
+                                        min_dist=0.1, seed=42, fit_sample=total_tokens // 3,
+                                        transform_batch_tokens=total_tokens // 4,
+                                        workers=workers)
+        layouts.append(pd.read_parquet(
+            os.path.join(data_dir, dataset_id, "umaps", f"{umap_id}.parquet")).to_numpy())
+        with open(os.path.join(data_dir, dataset_id, "umaps", f"{umap_id}.json")) as f:
+            assert set(json.load(f)["timings"]) == {"stream", "fit", "transform"}
+    assert streams == [1, 1, 1]
+    np.testing.assert_allclose(layouts[0], layouts[1], atol=1e-5)
+    np.testing.assert_allclose(layouts[0], layouts[2], atol=1e-5)
+    out = capsys.readouterr().out
+    assert "with 2 worker processes" in out and "using 1 token transform worker(s)" in out
+    assert sorted(os.listdir(os.path.join(data_dir, dataset_id, "umaps"))) == [
+        f"umap-00{i}.{ext}" for i in (1, 2, 3) for ext in ("json", "parquet", "png")]
+
+
 def test_token_cluster_rejects_row_level_input(pipeline_env, monkeypatch):
     """Clustering a token umap on the (row-level) embedding matrix must fail
     loudly instead of producing misaligned output."""
@@ -1080,6 +1120,738 @@ def test_embed_failure_leaves_debug_parquet_and_rerun_cleans_it(pipeline_env,
     assert get_embedding_count(data_dir, dataset_id, "embedding-001") == n_total
 
 
+# ---------------------------------------------------------------------------
+# pipelined embedding (ls-embed --pipeline)
+# ---------------------------------------------------------------------------
+
+def test_pipelined_embed_matches_serial(pipeline_env, capsys):
+    """--pipeline overlaps prepare/encode/write but stores exactly what the
+    serial loop stores, row-aligned, and reports per-stage throughput."""
+    data_dir = pipeline_env
+    from latentscope.scripts.embed import embed
+    from latentscope.scripts.ingest import ingest
+    from latentscope.util.embedding_store import load_embeddings
+
+    df = make_input_df()
+    ingest("serial", df, text_column="text")
+    ingest("pipelined", df, text_column="text")
+    embed("serial", "text", "fake-test-model", prefix="doc: ", rerun=None,
+          dimensions=None, batch_size=7)
+    embed("pipelined", "text", "fake-test-model", prefix="doc: ", rerun=None,
+          dimensions=None, batch_size=7, pipeline=True)
+
+    serial = load_embeddings(data_dir, "serial", "embedding-001")
+    pipelined = load_embeddings(data_dir, "pipelined", "embedding-001")
+    np.testing.assert_array_equal(serial, pipelined)
+    provider = FakeEmbedProvider()
+    np.testing.assert_allclose(pipelined[50], provider._vector("doc: " + df["text"].iloc[50]),
+                               atol=1e-6)
+    out = capsys.readouterr().out
+    assert "throughput: prepare" in out
+    assert "encode" in out and "write" in out
+
+
+def test_pipelined_embed_failure_preserves_prefix_and_resumes(pipeline_env, monkeypatch,
+                                                              capsys):
+    """A failing batch in --pipeline mode still leaves every earlier batch
+    written (a contiguous prefix), writes the debug parquet, and resumes."""
+    data_dir = pipeline_env
+    dataset_id = "e2e-test"
+
+    from latentscope.scripts.ingest import ingest
+    ingest(dataset_id, make_input_df(), text_column="text")
+
+    import latentscope.scripts.embed as embed_mod
+
+    class CrashingProvider(FakeEmbedProvider):
+        calls = 0
+
+        def embed(self, batch, dimensions=None):
+            CrashingProvider.calls += 1
+            if CrashingProvider.calls > 3:
+                raise RuntimeError("simulated crash")
+            return super().embed(batch, dimensions)
+
+    monkeypatch.setattr(embed_mod, "get_embedding_model",
+                        lambda model_id: CrashingProvider())
+    with pytest.raises(SystemExit):
+        embed_mod.embed(dataset_id, "text", "fake-test-model", prefix=None,
+                        rerun=None, dimensions=None, batch_size=20, pipeline=True)
+
+    from latentscope.util.embedding_store import get_embedding_count, load_embeddings
+    assert get_embedding_count(data_dir, dataset_id, "embedding-001") == 60
+    embedding_dir = os.path.join(data_dir, dataset_id, "embeddings")
+    assert os.path.exists(os.path.join(embedding_dir, "embedding-001-batch-3.parquet"))
+    assert "--rerun embedding-001" in capsys.readouterr().out
+
+    monkeypatch.setattr(embed_mod, "get_embedding_model",
+                        lambda model_id: FakeEmbedProvider())
+    embed_mod.embed(dataset_id, "text", "fake-test-model", prefix=None,
+                    rerun="embedding-001", dimensions=None, batch_size=20, pipeline=True)
+    vectors = load_embeddings(data_dir, dataset_id, "embedding-001")
+    n_total = N_PER_TOPIC * len(TOPICS)
+    assert vectors.shape == (n_total, DIM)
+    df = make_input_df()
+    np.testing.assert_allclose(vectors[70], FakeEmbedProvider()._vector(df["text"].iloc[70]),
+                               atol=1e-6)
+
+
+def test_pipelined_embed_write_failure_reports_failing_batch(pipeline_env, monkeypatch):
+    """A LanceDB write error surfaces as that batch's failure; nothing after it
+    is written."""
+    data_dir = pipeline_env
+    dataset_id = "e2e-test"
+    from latentscope.scripts.ingest import ingest
+    ingest(dataset_id, make_input_df(), text_column="text")
+
+    import latentscope.scripts.embed as embed_mod
+    import latentscope.util.embedding_store as store
+
+    real_append = store.append_embeddings
+
+    def flaky_append(data_dir, dataset_id, embedding_id, vectors, start_index=0,
+                     token_vectors_list=None, ls_indices=None):
+        if start_index == 40:
+            raise OSError("disk full")
+        return real_append(data_dir, dataset_id, embedding_id, vectors,
+                           start_index=start_index, token_vectors_list=token_vectors_list,
+                           ls_indices=ls_indices)
+
+    monkeypatch.setattr(store, "append_embeddings", flaky_append)
+    with pytest.raises(SystemExit):
+        embed_mod.embed(dataset_id, "text", "fake-test-model", prefix=None,
+                        rerun=None, dimensions=None, batch_size=20, pipeline=True)
+    assert store.get_embedding_count(data_dir, dataset_id, "embedding-001") == 40
+    assert os.path.exists(os.path.join(data_dir, dataset_id, "embeddings",
+                                       "embedding-001-batch-2.parquet"))
+
+
+def test_embed_cache_reuses_vectors_across_datasets(pipeline_env, monkeypatch):
+    """--cache: a second dataset sharing rows with the first only sends the
+    new rows to the provider, stores identical vectors, and records hit/miss
+    counters in the embedding meta."""
+    data_dir = pipeline_env
+    import latentscope.scripts.embed as embed_mod
+    from latentscope.scripts.ingest import ingest
+    from latentscope.util.embedding_store import load_embeddings
+
+    calls = []
+
+    class CountingProvider(FakeEmbedProvider):
+        def embed(self, batch, dimensions=None):
+            calls.extend(batch)
+            return super().embed(batch, dimensions)
+
+    monkeypatch.setattr(embed_mod, "get_embedding_model",
+                        lambda model_id: CountingProvider())
+    df = make_input_df()
+    ingest("first", df, text_column="text")
+    embed_mod.embed("first", "text", "fake-test-model", prefix=None, rerun=None,
+                    dimensions=None, batch_size=50, cache=True)
+    assert len(calls) == len(df)
+
+    changed = df.copy()
+    changed.loc[[3, 90], "text"] = ["a brand new science row", "a brand new sports row"]
+    ingest("second", changed, text_column="text")
+    calls.clear()
+    embed_mod.embed("second", "text", "fake-test-model", prefix=None, rerun=None,
+                    dimensions=None, batch_size=50, cache=True, pipeline=True)
+    assert calls == ["a brand new science row", "a brand new sports row"]
+
+    vectors = load_embeddings(data_dir, "second", "embedding-001")
+    provider = FakeEmbedProvider()
+    for i in [0, 3, 89, 90, len(df) - 1]:
+        np.testing.assert_allclose(vectors[i], provider._vector(changed["text"].iloc[i]),
+                                   atol=1e-6)
+    with open(os.path.join(data_dir, "second", "embeddings", "embedding-001.json")) as f:
+        meta = json.load(f)
+    assert meta["cache"]["hits"] == len(df) - 2
+    assert meta["cache"]["misses"] == 2
+
+    # a different prefix is a different cache namespace
+    calls.clear()
+    embed_mod.embed("second", "text", "fake-test-model", prefix="q: ", rerun=None,
+                    dimensions=None, batch_size=50, cache=True)
+    assert len(calls) == len(df)
+
+
+# ---------------------------------------------------------------------------
+# length-bucketed batching (ls-embed --sort-by-length)
+# ---------------------------------------------------------------------------
+
+class FakePaddingProvider(FakeTokenizingProvider):
+    """Tokenizing provider that pads batches like a local transformer, and
+    records the batches it was asked to embed."""
+
+    pads_batches = True
+
+    def __init__(self, dim=DIM):
+        super().__init__(dim)
+        self.batches = []
+
+    def embed(self, batch, dimensions=None):
+        self.batches.append(list(batch))
+        return super().embed(batch, dimensions)
+
+
+def make_mixed_length_df(n=90):
+    rng = np.random.default_rng(3)
+    rows = []
+    for i in range(n):
+        topic = TOPICS[i % len(TOPICS)]
+        filler = " ".join(["word"] * int(rng.integers(0, 40)))
+        rows.append({"text": f"row {i} about {topic} {filler}"})
+    return pd.DataFrame(rows)
+
+
+def test_sort_by_length_groups_batches_and_scatters_rows(pipeline_env, monkeypatch):
+    """Batches hold rows of similar token length, but every vector lands at
+    its original ls_index: the stored embeddings equal a file-order run."""
+    data_dir = pipeline_env
+    import latentscope.scripts.embed as embed_mod
+    from latentscope.scripts.ingest import ingest
+    from latentscope.util.embedding_store import load_embeddings
+
+    df = make_mixed_length_df()
+    ingest("sorted", df, text_column="text")
+    ingest("unsorted", df, text_column="text")
+    provider = FakePaddingProvider()
+    monkeypatch.setattr(embed_mod, "get_embedding_model", lambda model_id: provider)
+    embed_mod.embed("sorted", "text", "fake-test-model", prefix=None, rerun=None,
+                    dimensions=None, batch_size=20, sort_by_length=True)
+    lengths = [[len(t.split()) for t in b] for b in provider.batches]
+    # every batch's longest row is no longer than the next batch's shortest
+    for a, b in zip(lengths, lengths[1:]):
+        assert max(a) <= min(b)
+
+    monkeypatch.setattr(embed_mod, "get_embedding_model",
+                        lambda model_id: FakePaddingProvider())
+    embed_mod.embed("unsorted", "text", "fake-test-model", prefix=None, rerun=None,
+                    dimensions=None, batch_size=20)
+    np.testing.assert_array_equal(load_embeddings(data_dir, "sorted", "embedding-001"),
+                                  load_embeddings(data_dir, "unsorted", "embedding-001"))
+    with open(os.path.join(data_dir, "sorted", "embeddings", "embedding-001.json")) as f:
+        meta = json.load(f)
+    assert meta["sort_by_length"] is True
+    assert meta["token_stats"]["count"] == len(df)
+    # the finished table is stored in ls_index order again, so later passes
+    # stream it sequentially
+    import lancedb
+    db = lancedb.connect(os.path.join(data_dir, "sorted", "lancedb"))
+    ls_index = db.open_table("emb-embedding-001").to_arrow().column("ls_index").to_numpy()
+    assert (np.diff(ls_index) > 0).all()
+
+
+def test_sort_by_length_resumes_by_index_coverage(pipeline_env, monkeypatch, capsys):
+    """A crashed length-sorted run stores a scattered subset of rows; --rerun
+    embeds exactly the missing ones, with or without --sort-by-length."""
+    data_dir = pipeline_env
+    import latentscope.scripts.embed as embed_mod
+    from latentscope.scripts.ingest import ingest
+    from latentscope.util.embedding_store import get_embedded_indices, load_embeddings
+
+    df = make_mixed_length_df()
+    ingest("e2e-test", df, text_column="text")
+
+    class CrashingProvider(FakePaddingProvider):
+        def embed(self, batch, dimensions=None):
+            if len(self.batches) >= 2:
+                raise RuntimeError("simulated crash")
+            return super().embed(batch, dimensions)
+
+    monkeypatch.setattr(embed_mod, "get_embedding_model",
+                        lambda model_id: CrashingProvider())
+    with pytest.raises(SystemExit):
+        embed_mod.embed("e2e-test", "text", "fake-test-model", prefix=None, rerun=None,
+                        dimensions=None, batch_size=20, sort_by_length=True)
+    stored = get_embedded_indices(data_dir, "e2e-test", "embedding-001")
+    assert len(stored) == 40
+    assert stored[-1] != 39  # not a contiguous prefix
+    # the debug parquet holds the failing bucket's original rows
+    debug = pd.read_parquet(os.path.join(data_dir, "e2e-test", "embeddings",
+                                         "embedding-001-batch-2.parquet"))
+    assert list(debug["_ls_text_"]) == list(df["text"].iloc[debug.index])
+
+    provider = FakePaddingProvider()
+    monkeypatch.setattr(embed_mod, "get_embedding_model", lambda model_id: provider)
+    embed_mod.embed("e2e-test", "text", "fake-test-model", prefix=None,
+                    rerun="embedding-001", dimensions=None, batch_size=20)
+    assert sum(len(b) for b in provider.batches) == len(df) - 40
+    np.testing.assert_array_equal(get_embedded_indices(data_dir, "e2e-test", "embedding-001"),
+                                  np.arange(len(df)))
+    vectors = load_embeddings(data_dir, "e2e-test", "embedding-001")
+    for i in range(len(df)):
+        np.testing.assert_allclose(vectors[i], provider._vector(df["text"].iloc[i]), atol=1e-6)
+
+
+def test_sort_by_length_ignored_for_api_style_providers(pipeline_env, monkeypatch, capsys):
+    """Providers that don't pad batches locally keep file-order batching."""
+    data_dir = pipeline_env
+    import latentscope.scripts.embed as embed_mod
+    from latentscope.scripts.ingest import ingest
+
+    ingest("e2e-test", make_input_df(), text_column="text")
+    monkeypatch.setattr(embed_mod, "get_embedding_model",
+                        lambda model_id: FakeTokenizingProvider())
+    embed_mod.embed("e2e-test", "text", "fake-test-model", prefix=None, rerun=None,
+                    dimensions=None, batch_size=50, sort_by_length=True)
+    assert "--sort-by-length ignored" in capsys.readouterr().out
+    with open(os.path.join(data_dir, "e2e-test", "embeddings", "embedding-001.json")) as f:
+        assert "sort_by_length" not in json.load(f)
+
+
+# ---------------------------------------------------------------------------
+# concurrent API embedding (ls-embed --concurrency)
+# ---------------------------------------------------------------------------
+
+class FakeEmbeddingServer:
+    """Local OpenAI-style /embeddings endpoint that adds latency and answers
+    429 whenever more than `max_in_flight` requests overlap."""
+
+    def __init__(self, latency=0.05, max_in_flight=2):
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        self.latency = latency
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.peak = 0
+        self.rejected = 0
+        self.lock = threading.Lock()
+        provider = FakeEmbedProvider()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                import time
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with server.lock:
+                    server.in_flight += 1
+                    server.peak = max(server.peak, server.in_flight)
+                    overloaded = server.in_flight > server.max_in_flight
+                    if overloaded:
+                        server.rejected += 1
+                try:
+                    time.sleep(server.latency)
+                    if overloaded:
+                        self.send_response(429)
+                        self.end_headers()
+                        return
+                    data = [{"embedding": provider._vector(t).tolist()} for t in body["input"]]
+                    payload = json.dumps({"data": data}).encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                finally:
+                    with server.lock:
+                        server.in_flight -= 1
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/embeddings"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class FakeHTTPEmbedProvider:
+    """API-style provider posting to FakeEmbeddingServer, retrying like the
+    real providers do."""
+
+    name = "fake-api-model"
+    late_interaction = False
+    rate_limits = {"requests_per_minute": 60000, "tokens_per_minute": None}
+
+    def __init__(self, url):
+        self.url = url
+
+    def load_model(self):
+        pass
+
+    def embed(self, inputs, dimensions=None):
+        import urllib.request
+
+        from latentscope.util.retry import retry_transient
+
+        @retry_transient(tries=8, base=0.02, max_delay=0.2)
+        def _post():
+            req = urllib.request.Request(
+                self.url, data=json.dumps({"input": list(inputs)}).encode(),
+                headers={"Content-Type": "application/json"})
+            with urllib.request.urlopen(req, timeout=10) as resp:
+                return json.loads(resp.read())
+
+        return [d["embedding"] for d in _post()["data"]]
+
+
+def test_concurrent_api_embed_reorders_and_backs_off(pipeline_env, monkeypatch, capsys):
+    """--concurrency keeps several requests in flight, halves concurrency on
+    the server's 429s, and still stores every vector at its own row."""
+    data_dir = pipeline_env
+    import latentscope.scripts.embed as embed_mod
+    from latentscope.scripts.ingest import ingest
+    from latentscope.util.embedding_store import load_embeddings
+
+    server = FakeEmbeddingServer(latency=0.05, max_in_flight=2)
+    try:
+        monkeypatch.setattr(embed_mod, "get_embedding_model",
+                            lambda model_id: FakeHTTPEmbedProvider(server.url))
+        df = make_input_df()
+        ingest("e2e-test", df, text_column="text")
+        embed_mod.embed("e2e-test", "text", "fake-api-model", prefix=None, rerun=None,
+                        dimensions=None, batch_size=5, concurrency=6)
+    finally:
+        server.close()
+
+    assert server.peak > 1
+    assert server.rejected > 0
+    out = capsys.readouterr().out
+    assert "rate limited; reducing concurrency" in out
+    assert "api: 24 calls" in out
+    vectors = load_embeddings(data_dir, "e2e-test", "embedding-001")
+    provider = FakeEmbedProvider()
+    assert vectors.shape == (len(df), DIM)
+    for i in range(len(df)):
+        np.testing.assert_allclose(vectors[i], provider._vector(df["text"].iloc[i]), atol=1e-6)
+
+
+def test_concurrent_embed_failure_keeps_ordered_prefix(pipeline_env, monkeypatch):
+    """A batch failing mid-flight leaves exactly the batches before it stored."""
+    data_dir = pipeline_env
+    import latentscope.scripts.embed as embed_mod
+    from latentscope.scripts.ingest import ingest
+    from latentscope.util.embedding_store import get_embedded_indices
+
+    class FailingAPIProvider(FakeEmbedProvider):
+        rate_limits = {"requests_per_minute": None, "tokens_per_minute": None}
+
+        def embed(self, batch, dimensions=None):
+            import time
+            if any(t == make_input_df()["text"].iloc[45] for t in batch):
+                raise ValueError("bad input")
+            time.sleep(0.01)
+            return super().embed(batch, dimensions)
+
+    monkeypatch.setattr(embed_mod, "get_embedding_model",
+                        lambda model_id: FailingAPIProvider())
+    ingest("e2e-test", make_input_df(), text_column="text")
+    with pytest.raises(SystemExit):
+        embed_mod.embed("e2e-test", "text", "fake-test-model", prefix=None, rerun=None,
+                        dimensions=None, batch_size=10, concurrency=4)
+    np.testing.assert_array_equal(get_embedded_indices(data_dir, "e2e-test", "embedding-001"),
+                                  np.arange(40))
+    assert os.path.exists(os.path.join(data_dir, "e2e-test", "embeddings",
+                                       "embedding-001-batch-4.parquet"))
+
+
+# ---------------------------------------------------------------------------
+# token-budget request packing for API providers
+# ---------------------------------------------------------------------------
+
+def _fake_api_provider(max_batch_tokens, max_batch_items=None):
+    from latentscope.models.providers.base import APIEmbedProvider
+
+    class WordEncoder:
+        def __init__(self):
+            self.calls = 0
+
+        def encode(self, text):
+            self.calls += 1
+            return text.split(" ")
+
+        def decode(self, ids):
+            return " ".join(ids)
+
+    class FakeAPIProvider(APIEmbedProvider):
+        def __init__(self):
+            super().__init__("fake-api-model", {"max_tokens": 6})
+            self.max_batch_tokens = max_batch_tokens
+            self.max_batch_items = max_batch_items
+            self.encoder = WordEncoder()
+            self.requests = []
+            self._fake = FakeEmbedProvider()
+
+        def load_model(self):
+            pass
+
+        def embed_prepared(self, inputs, dimensions=None):
+            self.requests.append(list(inputs))
+            return self._fake.embed(inputs)
+
+    return FakeAPIProvider()
+
+
+def test_api_requests_packed_by_token_budget(pipeline_env, monkeypatch):
+    """Rows are tokenized once, truncated from the cached ids, packed into
+    requests under the token budget, and the counts become token_stats."""
+    data_dir = pipeline_env
+    import latentscope.scripts.embed as embed_mod
+    from latentscope.scripts.ingest import ingest
+    from latentscope.util.embedding_store import load_embeddings
+
+    df = make_input_df()
+    ingest("e2e-test", df, text_column="text")
+    provider = _fake_api_provider(max_batch_tokens=40, max_batch_items=7)
+    monkeypatch.setattr(embed_mod, "get_embedding_model", lambda model_id: provider)
+    embed_mod.embed("e2e-test", "text", "fake-api-model", prefix=None, rerun=None,
+                    dimensions=None, batch_size=100)
+
+    assert provider.encoder.calls == len(df)
+    assert all(len(r) <= 7 for r in provider.requests)
+    assert all(sum(len(t.split(" ")) for t in r) <= 40 for r in provider.requests)
+    sent = [t for r in provider.requests for t in r]
+    truncated = [" ".join(t.split(" ")[:6]) for t in df["text"]]
+    assert sent == truncated
+
+    vectors = load_embeddings(data_dir, "e2e-test", "embedding-001")
+    fake = FakeEmbedProvider()
+    for i in [0, 41, len(df) - 1]:
+        np.testing.assert_allclose(vectors[i], fake._vector(truncated[i]), atol=1e-6)
+    with open(os.path.join(data_dir, "e2e-test", "embeddings", "embedding-001.json")) as f:
+        meta = json.load(f)
+    assert meta["token_stats"]["total"] == 6 * len(df)
+    assert meta["token_stats"]["count"] == len(df)
+
+
+def test_api_packed_embed_resumes(pipeline_env, monkeypatch):
+    """A crash mid-run resumes after the stored prefix with packed requests."""
+    data_dir = pipeline_env
+    import latentscope.scripts.embed as embed_mod
+    from latentscope.scripts.ingest import ingest
+    from latentscope.util.embedding_store import get_embedded_indices
+
+    ingest("e2e-test", make_input_df(), text_column="text")
+    crashing = _fake_api_provider(max_batch_tokens=60)
+    real = crashing.embed_prepared
+
+    def flaky(inputs, dimensions=None):
+        if len(crashing.requests) >= 3:
+            raise RuntimeError("simulated crash")
+        return real(inputs, dimensions)
+
+    crashing.embed_prepared = flaky
+    monkeypatch.setattr(embed_mod, "get_embedding_model", lambda model_id: crashing)
+    with pytest.raises(SystemExit):
+        embed_mod.embed("e2e-test", "text", "fake-api-model", prefix=None, rerun=None,
+                        dimensions=None, batch_size=100)
+    assert len(get_embedded_indices(data_dir, "e2e-test", "embedding-001")) == 30
+
+    provider = _fake_api_provider(max_batch_tokens=60)
+    monkeypatch.setattr(embed_mod, "get_embedding_model", lambda model_id: provider)
+    embed_mod.embed("e2e-test", "text", "fake-api-model", prefix=None,
+                    rerun="embedding-001", dimensions=None, batch_size=100)
+    assert sum(len(r) for r in provider.requests) == len(make_input_df()) - 30
+    np.testing.assert_array_equal(get_embedded_indices(data_dir, "e2e-test", "embedding-001"),
+                                  np.arange(len(make_input_df())))
+
+
+# ---------------------------------------------------------------------------
+# streaming input reads
+# ---------------------------------------------------------------------------
+
+def test_embed_streams_only_the_text_column(pipeline_env, monkeypatch):
+    """ls-embed never loads input.parquet whole: it reads the text column one
+    batch at a time, and a resume starts reading at the first missing row."""
+    data_dir = pipeline_env
+    import pyarrow.parquet as pq
+
+    import latentscope.scripts.embed as embed_mod
+    from latentscope.scripts.ingest import ingest
+    from latentscope.util.embedding_store import load_embeddings
+
+    df = make_input_df()
+    ingest("e2e-test", df, text_column="text")
+
+    def no_full_read(*args, **kwargs):
+        raise AssertionError("input.parquet read in full")
+
+    monkeypatch.setattr(pd, "read_parquet", no_full_read)
+    read_columns = []
+    real_iter = pq.ParquetFile.iter_batches
+
+    def tracking_iter(self, *args, columns=None, **kwargs):
+        read_columns.append(tuple(columns))
+        return real_iter(self, *args, columns=columns, **kwargs)
+
+    monkeypatch.setattr(pq.ParquetFile, "iter_batches", tracking_iter)
+    embed_mod.embed("e2e-test", "text", "fake-test-model", prefix="doc: ", rerun=None,
+                    dimensions=None, batch_size=16)
+    assert read_columns and set(read_columns) == {("text",)}
+
+    vectors = load_embeddings(data_dir, "e2e-test", "embedding-001")
+    provider = FakeEmbedProvider()
+    assert vectors.shape == (len(df), DIM)
+    for i in [0, 16, 17, len(df) - 1]:
+        np.testing.assert_allclose(vectors[i], provider._vector("doc: " + df["text"].iloc[i]),
+                                   atol=1e-6)
+
+
+# ---------------------------------------------------------------------------
+# multi-process sharded embedding (ls-embed --workers)
+# ---------------------------------------------------------------------------
+# Worker processes are spawned, so the provider factory has to be importable
+# from this module rather than a monkeypatched lambda.
+
+def fake_provider_factory(model_id):
+    return FakeEmbedProvider()
+
+
+class SportsCrashProvider(FakeEmbedProvider):
+    def embed(self, batch, dimensions=None):
+        if any("sports" in t for t in batch):
+            raise RuntimeError("simulated shard crash")
+        return super().embed(batch, dimensions)
+
+
+def sports_crash_factory(model_id):
+    return SportsCrashProvider()
+
+
+def test_sharded_embed_matches_serial(pipeline_env, monkeypatch, capfd):
+    data_dir = pipeline_env
+    import latentscope.scripts.embed as embed_mod
+    from latentscope.scripts.ingest import ingest
+    from latentscope.util.embedding_store import load_embeddings
+
+    df = make_input_df()
+    ingest("serial", df, text_column="text")
+    ingest("sharded", df, text_column="text")
+    embed_mod.embed("serial", "text", "fake-test-model", prefix="doc: ", rerun=None,
+                    dimensions=None, batch_size=20)
+    monkeypatch.setattr(embed_mod, "get_embedding_model", fake_provider_factory)
+    embed_mod.embed("sharded", "text", "fake-test-model", prefix="doc: ", rerun=None,
+                    dimensions=None, batch_size=20, workers=2, threads_per_worker=1)
+
+    np.testing.assert_array_equal(load_embeddings(data_dir, "serial", "embedding-001"),
+                                  load_embeddings(data_dir, "sharded", "embedding-001"))
+    embedding_dir = os.path.join(data_dir, "sharded", "embeddings")
+    with open(os.path.join(embedding_dir, "embedding-001.json")) as f:
+        meta = json.load(f)
+    assert meta["workers"] == 2
+    assert not os.path.exists(os.path.join(embedding_dir, "embedding-001-shards.json"))
+    out = capfd.readouterr().out
+    assert "shard 0: 60/60 rows" in out and "shard 1: 60/60 rows" in out
+
+
+def test_sharded_embed_crashed_shard_resumes_alone(pipeline_env, monkeypatch, capfd):
+    """Shard 1 (rows 60-119) crashes when it reaches the sports rows; shard 0
+    finishes. --rerun picks shard 1 up where it stopped."""
+    data_dir = pipeline_env
+    dataset_id = "e2e-test"
+    import latentscope.scripts.embed as embed_mod
+    from latentscope.scripts.ingest import ingest
+    from latentscope.util.embedding_store import get_embedding_count, load_embeddings
+
+    df = make_input_df()
+    ingest(dataset_id, df, text_column="text")
+    monkeypatch.setattr(embed_mod, "get_embedding_model", sports_crash_factory)
+    with pytest.raises(SystemExit):
+        embed_mod.embed(dataset_id, "text", "fake-test-model", prefix=None, rerun=None,
+                        dimensions=None, batch_size=20, workers=2, threads_per_worker=1)
+    embedding_dir = os.path.join(data_dir, dataset_id, "embeddings")
+    with open(os.path.join(embedding_dir, "embedding-001-shards.json")) as f:
+        plan = json.load(f)
+    assert [s["complete"] for s in plan["shards"]] == [True, False]
+    assert get_embedding_count(data_dir, dataset_id, "embedding-001", shard=1) == 20
+    assert os.path.exists(os.path.join(embedding_dir, "embedding-001-batch-4.parquet"))
+    assert "--rerun embedding-001 --workers 2" in capfd.readouterr().out
+
+    monkeypatch.setattr(embed_mod, "get_embedding_model", fake_provider_factory)
+    embed_mod.embed(dataset_id, "text", "fake-test-model", prefix=None,
+                    rerun="embedding-001", dimensions=None, batch_size=20, workers=2)
+    assert "shard 1: resuming after 20 rows" in capfd.readouterr().out
+    vectors = load_embeddings(data_dir, dataset_id, "embedding-001")
+    expected = np.array([FakeEmbedProvider()._vector(t) for t in df["text"]])
+    np.testing.assert_allclose(vectors, expected, atol=1e-6)
+    assert not os.path.exists(os.path.join(embedding_dir, "embedding-001-batch-4.parquet"))
+
+
+# ---------------------------------------------------------------------------
+# inference backend selection (ls-embed --backend)
+# ---------------------------------------------------------------------------
+
+class FakeBackendProvider(FakeEmbedProvider):
+    """Records which backend it was loaded with; int8 adds a small error."""
+    backend = "torch"
+    loaded_backends = []
+
+    def load_model(self):
+        FakeBackendProvider.loaded_backends.append(self.backend)
+
+    def embed(self, batch, dimensions=None):
+        vectors = np.array(super().embed(batch, dimensions))
+        if self.backend == "onnx-int8":
+            vectors = vectors + 0.01
+        return list(vectors)
+
+
+def test_embed_backend_is_recorded_and_reused_by_search(pipeline_env, monkeypatch):
+    data_dir = pipeline_env
+    import latentscope.scripts.embed as embed_mod
+    import latentscope.server.search as search_mod
+    from latentscope.scripts.ingest import ingest
+
+    ingest("e2e-test", make_input_df(), text_column="text")
+    FakeBackendProvider.loaded_backends = []
+    monkeypatch.setattr(embed_mod, "get_embedding_model", lambda model_id: FakeBackendProvider())
+    embed_mod.embed("e2e-test", "text", "fake-test-model", prefix=None, rerun=None,
+                    dimensions=None, batch_size=50, backend="onnx-int8")
+    with open(os.path.join(data_dir, "e2e-test", "embeddings", "embedding-001.json")) as f:
+        meta = json.load(f)
+    assert meta["backend"] == "onnx-int8"
+
+    monkeypatch.setattr(search_mod, "get_embedding_model", lambda model_id: FakeBackendProvider())
+    model = search_mod._load_query_model(meta)
+    assert model.backend == "onnx-int8"
+    assert FakeBackendProvider.loaded_backends == ["onnx-int8", "onnx-int8"]
+
+
+def test_embed_benchmark_reports_each_backend(pipeline_env, monkeypatch, capsys):
+    import latentscope.scripts.embed as embed_mod
+
+    monkeypatch.setattr(embed_mod, "get_embedding_model", lambda model_id: FakeBackendProvider())
+    results = embed_mod.embed_benchmark("fake-test-model", ["torch", "onnx-int8"],
+                                        n_rows=40, batch_size=16)
+    assert [r["backend"] for r in results] == ["torch", "onnx-int8"]
+    assert results[0]["min_cosine"] == pytest.approx(1.0)
+    assert 0.9 < results[1]["min_cosine"] < 1.0
+    assert all(r["rows_per_sec"] > 0 for r in results)
+    assert "onnx-int8:" in capsys.readouterr().out
+
+
+# ---------------------------------------------------------------------------
+# quantized vector storage (ls-embed --precision)
+# ---------------------------------------------------------------------------
+
+def test_embed_int8_precision_is_recorded_and_dequantized(pipeline_env):
+    data_dir = pipeline_env
+    from latentscope.scripts.embed import embed
+    from latentscope.scripts.ingest import ingest
+    from latentscope.util.embedding_store import get_embedding_precision, load_embeddings
+
+    df = make_input_df()
+    ingest("e2e-test", df, text_column="text")
+    embed("e2e-test", "text", "fake-test-model", prefix=None, rerun=None, dimensions=None,
+          batch_size=50, precision="int8")
+
+    with open(os.path.join(data_dir, "e2e-test", "embeddings", "embedding-001.json")) as f:
+        meta = json.load(f)
+    assert meta["precision"] == "int8"
+    info = get_embedding_precision(data_dir, "e2e-test", "embedding-001")
+    np.testing.assert_allclose(info["offset"], meta["min_values"], atol=1e-6)
+
+    expected = np.array([FakeEmbedProvider()._vector(t) for t in df["text"]])
+    vectors = load_embeddings(data_dir, "e2e-test", "embedding-001")
+    np.testing.assert_allclose(vectors, expected, atol=np.max(info["scale"]))
+
+
 # ---------------------------------------------------------------------------
 # max_seq_length OOM preflight (#143)
 # ---------------------------------------------------------------------------
@@ -0,0 +1,97 @@
+"""Tests for the numpy thumbnail rasterizer (latentscope.util.preview)."""
+import math
+
+import numpy as np
+from PIL import Image
+
+from latentscope.util.preview import (
+    DEFAULT_COLOR,
+    _frame,
+    _pixels,
+    label_colors,
+    render_points,
+    render_points_3d,
+)
+
+
+def _read(path):
+    image = Image.open(path)
+    assert image.size == (1024, 1024)
+    return np.asarray(image.convert("RGB"), dtype=np.float64) / 255
+
+
+def _pixel_of(xy, points):
+    lo, hi = _frame(np.asarray(points, dtype=np.float64))
+    return divmod(int(_pixels(np.asarray([xy], dtype=np.float64), lo, hi, 1024)[0]), 1024)
+
+
+def test_points_blend_like_translucent_markers(tmp_path):
+    points = np.array([[-1, -1], [1, 1], [0, 0.5]] + [[-0.5, 0.0]] * 3, dtype=np.float32)
+    render_points(points, tmp_path / "p.png", point_size=30)
+    image = _read(tmp_path / "p.png")
+    np.testing.assert_allclose(image[0, 0], 1, atol=1 / 255)  # background
+    blue = np.asarray(DEFAULT_COLOR)
+    row, col = _pixel_of([0, 0.5], points)
+    np.testing.assert_allclose(image[row, col], 0.5 + 0.5 * blue, atol=2 / 255)
+    # three markers on one spot cover it as three alpha=0.5 scatter markers would
+    row, col = _pixel_of([-0.5, 0.0], points)
+    np.testing.assert_allclose(image[row, col], 0.125 + 0.875 * blue, atol=2 / 255)
+    # the marker covers its area (30 points^2 -> about a 5px disk), not one pixel
+    assert (image[row, col + 2] < 0.99).any() and (image[row, col + 5] > 0.99).all()
+
+
+def test_memmapped_layouts_render(tmp_path):
+    path = tmp_path / "coords.npy"
+    coords = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(5000, 2))
+    coords[:] = np.random.default_rng(0).uniform(-1, 1, size=(5000, 2))
+    coords.flush()
+    render_points(np.load(path, mmap_mode="r"), tmp_path / "p.png")
+    assert (_read(tmp_path / "p.png") < 0.99).any()
+
+
+def test_cluster_colours_and_hull_outlines(tmp_path):
+    rng = np.random.default_rng(1)
+    points = np.concatenate([rng.normal(loc=-0.5, scale=0.05, size=(500, 2)),
+                             rng.normal(loc=0.5, scale=0.05, size=(500, 2))])
+    labels = np.repeat([0, 1], 500)
+    colors = label_colors(labels)
+    np.testing.assert_allclose(colors[0], label_colors([0, 1])[0])
+    assert not np.allclose(colors[0], colors[-1])
+    hull = np.array([[0.2, 0.2], [0.8, 0.2], [0.8, 0.8], [0.2, 0.8]])
+    render_points(points, tmp_path / "c.png", colors=colors, hulls=[hull])
+    image = _read(tmp_path / "c.png")
+    row, col = _pixel_of([0.5, 0.2], points)  # the middle of the hull's bottom edge
+    np.testing.assert_allclose(image[row, col], 0, atol=1 / 255)
+    row, col = _pixel_of([-0.5, -0.5], points)
+    assert np.abs(image[row, col] - colors[0, :3]).max() < 0.3
+
+
+def test_3d_draws_near_points_over_far_ones(tmp_path):
+    elev, azim = math.radians(22), math.radians(-60)
+    camera = np.array([math.cos(elev) * math.cos(azim), math.cos(elev) * math.sin(azim),
+                       math.sin(elev)])
+    right = np.array([-math.sin(azim), math.cos(azim), 0.0])
+    up = np.cross(camera, right)
+    # a far and a near cluster on the same line of sight, in the middle of
+    # the frame
+    points = np.concatenate([np.tile(-camera, (50, 1)), np.tile(camera, (50, 1)),
+                             [right, -right, up, -up]]).astype(np.float32)
+    render_points_3d(points, tmp_path / "p3.png")
+    image = _read(tmp_path / "p3.png")
+    import matplotlib
+    viridis = matplotlib.colormaps["viridis"]
+    centre = image[511, 512]
+    # drawn in the nearest of the 12 depth slices, over the farthest
+    near = np.asarray(viridis(0.12 + 0.72 * 11.5 / 12)[:3])
+    far = np.asarray(viridis(0.12 + 0.72 * 0.5 / 12)[:3])
+    assert np.abs(centre - near).max() < 2 / 255
+    assert np.abs(centre - far).max() > 0.2
+
+
+def test_preview_benchmark_runs():
+    from latentscope.scripts.preview_benchmark import benchmark_preview
+
+    results = benchmark_preview(2000, cluster=True)
+    assert set(results) == {"numpy", "matplotlib"}
+    assert all(seconds > 0 for seconds in results.values())
+    assert set(benchmark_preview(2000, dimensions=3, matplotlib=False)) == {"numpy"}
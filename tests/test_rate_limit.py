@@ -0,0 +1,92 @@
+"""Unit tests for the client-side rate limiter behind ls-embed --concurrency."""
+import threading
+import time
+
+import pytest
+
+from latentscope.util.rate_limit import AIMDLimiter, RateLimiter, TokenBucket
+from latentscope.util.retry import retry_transient
+
+
+class FakeAPIError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"http {status_code}")
+        self.status_code = status_code
+
+
+class TestTokenBucket:
+    def test_paces_requests_after_burst(self):
+        bucket = TokenBucket(rate_per_minute=1200, capacity=2)  # 20/s
+        start = time.monotonic()
+        for _ in range(6):
+            bucket.acquire()
+        # 2 from the initial burst, 4 more at 20/s
+        assert time.monotonic() - start == pytest.approx(0.2, abs=0.1)
+
+    def test_oversized_request_overdraws(self):
+        bucket = TokenBucket(rate_per_minute=600, capacity=5)
+        assert bucket.acquire(50) == 0.0
+        assert bucket.tokens < 0
+
+
+class TestAIMDLimiter:
+    def test_halves_once_per_epoch_and_recovers(self):
+        limiter = AIMDLimiter(8)
+        epoch = limiter.acquire()
+        assert limiter.on_throttle(epoch)
+        assert not limiter.on_throttle(epoch)  # same burst: no second halving
+        assert limiter.limit == 4
+        limiter.release()
+        for _ in range(20):
+            limiter.on_success()
+        assert 4 < limiter.limit <= 8
+
+    def test_never_below_one(self):
+        limiter = AIMDLimiter(2)
+        for _ in range(5):
+            limiter.on_throttle(limiter.epoch)
+        assert limiter.limit == 1
+
+    def test_blocks_beyond_limit(self):
+        limiter = AIMDLimiter(1)
+        limiter.acquire()
+        acquired = threading.Event()
+
+        def second():
+            limiter.acquire()
+            acquired.set()
+
+        threading.Thread(target=second, daemon=True).start()
+        assert not acquired.wait(0.1)
+        limiter.release()
+        assert acquired.wait(1)
+
+
+class TestRateLimiter:
+    def test_retried_429_backs_off_concurrency(self):
+        limiter = RateLimiter(4)
+        calls = {"n": 0}
+
+        @retry_transient(tries=3, base=0.001)
+        def flaky():
+            calls["n"] += 1
+            if calls["n"] == 1:
+                raise FakeAPIError(429)
+            return "ok"
+
+        assert limiter.call(flaky) == "ok"
+        stats = limiter.stats()
+        assert stats["throttled"] == 1
+        assert stats["backoffs"] == 1
+        assert stats["calls"] == 1
+
+    def test_raised_errors_propagate(self):
+        limiter = RateLimiter(2)
+
+        def broken():
+            raise FakeAPIError(401)
+
+        with pytest.raises(FakeAPIError):
+            limiter.call(broken)
+        assert limiter.stats()["throttled"] == 0
+        assert limiter.aimd.in_flight == 0
@@ -7,7 +7,12 @@ random jitter are monkeypatched so the backoff sequence is deterministic.
 import pytest
 
 import latentscope.util.retry as retry_mod
-from latentscope.util.retry import is_transient_error, retry_transient
+from latentscope.util.retry import (
+    is_rate_limit_error,
+    is_transient_error,
+    retry_listener,
+    retry_transient,
+)
 
 
 class FakeAPIError(Exception):
@@ -120,6 +125,29 @@ def test_custom_predicate(sleeps):
     assert calls["n"] == 2
 
 
+def test_retry_listener_sees_each_retried_error(sleeps):
+    fn, _ = make_flaky(lambda: FakeAPIError(429), failures=2)
+    seen = []
+    with retry_listener(seen.append):
+        retry_transient(tries=4, base=1.0)(fn)()
+    assert [e.status_code for e in seen] == [429, 429]
+    # the listener is scoped to the with block
+    fn, _ = make_flaky(lambda: FakeAPIError(429), failures=1)
+    retry_transient(tries=4, base=1.0)(fn)()
+    assert len(seen) == 2
+
+
+def test_is_rate_limit_error():
+    assert is_rate_limit_error(FakeAPIError(429))
+    assert is_rate_limit_error(FakeResponseError(429))
+    assert not is_rate_limit_error(FakeAPIError(503))
+
+    class RateLimitError(Exception):
+        pass
+
+    assert is_rate_limit_error(RateLimitError("slow down"))
+
+
 class TestIsTransientError:
     def test_status_codes(self):
         assert is_transient_error(FakeAPIError(429))
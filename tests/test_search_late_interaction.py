@@ -112,3 +112,28 @@ def test_scoped_request_stays_in_scope_for_late_interaction(
     assert data["indices"] and all(0 <= i < 5 for i in data["indices"])
     # ...and the global MaxSim path must NOT have run (it encodes is_query=True).
     assert not any(c["is_query"] for c in provider.embed_multi_calls)
+
+
+def test_maxsim_candidates_use_the_tuned_index_settings(client, li_dataset, tmp_data_dir,
+                                                        monkeypatch):
+    import latentscope.server.search as search_mod
+    from latentscope.util import embedding_store
+
+    meta_path = os.path.join(tmp_data_dir, li_dataset, "embeddings", "embedding-001.json")
+    with open(meta_path) as f:
+        meta = json.load(f)
+    meta["vector_index"] = {"index_type": "IVF_PQ", "nprobes": 12, "refine_factor": 5}
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+    monkeypatch.setattr(search_mod, "get_embedding_model", lambda mid: FakeLIProvider())
+    search_mod.EMBEDDINGS.clear() if hasattr(search_mod.EMBEDDINGS, "clear") else None
+    calls = []
+    search_late_interaction = embedding_store.search_late_interaction
+    monkeypatch.setattr(embedding_store, "search_late_interaction",
+                        lambda *args, **kwargs: calls.append(kwargs) or
+                        search_late_interaction(*args, **kwargs))
+
+    res = client.get(f"/api/search/nn?dataset={li_dataset}"
+                     f"&embedding_id=embedding-001&query=hello")
+    assert res.status_code == 200
+    assert calls[0]["nprobes"] == 12 and calls[0]["refine_factor"] == 5
@@ -0,0 +1,169 @@
+"""Tests for the token-level centroid index behind late interaction search."""
+import os
+
+import numpy as np
+import pytest
+
+from latentscope.scripts.token_benchmark import exact_maxsim_topk, write_synthetic_corpus
+from latentscope.util.token_index import (
+    TokenIndex,
+    _pack_residuals,
+    _residual_table,
+    maxsim_scores,
+)
+
+
+def _flat_corpus(n_docs=300, dimensions=32, seed=0):
+    """Documents of Zipf-distributed term vectors; returns (terms, doc_terms,
+    matrix, offsets)."""
+    rng = np.random.default_rng(seed)
+    terms = rng.normal(size=(400, dimensions)).astype(np.float32)
+    terms /= np.linalg.norm(terms, axis=1, keepdims=True)
+    frequency = 1.0 / np.arange(1, 401)
+    doc_terms = [rng.choice(400, size=int(n), p=frequency / frequency.sum())
+                 for n in rng.integers(5, 20, size=n_docs)]
+    matrix = np.concatenate([terms[ids] for ids in doc_terms])
+    matrix += rng.normal(scale=0.02, size=matrix.shape).astype(np.float32)
+    offsets = np.zeros(n_docs + 1, dtype=np.int64)
+    np.cumsum([len(ids) for ids in doc_terms], out=offsets[1:])
+    return terms, doc_terms, matrix, offsets
+
+
+@pytest.mark.parametrize("chunk_tokens", [1, 5, 1 << 13])
+def test_maxsim_scores_match_per_document_loop(chunk_tokens):
+    rng = np.random.default_rng(0)
+    lengths = rng.integers(0, 6, size=40)
+    lengths[[0, 9, 39]] = 0
+    offsets = np.zeros(41, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    matrix = rng.normal(size=(int(offsets[-1]), 8)).astype(np.float16)
+    query = rng.normal(size=(3, 8))
+    q = query / np.linalg.norm(query, axis=1, keepdims=True)
+    expected = []
+    for start, stop in zip(offsets[:-1], offsets[1:]):
+        doc = matrix[start:stop].astype(np.float32)
+        doc /= np.linalg.norm(doc, axis=1, keepdims=True) + 1e-10
+        expected.append((q @ doc.T).max(axis=1).sum() if len(doc) else 0.0)
+    scores = maxsim_scores(query, matrix, offsets, normalized=False, chunk_tokens=chunk_tokens)
+    np.testing.assert_allclose(scores, expected, atol=1e-5)
+
+
+@pytest.mark.parametrize("nbits", [1, 2, 4, 8])
+def test_residual_lookup_decodes_packed_buckets(nbits):
+    rng = np.random.default_rng(0)
+    buckets = rng.integers(0, 2 ** nbits, size=(7, 24)).astype(np.uint8)
+    weights = np.arange(2 ** nbits, dtype=np.float32) / 10
+    packed = _pack_residuals(buckets, nbits)
+    assert packed.shape == (7, 24 * nbits // 8)
+    decoded = _residual_table(weights, nbits)[packed].reshape(7, -1)
+    np.testing.assert_allclose(decoded, weights[buckets])
+
+
+def test_search_recall_against_exact_maxsim(tmp_path):
+    terms, doc_terms, matrix, offsets = _flat_corpus()
+    index = TokenIndex.build(lambda: iter([(np.arange(300) * 2, matrix, offsets)]),
+                             len(matrix), num_centroids=64, version=3)
+    assert index.codes.shape == (len(matrix),)
+    assert index.ivf_offsets[-1] == len(index.ivf_docs)
+
+    rng = np.random.default_rng(1)
+    hits = 0
+    for doc in rng.choice(300, size=20, replace=False):
+        query = terms[np.unique(doc_terms[doc])[-3:]]
+        expected = set((exact_maxsim_topk(matrix, offsets, query, 5) * 2).tolist())
+        # the index only gathers candidates for the exact MaxSim rerank
+        found, scores = index.search(query, k=30)
+        assert scores == sorted(scores, reverse=True)
+        hits += len(expected & set(found))
+    assert hits / 100 >= 0.95
+
+    index.save(str(tmp_path / "index"))
+    loaded = TokenIndex.load(str(tmp_path / "index"))
+    assert loaded.version == 3 and isinstance(loaded.codes, np.memmap)
+    np.testing.assert_array_equal(loaded.decompress(np.arange(10)), index.decompress(np.arange(10)))
+    assert loaded.search(query, k=30) == index.search(query, k=30)
+
+
+def test_build_rejects_unsupported_nbits():
+    _, _, matrix, offsets = _flat_corpus(n_docs=10)
+    with pytest.raises(ValueError):
+        TokenIndex.build(lambda: iter([(np.arange(10), matrix, offsets)]), len(matrix), nbits=3)
+
+
+def test_late_interaction_uses_current_token_index(tmp_data_dir):
+    from latentscope.util.embedding_store import (
+        append_embeddings,
+        build_token_index,
+        get_token_index,
+        load_token_vectors,
+        search_late_interaction,
+    )
+
+    terms, doc_terms = write_synthetic_corpus(tmp_data_dir, "ds", "embedding-001", 400, 12, 32,
+                                              vocabulary=300, batch_size=200)
+    assert get_token_index(tmp_data_dir, "ds", "embedding-001") is None
+    index = build_token_index(tmp_data_dir, "ds", "embedding-001", num_centroids=32)
+    assert get_token_index(tmp_data_dir, "ds", "embedding-001").version == index.version
+
+    query = terms[np.unique(doc_terms[17])[-3:]]
+    matrix, offsets = load_token_vectors(tmp_data_dir, "ds", "embedding-001", flat=True)
+    expected = exact_maxsim_topk(matrix, offsets, query, 5).tolist()
+    found, _ = search_late_interaction(tmp_data_dir, "ds", "embedding-001", query,
+                                       final_limit=5)
+    assert found == expected
+
+    # an append makes the index stale: searches fall back to mean vectors
+    append_embeddings(tmp_data_dir, "ds", "embedding-001", np.ones((1, 32), dtype=np.float32),
+                      start_index=400, token_vectors_list=[np.ones((3, 32), dtype=np.float32)])
+    assert get_token_index(tmp_data_dir, "ds", "embedding-001") is None
+    found, _ = search_late_interaction(tmp_data_dir, "ds", "embedding-001", query,
+                                       final_limit=5)
+    assert len(found) == 5
+
+
+def test_late_interaction_on_table_without_unit_norm_tokens(tmp_data_dir):
+    """Tables written before token vectors were normalized on write are
+    normalized while scoring."""
+    import lancedb
+    import pyarrow as pa
+
+    from latentscope.util.embedding_store import search_late_interaction
+
+    rng = np.random.default_rng(3)
+    tokens = [rng.normal(size=(int(t), 8)) * 5 for t in rng.integers(1, 6, size=30)]
+    offsets = np.zeros(31, dtype=np.int32)
+    np.cumsum([len(t) for t in tokens], out=offsets[1:])
+    inner = pa.FixedSizeListArray.from_arrays(
+        pa.array(np.concatenate(tokens).astype(np.float16).reshape(-1)), 8)
+    db = lancedb.connect(os.path.join(tmp_data_dir, "ds", "lancedb"))
+    db.create_table("emb-embedding-001", pa.table({
+        "ls_index": pa.array(np.arange(30)),
+        "vector": pa.FixedSizeListArray.from_arrays(
+            pa.array(np.stack([t.mean(axis=0) for t in tokens]).astype(np.float32).ravel()), 8),
+        "token_vectors": pa.ListArray.from_arrays(pa.array(offsets), inner),
+        "num_tokens": pa.array(np.diff(offsets)),
+    }))
+    query = tokens[4][:2]  # one or two tokens, each matching itself at cosine 1
+    matrix = np.concatenate(tokens).astype(np.float16).astype(np.float32)
+    expected = exact_maxsim_topk(matrix, offsets.astype(np.int64), query, 5).tolist()
+    found, scores = search_late_interaction(tmp_data_dir, "ds", "embedding-001", query,
+                                            final_limit=5)
+    assert found == expected and found[0] == 4
+    assert scores[0] == pytest.approx(len(query), abs=1e-3)
+
+
+def test_maxsim_rerank_benchmark_runs():
+    from latentscope.scripts.token_benchmark import benchmark_maxsim_rerank
+
+    results = benchmark_maxsim_rerank(candidates=(20, 50), mean_tokens=6, dimensions=16,
+                                      repeats=1)
+    assert [r["candidates"] for r in results] == [20, 50]
+
+
+def test_token_index_benchmark_runs():
+    from latentscope.scripts.token_benchmark import benchmark_token_index
+
+    results = benchmark_token_index(n_docs=300, mean_tokens=10, dimensions=32, n_queries=5,
+                                    num_centroids=32)
+    assert set(results) == {"mean vectors", "token index"}
+    assert results["token index"]["recall"] >= 0.8
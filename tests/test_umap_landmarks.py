@@ -0,0 +1,71 @@
+"""ls-umap --fit_sample: landmark fit plus a streamed transform of the rest."""
+import functools
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from latentscope.scripts.umapper import _landmark_positions
+from tests.test_pipeline_e2e import FakeEmbedProvider, make_input_df
+
+
+@pytest.mark.parametrize("strategy", ["random", "stratified"])
+def test_landmarks_are_distinct_sorted_positions(strategy):
+    positions = _landmark_positions(1000, 100, strategy, seed=3)
+    assert len(np.unique(positions)) == 100 and (np.diff(positions) > 0).all()
+    assert positions.min() >= 0 and positions.max() < 1000
+    if strategy == "stratified":
+        # one per slice of ten rows
+        np.testing.assert_array_equal(positions // 10, np.arange(100))
+
+
+def test_fit_sample_streams_the_rows_it_did_not_fit(tmp_data_dir, monkeypatch):
+    import latentscope.scripts.embed as embed_mod
+    import latentscope.scripts.umapper as umapper_mod
+    from latentscope.scripts.embed import embed
+    from latentscope.scripts.ingest import ingest
+
+    monkeypatch.setenv("LATENT_SCOPE_DATA", tmp_data_dir)
+    monkeypatch.setenv("LATENT_SCOPE_NO_DOTENV", "1")
+    monkeypatch.setattr(embed_mod, "get_embedding_model", lambda model_id: FakeEmbedProvider())
+    ingest("landmarks", make_input_df(), text_column="text")
+    embed("landmarks", "text", "fake-test-model", prefix=None, rerun=None, dimensions=None,
+          batch_size=50)
+    monkeypatch.setattr(umapper_mod, "load_embeddings", lambda *args: pytest.fail(
+        "the whole embedding was loaded"))
+
+    transformed = []
+    reduce_umap = umapper_mod._reduce_umap
+
+    def recording_reduce(embeddings, *args, **kwargs):
+        umap_embeddings, reducer = reduce_umap(embeddings, *args, **kwargs)
+        transform = reducer.transform
+        reducer.transform = lambda X: transformed.append(len(X)) or transform(X)
+        return umap_embeddings, reducer
+
+    monkeypatch.setattr(umapper_mod, "_reduce_umap", recording_reduce)
+    monkeypatch.setattr(umapper_mod, "landmark_umapper",
+                        functools.partial(umapper_mod.landmark_umapper, batch_size=32))
+    # the fake embeddings are 3 topic clusters of 40 consecutive rows
+    umap_id = umapper_mod.umapper("landmarks", "embedding-001", neighbors=10, min_dist=0.1,
+                                  seed=1, fit_sample=60, fit_strategy="stratified")
+    assert sum(transformed) == 60 and max(transformed) <= 32  # batches of 32 rows
+
+    umap_dir = os.path.join(tmp_data_dir, "landmarks", "umaps")
+    with open(os.path.join(umap_dir, f"{umap_id}.json")) as f:
+        meta = json.load(f)
+    assert meta["fit_sample"] == 60 and meta["total_rows"] == 120
+    assert meta["fit_strategy"] == "stratified" and meta["peak_rss_mb"] > 0
+    df = pd.read_parquet(os.path.join(umap_dir, f"{umap_id}.parquet"))
+    assert list(df.columns) == ["x", "y"] and len(df) == 120
+    coords = df.to_numpy()
+    assert np.isclose(coords.min(), -1) and np.isclose(coords.max(), 1)
+    assert os.path.exists(os.path.join(umap_dir, f"{umap_id}.png"))
+    assert sorted(os.listdir(umap_dir)) == [f"{umap_id}.json", f"{umap_id}.parquet",
+                                            f"{umap_id}.png"]
+    # transformed rows land with the landmarks of their own topic
+    centers = np.stack([coords[i * 40:(i + 1) * 40].mean(axis=0) for i in range(3)])
+    nearest = np.argmin(((coords[:, None] - centers) ** 2).sum(axis=2), axis=1)
+    assert np.mean(nearest == np.arange(120) // 40) > 0.9
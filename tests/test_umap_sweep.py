@@ -0,0 +1,57 @@
+"""ls-umap-sweep: a grid of umaps built from one shared neighbour graph."""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import latentscope.util.knn_graph as knn_graph
+from tests.test_pipeline_e2e import FakeEmbedProvider, make_input_df
+
+
+def test_sweep_writes_a_umap_per_grid_point(tmp_data_dir, monkeypatch):
+    import latentscope.scripts.embed as embed_mod
+    from latentscope.scripts.embed import embed
+    from latentscope.scripts.ingest import ingest
+    from latentscope.scripts.umapper import umap_sweep, umapper
+
+    monkeypatch.setenv("LATENT_SCOPE_DATA", tmp_data_dir)
+    monkeypatch.setenv("LATENT_SCOPE_NO_DOTENV", "1")
+    monkeypatch.setattr(embed_mod, "get_embedding_model", lambda model_id: FakeEmbedProvider())
+    ingest("sweep", make_input_df(), text_column="text")
+    embed("sweep", "text", "fake-test-model", prefix=None, rerun=None, dimensions=None,
+          batch_size=50)
+    umapper("sweep", "embedding-001", neighbors=10, min_dist=0.1, seed=1)
+
+    builds = []
+    compute = knn_graph.compute_knn_graph
+    monkeypatch.setattr(knn_graph, "compute_knn_graph",
+                        lambda *args, **kwargs: builds.append(args[1]) or compute(*args, **kwargs))
+    summary = umap_sweep("sweep", "embedding-001", neighbors=[5, 10], min_dists=[0.1, 0.5],
+                         dimensions=[2], seed=1, workers=2)
+    assert builds == []  # the graph stored by ls-umap is reused
+    assert summary["id"] == "sweep-001"
+    assert set(summary["timings"]["fuzzy_graph"]) == {"5", "10"}
+    assert set(summary["timings"]["spectral_init"]) == {"5-2", "10-2"}
+    assert all(key in summary["timings"] for key in ("load", "knn", "layouts", "total"))
+
+    umap_dir = os.path.join(tmp_data_dir, "sweep", "umaps")
+    points = sorted(summary["umaps"], key=lambda p: p["umap_id"])
+    assert [p["umap_id"] for p in points] == ["umap-002", "umap-003", "umap-004", "umap-005"]
+    assert [(p["neighbors"], p["min_dist"]) for p in points] == [
+        (5, 0.1), (5, 0.5), (10, 0.1), (10, 0.5)]
+    for point in points:
+        umap_id = point["umap_id"]
+        with open(os.path.join(umap_dir, f"{umap_id}.json")) as f:
+            meta = json.load(f)
+        assert meta["sweep"] == "sweep-001" and meta["neighbors"] == point["neighbors"]
+        assert meta["embedding_id"] == "embedding-001" and meta["dimensions"] == 2
+        df = pd.read_parquet(os.path.join(umap_dir, f"{umap_id}.parquet"))
+        assert list(df.columns) == ["x", "y"] and len(df) == 120
+        assert np.isclose(df.to_numpy().min(), -1) and np.isclose(df.to_numpy().max(), 1)
+        assert os.path.exists(os.path.join(umap_dir, f"{umap_id}.png"))
+
+    # only the summary is left in sweeps/; nothing there is listed as a umap
+    assert os.listdir(os.path.join(umap_dir, "sweeps")) == ["sweep-001.json"]
+    with open(os.path.join(umap_dir, "sweeps", "sweep-001.json")) as f:
+        assert json.load(f)["timings"] == summary["timings"]